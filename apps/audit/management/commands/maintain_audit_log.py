@@ -0,0 +1,49 @@
+"""
+审计日志分区维护与归档命令
+
+创建未来几个月的分区（PostgreSQL），
+并把超过保留期的月份导出为压缩 JSONL 文件后删除。可由定时任务每天执行。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.audit.services import AuditArchiveService
+
+
+class Command(BaseCommand):
+    help = '维护审计日志分区，归档并删除超过保留期的月份'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help='保留的完整月份数（默认 AUDIT_RETENTION_MONTHS）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只列出将要归档的月份，不创建分区也不归档',
+        )
+
+    def handle(self, *args, **options):
+        retention_months = options['retention_months']
+        if retention_months is not None and retention_months < 0:
+            raise CommandError('--retention-months 不能为负数')
+
+        if options['dry_run']:
+            archived = AuditArchiveService.archive_expired(retention_months, dry_run=True)
+        else:
+            result = AuditArchiveService.maintain(retention_months)
+            for name in result['created']:
+                self.stdout.write(f'已创建分区 {name}')
+            archived = result['archived']
+
+        if not archived:
+            self.stdout.write(self.style.SUCCESS('没有需要归档的月份'))
+            return
+
+        for item in archived:
+            if item['path'] is None:
+                self.stdout.write(f"{item['month']}: {item['table']} {item['rows']} 条（将归档）")
+            else:
+                self.stdout.write(f"{item['month']}: {item['rows']} 条已归档到 {item['path']}")
+        self.stdout.write(self.style.SUCCESS(f'共 {len(archived)} 个月份'))
@@ -46,7 +46,7 @@ class AuditLogMiddleware(MiddlewareMixin):
                         description='用户登录'
                     )
                 except Exception as e:
-                    logger.error(f"记录登录日志失败: {e}")
+                    logger.error("记录登录日志失败: {}", e)
             
             elif request._audit_action == 'logout':
                 # 登出操作
@@ -59,7 +59,7 @@ class AuditLogMiddleware(MiddlewareMixin):
                         description='用户登出'
                     )
                 except Exception as e:
-                    logger.error(f"记录登出日志失败: {e}")
+                    logger.error("记录登出日志失败: {}", e)
         
         return response
 
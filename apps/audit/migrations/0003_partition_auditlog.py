@@ -0,0 +1,150 @@
+"""
+PostgreSQL 上把 audit_auditlog 转换为按 created_at 按月范围分区的分区表
+
+分区表的主键必须包含分区键，主键改为 (id, created_at)；id 仍由序列生成、全表唯一。
+其他数据库不做改动（由 AuditArchiveService 按月分表）。
+
+迁移不在单个事务中执行（大表复制不长时间持有锁、不产生超大事务）：
+1. 一个事务内：原表改名为 audit_auditlog_source，按原结构建新表（及分区），新表 id 使用新序列
+2. 按 id 分批复制原表数据（每批单独提交），迁移期间的新日志直接写入新表
+3. 一个事务内：删除原表，重建主键、索引和外键
+中途失败后重新执行迁移，从上次复制到的 id 继续。
+"""
+import re
+from datetime import datetime
+
+from django.db import migrations, transaction
+from django.utils import timezone
+
+TABLE = 'audit_auditlog'
+SOURCE = f'{TABLE}_source'
+SEQUENCE = f'{TABLE}_id_seq'
+# 迁移期间新表使用的序列（原表删除后改名为 SEQUENCE）
+NEW_SEQUENCE = f'{TABLE}_id_seq_new'
+# 提前创建的月份数（之后由 AuditArchiveService.ensure_partitions 维护）
+PREMAKE_MONTHS = 3
+# 每批复制的 id 范围
+COPY_BATCH_SIZE = 50000
+# 索引定义中的表名（分区表为 ON ONLY，可能带模式名），重建时替换为新表
+_INDEX_TABLE_RE = re.compile(rf' ON (?:ONLY )?(?:\S+\.)?"?(?:{TABLE}|{SOURCE})"? ')
+
+
+def _month(value, offset=0):
+    local = timezone.localtime(value)
+    index = local.year * 12 + local.month - 1 + offset
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def _prepare(cursor, qn, partitioned):
+    """原表改名，按原结构建新表（及分区），新表 id 使用新序列"""
+    cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(SOURCE)}')
+    cursor.execute(
+        f'CREATE TABLE {qn(TABLE)} (LIKE {qn(SOURCE)})'
+        + (' PARTITION BY RANGE (created_at)' if partitioned else '')
+    )
+
+    if partitioned:
+        cursor.execute(f'SELECT MIN(created_at) FROM {qn(SOURCE)}')
+        now = timezone.now()
+        month = _month(cursor.fetchone()[0] or now)
+        last = _month(now, PREMAKE_MONTHS)
+        while month <= last:
+            next_month = _month(month, 1)
+            cursor.execute(
+                f"CREATE TABLE {qn(f'{TABLE}_p{month:%Y%m}')} PARTITION OF {qn(TABLE)} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+            )
+            month = next_month
+        cursor.execute(f"CREATE TABLE {qn(f'{TABLE}_default')} PARTITION OF {qn(TABLE)} DEFAULT")
+
+    # 新日志的 id 从原表最大 id 之后开始，与待复制的数据不冲突
+    cursor.execute(f'CREATE SEQUENCE {qn(NEW_SEQUENCE)} OWNED BY {qn(TABLE)}.id')
+    cursor.execute(f"SELECT setval('{NEW_SEQUENCE}', COALESCE(MAX(id), 0) + 1, false) FROM {qn(SOURCE)}")
+    cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{NEW_SEQUENCE}')")
+
+
+def _copy(cursor, qn):
+    """按 id 分批复制原表数据（每条语句单独提交）"""
+    cursor.execute(f'SELECT MAX(id) FROM {qn(SOURCE)}')
+    last_id = cursor.fetchone()[0]
+    if last_id is None:
+        return
+    # 中途失败后重新执行时，从新表中已复制的最大 id 继续
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {qn(TABLE)} WHERE id <= %s', [last_id])
+    copied_id = cursor.fetchone()[0]
+    while copied_id < last_id:
+        upper = min(copied_id + COPY_BATCH_SIZE, last_id)
+        cursor.execute(
+            f'INSERT INTO {qn(TABLE)} SELECT * FROM {qn(SOURCE)} WHERE id > %s AND id <= %s',
+            [copied_id, upper]
+        )
+        copied_id = upper
+
+
+def _finish(cursor, qn, partitioned, index_defs, foreign_keys):
+    """删除原表，重建主键、索引和外键"""
+    # 同时删除原表的 id 序列
+    cursor.execute(f'DROP TABLE {qn(SOURCE)}')
+    cursor.execute(f'ALTER SEQUENCE {qn(NEW_SEQUENCE)} RENAME TO {qn(SEQUENCE)}')
+
+    primary_key = '(id, created_at)' if partitioned else '(id)'
+    cursor.execute(f"ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(f'{TABLE}_pkey')} PRIMARY KEY {primary_key}")
+    for index_def in index_defs:
+        cursor.execute(index_def)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}')
+
+
+def _rebuild(schema_editor, partitioned):
+    """按原表结构重建审计日志表并分批复制数据（partitioned 为 True 时建为分区表）"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = schema_editor.quote_name
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [SOURCE])
+        resuming = cursor.fetchone()[0]
+        # 索引和约束名在模式内唯一，删除原表后再按原定义重建（继续执行时原定义仍在原表上）
+        table = SOURCE if resuming else TABLE
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname NOT IN ("
+            "  SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'"
+            ")",
+            [table, table]
+        )
+        index_defs = [_INDEX_TABLE_RE.sub(f' ON {qn(TABLE)} ', row[0]) for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table]
+        )
+        foreign_keys = cursor.fetchall()
+
+        if not resuming:
+            with transaction.atomic(using=connection.alias):
+                _prepare(cursor, qn, partitioned)
+        _copy(cursor, qn)
+        with transaction.atomic(using=connection.alias):
+            _finish(cursor, qn, partitioned, index_defs, foreign_keys)
+
+
+def partition_auditlog(apps, schema_editor):
+    _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_auditlog(apps, schema_editor):
+    _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('audit', '0002_alter_auditlog_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, unpartition_auditlog),
+    ]
@@ -30,6 +30,12 @@ class AuditLog(TimestampMixin, models.Model):
         ('other', '其他'),
     ]
     
+    # 操作发生时间：缓冲后批量写入时在记录操作时设置（auto_now_add 会变成写入时间）
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='创建时间',
+        help_text='记录创建时间'
+    )
     user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -4,6 +4,8 @@
 从 apps.audit.services 迁移
 """
 
+from .audit_archive import AuditArchiveService
 from .audit_service import AuditService
+from .audit_writer import AuditWriter, audit_writer
 
-__all__ = ['AuditService']
+__all__ = ['AuditArchiveService', 'AuditService', 'AuditWriter', 'audit_writer']
@@ -0,0 +1,454 @@
+"""
+审计日志分区与归档
+
+审计日志按月（TIME_ZONE 时区）归档，超过保留期的月份导出为压缩 JSONL 文件后删除：
+- PostgreSQL：audit_auditlog 是按 created_at 范围分区的分区表（迁移 0003 转换），
+  每月一个分区 audit_auditlog_pYYYYMM，提前创建未来几个月的分区，默认分区兜底
+  （没有对应分区的月份，例如分区创建失败期间写入的日志；过期后按月从默认分区导出并删除）
+- 其他数据库：保留期内的日志都在 audit_auditlog 中（管理后台和 AuditLog.objects 可查），
+  过期月份直接从 audit_auditlog 按月导出后删除
+
+归档文件为 {AUDIT_ARCHIVE_DIR}/audit_log_YYYYMM.jsonl.gz，每行一条日志（同一月份再次归档时
+文件名加 -2、-3 等后缀）。search() 同时查询在线数据和归档文件。
+"""
+import gzip
+import heapq
+import json
+import os
+import re
+from collections.abc import Iterator
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from loguru import logger
+
+from apps.audit.models import AuditLog
+
+TABLE = AuditLog._meta.db_table
+PARTITION_PREFIX = f'{TABLE}_p'
+PARTITION_RE = re.compile(rf'^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$')
+DEFAULT_PARTITION = f'{TABLE}_default'
+ARCHIVE_RE = re.compile(r'^audit_log_(\d{4})(\d{2})(?:-\d+)?\.jsonl\.gz$')
+
+# 默认保留最近 12 个完整月份（加当月）的在线数据
+DEFAULT_RETENTION_MONTHS = 12
+# PostgreSQL 默认提前创建未来 3 个月的分区
+DEFAULT_PREMAKE_MONTHS = 3
+
+# 归档字段（数据库列）及需要转换的日期时间字段
+FIELDS = [field.attname for field in AuditLog._meta.concrete_fields]
+DATETIME_FIELDS = ('created_at', 'updated_at')
+# search() 支持的精确匹配条件
+SEARCH_FIELDS = ('user_id', 'action', 'model_name', 'object_id')
+
+
+def month_start(value: datetime) -> datetime:
+    """所在月份第一天零点（TIME_ZONE 时区）"""
+    local = timezone.localtime(value)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """月份第一天零点加减若干个月"""
+    index = month.year * 12 + month.month - 1 + months
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def _month_from(match: re.Match) -> datetime:
+    return timezone.make_aware(datetime(int(match.group(1)), int(match.group(2)), 1))
+
+
+def _overlaps(month: datetime, start: Optional[datetime], end: Optional[datetime]) -> bool:
+    """月份是否与 [start, end) 有交集"""
+    return (end is None or month < end) and (start is None or add_months(month, 1) > start)
+
+
+def _sort_key(entry: AuditLog) -> tuple[datetime, int]:
+    return entry.created_at, entry.pk
+
+
+def _dump(entry: AuditLog) -> str:
+    row = {name: getattr(entry, name) for name in FIELDS}
+    for name in DATETIME_FIELDS:
+        if row[name] is not None:
+            row[name] = row[name].isoformat()
+    return json.dumps(row, ensure_ascii=False)
+
+
+def _load(line: str) -> AuditLog:
+    row = json.loads(line)
+    for name in DATETIME_FIELDS:
+        if row.get(name):
+            row[name] = datetime.fromisoformat(row[name])
+    return AuditLog(**row)
+
+
+def _quote(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _db_datetime(value: datetime):
+    """原生 SQL 的日期时间参数（与 ORM 写入的格式一致）"""
+    return AuditLog._meta.get_field('created_at').get_db_prep_value(value, connection)
+
+
+def _from_db_datetime(value) -> Optional[datetime]:
+    """原生 SQL 返回的日期时间（SQLite 为字符串，MySQL 为不带时区的 UTC 时间）"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+class AuditArchiveService:
+    """
+    审计日志分区与归档服务类
+
+    Example:
+        AuditArchiveService.maintain()  # 定时任务：创建分区，归档过期月份
+        AuditArchiveService.search(start, end, user_id=1)  # 跨在线数据和归档文件查询
+    """
+
+    @staticmethod
+    def is_partitioned() -> bool:
+        """审计日志表是否为 PostgreSQL 分区表"""
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+            row = cursor.fetchone()
+        return bool(row) and row[0] == 'p'
+
+    @staticmethod
+    def month_tables() -> dict[datetime, str]:
+        """
+        在线的月分区（仅 PostgreSQL 分区表，其他数据库为空）
+
+        Returns:
+            dict[datetime, str]: 月份第一天 → 分区表名，按月份排序
+        """
+        if not AuditArchiveService.is_partitioned():
+            return {}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)",
+                [TABLE]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+
+        tables = {}
+        for name in names:
+            match = PARTITION_RE.match(name)
+            if match:
+                tables[_month_from(match)] = name
+        return dict(sorted(tables.items()))
+
+    @staticmethod
+    def archive_files() -> dict[datetime, list[Path]]:
+        """
+        归档文件
+
+        Returns:
+            dict[datetime, list[Path]]: 月份第一天 → 归档文件，按月份排序
+        """
+        archive_dir = Path(settings.AUDIT_ARCHIVE_DIR)
+        files: dict[datetime, list[Path]] = {}
+        if archive_dir.is_dir():
+            for path in sorted(archive_dir.iterdir()):
+                match = ARCHIVE_RE.match(path.name)
+                if match:
+                    files.setdefault(_month_from(match), []).append(path)
+        return dict(sorted(files.items()))
+
+    @staticmethod
+    def ensure_partitions(months_ahead: Optional[int] = None) -> list[str]:
+        """
+        创建当月及未来几个月的分区（仅 PostgreSQL 分区表）
+
+        Args:
+            months_ahead: 提前创建的月数，默认 AUDIT_PARTITION_PREMAKE_MONTHS
+
+        Returns:
+            list[str]: 新建的分区表名
+        """
+        if not AuditArchiveService.is_partitioned():
+            return []
+        if months_ahead is None:
+            months_ahead = getattr(settings, 'AUDIT_PARTITION_PREMAKE_MONTHS', DEFAULT_PREMAKE_MONTHS)
+
+        existing = AuditArchiveService.month_tables()
+        current = month_start(timezone.now())
+        created = []
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            name = f'{PARTITION_PREFIX}{month:%Y%m}'
+            try:
+                # 默认分区中已有该月数据时创建失败，需要人工把数据移出默认分区
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        f"CREATE TABLE {_quote(name)} PARTITION OF {_quote(TABLE)} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') "
+                        f"TO ('{add_months(month, 1).isoformat()}')"
+                    )
+            except Exception as e:
+                logger.error('创建审计日志分区 {} 失败: {}', name, e)
+                continue
+            created.append(name)
+        return created
+
+    @staticmethod
+    def archive_expired(
+        retention_months: Optional[int] = None,
+        dry_run: bool = False
+    ) -> list[dict[str, Any]]:
+        """
+        归档过期月份：导出为压缩 JSONL 文件后删除
+
+        保留最近 retention_months 个完整月份和当月，更早的月份整月归档：
+        分区表导出后删除月分区，默认分区中更早月份的日志同样按月导出后删除；
+        非分区表直接从 audit_auditlog 按月导出后删除。
+
+        Args:
+            retention_months: 保留的完整月份数，默认 AUDIT_RETENTION_MONTHS
+            dry_run: 只列出将要归档的月份，不导出也不删除
+
+        Returns:
+            list[dict]: 每个归档月份的 month、table、rows、path（dry_run 时为 None）
+        """
+        if retention_months is None:
+            retention_months = getattr(settings, 'AUDIT_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS)
+        cutoff = add_months(month_start(timezone.now()), -retention_months)
+
+        archived = []
+        for month, name in AuditArchiveService.month_tables().items():
+            if month >= cutoff:
+                break
+            if dry_run:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {_quote(name)}')
+                    rows, path = cursor.fetchone()[0], None
+            else:
+                path, rows, _ = AuditArchiveService._export(month, name)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {_quote(name)}')
+                logger.info('已归档审计日志 {}（{} 条）到 {}', name, rows, path)
+            archived.append({'month': f'{month:%Y-%m}', 'table': name, 'rows': rows, 'path': path})
+
+        table = DEFAULT_PARTITION if AuditArchiveService.is_partitioned() else TABLE
+        archived += AuditArchiveService._archive_rows(table, cutoff, dry_run)
+        archived.sort(key=lambda item: item['month'])
+        return archived
+
+    @staticmethod
+    def _archive_rows(table: str, cutoff: datetime, dry_run: bool = False) -> list[dict[str, Any]]:
+        """按月导出并删除表中早于 cutoff 的日志（PostgreSQL 的默认分区或非分区表）"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT MIN(created_at) FROM {_quote(table)} WHERE created_at < %s',
+                [_db_datetime(cutoff)]
+            )
+            oldest = _from_db_datetime(cursor.fetchone()[0])
+        if oldest is None:
+            return []
+
+        archived = []
+        month = month_start(oldest)
+        while month < cutoff:
+            next_month = add_months(month, 1)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {_quote(table)} '
+                    f'WHERE created_at >= %s AND created_at < %s',
+                    [_db_datetime(month), _db_datetime(next_month)]
+                )
+                rows, path = cursor.fetchone()[0], None
+            if rows and not dry_run:
+                # 导出和删除在同一事务中，导出后新写入该月的日志不会被删除
+                with transaction.atomic():
+                    path, rows, last_id = AuditArchiveService._export(month, table, month, next_month)
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f'DELETE FROM {_quote(table)} '
+                            f'WHERE created_at >= %s AND created_at < %s AND id <= %s',
+                            [_db_datetime(month), _db_datetime(next_month), last_id]
+                        )
+                logger.info('已归档 {} 中 {:%Y-%m} 的审计日志（{} 条）到 {}', table, month, rows, path)
+            if rows:
+                archived.append({
+                    'month': f'{month:%Y-%m}', 'table': table, 'rows': rows, 'path': path
+                })
+            month = next_month
+        return archived
+
+    @staticmethod
+    def maintain(retention_months: Optional[int] = None) -> dict[str, Any]:
+        """
+        定时维护：创建分区（PostgreSQL），并归档过期月份
+
+        Args:
+            retention_months: 保留的完整月份数，默认 AUDIT_RETENTION_MONTHS
+
+        Returns:
+            dict: created（新建分区）、archived（归档结果）
+        """
+        created = AuditArchiveService.ensure_partitions()
+        archived = AuditArchiveService.archive_expired(retention_months)
+        return {'created': created, 'archived': archived}
+
+    @staticmethod
+    def search(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        **filters: Any
+    ) -> list[AuditLog]:
+        """
+        跨在线数据和归档文件查询审计日志（合规查询）
+
+        在线数据的条件、排序和条数在 SQL 中处理；只读取与时间范围有交集的归档文件，
+        指定 limit 时从最近的月份开始读取，已取够更新的日志后不再读取更早的归档文件。
+        归档文件中的日志为未保存的 AuditLog 对象（user 只有 user_id，用户可能已删除）。
+        同一条日志（相同 id）只返回一次。
+
+        Args:
+            start: 开始时间（含），None 表示不限
+            end: 结束时间（不含），None 表示不限
+            limit: 最多返回条数
+            **filters: 精确匹配条件，支持 user_id、action、model_name、object_id
+
+        Returns:
+            list[AuditLog]: 按时间倒序的审计日志
+        """
+        unknown = set(filters) - set(SEARCH_FIELDS)
+        if unknown:
+            raise ValueError(f"不支持的查询条件: {', '.join(sorted(unknown))}")
+        filters = {name: value for name, value in filters.items() if value is not None}
+
+        time_filters = {}
+        if start is not None:
+            time_filters['created_at__gte'] = start
+        if end is not None:
+            time_filters['created_at__lt'] = end
+
+        # 在线数据（分区表包含所有分区，非分区表包含保留期内的全部月份）
+        online = AuditLog.objects.filter(**time_filters, **filters).order_by('-created_at', '-id')
+        if limit is not None:
+            online = online[:limit]
+        results = {entry.pk: entry for entry in online.iterator()}
+
+        # 归档文件，从最近的月份开始
+        sources = [
+            (month, path)
+            for month, paths in AuditArchiveService.archive_files().items()
+            if _overlaps(month, start, end)
+            for path in paths
+        ]
+        sources.sort(key=lambda source: source[0], reverse=True)
+
+        for month, path in sources:
+            if limit is not None and len(results) >= limit:
+                # 已有 limit 条不早于该月月末的日志，该月及更早的月份不会进入结果
+                if min(results.values(), key=_sort_key).created_at >= add_months(month, 1):
+                    break
+            entries = AuditArchiveService._search_archive(path, start, end, filters, limit)
+            for entry in entries:
+                results.setdefault(entry.pk, entry)
+            if limit is not None and len(results) > limit:
+                results = {
+                    entry.pk: entry
+                    for entry in heapq.nlargest(limit, results.values(), key=_sort_key)
+                }
+
+        return sorted(results.values(), key=_sort_key, reverse=True)
+
+    @staticmethod
+    def _iter_table(
+        name: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[AuditLog]:
+        """按 id 顺序读取表（月分区、默认分区或 audit_auditlog）中 [start, end) 的日志"""
+        where, params = [], []
+        for operator, value in (('>=', start), ('<', end)):
+            if value is None:
+                continue
+            where.append(f"{_quote('created_at')} {operator} %s")
+            params.append(_db_datetime(value))
+
+        sql = f"SELECT {', '.join(_quote(field) for field in FIELDS)} FROM {_quote(name)}"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f" ORDER BY {_quote('id')}"
+        return AuditLog.objects.raw(sql, params).iterator()
+
+    @staticmethod
+    def _iter_archive(path: Path) -> Iterator[AuditLog]:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield _load(line)
+
+    @staticmethod
+    def _search_archive(
+        path: Path,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        filters: dict[str, Any],
+        limit: Optional[int]
+    ) -> list[AuditLog]:
+        """按条件读取归档文件中的日志（指定 limit 时只保留最近的 limit 条）"""
+        entries = (
+            entry for entry in AuditArchiveService._iter_archive(path)
+            if (start is None or entry.created_at >= start)
+            and (end is None or entry.created_at < end)
+            and all(getattr(entry, name) == value for name, value in filters.items())
+        )
+        if limit is None:
+            return list(entries)
+        return heapq.nlargest(limit, entries, key=_sort_key)
+
+    @staticmethod
+    def _export(
+        month: datetime,
+        name: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> tuple[Path, int, Optional[int]]:
+        """
+        导出表（或其中 [start, end) 的日志）到归档文件（写完并落盘后才出现在归档目录中）
+
+        Returns:
+            tuple: 归档文件路径、导出条数、导出的最大 id（没有日志时为 None）
+        """
+        archive_dir = Path(settings.AUDIT_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+
+        # 同一月份已归档过（例如之后又写入了该月的日志）时另起文件，不覆盖
+        path = archive_dir / f'audit_log_{month:%Y%m}.jsonl.gz'
+        suffix = 2
+        while path.exists():
+            path = archive_dir / f'audit_log_{month:%Y%m}-{suffix}.jsonl.gz'
+            suffix += 1
+
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        rows, last_id = 0, None
+        with open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(filename=path.name, mode='wb', fileobj=raw) as f:
+                for entry in AuditArchiveService._iter_table(name, start, end):
+                    f.write(_dump(entry).encode('utf-8') + b'\n')
+                    rows += 1
+                    last_id = entry.pk
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        return path, rows, last_id
@@ -2,22 +2,26 @@
 审计日志服务
 
 提供审计日志的创建和查询服务。
+
+审计日志由 audit_writer 缓冲后批量写入（见 audit_writer.py），
+在事务中记录的日志等事务提交后才进入缓冲区（事务回滚时不记录）。
 """
-import json
+import ipaddress
+from collections.abc import Iterable
 from typing import Any, Optional
 
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import models, transaction
 from django.http import HttpRequest
 
 from apps.audit.models import AuditLog
+from apps.audit.services.audit_writer import audit_writer
 
 
 class AuditService:
     """审计日志服务类"""
-    
+
     @staticmethod
-    @transaction.atomic
     def log_action(
         action: str,
         model_name: str,
@@ -30,7 +34,7 @@ class AuditService:
     ) -> AuditLog:
         """
         记录操作日志
-        
+
         Args:
             action: 操作类型（create/update/delete/view等）
             model_name: 模型名称
@@ -40,72 +44,42 @@ class AuditService:
             description: 操作描述
             request: HTTP请求对象（用于获取IP和User-Agent）
             changes: 变更内容（字典格式）
-            
+
         Returns:
-            AuditLog: 创建的审计日志对象
+            AuditLog: 审计日志对象（缓冲写入时尚未保存）
         """
-        ip_address = None
-        user_agent = ''
-        
-        if request:
-            # 获取IP地址
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(',')[0]
-            else:
-                ip_address = request.META.get('REMOTE_ADDR')
-            
-            # 获取User-Agent
-            user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
-        
-        # 如果没有提供user，尝试从request获取
-        if not user and request and hasattr(request, 'user'):
-            user = request.user if request.user.is_authenticated else None
-        
-        audit_log = AuditLog.objects.create(
-            user=user,
-            action=action,
-            model_name=model_name,
-            object_id=str(object_id) if object_id else None,
-            object_repr=object_repr[:200] if object_repr else None,
+        user, ip_address, user_agent = AuditService._request_info(user, request)
+        audit_log = AuditService._build(
+            action, model_name, user, ip_address, user_agent,
+            object_id=object_id,
+            object_repr=object_repr,
             description=description,
-            ip_address=ip_address,
-            user_agent=user_agent,
             changes=changes
         )
-        
+        AuditService._write([audit_log])
         return audit_log
-    
+
     @staticmethod
     def log_model_create(
         instance: Any,
         user: Optional[User] = None,
         request: Optional[HttpRequest] = None,
         description: str = ''
-    ) -> AuditLog:
+    ) -> AuditLog | list[AuditLog]:
         """
         记录模型创建操作
-        
+
         Args:
-            instance: 创建的模型实例
+            instance: 创建的模型实例，或实例列表/查询集（批量操作，逐个记录、一次写入）
             user: 操作用户
             request: HTTP请求对象
             description: 操作描述
-            
+
         Returns:
-            AuditLog: 创建的审计日志对象
+            AuditLog | list[AuditLog]: 审计日志对象（传入多个实例时为列表）
         """
-        model_name = instance._meta.label
-        return AuditService.log_action(
-            action='create',
-            model_name=model_name,
-            user=user,
-            object_id=str(instance.pk),
-            object_repr=str(instance),
-            description=description or f"创建{model_name}对象",
-            request=request
-        )
-    
+        return AuditService._log_instances('create', '创建', instance, user, request, description)
+
     @staticmethod
     def log_model_update(
         instance: Any,
@@ -114,68 +88,149 @@ class AuditService:
         old_values: Optional[dict[str, Any]] = None,
         new_values: Optional[dict[str, Any]] = None,
         description: str = ''
-    ) -> AuditLog:
+    ) -> AuditLog | list[AuditLog]:
         """
         记录模型更新操作
-        
+
         Args:
-            instance: 更新的模型实例
+            instance: 更新的模型实例，或实例列表/查询集（批量操作，变更内容相同）
             user: 操作用户
             request: HTTP请求对象
             old_values: 更新前的值
             new_values: 更新后的值
             description: 操作描述
-            
+
         Returns:
-            AuditLog: 创建的审计日志对象
+            AuditLog | list[AuditLog]: 审计日志对象（传入多个实例时为列表）
         """
-        model_name = instance._meta.label
-        
         changes = None
         if old_values and new_values:
             changes = {
                 'old': old_values,
                 'new': new_values
             }
-        
-        return AuditService.log_action(
-            action='update',
-            model_name=model_name,
-            user=user,
-            object_id=str(instance.pk),
-            object_repr=str(instance),
-            description=description or f"更新{model_name}对象",
-            request=request,
-            changes=changes
+
+        return AuditService._log_instances(
+            'update', '更新', instance, user, request, description, changes
         )
-    
+
     @staticmethod
     def log_model_delete(
         instance: Any,
         user: Optional[User] = None,
         request: Optional[HttpRequest] = None,
         description: str = ''
-    ) -> AuditLog:
+    ) -> AuditLog | list[AuditLog]:
         """
         记录模型删除操作
-        
+
+        批量删除时应在删除前调用（删除后实例的主键为空）。
+
         Args:
-            instance: 删除的模型实例
+            instance: 删除的模型实例，或实例列表/查询集（批量操作）
             user: 操作用户
             request: HTTP请求对象
             description: 操作描述
-            
+
         Returns:
-            AuditLog: 创建的审计日志对象
+            AuditLog | list[AuditLog]: 审计日志对象（传入多个实例时为列表）
         """
-        model_name = instance._meta.label
-        return AuditService.log_action(
-            action='delete',
-            model_name=model_name,
+        return AuditService._log_instances('delete', '删除', instance, user, request, description)
+
+    @staticmethod
+    def _log_instances(
+        action: str,
+        verb: str,
+        instances: models.Model | Iterable[models.Model],
+        user: Optional[User],
+        request: Optional[HttpRequest],
+        description: str,
+        changes: Optional[dict[str, Any]] = None
+    ) -> AuditLog | list[AuditLog]:
+        """为一个或多个模型实例记录同一操作，一次放入写入缓冲区"""
+        single = isinstance(instances, models.Model)
+        user, ip_address, user_agent = AuditService._request_info(user, request)
+
+        audit_logs = []
+        for instance in [instances] if single else instances:
+            model_name = instance._meta.label
+            audit_logs.append(AuditService._build(
+                action, model_name, user, ip_address, user_agent,
+                object_id=str(instance.pk),
+                object_repr=str(instance),
+                description=description or f"{verb}{model_name}对象",
+                changes=changes
+            ))
+
+        AuditService._write(audit_logs)
+        return audit_logs[0] if single else audit_logs
+
+    @staticmethod
+    def _request_info(
+        user: Optional[User],
+        request: Optional[HttpRequest]
+    ) -> tuple[Optional[User], Optional[str], str]:
+        """从请求中获取操作用户（未提供时）、IP地址和User-Agent"""
+        ip_address = None
+        user_agent = ''
+
+        if request:
+            # 获取IP地址
+            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+            if x_forwarded_for:
+                ip_address = x_forwarded_for.split(',')[0]
+            else:
+                ip_address = request.META.get('REMOTE_ADDR')
+            # X-Forwarded-For 由客户端控制，不合法的地址写入 inet 列会导致写入失败
+            ip_address = AuditService._valid_ip(ip_address)
+
+            # 获取User-Agent
+            user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
+
+        # 如果没有提供user，尝试从request获取
+        if not user and request and hasattr(request, 'user'):
+            user = request.user if request.user.is_authenticated else None
+
+        return user, ip_address, user_agent
+
+    @staticmethod
+    def _valid_ip(value: Optional[str]) -> Optional[str]:
+        """校验 IP 地址，不合法时返回 None"""
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            ipaddress.ip_address(value)
+        except ValueError:
+            return None
+        return value
+
+    @staticmethod
+    def _build(
+        action: str,
+        model_name: str,
+        user: Optional[User],
+        ip_address: Optional[str],
+        user_agent: str,
+        object_id: Optional[str] = None,
+        object_repr: Optional[str] = None,
+        description: str = '',
+        changes: Optional[dict[str, Any]] = None
+    ) -> AuditLog:
+        """创建未保存的审计日志对象（操作时间为当前时间）"""
+        return AuditLog(
             user=user,
-            object_id=str(instance.pk),
-            object_repr=str(instance),
-            description=description or f"删除{model_name}对象",
-            request=request
+            action=action,
+            model_name=model_name,
+            object_id=str(object_id) if object_id else None,
+            object_repr=object_repr[:200] if object_repr else None,
+            description=description,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            changes=changes
         )
 
+    @staticmethod
+    def _write(audit_logs: list[AuditLog]) -> None:
+        """事务提交后放入写入缓冲区（不在事务中时立即放入）"""
+        transaction.on_commit(lambda: audit_writer.write(audit_logs))
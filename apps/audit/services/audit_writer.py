@@ -0,0 +1,226 @@
+"""
+审计日志缓冲写入
+
+请求线程只把审计日志（未保存的 AuditLog）放入进程内缓冲区，
+由后台线程按数量或时间阈值批量写入（bulk_create），进程退出时写完缓冲区。
+
+写入方式由 AUDIT_WRITE_MODE 决定：
+- 'buffered'（默认）：后台线程 bulk_create
+- 'celery'：后台线程把一批日志投递给 Celery 任务写入（投递失败时在本进程写入）
+- 'sync'：立即 bulk_create（测试环境或需要立即可查的场景）
+
+整批写入因个别日志的数据错误（外键指向已删除的用户等）失败时改为逐条写入，
+只丢弃写不进去的日志，其余日志不受影响。
+"""
+import atexit
+import os
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from loguru import logger
+
+from apps.audit.models import AuditLog
+
+# 缓冲区达到此条数时立即唤醒后台线程写入
+DEFAULT_BUFFER_SIZE = 100
+# 后台线程的最长写入间隔（秒）
+DEFAULT_FLUSH_INTERVAL = 2.0
+# 写入失败时缓冲区最多保留的条数，超出时丢弃最早的日志
+MAX_PENDING = 10000
+# bulk_create 每批条数
+BULK_BATCH_SIZE = 500
+
+# Celery 投递时序列化的字段
+SERIALIZED_FIELDS = (
+    'user_id', 'action', 'model_name', 'object_id', 'object_repr',
+    'description', 'ip_address', 'user_agent', 'changes',
+)
+
+
+class AuditWriteError(Exception):
+    """逐条写入时发生数据错误以外的异常（连接中断等），remaining 为尚未写入的日志"""
+
+    def __init__(self, remaining: list[AuditLog]) -> None:
+        super().__init__(f'{len(remaining)} 条审计日志未写入')
+        self.remaining = remaining
+
+
+def write_entries(entries: list[AuditLog]) -> int:
+    """
+    批量写入审计日志，整批写入因数据错误失败时逐条写入并丢弃出错的日志
+
+    Args:
+        entries: 未保存的审计日志
+
+    Returns:
+        int: 写入的条数
+
+    Raises:
+        AuditWriteError: 逐条写入时发生连接中断等异常（已写入的日志不在 remaining 中）
+        Exception: 整批写入时发生数据错误以外的异常（均未写入）
+    """
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        return len(entries)
+    except (IntegrityError, DataError) as e:
+        logger.warning('批量写入审计日志失败（{} 条），改为逐条写入: {}', len(entries), e)
+
+    written = 0
+    for index, entry in enumerate(entries):
+        try:
+            with transaction.atomic():
+                AuditLog.objects.bulk_create([entry])
+        except (IntegrityError, DataError) as e:
+            logger.error(
+                '丢弃无法写入的审计日志: action={}, model={}, object_id={}, 原因: {}',
+                entry.action, entry.model_name, entry.object_id, e
+            )
+        except Exception as e:
+            raise AuditWriteError(entries[index:]) from e
+        else:
+            written += 1
+    return written
+
+
+def serialize_entries(entries: list[AuditLog]) -> list[dict]:
+    """序列化审计日志（用于 Celery 投递）"""
+    return [
+        {
+            **{name: getattr(entry, name) for name in SERIALIZED_FIELDS},
+            'created_at': entry.created_at.isoformat(),
+        }
+        for entry in entries
+    ]
+
+
+def deserialize_entries(rows: list[dict]) -> list[AuditLog]:
+    """反序列化审计日志"""
+    return [
+        AuditLog(**{**row, 'created_at': datetime.fromisoformat(row['created_at'])})
+        for row in rows
+    ]
+
+
+class AuditWriter:
+    """
+    审计日志缓冲写入器（每个进程一个，见 audit_writer）
+
+    Example:
+        audit_writer.write([AuditLog(action='login', model_name='User')])
+        audit_writer.flush()  # 立即写入缓冲区（进程退出时自动调用）
+    """
+
+    def __init__(self) -> None:
+        self._buffer: list[AuditLog] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        atexit.register(self.flush)
+
+    @property
+    def mode(self) -> str:
+        return getattr(settings, 'AUDIT_WRITE_MODE', 'buffered')
+
+    def write(self, entries: list[AuditLog]) -> None:
+        """
+        写入审计日志（缓冲模式下只放入缓冲区）
+
+        Args:
+            entries: 未保存的审计日志
+        """
+        if not entries:
+            return
+        if self.mode == 'sync':
+            write_entries(entries)
+            return
+
+        buffer_size = getattr(settings, 'AUDIT_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+        with self._lock:
+            self._buffer.extend(entries)
+            full = len(self._buffer) >= buffer_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        写入缓冲区中的全部审计日志
+
+        Returns:
+            int: 写入（或投递）的条数（数据错误被丢弃的日志不计入），
+                数据库不可用时为 0（未写入的日志放回缓冲区等待下次写入）
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return 0
+            try:
+                if self.mode == 'celery':
+                    return self._send(entries)
+                return write_entries(entries)
+            except AuditWriteError as e:
+                logger.error('写入审计日志失败（{} 条未写入）: {}', len(e.remaining), e.__cause__)
+                self._requeue(e.remaining)
+                return 0
+            except Exception as e:
+                logger.error('写入审计日志失败（{} 条）: {}', len(entries), e)
+                self._requeue(entries)
+                return 0
+
+    def pending(self) -> int:
+        """缓冲区中等待写入的条数"""
+        with self._lock:
+            return len(self._buffer)
+
+    def _send(self, entries: list[AuditLog]) -> int:
+        """投递给 Celery 任务写入，投递失败时在本进程写入"""
+        from apps.audit.tasks import write_audit_logs
+
+        try:
+            write_audit_logs.delay(serialize_entries(entries))
+        except Exception as e:
+            logger.warning('投递审计日志任务失败，改为直接写入: {}', e)
+            return write_entries(entries)
+        return len(entries)
+
+    def _requeue(self, entries: list[AuditLog]) -> None:
+        with self._lock:
+            self._buffer[:0] = entries
+            dropped = len(self._buffer) - MAX_PENDING
+            if dropped > 0:
+                del self._buffer[:dropped]
+        if dropped > 0:
+            logger.error('审计日志积压超过 {} 条，已丢弃最早的 {} 条', MAX_PENDING, dropped)
+
+    def _ensure_thread(self) -> None:
+        """启动后台写入线程（按进程启动，fork 出的子进程重新启动）"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        interval = getattr(settings, 'AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        while True:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # 每次写入后（无论成功与否）关闭出错或超过 CONN_MAX_AGE 的连接，
+                # 数据库重启等故障后下次写入使用新连接
+                close_old_connections()
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,48 @@
+"""
+审计日志异步任务
+
+- write_audit_logs：AUDIT_WRITE_MODE='celery' 时，各进程的审计日志缓冲区按批投递到此任务写入
+- maintain_audit_log：分区维护与过期月份归档（也可用 maintain_audit_log 管理命令由 cron 执行）
+"""
+
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=5, ignore_result=True)
+def write_audit_logs(self, rows):
+    """
+    批量写入审计日志
+
+    Args:
+        rows: 序列化的审计日志列表（见 apps.audit.services.audit_writer.serialize_entries）
+    """
+    from apps.audit.services.audit_writer import (
+        AuditWriteError,
+        deserialize_entries,
+        serialize_entries,
+        write_entries,
+    )
+
+    # 数据错误的日志在 write_entries 中逐条丢弃，重试只针对连接中断等暂时性错误
+    try:
+        count = write_entries(deserialize_entries(rows))
+    except AuditWriteError as exc:
+        raise self.retry(args=(serialize_entries(exc.remaining),), exc=exc.__cause__)
+    except Exception as exc:
+        raise self.retry(exc=exc)
+    return {'status': 'success', 'count': count}
+
+
+@shared_task(ignore_result=True)
+def maintain_audit_log():
+    """
+    审计日志分区维护与归档（每天执行，见 AuditArchiveService.maintain）
+    """
+    from apps.audit.services.audit_archive import AuditArchiveService
+
+    result = AuditArchiveService.maintain()
+    return {
+        'status': 'success',
+        'created': result['created'],
+        'archived': [item['month'] for item in result['archived']],
+    }
@@ -0,0 +1,200 @@
+"""
+审计日志归档测试（SQLite，非分区表）
+
+验证保留期内的日志留在 audit_auditlog 中，过期月份导出为 .jsonl.gz 后删除，
+search() 合并在线数据和归档文件（时间倒序、limit、按 id 去重）。
+"""
+import gzip
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from apps.audit.models import AuditLog
+from apps.audit.services import AuditArchiveService
+from apps.audit.services.audit_archive import TABLE, add_months, month_start
+
+RETENTION_MONTHS = 2
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(settings, tmp_path):
+    settings.AUDIT_ARCHIVE_DIR = str(tmp_path / 'audit_log')
+    settings.AUDIT_RETENTION_MONTHS = RETENTION_MONTHS
+    return tmp_path / 'audit_log'
+
+
+def months_ago(months: int, days: int = 2):
+    """若干个月前的月份中的某个时间"""
+    return add_months(month_start(timezone.now()), -months) + timedelta(days=days)
+
+
+def create_logs(months: int, count: int, **fields) -> list[AuditLog]:
+    return [
+        AuditLog.objects.create(
+            action='update',
+            model_name='ParkingLot',
+            object_id=f'{months}-{i}',
+            created_at=months_ago(months, days=i + 1),
+            **fields
+        )
+        for i in range(count)
+    ]
+
+
+def read_archive(path) -> list[dict]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.django_db
+class TestArchiveExpired:
+    """过期月份归档"""
+
+    def test_retention_window_stays_in_main_table(self):
+        """保留期内的月份不归档，仍可通过 AuditLog.objects 查询"""
+        create_logs(0, 1)
+        create_logs(1, 2)
+        create_logs(RETENTION_MONTHS, 2)
+
+        assert AuditArchiveService.archive_expired() == []
+        assert AuditLog.objects.count() == 5
+        assert AuditArchiveService.month_tables() == {}
+
+    def test_export_and_delete_expired_months(self, archive_dir):
+        """过期月份按月导出为 .jsonl.gz 后从 audit_auditlog 删除"""
+        kept = create_logs(1, 2)
+        old = create_logs(RETENTION_MONTHS + 1, 3)
+        older = create_logs(RETENTION_MONTHS + 4, 1)
+
+        archived = AuditArchiveService.archive_expired()
+
+        assert [(item['month'], item['table'], item['rows']) for item in archived] == [
+            (f'{months_ago(RETENTION_MONTHS + 4):%Y-%m}', TABLE, 1),
+            (f'{months_ago(RETENTION_MONTHS + 1):%Y-%m}', TABLE, 3),
+        ]
+        assert sorted(AuditLog.objects.values_list('pk', flat=True)) == [e.pk for e in kept]
+
+        path = archived[1]['path']
+        assert path.parent == archive_dir
+        assert path.name == f'audit_log_{months_ago(RETENTION_MONTHS + 1):%Y%m}.jsonl.gz'
+        rows = read_archive(path)
+        assert [row['id'] for row in rows] == [e.pk for e in old]
+        assert rows[0]['object_id'] == old[0].object_id
+        assert datetime.fromisoformat(rows[0]['created_at']) == old[0].created_at
+        assert [e.pk for e in older] == [row['id'] for row in read_archive(archived[0]['path'])]
+        assert not list(archive_dir.glob('.*.tmp'))
+
+    def test_dry_run_changes_nothing(self, archive_dir):
+        """dry_run 只列出将要归档的月份"""
+        create_logs(RETENTION_MONTHS + 1, 2)
+
+        archived = AuditArchiveService.archive_expired(dry_run=True)
+
+        assert [(item['rows'], item['path']) for item in archived] == [(2, None)]
+        assert AuditLog.objects.count() == 2
+        assert not archive_dir.exists()
+
+    def test_rearchive_same_month_uses_new_file(self):
+        """同一月份再次归档时另起文件，不覆盖已有归档"""
+        create_logs(RETENTION_MONTHS + 1, 1)
+        first = AuditArchiveService.archive_expired()[0]['path']
+        create_logs(RETENTION_MONTHS + 1, 2)
+
+        second = AuditArchiveService.archive_expired()[0]['path']
+
+        assert second.name == first.name.replace('.jsonl.gz', '-2.jsonl.gz')
+        assert len(read_archive(first)) == 1
+        assert len(read_archive(second)) == 2
+
+    def test_maintain_command(self):
+        """维护命令归档过期月份"""
+        create_logs(RETENTION_MONTHS + 1, 2)
+        out = StringIO()
+
+        call_command('maintain_audit_log', stdout=out)
+
+        assert '2 条已归档到' in out.getvalue()
+        assert AuditLog.objects.count() == 0
+
+
+@pytest.mark.django_db
+class TestArchiveSearch:
+    """跨在线数据和归档文件查询"""
+
+    def test_merges_live_and_archived_logs(self):
+        """合并在线数据和归档文件，按时间倒序返回"""
+        live = create_logs(1, 2)
+        archived = create_logs(RETENTION_MONTHS + 1, 2)
+        AuditArchiveService.archive_expired()
+
+        results = AuditArchiveService.search()
+
+        assert [e.pk for e in results] == [e.pk for e in sorted(
+            live + archived, key=lambda e: e.created_at, reverse=True
+        )]
+        assert results[-1].object_id == archived[0].object_id
+        assert results[-1]._state.adding
+
+    def test_filters_and_time_range(self):
+        """精确匹配条件和时间范围同时作用于在线数据和归档文件"""
+        create_logs(1, 2)
+        create_logs(RETENTION_MONTHS + 1, 2)
+        AuditLog.objects.filter(
+            object_id__in=['1-0', f'{RETENTION_MONTHS + 1}-0']
+        ).update(action='delete')
+        AuditArchiveService.archive_expired()
+
+        results = AuditArchiveService.search(action='delete')
+        assert sorted(e.object_id for e in results) == ['1-0', f'{RETENTION_MONTHS + 1}-0']
+
+        start = month_start(months_ago(RETENTION_MONTHS + 1))
+        end = add_months(start, 1)
+        results = AuditArchiveService.search(start, end)
+        assert sorted(e.object_id for e in results) == [
+            f'{RETENTION_MONTHS + 1}-0', f'{RETENTION_MONTHS + 1}-1'
+        ]
+
+    def test_unknown_filter(self):
+        """不支持的查询条件"""
+        with pytest.raises(ValueError, match='ip_address'):
+            AuditArchiveService.search(ip_address='127.0.0.1')
+
+    def test_limit_reads_newest_sources_first(self, monkeypatch):
+        """指定 limit 时取够最近的日志后不再读取更早的归档文件"""
+        create_logs(RETENTION_MONTHS + 1, 3)
+        create_logs(RETENTION_MONTHS + 3, 3)
+        AuditArchiveService.archive_expired()
+        newest = create_logs(1, 2)
+
+        read = []
+        search_archive = AuditArchiveService._search_archive
+
+        def record(path, *args):
+            read.append(path.name)
+            return search_archive(path, *args)
+
+        monkeypatch.setattr(AuditArchiveService, '_search_archive', staticmethod(record))
+
+        results = AuditArchiveService.search(limit=4)
+
+        assert [e.object_id for e in results] == [
+            newest[1].object_id, newest[0].object_id,
+            f'{RETENTION_MONTHS + 1}-2', f'{RETENTION_MONTHS + 1}-1',
+        ]
+        assert read == [f'audit_log_{months_ago(RETENTION_MONTHS + 1):%Y%m}.jsonl.gz']
+
+    def test_duplicate_ids_returned_once(self):
+        """同一条日志同时在线和在归档文件中时只返回一次"""
+        logs = create_logs(RETENTION_MONTHS + 1, 2)
+        month = month_start(logs[0].created_at)
+        # 导出后删除前中断：日志同时存在于 audit_auditlog 和归档文件中
+        AuditArchiveService._export(month, TABLE, month, add_months(month, 1))
+
+        results = AuditArchiveService.search()
+
+        assert sorted(e.pk for e in results) == sorted(e.pk for e in logs)
+        assert all(not e._state.adding for e in results)
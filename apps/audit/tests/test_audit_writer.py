@@ -0,0 +1,258 @@
+"""
+审计日志缓冲写入测试
+
+验证 AuditWriter 缓冲后批量写入、写入失败时日志放回缓冲区，
+以及后台线程每次写入后关闭失效的数据库连接，下次写入成功。
+"""
+import sys
+
+import pytest
+from django.db import IntegrityError, OperationalError
+from django.test import RequestFactory
+
+from apps.audit.models import AuditLog
+from apps.audit.services import AuditService
+from apps.audit.services.audit_writer import (
+    AuditWriter,
+    deserialize_entries,
+    serialize_entries,
+)
+from apps.audit.tasks import write_audit_logs
+
+# apps.audit.services 导出的 audit_writer 是写入器实例，模块需从 sys.modules 获取
+writer_module = sys.modules['apps.audit.services.audit_writer']
+
+
+class StopLoop(Exception):
+    """结束后台写入循环"""
+
+
+def make_entries(count: int, prefix: str = 'obj') -> list[AuditLog]:
+    return [
+        AuditLog(action='update', model_name='ParkingLot', object_id=f'{prefix}{i}')
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def writer(settings, monkeypatch):
+    """缓冲模式的写入器（不启动后台线程，由测试显式写入）"""
+    settings.AUDIT_WRITE_MODE = 'buffered'
+    instance = AuditWriter()
+    monkeypatch.setattr(instance, '_ensure_thread', lambda: None)
+    return instance
+
+
+@pytest.fixture
+def failing_bulk_create(monkeypatch):
+    """前 N 次 bulk_create 抛出数据库连接错误，之后正常写入"""
+    bulk_create = AuditLog.objects.bulk_create
+
+    def install(failures: int = 1) -> list:
+        calls = []
+
+        def flaky(entries, **kwargs):
+            calls.append(len(entries))
+            if len(calls) <= failures:
+                raise OperationalError('server closed the connection unexpectedly')
+            return bulk_create(entries, **kwargs)
+
+        monkeypatch.setattr(AuditLog.objects, 'bulk_create', flaky)
+        return calls
+
+    return install
+
+
+@pytest.mark.django_db
+class TestAuditWriter:
+    """缓冲写入"""
+
+    def test_sync_mode_writes_immediately(self, settings):
+        """同步模式立即写入"""
+        settings.AUDIT_WRITE_MODE = 'sync'
+
+        AuditWriter().write(make_entries(3))
+
+        assert AuditLog.objects.count() == 3
+
+    def test_buffered_until_flush(self, writer):
+        """缓冲模式下写入前只放入缓冲区，flush 后批量写入"""
+        writer.write(make_entries(5))
+
+        assert writer.pending() == 5
+        assert AuditLog.objects.count() == 0
+
+        assert writer.flush() == 5
+        assert writer.pending() == 0
+        assert sorted(AuditLog.objects.values_list('object_id', flat=True)) == [
+            f'obj{i}' for i in range(5)
+        ]
+
+    def test_full_buffer_wakes_writer(self, writer, settings):
+        """缓冲区达到阈值时唤醒后台线程"""
+        settings.AUDIT_BUFFER_SIZE = 3
+
+        writer.write(make_entries(2))
+        assert not writer._wakeup.is_set()
+
+        writer.write(make_entries(1, prefix='more'))
+        assert writer._wakeup.is_set()
+
+    def test_failed_flush_requeues(self, writer, failing_bulk_create):
+        """写入失败时日志按原顺序放回缓冲区，下次写入成功"""
+        calls = failing_bulk_create()
+        writer.write(make_entries(2, prefix='first'))
+
+        assert writer.flush() == 0
+        assert writer.pending() == 2
+
+        writer.write(make_entries(1, prefix='second'))
+        assert writer.flush() == 3
+        assert calls == [2, 3]
+        assert list(
+            AuditLog.objects.order_by('pk').values_list('object_id', flat=True)
+        ) == ['first0', 'first1', 'second0']
+
+    def test_invalid_row_is_dropped(self, writer):
+        """个别日志数据错误时只丢弃该条，其余日志正常写入"""
+        entries = make_entries(3)
+        entries[1].action = None
+
+        writer.write(entries)
+
+        assert writer.flush() == 2
+        assert writer.pending() == 0
+        assert sorted(AuditLog.objects.values_list('object_id', flat=True)) == ['obj0', 'obj2']
+
+    def test_connection_error_during_row_fallback(self, writer, monkeypatch):
+        """逐条写入时连接中断，只把尚未写入的日志放回缓冲区"""
+        bulk_create = AuditLog.objects.bulk_create
+        calls = []
+
+        def flaky(entries, **kwargs):
+            calls.append(len(entries))
+            if len(calls) == 1:
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            if len(calls) == 3:
+                raise OperationalError('server closed the connection unexpectedly')
+            return bulk_create(entries, **kwargs)
+
+        monkeypatch.setattr(AuditLog.objects, 'bulk_create', flaky)
+        writer.write(make_entries(3))
+
+        assert writer.flush() == 0
+        assert writer.pending() == 2
+        assert list(AuditLog.objects.values_list('object_id', flat=True)) == ['obj0']
+
+        assert writer.flush() == 2
+        assert AuditLog.objects.count() == 3
+
+    def test_backlog_is_capped(self, writer, failing_bulk_create, monkeypatch):
+        """持续写入失败时只保留最近的 MAX_PENDING 条"""
+        monkeypatch.setattr(writer_module, 'MAX_PENDING', 3)
+        failing_bulk_create(failures=2)
+
+        writer.write(make_entries(2, prefix='old'))
+        writer.flush()
+        writer.write(make_entries(2, prefix='new'))
+        writer.flush()
+
+        assert writer.pending() == 3
+        assert writer.flush() == 3
+        assert sorted(AuditLog.objects.values_list('object_id', flat=True)) == [
+            'new0', 'new1', 'old1'
+        ]
+
+    def test_celery_mode_falls_back_to_local_write(self, writer, settings, monkeypatch):
+        """Celery 投递失败时在本进程写入"""
+        from apps.audit.tasks import write_audit_logs
+
+        settings.AUDIT_WRITE_MODE = 'celery'
+
+        def broker_down(rows):
+            raise ConnectionError('broker unavailable')
+
+        monkeypatch.setattr(write_audit_logs, 'delay', broker_down)
+        writer.write(make_entries(2))
+
+        assert writer.flush() == 2
+        assert AuditLog.objects.count() == 2
+
+    def test_task_drops_only_invalid_rows(self):
+        """Celery 任务整批写入失败时逐条写入，不因个别日志重试整批"""
+        entries = make_entries(3)
+        rows = serialize_entries(entries)
+        rows[0]['action'] = None
+
+        result = write_audit_logs.apply(args=(rows,)).get()
+
+        assert result['count'] == 2
+        assert sorted(AuditLog.objects.values_list('object_id', flat=True)) == ['obj1', 'obj2']
+
+    def test_invalid_forwarded_ip_is_ignored(self):
+        """X-Forwarded-For 中不合法的地址不写入"""
+        valid = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='203.0.113.9, 10.0.0.1')
+        invalid = RequestFactory().get('/', HTTP_X_FORWARDED_FOR='<script>, 10.0.0.1')
+
+        assert AuditService._request_info(None, valid)[1] == '203.0.113.9'
+        assert AuditService._request_info(None, invalid)[1] is None
+
+    def test_serialize_round_trip(self):
+        """序列化后反序列化保留字段和操作时间"""
+        entries = make_entries(2)
+        entries[0].changes = {'hourly_rate': ['5.00', '6.00']}
+
+        restored = deserialize_entries(serialize_entries(entries))
+
+        for entry, copy in zip(entries, restored):
+            assert copy.object_id == entry.object_id
+            assert copy.changes == entry.changes
+            assert copy.created_at == entry.created_at
+
+
+@pytest.mark.django_db
+class TestAuditWriterThread:
+    """后台写入循环"""
+
+    def test_reconnects_after_failed_flush(
+        self, writer, settings, failing_bulk_create, monkeypatch
+    ):
+        """每次写入后关闭失效连接，数据库恢复后下次写入成功"""
+        settings.AUDIT_FLUSH_INTERVAL = 0
+        failing_bulk_create()
+        closed = []
+        monkeypatch.setattr(writer_module, 'close_old_connections', lambda: closed.append(True))
+
+        flushed = []
+        flush = writer.flush
+
+        def flush_twice():
+            flushed.append(flush())
+            if len(flushed) == 2:
+                raise StopLoop
+
+        monkeypatch.setattr(writer, 'flush', flush_twice)
+        writer.write(make_entries(2))
+
+        with pytest.raises(StopLoop):
+            writer._run()
+
+        assert flushed == [0, 2]
+        assert len(closed) == 2
+        assert AuditLog.objects.count() == 2
+
+    def test_closes_connections_when_flush_raises(self, writer, settings, monkeypatch):
+        """写入过程抛出异常时也关闭连接"""
+        settings.AUDIT_FLUSH_INTERVAL = 0
+        closed = []
+        monkeypatch.setattr(writer_module, 'close_old_connections', lambda: closed.append(True))
+
+        def broken_flush():
+            raise StopLoop
+
+        monkeypatch.setattr(writer, 'flush', broken_flush)
+
+        with pytest.raises(StopLoop):
+            writer._run()
+
+        assert closed == [True]
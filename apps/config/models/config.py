@@ -5,7 +5,6 @@
 """
 from typing import Any, Optional
 
-from django.core.cache import cache
 from django.db import models
 
 from apps.common.models import TimestampMixin
@@ -116,6 +115,5 @@ class SystemConfig(TimestampMixin, models.Model):
         """
         super().save(*args, **kwargs)
         # 清除缓存
-        cache_key = f"config:{self.key}"
-        cache.delete(cache_key)
-        cache.delete("config:all")
+        from apps.config.services import ConfigService
+        ConfigService.invalidate(self.key, self.group)
@@ -5,15 +5,17 @@
 """
 from typing import Any, Optional
 
-from django.core.cache import cache
-
 from apps.config.models import SystemConfig
+from infra.cache import SingleFlightCache
 
 
 class ConfigService:
     """系统配置服务类"""
     CACHE_TIMEOUT = 3600  # 缓存1小时
     
+    # 过期后由一个请求重建，其余请求在宽限期内使用旧值；配置保存后直接删除
+    _cache = SingleFlightCache('config', ttl=CACHE_TIMEOUT, grace=300, key_prefix='config:')
+    
     @classmethod
     def get(
         cls, 
@@ -32,26 +34,12 @@ class ConfigService:
         Returns:
             Any: 配置值
         """
-        cache_key = f"config:{key}"
-        
-        # 尝试从缓存获取
-        if use_cache:
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+        def load() -> Any:
+            config = SystemConfig.objects.filter(key=key).first()
+            return config.get_value() if config is not None else None
         
-        # 从数据库获取
-        try:
-            config = SystemConfig.objects.get(key=key)
-            value = config.get_value()
-            
-            # 存入缓存
-            if use_cache:
-                cache.set(cache_key, value, cls.CACHE_TIMEOUT)
-            
-            return value
-        except SystemConfig.DoesNotExist:
-            return default
+        value = cls._cache.get(key, load) if use_cache else load()
+        return default if value is None else value
     
     @classmethod
     def set(cls, key: str, value: Any, config_type: str = 'string', 
@@ -95,23 +83,11 @@ class ConfigService:
         Returns:
             dict: 配置字典（key: value）
         """
-        cache_key = f"config:group:{group}"
+        def load() -> dict[str, Any]:
+            configs = SystemConfig.objects.filter(group=group)
+            return {config.key: config.get_value() for config in configs}
         
-        # 尝试从缓存获取
-        if use_cache:
-            cached_value = cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-        
-        # 从数据库获取
-        configs = SystemConfig.objects.filter(group=group)
-        result = {config.key: config.get_value() for config in configs}
-        
-        # 存入缓存
-        if use_cache:
-            cache.set(cache_key, result, cls.CACHE_TIMEOUT)
-        
-        return result
+        return cls._cache.get(f'group:{group}', load) if use_cache else load()
     
     @classmethod
     def get_public_configs(cls) -> dict[str, Any]:
@@ -121,19 +97,22 @@ class ConfigService:
         Returns:
             dict: 公开配置字典
         """
-        cache_key = "config:public"
-        
-        # 尝试从缓存获取
-        cached_value = cache.get(cache_key)
-        if cached_value is not None:
-            return cached_value
+        def load() -> dict[str, Any]:
+            configs = SystemConfig.objects.filter(is_public=True)
+            return {config.key: config.get_value() for config in configs}
         
-        # 从数据库获取
-        configs = SystemConfig.objects.filter(is_public=True)
-        result = {config.key: config.get_value() for config in configs}
-        
-        # 存入缓存
-        cache.set(cache_key, result, cls.CACHE_TIMEOUT)
+        return cls._cache.get('public', load)
+    
+    @classmethod
+    def invalidate(cls, key: str, group: str | None = None) -> None:
+        """
+        清除配置缓存（配置保存后调用）
         
-        return result
-
+        Args:
+            key: 配置键
+            group: 配置分组
+        """
+        cls._cache.delete(key)
+        cls._cache.delete('public')
+        if group:
+            cls._cache.delete(f'group:{group}')
@@ -15,5 +15,9 @@ class InfrastructureConfig(AppConfig):
         # 配置 loguru（从 infra.logging 导入）
         from infra.logging.loguru_config import configure_loguru
         configure_loguru()
-        # 导入信号处理器
-        import apps.infrastructure.signals  # noqa: F401
+        # 通用的模型保存/删除日志接收器（每次模型保存都会执行，按配置连接）
+        from django.conf import settings
+
+        from apps.infrastructure.signals import connect_model_log_signals
+        if getattr(settings, 'LOG_MODEL_SIGNALS', settings.DEBUG):
+            connect_model_log_signals()
@@ -2,45 +2,44 @@
 信号处理器
 
 处理Django信号，实现模块间解耦通信。
+
+通用的模型保存/删除日志接收器会在每次模型保存时执行，
+只在 LOG_MODEL_SIGNALS 为 True 时连接（见 connect_model_log_signals），生产环境默认不连接。
 """
 from django.db.models.signals import post_save, pre_delete
-from django.dispatch import receiver
 from loguru import logger
 
+# 不记录的应用（Django内置模型）
+EXCLUDED_APPS = frozenset({'admin', 'contenttypes', 'sessions', 'auth'})
+
 
-@receiver(post_save)
 def log_model_save(sender, instance, created, **kwargs):
     """
     记录模型保存操作
-    
+
     当任何模型被保存时，记录日志（排除某些系统模型）。
     """
-    # 排除Django内置模型
-    excluded_apps = ['admin', 'contenttypes', 'sessions', 'auth']
-    app_label = sender._meta.app_label
-    
-    if app_label not in excluded_apps:
-        action = "创建" if created else "更新"
+    if sender._meta.app_label not in EXCLUDED_APPS:
         logger.debug(
-            f"模型保存: {sender.__name__} - {action} - "
-            f"ID: {getattr(instance, 'id', 'N/A')}"
+            "模型保存: {} - {} - ID: {}",
+            sender.__name__, "创建" if created else "更新", getattr(instance, 'id', 'N/A')
         )
 
 
-@receiver(pre_delete)
 def log_model_delete(sender, instance, **kwargs):
     """
     记录模型删除操作
-    
+
     当任何模型被删除时，记录日志（排除某些系统模型）。
     """
-    # 排除Django内置模型
-    excluded_apps = ['admin', 'contenttypes', 'sessions', 'auth']
-    app_label = sender._meta.app_label
-    
-    if app_label not in excluded_apps:
+    if sender._meta.app_label not in EXCLUDED_APPS:
         logger.debug(
-            f"模型删除: {sender.__name__} - "
-            f"ID: {getattr(instance, 'id', 'N/A')}"
+            "模型删除: {} - ID: {}",
+            sender.__name__, getattr(instance, 'id', 'N/A')
         )
 
+
+def connect_model_log_signals() -> None:
+    """连接通用的模型保存/删除日志接收器"""
+    post_save.connect(log_model_save, dispatch_uid='infrastructure.log_model_save')
+    pre_delete.connect(log_model_delete, dispatch_uid='infrastructure.log_model_delete')
@@ -4,4 +4,6 @@
 从 apps.infrastructure.views 迁移
 """
 
-__all__ = []
+from .views import metrics_view
+
+__all__ = ['metrics_view']
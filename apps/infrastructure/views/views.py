@@ -1,3 +1,35 @@
-from django.shortcuts import render
+"""
+基础设施视图
 
-# Create your views here.
+提供 Prometheus 指标导出等系统级视图。
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.http import require_GET
+
+from infra.metrics import load_metrics, render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus 指标导出
+
+    合并所有工作进程的按路由请求指标和缓存命中计数，以 Prometheus 文本格式返回。
+    请求需带 Authorization: Bearer <METRICS_TOKEN>，或由管理员登录访问。
+    """
+    if not _authorized(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(load_metrics()), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _authorized(request: HttpRequest) -> bool:
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    if token and authorization.startswith('Bearer '):
+        return hmac.compare_digest(authorization[len('Bearer '):], token)
+    return request.user.is_authenticated and request.user.is_staff
@@ -7,10 +7,11 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Any, Optional
 
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 
-from parking.models import ParkingLot, ParkingRecord, ParkingSpace
+from parking.models import ParkingLot, ParkingRecord
+from parking.services.occupancy_service import OccupancyService
 
 
 class ReportService:
@@ -72,9 +73,9 @@ class ReportService:
         paid_records = records.filter(is_paid=True)
         revenue = paid_records.aggregate(total=Sum('fee'))['total'] or Decimal('0.00')
         
-        # 按停车场统计
+        # 按停车场统计（按冗余的 parking_lot 分组，结果键名保持 parking_space__parking_lot__name）
         parking_lot_stats = records.values(
-            'parking_space__parking_lot__name'
+            parking_space__parking_lot__name=F('parking_lot__name')
         ).annotate(
             count=Count('id'),
             revenue=Sum('fee', filter=Q(is_paid=True))
@@ -104,22 +105,29 @@ class ReportService:
         else:
             parking_lots = ParkingLot.objects.filter(is_active=True)
         
+        occupancy = OccupancyService.get_occupancy_map(lot.pk for lot in parking_lots)
+        
+        # 今日统计（按 (parking_lot, entry_time) 索引一次分组查询）
+        today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_stats = {
+            row['parking_lot_id']: row
+            for row in ParkingRecord.objects.filter(
+                parking_lot__in=parking_lots,
+                entry_time__gte=today_start
+            ).values('parking_lot_id').annotate(
+                count=Count('id'),
+                revenue=Sum('fee', filter=Q(is_paid=True))
+            )
+        }
+        
         result = []
         for lot in parking_lots:
-            spaces = ParkingSpace.objects.filter(parking_lot=lot)
-            occupied = spaces.filter(is_occupied=True).count()
-            available = spaces.filter(is_occupied=False).count()
+            occupied = occupancy[lot.pk].occupied
+            available = occupancy[lot.pk].available
             
-            # 今日统计
-            today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_records = ParkingRecord.objects.filter(
-                parking_space__parking_lot=lot,
-                entry_time__gte=today_start
-            )
-            today_count = today_records.count()
-            today_revenue = today_records.filter(
-                is_paid=True
-            ).aggregate(total=Sum('fee'))['total'] or Decimal('0.00')
+            today = today_stats.get(lot.pk, {})
+            today_count = today.get('count', 0)
+            today_revenue = today.get('revenue') or Decimal('0.00')
             
             result.append({
                 'id': lot.id,
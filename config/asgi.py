@@ -3,6 +3,9 @@ ASGI config for ParkingManagement project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+停车场占用实时推送（/parking/api/occupancy/stream/，Server-Sent Events）是异步流式视图，
+以 ASGI 方式部署时长连接不占用工作线程。
+
 For more information on this file, see
 https://docs.djangoproject.com/zh-hans/5.2/howto/deployment/asgi/
 """
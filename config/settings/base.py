@@ -49,6 +49,7 @@ MIDDLEWARE = [
     # 自定义中间件（从core.middleware导入）
     'core.middleware.middleware.RequestLoggingMiddleware',
     'core.middleware.middleware.PerformanceMonitoringMiddleware',
+    'core.middleware.middleware.QueryInstrumentationMiddleware',
     'apps.audit.middleware.AuditLogMiddleware',
     # 停车场应用中间件
     'parking.middleware.SessionExpiryMiddleware',
@@ -134,7 +135,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Session 配置
 SESSION_COOKIE_AGE = 3600 * 2  # 2小时过期
-SESSION_SAVE_EVERY_REQUEST = True
+# 不在每个请求都写会话：由 SessionExpiryMiddleware 在临近过期时续期（见 SESSION_REFRESH_WINDOW）
+SESSION_SAVE_EVERY_REQUEST = False
+# 会话过期检查方式：'session' 检查会话数据中的过期时间戳（不访问数据库，适用于缓存会话引擎），
+# 'database' 每个请求查询 Session 表
+SESSION_EXPIRY_CHECK = os.environ.get('SESSION_EXPIRY_CHECK', 'session')
+# 会话剩余有效期小于此值（秒）时续期并写入会话，其余请求不写
+SESSION_REFRESH_WINDOW = int(os.environ.get('SESSION_REFRESH_WINDOW', 1800))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
@@ -159,6 +166,12 @@ EMAIL_USE_TLS = False
 # loguru 配置在 apps/infrastructure/apps.py 中初始化
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
+# 日志通过队列由后台线程写入控制台和文件，请求线程不做日志 I/O
+LOG_ENQUEUE = os.environ.get('LOG_ENQUEUE', 'true').lower() == 'true'
+# 成功请求日志的抽样比例（1 为全部记录），4xx/5xx 请求始终记录
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', 1.0))
+# 是否连接通用的模型保存/删除日志接收器（apps.infrastructure.signals），未设置时跟随 DEBUG
+# LOG_MODEL_SIGNALS = True
 
 # 缓存配置（基础配置，各环境可覆盖）
 # 开发环境使用内存缓存，生产环境使用Redis
@@ -182,3 +195,42 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Shanghai'
 CELERY_ENABLE_UTC = True
+
+# 通缉车辆警报：命中后在事务提交后投递到 Celery 高优先级队列异步处理
+# 关闭时（或投递失败时）在事务提交后同步处理
+WANTED_ALERT_ASYNC = os.environ.get('WANTED_ALERT_ASYNC', 'true').lower() == 'true'
+
+# 道闸 API 幂等键：首次请求的响应保留时间（秒），期间相同 Idempotency-Key 的重试直接返回原响应
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 600))
+
+# 按视图的查询统计（见 infra.db.query_stats）：按比例抽样请求记录查询次数、耗时和 SQL 指纹，
+# 0 为关闭（管理员仍可用 X-Query-Stats 请求头记录单个请求），汇总结果用 analyze_queries 查看
+QUERY_STATS_SAMPLE_RATE = float(os.environ.get('QUERY_STATS_SAMPLE_RATE', 0))
+
+# 慢请求阈值（秒）：超过阈值的请求记录警告并计入 /metrics 的 parking_http_slow_requests_total
+# SLOW_REQUEST_THRESHOLDS 按 URL 名称（或带命名空间的视图名称）覆盖默认阈值
+SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 1.0))
+SLOW_REQUEST_THRESHOLDS = {
+    'api_entry': 0.5,
+    'api_exit': 0.5,
+}
+
+# /metrics 访问令牌：Prometheus 以 Authorization: Bearer <令牌> 抓取，未设置时只允许管理员访问
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# 审计日志写入（apps.audit.services.audit_writer）：'buffered' 后台线程批量写入，
+# 'celery' 按批投递给 Celery 任务写入，'sync' 立即写入；进程退出时写完缓冲区
+AUDIT_WRITE_MODE = os.environ.get('AUDIT_WRITE_MODE', 'buffered')
+# 缓冲区达到此条数时立即写入，否则最多每 AUDIT_FLUSH_INTERVAL 秒写入一次
+AUDIT_BUFFER_SIZE = int(os.environ.get('AUDIT_BUFFER_SIZE', 100))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+
+# 审计日志分区与归档（apps.audit.services.audit_archive）：按月分区（PostgreSQL）或分表，
+# 保留最近 AUDIT_RETENTION_MONTHS 个完整月份，更早的月份导出到 AUDIT_ARCHIVE_DIR 后删除
+AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', 12))
+AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'audit_log'))
+AUDIT_PARTITION_PREMAKE_MONTHS = int(os.environ.get('AUDIT_PARTITION_PREMAKE_MONTHS', 3))
+
+# 车位实时推送（parking.views.stream，仅 ASGI）：每个进程的最大连接数、每个用户或 IP 的最大并发连接数
+OCCUPANCY_STREAM_MAX_CONNECTIONS = int(os.environ.get('OCCUPANCY_STREAM_MAX_CONNECTIONS', 500))
+OCCUPANCY_STREAM_MAX_PER_CLIENT = int(os.environ.get('OCCUPANCY_STREAM_MAX_PER_CLIENT', 3))
@@ -56,6 +56,9 @@ CACHES = {
     }
 }
 
+# 开发环境通常不运行 Celery worker，通缉车辆警报同步处理
+WANTED_ALERT_ASYNC = False
+
 # 静态文件配置（开发环境）
 # 开发环境不使用ManifestStaticFilesStorage，以便实时看到文件变化
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
@@ -68,6 +68,14 @@ CACHES = {
     }
 }
 
+# Session 配置（生产环境）：会话读取走 Redis，写入同时落库；
+# 过期检查使用会话数据中的时间戳（SESSION_EXPIRY_CHECK='session'），道闸请求不再额外访问数据库
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+# 日志配置（生产环境）：成功请求日志按比例抽样，不记录通用的模型保存日志
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', 0.1))
+LOG_MODEL_SIGNALS = False
+
 # 静态文件配置（生产环境）
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
@@ -40,6 +40,13 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_HOST_USER = 'test@example.com'  # 测试环境邮件配置
 EMAIL_HOST_PASSWORD = 'test_password'
 
+# 日志和审计日志同步写入（便于测试捕获输出和断言）
+LOG_ENQUEUE = False
+AUDIT_WRITE_MODE = 'sync'
+
+# 通缉车辆警报同步处理（测试环境无 Celery worker）
+WANTED_ALERT_ASYNC = False
+
 # 禁用迁移（测试时）
 class DisableMigrations:
     def __contains__(self, item):
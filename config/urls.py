@@ -19,6 +19,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from apps.infrastructure.views import metrics_view
 from parking.views.auth import login_view, logout_view
 from parking.views.i18n import set_language
 
@@ -27,6 +28,7 @@ urlpatterns = [
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
     path('i18n/setlang/', set_language, name='set_language'),
+    path('metrics', metrics_view, name='metrics'),
     path('parking/', include('parking.urls', namespace='parking')),
     path('', include('parking.urls', namespace='parking_main')),
 ]
@@ -8,9 +8,11 @@
 from .middleware import (
     RequestLoggingMiddleware,
     PerformanceMonitoringMiddleware,
+    QueryInstrumentationMiddleware,
 )
 
 __all__ = [
     'RequestLoggingMiddleware',
     'PerformanceMonitoringMiddleware',
+    'QueryInstrumentationMiddleware',
 ]
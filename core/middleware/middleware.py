@@ -6,21 +6,35 @@
 从 apps.infrastructure.middleware 迁移
 """
 
+import random
 import time
+from contextlib import ExitStack
 from typing import Callable
 
+from django.conf import settings
+from django.db import connections
 from django.http import HttpRequest, HttpResponse
 from django.utils.deprecation import MiddlewareMixin
 from loguru import logger
 
+from infra.db.query_stats import QueryRecorder, collector
+from infra.metrics import metrics
+
 
 class RequestLoggingMiddleware(MiddlewareMixin):
     """
     请求日志中间件
     
-    记录所有HTTP请求的详细信息，用于调试和监控。
+    记录HTTP请求的详细信息，用于调试和监控。
+    
+    成功请求（状态码 < 400）按 REQUEST_LOG_SAMPLE_RATE 比例抽样记录（1 为全部记录，0 为不记录），
+    客户端错误和服务端错误请求始终记录。
     """
     
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0)
+    
     def process_request(self, request: HttpRequest) -> None:
         """处理请求前记录开始时间"""
         request._start_time = time.time()
@@ -31,14 +45,20 @@ class RequestLoggingMiddleware(MiddlewareMixin):
         response: HttpResponse
     ) -> HttpResponse:
         """处理响应后记录请求信息"""
-        if hasattr(request, '_start_time'):
-            duration = time.time() - request._start_time
-            logger.info(
-                f"{request.method} {request.path} - "
-                f"状态码: {response.status_code} - "
-                f"耗时: {duration:.4f}秒 - "
-                f"IP: {self.get_client_ip(request)}"
-            )
+        if not hasattr(request, '_start_time'):
+            return response
+        if response.status_code < 400 and (
+            self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate)
+        ):
+            return response
+        
+        duration = time.time() - request._start_time
+        # 使用占位符：日志级别被过滤时不格式化消息
+        logger.info(
+            "{} {} - 状态码: {} - 耗时: {:.4f}秒 - IP: {}",
+            request.method, request.path, response.status_code,
+            duration, self.get_client_ip(request)
+        )
         return response
     
     @staticmethod
@@ -60,29 +80,97 @@ class RequestLoggingMiddleware(MiddlewareMixin):
         return ip
 
 
-class PerformanceMonitoringMiddleware(MiddlewareMixin):
+class PerformanceMonitoringMiddleware:
     """
     性能监控中间件
-    
-    监控慢请求，记录超过阈值的请求。
+
+    记录每个请求的耗时、状态码和数据库查询（次数、耗时）到按路由的指标
+    （见 infra.metrics，由 /metrics 导出），并记录超过路由阈值的慢请求。
+    阈值由 SLOW_REQUEST_THRESHOLDS 按 URL 名称（如 'api_entry'）或
+    带命名空间的视图名称（如 'parking:api_entry'）配置，未配置的路由使用 SLOW_REQUEST_THRESHOLD。
     """
-    SLOW_REQUEST_THRESHOLD = 1.0  # 慢请求阈值（秒）
-    
-    def process_request(self, request: HttpRequest) -> None:
-        """处理请求前记录开始时间"""
-        request._perf_start_time = time.time()
-    
-    def process_response(
-        self, 
-        request: HttpRequest, 
-        response: HttpResponse
-    ) -> HttpResponse:
-        """处理响应后检查性能"""
-        if hasattr(request, '_perf_start_time'):
-            duration = time.time() - request._perf_start_time
-            if duration > self.SLOW_REQUEST_THRESHOLD:
-                logger.warning(
-                    f"慢请求检测: {request.method} {request.path} - "
-                    f"耗时: {duration:.4f}秒（阈值: {self.SLOW_REQUEST_THRESHOLD}秒）"
-                )
+    SLOW_REQUEST_THRESHOLD = 1.0  # 默认慢请求阈值（秒）
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.default_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', self.SLOW_REQUEST_THRESHOLD)
+        self.thresholds: dict[str, float] = getattr(settings, 'SLOW_REQUEST_THRESHOLDS', {})
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        recorder = QueryRecorder(record_sql=False)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        route, threshold = self._route(request)
+        slow = duration > threshold
+        metrics.observe(
+            route, response.status_code, duration,
+            db_time=recorder.duration, db_queries=recorder.count, slow=slow
+        )
+        if slow:
+            logger.warning(
+                "慢请求检测: {} {} ({}) - 耗时: {:.4f}秒（阈值: {}秒）- 数据库: {} 次查询, {:.4f}秒",
+                request.method, request.path, route, duration, threshold,
+                recorder.count, recorder.duration
+            )
         return response
+
+    def _route(self, request: HttpRequest) -> tuple[str, float]:
+        """路由名称（带命名空间的视图名称）和慢请求阈值"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return '<unresolved>', self.default_threshold
+        threshold = self.thresholds.get(match.view_name)
+        if threshold is None:
+            threshold = self.thresholds.get(match.url_name, self.default_threshold)
+        return match.view_name, threshold
+
+
+class QueryInstrumentationMiddleware:
+    """
+    按视图的查询统计中间件
+
+    通过数据库 execute_wrapper 记录请求执行的查询次数、耗时和 SQL 指纹，
+    按视图聚合（见 infra.db.query_stats），不依赖 DEBUG：
+    - 按 QUERY_STATS_SAMPLE_RATE 比例抽样（0 为关闭，1 为全部记录）
+    - 管理员请求带 X-Query-Stats 请求头时记录该请求，
+      并在响应头中返回 X-Query-Count 和 X-DB-Time（毫秒）
+    """
+    REQUEST_HEADER = 'X-Query-Stats'
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        forced = self._forced(request)
+        if not forced and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        collector.record(self._view_name(request), recorder)
+        if forced:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-DB-Time'] = f'{recorder.duration * 1000:.2f}'
+        return response
+
+    def _forced(self, request: HttpRequest) -> bool:
+        if self.REQUEST_HEADER not in request.headers:
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+    @staticmethod
+    def _view_name(request: HttpRequest) -> str:
+        """视图名称：URL 名称（含命名空间），没有名称时为视图函数路径"""
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else '<unresolved>'
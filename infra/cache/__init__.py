@@ -0,0 +1,11 @@
+"""
+缓存基础设施
+
+进程内快照缓存、防击穿缓存、多进程统计快照等通用缓存组件
+"""
+
+from .process_cache import ProcessCache
+from .process_snapshots import ProcessSnapshots
+from .single_flight import SingleFlightCache, get_cache_metrics
+
+__all__ = ['ProcessCache', 'ProcessSnapshots', 'SingleFlightCache', 'get_cache_metrics']
@@ -0,0 +1,109 @@
+"""
+进程内版本化缓存
+
+用于缓存很少变化、但在热路径上频繁读取的只读数据（如编译后的费率）。
+数据保存在当前进程内存中，读取不访问数据库也不访问缓存后端；
+多进程之间通过 Django 缓存中的共享版本号同步失效：
+每隔 check_interval 秒对比一次共享版本号，不一致时丢弃本进程数据。
+"""
+import threading
+import time
+import uuid
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from django.core.cache import cache
+from django.db import transaction
+
+# 共享版本号缓存键前缀
+VERSION_KEY_PREFIX = 'parking:process_cache:'
+
+
+class ProcessCache:
+    """
+    进程内版本化缓存
+
+    Example:
+        tariffs = ProcessCache('tariff')
+        tariff = tariffs.get(lot_id, lambda: compile_tariff(lot_id))
+        tariffs.invalidate()  # 数据变更后调用，所有进程在 check_interval 内失效
+    """
+
+    def __init__(self, name: str, check_interval: float = 1.0) -> None:
+        """
+        Args:
+            name: 缓存名称（用于共享版本号的缓存键）
+            check_interval: 检查共享版本号的间隔（秒）
+        """
+        self.name = name
+        self.check_interval = check_interval
+        self._version_key = f'{VERSION_KEY_PREFIX}{name}:version'
+        self._lock = threading.Lock()
+        self._data: dict[Hashable, Any] = {}
+        self._version: str | None = None
+        self._checked_at = 0.0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，不存在时调用 loader 加载
+
+        Args:
+            key: 缓存键
+            loader: 加载函数（无参数）
+
+        Returns:
+            Any: 缓存值
+        """
+        self._check_version()
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+
+        value = loader()
+        with self._lock:
+            self._data[key] = value
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，不存在时返回默认值（不加载）"""
+        self._check_version()
+        return self._data.get(key, default)
+
+    def invalidate(self) -> None:
+        """
+        使缓存失效
+
+        立即清空本进程数据；共享版本号在事务提交后更新，
+        避免其他进程在提交前重新加载到旧数据。
+        """
+        self.clear_local()
+
+        def bump():
+            self.clear_local()
+            cache.set(self._version_key, uuid.uuid4().hex, None)
+
+        transaction.on_commit(bump)
+
+    def clear_local(self) -> None:
+        """仅清空本进程数据"""
+        with self._lock:
+            self._data = {}
+            self._checked_at = 0.0
+
+    def _check_version(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+
+        version = cache.get(self._version_key)
+        if version is None:
+            # 缓存后端无版本号（首次使用或缓存被清空），发布本进程的版本号
+            version = self._version or uuid.uuid4().hex
+            cache.add(self._version_key, version, None)
+
+        with self._lock:
+            if self._version is not None and version != self._version:
+                self._data = {}
+            self._version = version
+            self._checked_at = now
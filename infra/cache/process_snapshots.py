@@ -0,0 +1,200 @@
+"""
+多进程统计快照
+
+各工作进程在内存中累计统计（请求指标、查询统计等），定期把增量写入共享缓存；
+读取方合并所有进程的快照。写入和读取都不需要全局锁：
+- 每个进程写自己的键（主机名:进程号），快照键登记在索引键中
+- 进程只提交自上次写入以来的增量，合并到本进程的累计快照后写入缓存
+- 长时间未更新的快照（进程已退出或空闲）由读取方合并到基础快照（不过期）后删除，
+  累计计数不会因进程快照过期而减少；原进程再次写入时发现已合并，从空快照重新累计
+- 清空时递增代数，其他进程下次写入前发现代数变化即丢弃本地旧统计
+"""
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from django.core.cache import cache
+
+# 合并快照时持有的锁的超时时间（秒），防止持有锁的进程异常退出后无法释放
+LOCK_TIMEOUT = 30
+# 快照已合并到基础快照的标记保留时间（秒），应长于进程可能的最长空闲时间
+FOLDED_MARK_TTL = 30 * 24 * 3600
+
+
+class ProcessSnapshots:
+    """
+    多进程统计快照
+
+    merge(target, source) 把 source 的计数累加到 target（原地修改，不引用 source 中的可变对象），
+    target 可以是空字典。
+
+    Example:
+        snapshots = ProcessSnapshots('parking:metrics:', merge)
+        if snapshots.changed():
+            local_stats.clear()  # 统计已被清空，丢弃本地旧统计
+        snapshots.publish(take(local_stats))  # 提交增量后本地统计从零累计
+        for stats in snapshots.load(local=local_stats).values():
+            merge(total, stats)
+    """
+
+    def __init__(
+        self,
+        key_prefix: str,
+        merge: Callable[[dict, dict], None],
+        ttl: int = 24 * 3600,
+        stale_after: int = 3600
+    ) -> None:
+        """
+        Args:
+            key_prefix: 缓存键前缀
+            merge: 快照合并函数
+            ttl: 快照保留时间（秒），未被读取方合并的快照在此期限后过期
+            stale_after: 快照超过该时间（秒）未更新时合并到基础快照
+        """
+        self.merge = merge
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.index_key = f'{key_prefix}index'
+        self.generation_key = f'{key_prefix}generation'
+        self.base_key = f'{key_prefix}base'
+        self.fold_lock_key = f'{key_prefix}fold_lock'
+        self.key = f'{key_prefix}{socket.gethostname()}:{os.getpid()}'
+        self._generation = None
+        # 本进程已写入缓存的累计快照和尚未写入的增量
+        self._snapshot: dict = {}
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+
+    def changed(self) -> bool:
+        """统计是否在本进程上次写入后被清空（调用方应丢弃本地旧统计）"""
+        generation = cache.get(self.generation_key, 0)
+        changed = self._generation is not None and generation != self._generation
+        self._generation = generation
+        if changed:
+            with self._lock:
+                self._snapshot = {}
+                self._pending = {}
+        return changed
+
+    def publish(self, delta: dict) -> None:
+        """
+        把本进程的增量合并到累计快照后写入缓存，并确认已登记在索引中
+
+        （索引键过期、被清空或并发登记丢失时补登）。快照正被读取方合并时跳过本次写入，
+        写入失败时增量保留在内存中，下次写入时一并提交。
+
+        Args:
+            delta: 自上次调用以来的增量
+        """
+        with self._lock:
+            self.merge(self._pending, delta)
+            lock_key = f'{self.key}:lock'
+            if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                return
+            try:
+                folded_key = f'{self.key}:folded'
+                if cache.get(folded_key):
+                    # 上次写入的快照已计入基础快照，从空快照重新累计
+                    self._snapshot = {}
+                    cache.delete(folded_key)
+                snapshot = {}
+                self.merge(snapshot, self._snapshot)
+                self.merge(snapshot, self._pending)
+                cache.set(self.key, {'updated_at': time.time(), 'data': snapshot}, self.ttl)
+                self._snapshot = snapshot
+                self._pending = {}
+            finally:
+                cache.delete(lock_key)
+
+        keys = cache.get(self.index_key) or []
+        if self.key not in keys:
+            cache.set(self.index_key, [*keys, self.key], self.ttl)
+
+    def load(self, local: dict | None = None) -> dict[str, Any]:
+        """
+        读取基础快照和所有进程的快照（先合并长时间未更新的快照）
+
+        Args:
+            local: 本进程尚未提交的增量（提供时本进程使用内存中的最新统计）
+
+        Returns:
+            dict: 快照键 → 快照（基础快照的键为 base_key）
+        """
+        keys = cache.get(self.index_key) or []
+        entries = cache.get_many([*keys, self.base_key])
+        base = entries.pop(self.base_key, None)
+        if self._fold_stale(keys, entries):
+            keys = cache.get(self.index_key) or []
+            entries = cache.get_many([*keys, self.base_key])
+            base = entries.pop(self.base_key, None)
+
+        snapshots = {key: entry['data'] for key, entry in entries.items()}
+        if base is not None:
+            snapshots[self.base_key] = base
+        if local is not None:
+            with self._lock:
+                current = {}
+                for source in (self._snapshot, self._pending, local):
+                    self.merge(current, source)
+            snapshots[self.key] = current
+        return snapshots
+
+    def clear(self) -> None:
+        """删除所有进程的快照和基础快照并递增代数"""
+        keys = cache.get(self.index_key) or []
+        cache.delete_many([*keys, self.index_key, self.base_key])
+        cache.set(self.generation_key, cache.get(self.generation_key, 0) + 1, None)
+        self._generation = None
+        with self._lock:
+            self._snapshot = {}
+            self._pending = {}
+
+    def _fold_stale(self, keys: list[str], entries: dict[str, dict]) -> bool:
+        """
+        把长时间未更新的快照合并到基础快照并删除，同时从索引中移除已过期的键
+
+        本进程的快照不合并（读取时使用内存中的统计）。
+
+        Returns:
+            bool: 是否修改了基础快照或索引
+        """
+        deadline = time.time() - self.stale_after
+        stale = [
+            key for key in keys
+            if key != self.key and (key not in entries or entries[key]['updated_at'] < deadline)
+        ]
+        if not stale or not cache.add(self.fold_lock_key, 1, LOCK_TIMEOUT):
+            return False
+
+        locked = []
+        try:
+            base = cache.get(self.base_key) or {}
+            folded = []
+            merged = []
+            for key in stale:
+                lock_key = f'{key}:lock'
+                if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+                    continue
+                locked.append(lock_key)
+                # 加锁后重新读取：所属进程可能刚刚写入
+                entry = cache.get(key)
+                if entry is not None and entry['updated_at'] >= deadline:
+                    continue
+                if entry is not None:
+                    self.merge(base, entry['data'])
+                    merged.append(key)
+                folded.append(key)
+
+            if folded:
+                # 先写基础快照再删除进程快照，所属进程写入前会看到已合并标记
+                cache.set(self.base_key, base, None)
+                cache.set_many({f'{key}:folded': True for key in merged}, FOLDED_MARK_TTL)
+                cache.delete_many(folded)
+                current = cache.get(self.index_key) or []
+                cache.set(self.index_key, [key for key in current if key not in folded], self.ttl)
+            return bool(folded)
+        finally:
+            cache.delete_many([*locked, self.fold_lock_key])
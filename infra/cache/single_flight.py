@@ -0,0 +1,295 @@
+"""
+防击穿缓存（请求合并）
+
+缓存值过期或失效时，只有拿到缓存锁的一个请求重建，其余请求：
+- 在宽限期内直接返回旧值（旧值在逻辑过期后仍保留 grace 秒）
+- 没有旧值时短暂等待重建结果，超时后自行加载
+
+临近过期时按概率提前重建（XFetch：重建耗时越长、越接近过期，提前重建概率越大），
+热点键通常在过期前就已被刷新，不会出现集中重建。
+
+命中、未命中、重建等计数保存在进程内（见 get_cache_metrics）。
+"""
+import math
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from django.core.cache import cache
+from loguru import logger
+
+# 指标名称
+METRIC_NAMES = (
+    'hits',             # 命中未过期的值
+    'stale_hits',       # 其他请求正在重建，返回宽限期内的旧值
+    'misses',           # 没有可用值
+    'rebuilds',         # 实际执行的重建次数
+    'early_refreshes',  # 其中按概率提前重建的次数
+    'waits',            # 等待其他请求的重建结果
+    'errors',           # 重建失败次数
+)
+
+# 缺失值占位（区分“未缓存”和“缓存了 None”）
+_MISSING = object()
+
+_registry: dict[str, 'SingleFlightCache'] = {}
+_registry_lock = threading.Lock()
+
+
+class SingleFlightCache:
+    """
+    防击穿缓存
+
+    缓存值以 (值, 逻辑过期时间, 重建耗时) 保存，实际 TTL 为 ttl + grace。
+
+    Example:
+        lots = SingleFlightCache('lot', ttl=60, key_prefix='parking:lot:')
+        lot = lots.get(lot_id, lambda: load_lot(lot_id))
+        lots.invalidate(lot_id)  # 标记为过期，宽限期内仍可返回旧值
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        grace: float | None = None,
+        key_prefix: str | None = None,
+        beta: float = 1.0,
+        lock_timeout: float = 10.0,
+        wait_timeout: float = 1.0,
+        cache_none: bool = True,
+    ) -> None:
+        """
+        Args:
+            name: 缓存名称（用于指标）
+            ttl: 逻辑有效期（秒）
+            grace: 逻辑过期后旧值的保留时间（秒），默认与 ttl 相同
+            key_prefix: 缓存键前缀，默认 'parking:<name>:'
+            beta: 提前重建系数，0 表示不提前重建
+            lock_timeout: 重建锁的有效期（秒），重建进程异常退出时锁自动释放
+            wait_timeout: 没有旧值时等待其他请求重建的最长时间（秒）
+            cache_none: 是否缓存重建结果 None（为 False 时每次都重新加载）
+        """
+        self.name = name
+        self.ttl = ttl
+        self.grace = ttl if grace is None else grace
+        self.key_prefix = f'parking:{name}:' if key_prefix is None else key_prefix
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.cache_none = cache_none
+        self._metrics: Counter[str] = Counter()
+        self._metrics_lock = threading.Lock()
+        with _registry_lock:
+            _registry[name] = self
+
+    def get(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，过期或不存在时合并重建
+
+        Args:
+            key: 缓存键（拼接在 key_prefix 之后）
+            builder: 重建函数（无参数），返回值可以为 None
+
+        Returns:
+            Any: 缓存值
+        """
+        cache_key = self.cache_key(key)
+        entry = cache.get(cache_key)
+        if not isinstance(entry, tuple) or len(entry) != 3:
+            # 未缓存，或是改用本类之前写入的旧格式值
+            self._count('misses')
+            return self._rebuild_or_wait(cache_key, builder)
+
+        value, expires_at, cost = entry
+        now = time.time()
+        if now < expires_at:
+            self._count('hits')
+            if not self._refresh_early(expires_at, cost, now) or not self._acquire(cache_key):
+                return value
+            self._count('early_refreshes')
+            return self._rebuild_locked(cache_key, builder, stale=value)
+
+        if not self._acquire(cache_key):
+            self._count('stale_hits')
+            return value
+        self._count('misses')
+        return self._rebuild_locked(cache_key, builder, stale=value)
+
+    def coalesce(
+        self,
+        cache_key: str,
+        load: Callable[[], Any],
+        stale: Callable[[], Any] | None = None,
+        read: Callable[[], Any] | None = None,
+    ) -> Any:
+        """
+        合并对同一缓存键的重建（由调用方自行读写缓存值）
+
+        拿到锁的请求调用 load（load 负责写入缓存）；
+        其余请求返回 stale() 的结果，没有旧值时等待 cache_key 被写入。
+        用于缓存值不便包装的场景（如需要 cache.incr 的计数）。
+
+        Args:
+            cache_key: 完整缓存键（一组键共用一个锁时取其中之一）
+            load: 加载并写入缓存的函数，返回加载结果
+            stale: 返回旧值的函数，没有旧值时返回 None
+            read: 等到 cache_key 被写入后读取结果的函数，默认返回 cache_key 的值，
+                返回 None 时自行加载
+
+        Returns:
+            Any: 加载结果、旧值或等待到的值
+        """
+        if self._acquire(cache_key):
+            self._count('misses')
+            try:
+                self._count('rebuilds')
+                return load()
+            except Exception:
+                self._count('errors')
+                raise
+            finally:
+                self._release(cache_key)
+
+        if stale is not None:
+            value = stale()
+            if value is not None:
+                self._count('stale_hits')
+                return value
+
+        self._count('misses')
+        value = self._wait(cache_key)
+        if value is not _MISSING and read is not None:
+            value = read()
+            if value is None:
+                value = _MISSING
+        if value is not _MISSING:
+            return value
+        self._count('rebuilds')
+        return load()
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        标记缓存值为过期（宽限期内仍可作为旧值返回，由下一个请求重建）
+
+        Args:
+            key: 缓存键
+        """
+        cache_key = self.cache_key(key)
+        entry = cache.get(cache_key)
+        if isinstance(entry, tuple) and len(entry) == 3:
+            cache.set(cache_key, (entry[0], 0.0, entry[2]), self.grace)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        删除缓存值（之后的请求不会拿到旧值）
+
+        Args:
+            key: 缓存键
+        """
+        cache.delete(self.cache_key(key))
+
+    def cache_key(self, key: Hashable) -> str:
+        """完整缓存键"""
+        return f'{self.key_prefix}{key}'
+
+    def metrics(self) -> dict[str, int]:
+        """本进程内的指标计数"""
+        with self._metrics_lock:
+            return {name: self._metrics[name] for name in METRIC_NAMES}
+
+    def reset_metrics(self) -> None:
+        """清零本进程内的指标计数"""
+        with self._metrics_lock:
+            self._metrics.clear()
+
+    def _rebuild_or_wait(self, cache_key: str, builder: Callable[[], Any]) -> Any:
+        """没有旧值：拿到锁则重建，否则等待重建结果，超时后自行重建"""
+        if self._acquire(cache_key):
+            return self._rebuild_locked(cache_key, builder)
+        entry = self._wait(cache_key)
+        if entry is not _MISSING:
+            return entry[0]
+        return self._build(cache_key, builder)
+
+    def _rebuild_locked(
+        self,
+        cache_key: str,
+        builder: Callable[[], Any],
+        stale: Any = _MISSING,
+    ) -> Any:
+        try:
+            return self._build(cache_key, builder)
+        except Exception as e:
+            if stale is _MISSING:
+                raise
+            # 重建失败时继续使用旧值
+            logger.warning("缓存重建失败，返回旧值: key={}, 错误={}", cache_key, str(e))
+            return stale
+        finally:
+            self._release(cache_key)
+
+    def _build(self, cache_key: str, builder: Callable[[], Any]) -> Any:
+        self._count('rebuilds')
+        started = time.time()
+        try:
+            value = builder()
+        except Exception:
+            self._count('errors')
+            raise
+        if value is None and not self.cache_none:
+            return value
+        now = time.time()
+        cache.set(cache_key, (value, now + self.ttl, now - started), self.ttl + self.grace)
+        return value
+
+    def _refresh_early(self, expires_at: float, cost: float, now: float) -> bool:
+        if self.beta <= 0 or cost <= 0:
+            return False
+        return now - cost * self.beta * math.log(1.0 - random.random()) >= expires_at
+
+    def _wait(self, cache_key: str) -> Any:
+        """等待其他请求写入缓存值，超时返回 _MISSING"""
+        self._count('waits')
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = cache.get(cache_key, _MISSING)
+            if value is not _MISSING:
+                return value
+            delay = min(delay * 2, 0.1)
+        return _MISSING
+
+    def _acquire(self, cache_key: str) -> bool:
+        return cache.add(f'{cache_key}:rebuild', 1, self.lock_timeout)
+
+    def _release(self, cache_key: str) -> None:
+        cache.delete(f'{cache_key}:rebuild')
+
+    def _count(self, name: str) -> None:
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+
+def get_cache_metrics() -> dict[str, dict[str, int]]:
+    """
+    获取本进程内所有防击穿缓存的指标
+
+    Returns:
+        dict: 缓存名称 → 指标计数（含命中率 hit_ratio）
+    """
+    with _registry_lock:
+        caches = list(_registry.values())
+    result = {}
+    for flight in caches:
+        metrics = flight.metrics()
+        served = metrics['hits'] + metrics['stale_hits'] + metrics['misses']
+        metrics['hit_ratio'] = round(
+            (metrics['hits'] + metrics['stale_hits']) / served, 4
+        ) if served else None
+        result[flight.name] = metrics
+    return result
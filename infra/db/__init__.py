@@ -1,5 +1,9 @@
 """
 数据库配置
 
-数据库连接池、配置等
+数据库连接池、配置、按视图查询统计等
 """
+
+from .query_stats import QueryRecorder, fingerprint_sql, load_query_stats, reset_query_stats
+
+__all__ = ['QueryRecorder', 'fingerprint_sql', 'load_query_stats', 'reset_query_stats']
@@ -0,0 +1,240 @@
+"""
+生产环境的按视图查询统计
+
+通过数据库 execute_wrapper 记录单个请求执行的查询（不依赖 DEBUG 和 connection.queries），
+按视图聚合查询次数、数据库耗时和 SQL 指纹（参数值替换为 ?），用于发现 N+1 查询：
+同一指纹在单个请求中执行多次（max_per_request）即为典型的 N+1。
+
+- 每个进程在内存中聚合（视图数和每个视图的指纹数有上限），
+  定期把增量写入共享缓存（见 infra.cache.ProcessSnapshots），读取时合并（见 load_query_stats）
+- 是否记录由 QueryInstrumentationMiddleware 决定（按比例抽样或按请求开启）
+"""
+import re
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from loguru import logger
+
+from infra.cache.process_snapshots import ProcessSnapshots
+
+CACHE_KEY_PREFIX = 'parking:querystats:'
+# 进程快照的写入间隔（秒）
+FLUSH_INTERVAL = 30
+# 每个进程最多聚合的视图数，超出后的视图计入 OTHER_KEY
+MAX_VIEWS = 200
+# 每个视图最多保留的 SQL 指纹数，超出后的指纹计入 OTHER_KEY
+MAX_FINGERPRINTS = 100
+# 指纹的最大长度
+MAX_FINGERPRINT_LENGTH = 1000
+OTHER_KEY = '<other>'
+
+_STRING_RE = re.compile(r"'[^']*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+# IN 参数列表（IN (%s, %s, ...)），长度不同的列表归为同一指纹
+_IN_LIST_RE = re.compile(r'\bIN\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.IGNORECASE)
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    生成 SQL 指纹：移除字符串和数字值，参数占位符统一为 ?，IN 列表合并，标准化空白
+
+    Args:
+        sql: SQL 语句（参数化或已代入参数）
+
+    Returns:
+        str: SQL 指纹
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = sql.replace('%s', '?')
+    sql = ' '.join(sql.split())
+    return sql[:MAX_FINGERPRINT_LENGTH]
+
+
+class QueryRecorder:
+    """
+    单个请求的查询记录（作为 connection.execute_wrapper 使用）
+
+    Example:
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            ...
+        recorder.count, recorder.duration, recorder.fingerprints
+    """
+
+    def __init__(self, record_sql: bool = True) -> None:
+        """
+        Args:
+            record_sql: 是否按 SQL 记录（False 时只统计次数和耗时）
+        """
+        self.count = 0
+        self.duration = 0.0
+        self.record_sql = record_sql
+        # SQL → [执行次数, 耗时]
+        self.fingerprints: dict[str, list] = {}
+
+    def __call__(self, execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.record_sql:
+                entry = self.fingerprints.get(sql)
+                if entry is None:
+                    entry = self.fingerprints[sql] = [0, 0.0]
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+def _new_view_stats() -> dict:
+    return {
+        'requests': 0,
+        'queries': 0,
+        'max_queries': 0,
+        'db_time': 0.0,
+        'max_db_time': 0.0,
+        'fingerprints': {},
+    }
+
+
+def _new_fingerprint_stats() -> dict:
+    return {'count': 0, 'time': 0.0, 'requests': 0, 'max_per_request': 0}
+
+
+def _merge(target: dict[str, dict], source: dict[str, dict]) -> None:
+    """把 source 的统计累加到 target（视图数和指纹数的上限同进程内聚合）"""
+    for view, stats in source.items():
+        if view not in target and len(target) >= MAX_VIEWS:
+            view = OTHER_KEY
+        merged = target.setdefault(view, _new_view_stats())
+        for name in ('requests', 'queries', 'db_time'):
+            merged[name] += stats[name]
+        for name in ('max_queries', 'max_db_time'):
+            merged[name] = max(merged[name], stats[name])
+        fingerprints = merged['fingerprints']
+        for fingerprint, entry in stats['fingerprints'].items():
+            if fingerprint not in fingerprints and len(fingerprints) >= MAX_FINGERPRINTS:
+                fingerprint = OTHER_KEY
+            merged_entry = fingerprints.setdefault(fingerprint, _new_fingerprint_stats())
+            for name in ('count', 'time', 'requests'):
+                merged_entry[name] += entry[name]
+            merged_entry['max_per_request'] = max(merged_entry['max_per_request'], entry['max_per_request'])
+
+
+class QueryStatsCollector:
+    """
+    进程内的按视图查询统计（有上限），定期把增量写入共享缓存
+    """
+
+    def __init__(self) -> None:
+        # 自上次写入以来的统计
+        self._views: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.snapshots = ProcessSnapshots(CACHE_KEY_PREFIX, _merge)
+
+    def record(self, view: str, recorder: QueryRecorder) -> None:
+        """
+        合并一个请求的查询记录
+
+        Args:
+            view: 视图名称
+            recorder: 请求的查询记录
+        """
+        # 指纹化在锁外进行（同一请求的参数化 SQL 先合并，减少正则次数）
+        per_request: dict[str, list] = {}
+        for sql, (count, elapsed) in recorder.fingerprints.items():
+            entry = per_request.setdefault(fingerprint_sql(sql), [0, 0.0])
+            entry[0] += count
+            entry[1] += elapsed
+
+        with self._lock:
+            if view not in self._views and len(self._views) >= MAX_VIEWS:
+                view = OTHER_KEY
+            stats = self._views.setdefault(view, _new_view_stats())
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['db_time'] += recorder.duration
+            stats['max_db_time'] = max(stats['max_db_time'], recorder.duration)
+
+            fingerprints = stats['fingerprints']
+            for fingerprint, (count, elapsed) in per_request.items():
+                if fingerprint not in fingerprints and len(fingerprints) >= MAX_FINGERPRINTS:
+                    fingerprint = OTHER_KEY
+                entry = fingerprints.setdefault(fingerprint, _new_fingerprint_stats())
+                entry['count'] += count
+                entry['time'] += elapsed
+                entry['requests'] += 1
+                entry['max_per_request'] = max(entry['max_per_request'], count)
+
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self, take: bool = False) -> dict[str, dict]:
+        """
+        本进程自上次写入以来的统计增量
+
+        Args:
+            take: 是否同时清空（写入共享缓存时使用）
+        """
+        with self._lock:
+            if take:
+                views, self._views = self._views, {}
+                return views
+            return {
+                view: {
+                    **stats,
+                    'fingerprints': {
+                        fingerprint: dict(entry)
+                        for fingerprint, entry in stats['fingerprints'].items()
+                    },
+                }
+                for view, stats in self._views.items()
+            }
+
+    def flush(self) -> None:
+        """将本进程的统计增量写入共享缓存（缓存不可用时只记录警告，增量在下次写入时提交）"""
+        self._last_flush = time.monotonic()
+        try:
+            if self.snapshots.changed():
+                self.reset()
+            self.snapshots.publish(self.snapshot(take=True))
+        except Exception as e:
+            logger.warning('写入查询统计失败: {}', e)
+
+    def reset(self) -> None:
+        """清空本进程统计"""
+        with self._lock:
+            self._views.clear()
+
+
+collector = QueryStatsCollector()
+
+
+def load_query_stats() -> dict[str, dict]:
+    """
+    读取所有进程写入共享缓存的查询统计并合并
+
+    Returns:
+        dict: 视图名称 → requests、queries、max_queries、db_time、max_db_time、
+            fingerprints（SQL 指纹 → count、time、requests、max_per_request）
+    """
+    merged: dict[str, dict] = {}
+    # 当前进程使用内存中的最新统计（缓存中的快照可能尚未写入或已落后）
+    snapshots = collector.snapshots.load(local=collector.snapshot())
+    for snapshot in snapshots.values():
+        _merge(merged, snapshot)
+    return merged
+
+
+def reset_query_stats() -> None:
+    """删除共享缓存中的查询统计（其他进程下次写入时丢弃旧统计并重新登记）"""
+    collector.snapshots.clear()
+    collector.reset()
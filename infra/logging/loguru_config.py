@@ -15,10 +15,17 @@ def configure_loguru():
     配置 loguru 日志系统
     
     在应用启动时调用此函数来配置日志系统。
+    
+    LOG_ENQUEUE 为 True 时各输出通过队列由后台线程写入（请求线程只入队，不做控制台/文件 I/O），
+    进程退出时 loguru 会写完队列中剩余的日志。
+    LOG_FILE_LEVEL 控制主日志文件的级别（默认 DEBUG 环境为 DEBUG，否则为 INFO）。
     """
     # 移除默认的 handler
     logger.remove()
     
+    enqueue = getattr(settings, 'LOG_ENQUEUE', True)
+    file_level = getattr(settings, 'LOG_FILE_LEVEL', 'DEBUG' if settings.DEBUG else 'INFO')
+    
     # 日志格式
     log_format = (
         "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
@@ -33,6 +40,7 @@ def configure_loguru():
         format=log_format,
         level="DEBUG" if settings.DEBUG else "INFO",
         colorize=True,
+        enqueue=enqueue,
     )
     
     # 文件输出
@@ -40,11 +48,12 @@ def configure_loguru():
     logger.add(
         str(log_file),
         format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} | {message}",
-        level="DEBUG",
+        level=file_level,
         rotation="10 MB",
         retention="7 days",
         compression="zip",
         encoding="utf-8",
+        enqueue=enqueue,
     )
     
     # 错误日志单独文件
@@ -57,4 +66,5 @@ def configure_loguru():
         retention="30 days",
         compression="zip",
         encoding="utf-8",
+        enqueue=enqueue,
     )
@@ -0,0 +1,9 @@
+"""
+监控指标
+
+按路由的请求延迟直方图、状态码、数据库耗时和缓存命中等指标
+"""
+
+from .request_metrics import RequestMetrics, load_metrics, metrics, render_prometheus
+
+__all__ = ['RequestMetrics', 'load_metrics', 'metrics', 'render_prometheus']
@@ -0,0 +1,255 @@
+"""
+按路由的请求指标
+
+每个请求按路由（URL 名称，含命名空间）累计：
+- 延迟直方图（桶上界见 LATENCY_BUCKETS）、总耗时和请求数
+- 各状态码的响应数
+- 数据库查询次数和耗时
+- 超过路由慢请求阈值的请求数
+
+进程内累计（有锁，开销为一次字典更新），定期把增量写入共享缓存（见 infra.cache.ProcessSnapshots），
+读取时合并所有进程的快照（计数累加），同时附带各进程防击穿缓存的命中计数。
+已退出进程的计数并入基础快照，导出的计数器不会因进程快照过期而减少。
+由 PerformanceMonitoringMiddleware 记录，/metrics 以 Prometheus 文本格式导出。
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from loguru import logger
+
+from infra.cache.process_snapshots import ProcessSnapshots
+from infra.cache.single_flight import METRIC_NAMES, get_cache_metrics
+
+CACHE_KEY_PREFIX = 'parking:metrics:'
+# 进程快照的写入间隔（秒），应不大于 Prometheus 的抓取间隔
+FLUSH_INTERVAL = 15
+# 每个进程最多记录的路由数，超出后的路由计入 OTHER_ROUTE
+MAX_ROUTES = 300
+OTHER_ROUTE = '<other>'
+# 延迟直方图的桶上界（秒），慢请求阈值最好与其中一个桶上界相同
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _new_route_stats() -> dict:
+    return {
+        # 各桶的请求数（非累计），最后一个为超过最大桶上界的请求
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+        'sum': 0.0,
+        'count': 0,
+        'status': {},
+        'db_time': 0.0,
+        'db_queries': 0,
+        'slow': 0,
+    }
+
+
+def _merge(target: dict, source: dict) -> None:
+    """把 source 的指标累加到 target（target 可以是空字典）"""
+    routes = target.setdefault('routes', {})
+    for route, stats in source.get('routes', {}).items():
+        if route not in routes and len(routes) >= MAX_ROUTES:
+            route = OTHER_ROUTE
+        merged = routes.get(route)
+        if merged is None:
+            merged = routes[route] = _new_route_stats()
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], stats['buckets'])]
+        for name in ('sum', 'count', 'db_time', 'db_queries', 'slow'):
+            merged[name] += stats[name]
+        for status, count in stats['status'].items():
+            merged['status'][status] = merged['status'].get(status, 0) + count
+    caches = target.setdefault('caches', {})
+    for name, values in source.get('caches', {}).items():
+        merged = caches.setdefault(name, dict.fromkeys(METRIC_NAMES, 0))
+        for metric in METRIC_NAMES:
+            merged[metric] += values.get(metric, 0)
+
+
+class RequestMetrics:
+    """
+    进程内的按路由请求指标，定期把增量写入共享缓存
+    """
+
+    def __init__(self) -> None:
+        # 自上次写入以来的路由指标
+        self._routes: dict[str, dict] = {}
+        # 上次写入时各防击穿缓存的计数（缓存计数在进程内累计，写入时取差值）
+        self._cache_counts: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.snapshots = ProcessSnapshots(CACHE_KEY_PREFIX, _merge)
+
+    def observe(
+        self,
+        route: str,
+        status: int,
+        duration: float,
+        db_time: float = 0.0,
+        db_queries: int = 0,
+        slow: bool = False
+    ) -> None:
+        """
+        记录一个请求
+
+        Args:
+            route: 路由名称
+            status: 响应状态码
+            duration: 请求耗时（秒）
+            db_time: 数据库耗时（秒）
+            db_queries: 数据库查询次数
+            slow: 是否超过慢请求阈值
+        """
+        bucket = bisect_left(LATENCY_BUCKETS, duration)
+        with self._lock:
+            if route not in self._routes and len(self._routes) >= MAX_ROUTES:
+                route = OTHER_ROUTE
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _new_route_stats()
+            stats['buckets'][bucket] += 1
+            stats['sum'] += duration
+            stats['count'] += 1
+            stats['status'][status] = stats['status'].get(status, 0) + 1
+            stats['db_time'] += db_time
+            stats['db_queries'] += db_queries
+            if slow:
+                stats['slow'] += 1
+
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self, take: bool = False) -> dict:
+        """
+        本进程自上次写入以来的指标增量（含防击穿缓存计数）
+
+        Args:
+            take: 是否同时清空（写入共享缓存时使用）
+        """
+        counts = {
+            name: {metric: values[metric] for metric in METRIC_NAMES}
+            for name, values in get_cache_metrics().items()
+        }
+        with self._lock:
+            routes = {
+                route: {**stats, 'buckets': list(stats['buckets']), 'status': dict(stats['status'])}
+                for route, stats in self._routes.items()
+            }
+            caches = {
+                name: {
+                    metric: values[metric] - self._cache_counts.get(name, {}).get(metric, 0)
+                    for metric in METRIC_NAMES
+                }
+                for name, values in counts.items()
+            }
+            if take:
+                self._routes.clear()
+                self._cache_counts = counts
+        return {'routes': routes, 'caches': caches}
+
+    def flush(self) -> None:
+        """将本进程的指标增量写入共享缓存（缓存不可用时只记录警告，增量在下次写入时提交）"""
+        self._last_flush = time.monotonic()
+        try:
+            if self.snapshots.changed():
+                self.reset()
+            self.snapshots.publish(self.snapshot(take=True))
+        except Exception as e:
+            logger.warning('写入请求指标失败: {}', e)
+
+    def reset(self) -> None:
+        """清空本进程指标"""
+        with self._lock:
+            self._routes.clear()
+
+
+metrics = RequestMetrics()
+
+
+def load_metrics() -> dict:
+    """
+    读取所有进程的指标并合并（当前进程使用内存中的最新指标）
+
+    Returns:
+        dict: routes（路由 → 直方图和计数）、caches（缓存名称 → 计数）、
+            processes（进程数，不含已并入基础快照的进程）
+    """
+    snapshots = metrics.snapshots.load(local=metrics.snapshot())
+
+    merged: dict = {'routes': {}, 'caches': {}}
+    for snapshot in snapshots.values():
+        _merge(merged, snapshot)
+
+    processes = len(snapshots) - (metrics.snapshots.base_key in snapshots)
+    return {**merged, 'processes': processes}
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(data: dict) -> str:
+    """
+    以 Prometheus 文本格式输出指标
+
+    Args:
+        data: load_metrics 的结果
+
+    Returns:
+        str: Prometheus 文本格式（0.0.4）
+    """
+    lines = [
+        '# HELP parking_http_request_duration_seconds 请求耗时（按路由）',
+        '# TYPE parking_http_request_duration_seconds histogram',
+    ]
+    routes = sorted(data['routes'].items())
+    for route, stats in routes:
+        label = _label(route)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'parking_http_request_duration_seconds_bucket{{route="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'parking_http_request_duration_seconds_bucket{{route="{label}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'parking_http_request_duration_seconds_sum{{route="{label}"}} {stats["sum"]:.6f}')
+        lines.append(f'parking_http_request_duration_seconds_count{{route="{label}"}} {stats["count"]}')
+
+    lines += [
+        '# HELP parking_http_responses_total 响应数（按路由和状态码）',
+        '# TYPE parking_http_responses_total counter',
+    ]
+    for route, stats in routes:
+        for status, count in sorted(stats['status'].items()):
+            lines.append(f'parking_http_responses_total{{route="{_label(route)}",status="{status}"}} {count}')
+
+    for name, key, help_text, fmt in (
+        ('parking_http_db_seconds_total', 'db_time', '数据库耗时（按路由）', '.6f'),
+        ('parking_http_db_queries_total', 'db_queries', '数据库查询次数（按路由）', 'd'),
+        ('parking_http_slow_requests_total', 'slow', '超过路由慢请求阈值的请求数', 'd'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for route, stats in routes:
+            lines.append(f'{name}{{route="{_label(route)}"}} {stats[key]:{fmt}}')
+
+    caches = sorted(data['caches'].items())
+    lines += [
+        '# HELP parking_cache_events_total 防击穿缓存事件数（hits、stale_hits、misses 等）',
+        '# TYPE parking_cache_events_total counter',
+    ]
+    for name, values in caches:
+        for metric in METRIC_NAMES:
+            lines.append(f'parking_cache_events_total{{cache="{_label(name)}",event="{metric}"}} {values[metric]}')
+    lines += [
+        '# HELP parking_cache_hit_ratio 防击穿缓存命中率（含宽限期旧值命中）',
+        '# TYPE parking_cache_hit_ratio gauge',
+    ]
+    for name, values in caches:
+        served = values['hits'] + values['stale_hits'] + values['misses']
+        if served:
+            ratio = (values['hits'] + values['stale_hits']) / served
+            lines.append(f'parking_cache_hit_ratio{{cache="{_label(name)}"}} {ratio:.4f}')
+
+    lines += [
+        '# HELP parking_metrics_processes 已合并指标的工作进程数',
+        '# TYPE parking_metrics_processes gauge',
+        f'parking_metrics_processes {data["processes"]}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -11,7 +11,7 @@ Version: 1.1.0
 from django.contrib import admin
 from django.utils.html import format_html
 
-from parking.models import ParkingLot, ParkingRecord, ParkingSpace, Vehicle
+from parking.models import ActiveParking, LotOccupancy, ParkingLot, ParkingRecord, ParkingSpace, Vehicle
 from parking.license_plate_models import (
     LicensePlateLocation, Province, City, VehicleAlertLog, WantedVehicle
 )
@@ -60,6 +60,33 @@ class ParkingLotAdmin(admin.ModelAdmin):
     occupied_spaces_display.short_description = '已占用'
 
 
+@admin.register(LotOccupancy)
+class LotOccupancyAdmin(admin.ModelAdmin):
+    """停车场占用计数（只读，漂移通过 reconcile_occupancy 命令修复）"""
+    list_display = ['parking_lot', 'occupied_count', 'space_count', 'updated_at', 'reconciled_at']
+    readonly_fields = ['parking_lot', 'occupied_count', 'space_count', 'updated_at', 'reconciled_at']
+    
+    def has_add_permission(self, request) -> bool:
+        return False
+    
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
+@admin.register(ActiveParking)
+class ActiveParkingAdmin(admin.ModelAdmin):
+    """在场车辆（只读，随入场/出场自动维护）"""
+    list_display = ['license_plate', 'record', 'created_at']
+    search_fields = ['license_plate']
+    readonly_fields = ['license_plate', 'record', 'created_at']
+    
+    def has_add_permission(self, request) -> bool:
+        return False
+    
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
 @admin.register(ParkingSpace)
 class ParkingSpaceAdmin(admin.ModelAdmin):
     """停车位管理"""
@@ -85,17 +112,23 @@ class ParkingSpaceAdmin(admin.ModelAdmin):
 @admin.register(Vehicle)
 class VehicleAdmin(admin.ModelAdmin):
     """车辆管理"""
-    list_display = ['license_plate', 'vehicle_type', 'owner_name', 'owner_phone', 'created_at']
+    list_display = ['license_plate', 'vehicle_type', 'owner_name', 'owner_phone', 'vip_status', 'created_at']
     list_filter = ['vehicle_type', 'created_at']
     search_fields = ['license_plate', 'owner_name', 'owner_phone']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def vip_status(self, obj: Vehicle) -> bool:
+        """显示VIP状态（查询进程内索引，不逐行查询数据库）"""
+        return obj.is_vip
+    vip_status.short_description = 'VIP'
+    vip_status.boolean = True
 
 
 @admin.register(ParkingRecord)
 class ParkingRecordAdmin(admin.ModelAdmin):
     """停车记录管理"""
     list_display = ['vehicle', 'parking_space', 'entry_time', 'exit_time', 'duration_display', 'fee', 'is_paid', 'operator']
-    list_filter = ['is_paid', 'entry_time', 'parking_space__parking_lot']
+    list_filter = ['is_paid', 'entry_time', 'parking_lot']
     search_fields = ['vehicle__license_plate', 'parking_space__space_number']
     readonly_fields = ['created_at', 'updated_at', 'duration_display']
     date_hierarchy = 'entry_time'
@@ -9,3 +9,7 @@ class ParkingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'parking'
     verbose_name = '停车场管理'
+
+    def ready(self):
+        """应用就绪时注册信号处理器"""
+        import parking.signals  # noqa: F401
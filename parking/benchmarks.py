@@ -0,0 +1,391 @@
+"""
+核心热点函数微基准
+
+由 benchmark 管理命令在临时测试数据库和进程内缓存中运行（不访问外部服务），
+结果与保存的基线比较，用于验证性能优化和发现回退。
+
+每个基准由 @benchmark 注册的准备函数定义：准备函数创建所需数据，
+返回被计时的无参数函数（每次调用计为一次操作）。
+"""
+import json
+import platform
+import statistics
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+import django
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.utils import timezone
+
+# 单批计时的最短时长（秒），不足时增加每批的操作次数
+MIN_BATCH_SECONDS = 0.05
+# 默认的车位号批量解析规模
+DEFAULT_ROWS = (10_000, 100_000)
+
+# 车牌样本：普通、新能源、特殊车牌和不合规车牌混合
+PLATE_SAMPLES = (
+    '粤E9KM03', '粤ED12345', '京A88888', '沪A99999', '苏E12345',
+    '粤B1234学', '粤Z1234港', '粤AD1234F', '浙A12345挂', '川A12345',
+    'ABC123', '粤E', '粤I12345', '粤E1234567890', '京AO1234',
+)
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """已注册的基准"""
+    name: str
+    prepare: Callable[..., Callable[[], object]]
+    # 是否按解析规模展开（名称后缀为行数）
+    sized: bool = False
+
+
+_registry: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, sized: bool = False):
+    """
+    注册基准
+
+    Args:
+        name: 基准名称
+        sized: 准备函数是否接收行数参数（按 rows 展开为多个基准）
+    """
+    def decorator(prepare):
+        _registry[name] = Benchmark(name, prepare, sized)
+        return prepare
+    return decorator
+
+
+def _time(func: Callable[[], object], repeat: int) -> dict:
+    """计时：先校准每批次数，再重复计时多批，返回每次操作的耗时（微秒）"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_BATCH_SECONDS:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(MIN_BATCH_SECONDS / elapsed) + 1))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+
+    return {
+        'min_us': round(min(timings) * 1e6, 3),
+        'median_us': round(statistics.median(timings) * 1e6, 3),
+        'number': number,
+        'repeat': len(timings),
+    }
+
+
+def run_benchmarks(
+    patterns: Iterable[str] = (),
+    rows: Iterable[int] = DEFAULT_ROWS,
+    repeat: int = 5,
+    progress: Callable[[str, dict], None] | None = None
+) -> dict:
+    """
+    运行基准（需要已准备好的数据库和缓存）
+
+    Args:
+        patterns: 名称包含任一字符串的基准才运行，为空时全部运行
+        rows: 车位号批量解析的行数
+        repeat: 每个基准计时的批数
+        progress: 每个基准完成后调用，参数为名称和结果
+
+    Returns:
+        dict: meta（运行环境）和 results（名称 → 计时结果）
+    """
+    patterns = list(patterns)
+    results = {}
+    for bench in _registry.values():
+        variants = [(f'{bench.name}[{count}]', (count,)) for count in rows] if bench.sized else [(bench.name, ())]
+        for name, args in variants:
+            if patterns and not any(pattern in name for pattern in patterns):
+                continue
+            func = bench.prepare(*args)
+            results[name] = _time(func, repeat)
+            if progress is not None:
+                progress(name, results[name])
+
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+        },
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    与基线比较
+
+    Args:
+        results: run_benchmarks 的结果
+        baseline: 保存的基线（同一格式）
+        threshold: 回退阈值（0.25 表示比基线慢 25% 以上视为回退）
+
+    Returns:
+        list[dict]: 每个共同基准的 name、baseline_us、current_us、ratio、regressed
+    """
+    comparison = []
+    for name, current in results['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = current['min_us'] / base['min_us'] if base['min_us'] else 1.0
+        comparison.append({
+            'name': name,
+            'baseline_us': base['min_us'],
+            'current_us': current['min_us'],
+            'ratio': round(ratio, 3),
+            'regressed': ratio > 1 + threshold,
+        })
+    return comparison
+
+
+# ==================== 车牌验证 ====================
+
+@benchmark('validate_license_plate')
+def _validate_license_plate():
+    from parking.models.validators import validate_license_plate
+
+    def run():
+        for plate in PLATE_SAMPLES:
+            try:
+                validate_license_plate(plate)
+            except ValidationError:
+                pass
+    return run
+
+
+@benchmark('license_plate_field_clean')
+def _license_plate_field_clean():
+    from parking.forms import LicensePlateField
+
+    field = LicensePlateField()
+
+    def run():
+        for plate in PLATE_SAMPLES:
+            try:
+                field.clean(plate)
+            except ValidationError:
+                pass
+    return run
+
+
+# ==================== 计费 ====================
+
+def _fee_fixture(name: str, pricing: dict | None = None, vip: bool = False):
+    """创建停车场、车位和车辆，返回未保存的在场停车记录（入场 5 小时 17 分钟前）"""
+    from parking.models import ParkingLot, ParkingRecord, ParkingSpace, Vehicle, VIPVehicle
+    from parking.pricing_models import ParkingLotPricing
+
+    lot = ParkingLot.objects.create(
+        name=f'基准-{name}', address='基准数据', total_spaces=1, hourly_rate=Decimal('5.00')
+    )
+    space = ParkingSpace.objects.create(parking_lot=lot, space_number='A001')
+    if pricing is not None:
+        ParkingLotPricing.objects.create(parking_lot=lot, **pricing)
+    plate = {'fixed': '粤E10001', 'tiered': '粤E10002', 'tiered_rules': '粤E10003', 'vip': '粤E10004'}[name]
+    vehicle = Vehicle.objects.create(license_plate=plate)
+    if vip:
+        from django.contrib.auth.models import User
+
+        VIPVehicle.objects.create(
+            license_plate=plate, owner_name='基准', discount_rate=Decimal('0.50'),
+            valid_from=timezone.localdate(),
+            created_by=User.objects.create_user(username='benchmark'),
+        )
+    return ParkingRecord(
+        vehicle=vehicle,
+        parking_space=space,
+        parking_lot=lot,
+        entry_time=timezone.now() - timedelta(hours=5, minutes=17),
+    )
+
+
+TIERED_RULES = [
+    {'start_minutes': 0, 'end_minutes': 60, 'rate_per_hour': 2},
+    {'start_minutes': 60, 'end_minutes': 240, 'rate_per_hour': 4},
+    {'start_minutes': 240, 'end_minutes': None, 'rate_per_hour': 6},
+]
+
+
+@benchmark('calculate_fee[fixed]')
+def _calculate_fee_fixed():
+    record = _fee_fixture('fixed')
+    return record.calculate_fee
+
+
+@benchmark('calculate_fee[tiered]')
+def _calculate_fee_tiered():
+    record = _fee_fixture('tiered', {'charge_type': 'tiered', 'free_minutes': 30})
+    return record.calculate_fee
+
+
+@benchmark('calculate_fee[tiered_rules]')
+def _calculate_fee_tiered_rules():
+    record = _fee_fixture('tiered_rules', {
+        'charge_type': 'tiered', 'free_minutes': 15,
+        'custom_rules': TIERED_RULES, 'daily_max_fee': Decimal('30.00'),
+    })
+    return record.calculate_fee
+
+
+@benchmark('calculate_fee[vip]')
+def _calculate_fee_vip():
+    record = _fee_fixture('vip', vip=True)
+    return record.calculate_fee
+
+
+@benchmark('calculate_tiered_fee')
+def _calculate_tiered_fee():
+    from parking.models import ParkingLot, ParkingRecord
+    from parking.pricing_models import ParkingLotPricing
+
+    parking_lot = ParkingLot(name='基准-阶梯', hourly_rate=Decimal('5.00'))
+    pricing_config = ParkingLotPricing(
+        charge_type='tiered', free_minutes=15, custom_rules=TIERED_RULES
+    )
+    record = ParkingRecord()
+
+    def run():
+        for minutes in (10, 45, 130, 317, 1500):
+            record._calculate_tiered_fee(minutes, pricing_config, parking_lot)
+    return run
+
+
+# ==================== 车位号解析 ====================
+
+@benchmark('parse_range', sized=True)
+def _parse_range(rows: int):
+    from parking.space_creation_service import SpaceNumberParser
+
+    end = f'A{rows:0{max(3, len(str(rows)))}d}'
+    start = f'A{1:0{len(end) - 1}d}'
+    return lambda: SpaceNumberParser.parse_range(start, end)
+
+
+@benchmark('parse_from_text', sized=True)
+def _parse_from_text(rows: int):
+    from parking.space_creation_service import SpaceNumberParser
+
+    # 单行、逗号分隔和范围混合
+    lines = []
+    for index in range(0, rows, 10):
+        lines.append(f'B{index:06d}')
+        lines.append(','.join(f'C{index + offset:06d}' for offset in range(1, 5)))
+        lines.append(f'D{index + 5:06d}-D{index + 9:06d}')
+    text = '\n'.join(lines)
+    return lambda: SpaceNumberParser.parse_from_text(text)
+
+
+@benchmark('parse_from_excel', sized=True)
+def _parse_from_excel(rows: int):
+    from openpyxl import Workbook
+
+    from parking.space_creation_service import SpaceNumberParser
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['车位号', '楼层', '区域', '车位类型'])
+    for index in range(rows):
+        sheet.append([f'E{index:06d}', 'B1', f'{index % 8}区', 'standard'])
+    buffer = BytesIO()
+    workbook.save(buffer)
+    content = buffer.getvalue()
+    return lambda: SpaceNumberParser.parse_from_excel(content)
+
+
+# ==================== 仪表盘 ====================
+
+def _dashboard_fixture() -> None:
+    """创建仪表盘数据：5 个停车场，各 40 个车位，一半在场"""
+    from parking.models import ParkingLot, ParkingSpace
+    from parking.services import ParkingRecordService
+
+    if ParkingLot.objects.filter(name__startswith='基准-仪表盘').exists():
+        return
+    for lot_index in range(5):
+        lot = ParkingLot.objects.create(
+            name=f'基准-仪表盘{lot_index}', address='基准数据', total_spaces=40,
+            hourly_rate=Decimal('5.00')
+        )
+        for space_index in range(40):
+            ParkingSpace.objects.create(parking_lot=lot, space_number=f'A{space_index:03d}')
+        for vehicle_index in range(20):
+            ParkingRecordService.vehicle_entry(f'沪C{lot_index}{vehicle_index:04d}', lot.pk)
+
+
+@benchmark('dashboard[cold]')
+def _dashboard_cold():
+    from parking.services import DashboardService
+
+    _dashboard_fixture()
+
+    def run():
+        cache.clear()
+        DashboardService.get_dashboard_data()
+    return run
+
+
+@benchmark('dashboard[warm]')
+def _dashboard_warm():
+    from parking.services import DashboardService
+
+    _dashboard_fixture()
+    DashboardService.get_dashboard_data()
+    return DashboardService.get_dashboard_data
+
+
+# ==================== API 响应 ====================
+
+@benchmark('api_response')
+def _api_response():
+    from parking.views.api import api_response
+
+    data = {
+        'records': [
+            {
+                'id': index,
+                'license_plate': f'粤E{index:05d}',
+                'parking_lot': '早点喝茶停车场',
+                'space_number': f'A{index:03d}',
+                'entry_time': '2025-12-11 08:30:00',
+                'fee': Decimal('12.50'),
+                'is_paid': bool(index % 2),
+            }
+            for index in range(50)
+        ],
+        'total': 50,
+    }
+    return lambda: api_response(success=True, data=data, message='查询成功')
+
+
+def load_results(path) -> dict:
+    """读取保存的结果或基线"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path) -> None:
+    """保存结果或基线（JSON）"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+        f.write('\n')
@@ -1,18 +1,25 @@
 """
 自定义装饰器
 
-提供登录和权限检查装饰器，统一重定向到自定义登录页。
+提供登录和权限检查装饰器，统一重定向到自定义登录页；
+以及道闸 API 使用的幂等请求装饰器。
 
 Author: HeZaoCha
 Created: 2025-12-11
 Version: 1.1.0
 """
+import hashlib
+import json
+import re
 from functools import wraps
 
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.admin.views.decorators import staff_member_required as django_staff_member_required
 from django.shortcuts import redirect
 from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from loguru import logger
 
 
 def staff_member_required(view_func):
@@ -54,3 +61,111 @@ def login_required_redirect(view_func):
     
     return _wrapped_view
 
+
+# 幂等键请求头及允许的格式（客户端生成的 UUID 等）
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.:\-]{1,128}$')
+# 处理中标记的有效期（秒），超过后视为首次请求已中断
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+# 暂时性错误：响应不保存，客户端用相同键重试时重新处理
+TRANSIENT_ERROR_CODES = frozenset({'server_error', 'database_error', 'unknown_error'})
+
+
+def idempotent_request(scope: str):
+    """
+    幂等请求装饰器（用于道闸入场/出场等 JSON API）
+    
+    请求携带 Idempotency-Key 头时，首次请求的响应在缓存中保留
+    IDEMPOTENCY_KEY_TTL 秒，同一用户用相同键重试时直接返回原响应，不再访问数据库。
+    - 首次请求仍在处理中时，重试返回 409（request_in_progress）
+    - 相同键但请求体不同时返回 422（idempotency_key_reused）
+    - 暂时性错误（5xx 及 TRANSIENT_ERROR_CODES，包括批量结果中的单条失败）不保存，
+      重试会重新处理
+    未携带请求头时行为不变。应放在 login_required 之后。
+    
+    Args:
+        scope: 接口标识，不同接口的键互不冲突
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return view_func(request, *args, **kwargs)
+            
+            if not IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+                return JsonResponse({
+                    'success': False,
+                    'message': '无效的幂等键',
+                    'error_code': 'invalid_idempotency_key',
+                }, status=400)
+            
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+            cache_key = f'parking:idempotency:{scope}:{request.user.pk}:{digest}'
+            lock_key = f'{cache_key}:lock'
+            fingerprint = hashlib.sha256(request.body).hexdigest()
+            
+            stored = cache.get(cache_key)
+            if stored is None:
+                if not cache.add(lock_key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT):
+                    # 首次请求尚未完成（或刚好在此期间完成）
+                    stored = cache.get(cache_key)
+                    if stored is None:
+                        return JsonResponse({
+                            'success': False,
+                            'message': '相同请求正在处理中，请稍后重试',
+                            'error_code': 'request_in_progress',
+                        }, status=409)
+            
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return JsonResponse({
+                        'success': False,
+                        'message': '幂等键已用于其他请求',
+                        'error_code': 'idempotency_key_reused',
+                    }, status=422)
+                logger.info("幂等请求重放: scope={}, user={}", scope, request.user.pk)
+                response = HttpResponse(
+                    stored['content'],
+                    content_type='application/json',
+                    status=stored['status']
+                )
+                response[f'{IDEMPOTENCY_HEADER}-Replayed'] = 'true'
+                return response
+            
+            try:
+                response = view_func(request, *args, **kwargs)
+                if _is_replayable(response):
+                    cache.set(cache_key, {
+                        'fingerprint': fingerprint,
+                        'status': response.status_code,
+                        'content': response.content,
+                    }, getattr(settings, 'IDEMPOTENCY_KEY_TTL', 600))
+                return response
+            finally:
+                cache.delete(lock_key)
+        
+        return _wrapped_view
+    
+    return decorator
+
+
+def _is_replayable(response) -> bool:
+    """响应是否可以保存用于重放（暂时性错误不保存，以便重试时重新处理）"""
+    if response.status_code >= 500 or response.get('Content-Type') != 'application/json':
+        return False
+    try:
+        payload = json.loads(response.content)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict):
+        return True
+    if payload.get('error_code') in TRANSIENT_ERROR_CODES:
+        return False
+    # 批量接口：任一条结果为暂时性错误时整批不保存
+    data = payload.get('data')
+    results = data.get('results') if isinstance(data, dict) else None
+    return not any(
+        isinstance(item, dict) and item.get('error_code') in TRANSIENT_ERROR_CODES
+        for item in results or ()
+    )
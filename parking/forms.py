@@ -117,13 +117,10 @@ class VehicleEntryForm(forms.Form):
         """验证车牌号是否已在场内"""
         plate = self.cleaned_data['license_plate']
         
-        # 检查是否已经有未出场的记录
-        from parking.models import ParkingRecord
+        # 检查是否已经有未出场的记录（在场车辆表按车牌主键读取）
+        from parking.services import ActiveParkingService
         
-        active_record = ParkingRecord.objects.filter(
-            vehicle__license_plate=plate,
-            exit_time__isnull=True
-        ).select_related('parking_space__parking_lot').first()
+        active_record = ActiveParkingService.get_record(plate)
         
         if active_record:
             lot_name = active_record.parking_space.parking_lot.name
@@ -177,6 +174,7 @@ class VehicleExitForm(forms.Form):
             ValidationError: 找不到记录或记录已出场时抛出
         """
         from parking.models import ParkingRecord
+        from parking.services import ActiveParkingService
         
         record_id = self.cleaned_data.get('record_id')
         plate = self.cleaned_data.get('license_plate')
@@ -189,12 +187,7 @@ class VehicleExitForm(forms.Form):
             except ParkingRecord.DoesNotExist:
                 raise ValidationError('停车记录不存在', code='record_not_found')
         else:
-            record = ParkingRecord.objects.filter(
-                vehicle__license_plate=plate,
-                exit_time__isnull=True
-            ).select_related(
-                'vehicle', 'parking_space__parking_lot'
-            ).first()
+            record = ActiveParkingService.get_record(plate)
             
             if not record:
                 raise ValidationError(
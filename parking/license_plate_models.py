@@ -88,22 +88,9 @@ class LicensePlateLocation(models.Model):
         Returns:
             dict: 包含省份、城市等信息的字典
         """
-        if len(license_plate) < 2:
-            return {}
-        
-        prefix = license_plate[:2].upper()
-        try:
-            location = cls.objects.select_related('province', 'city').get(license_plate_prefix=prefix)
-            return {
-                'province_code': location.province.code,
-                'province_name': location.province.name,
-                'city_code': location.city.code,
-                'city_name': location.city.name,
-                'prefix': prefix,
-                'description': location.description,
-            }
-        except cls.DoesNotExist:
-            return {}
+        # 从进程内前缀映射解析，不逐条查询数据库（延迟导入避免循环依赖）
+        from parking.services.plate_location_service import PlateLocationService
+        return PlateLocationService.resolve(license_plate)
 
 
 class WantedVehicle(models.Model):
@@ -1,121 +1,134 @@
 """
-分析慢查询日志
+分析数据库查询统计
 
-Django管理命令，用于分析数据库慢查询
+Django管理命令，读取生产环境按视图聚合的查询统计（见 infra.db.query_stats，
+由 QueryInstrumentationMiddleware 抽样记录，不需要 DEBUG=True），
+列出数据库耗时最多的视图和 SQL 指纹，并提示可能的 N+1 查询
 """
 
 from django.core.management.base import BaseCommand
-from django.db import connection
-from django.conf import settings
-import json
-from collections import defaultdict
+
+from infra.db.query_stats import fingerprint_sql, load_query_stats, reset_query_stats
+
+# 同一指纹在单个请求中执行超过此次数时视为可能的 N+1 查询
+N_PLUS_ONE_THRESHOLD = 10
 
 
 class Command(BaseCommand):
-    help = '分析数据库慢查询日志'
+    help = '分析按视图聚合的数据库查询统计'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--limit',
             type=int,
             default=10,
-            help='显示最慢的N个查询（默认：10）'
+            help='显示数据库耗时最多的N个视图和SQL（默认：10）'
         )
         parser.add_argument(
             '--min-time',
             type=float,
-            default=0.1,
-            help='最小查询时间（秒），低于此时间的查询不显示（默认：0.1）'
+            default=0.0,
+            help='最小平均查询时间（秒），低于此时间的SQL不显示（默认：0）'
+        )
+        parser.add_argument(
+            '--view',
+            help='只显示名称包含该字符串的视图'
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='清空已收集的统计'
         )
 
     def handle(self, *args, **options):
+        if options['reset']:
+            reset_query_stats()
+            self.stdout.write(self.style.SUCCESS('已清空查询统计'))
+            return
+
         limit = options['limit']
         min_time = options['min_time']
 
         self.stdout.write(self.style.SUCCESS('开始分析数据库查询...'))
 
-        # 获取查询日志
-        queries = connection.queries if settings.DEBUG else []
+        stats = load_query_stats()
+        if options['view']:
+            stats = {view: data for view, data in stats.items() if options['view'] in view}
 
-        if not queries:
-            self.stdout.write(self.style.WARNING('未找到查询日志。请确保DEBUG=True。'))
+        if not stats:
+            self.stdout.write(self.style.WARNING(
+                '未找到查询统计。请设置 QUERY_STATS_SAMPLE_RATE 开启抽样，'
+                '或以管理员身份带 X-Query-Stats 请求头访问需要分析的页面。'
+            ))
             return
 
-        # 分析查询
-        query_stats = defaultdict(lambda: {'count': 0, 'total_time': 0, 'queries': []})
-
-        for query in queries:
-            sql = query['sql']
-            time = float(query['time'])
+        # 视图按数据库总耗时排序
+        sorted_views = sorted(stats.items(), key=lambda x: x[1]['db_time'], reverse=True)[:limit]
 
-            if time < min_time:
-                continue
-
-            # 简化SQL（移除参数值）
-            simplified_sql = self.simplify_sql(sql)
-
-            query_stats[simplified_sql]['count'] += 1
-            query_stats[simplified_sql]['total_time'] += time
-            query_stats[simplified_sql]['queries'].append({
-                'sql': sql,
-                'time': time
-            })
+        self.stdout.write(self.style.SUCCESS(f'\n数据库耗时最多的 {len(sorted_views)} 个视图：\n'))
+        for view, data in sorted_views:
+            requests = data['requests']
+            self.stdout.write(
+                f'  {view}: 请求 {requests} 次, '
+                f'平均查询 {data["queries"] / requests:.1f} 条（最多 {data["max_queries"]} 条）, '
+                f'平均耗时 {data["db_time"] / requests * 1000:.1f}ms（最长 {data["max_db_time"] * 1000:.1f}ms）'
+            )
 
-        # 排序并显示
-        sorted_queries = sorted(
-            query_stats.items(),
-            key=lambda x: x[1]['total_time'],
-            reverse=True
-        )[:limit]
+        # SQL 指纹跨视图按总耗时排序
+        query_stats = []
+        for view, data in stats.items():
+            for sql, entry in data['fingerprints'].items():
+                if entry['time'] / entry['count'] < min_time:
+                    continue
+                query_stats.append((view, sql, entry))
+        sorted_queries = sorted(query_stats, key=lambda x: x[2]['time'], reverse=True)[:limit]
 
         self.stdout.write(self.style.SUCCESS(f'\n最慢的 {len(sorted_queries)} 个查询：\n'))
 
-        for i, (sql, stats) in enumerate(sorted_queries, 1):
-            avg_time = stats['total_time'] / stats['count']
+        for i, (view, sql, entry) in enumerate(sorted_queries, 1):
+            avg_time = entry['time'] / entry['count']
             self.stdout.write(
-                self.style.WARNING(f'\n{i}. 执行次数: {stats["count"]}, '
-                                 f'总时间: {stats["total_time"]:.3f}s, '
-                                 f'平均时间: {avg_time:.3f}s')
+                self.style.WARNING(f'\n{i}. 视图: {view}, 执行次数: {entry["count"]}, '
+                                 f'总时间: {entry["time"]:.3f}s, '
+                                 f'平均时间: {avg_time * 1000:.2f}ms, '
+                                 f'单请求最多: {entry["max_per_request"]} 次')
             )
             self.stdout.write(f'SQL: {sql[:200]}...' if len(sql) > 200 else f'SQL: {sql}')
 
         # 生成建议
         self.stdout.write(self.style.SUCCESS('\n\n优化建议：'))
-        self.generate_suggestions(sorted_queries)
+        self.generate_suggestions(stats, sorted_queries)
 
     def simplify_sql(self, sql):
         """简化SQL，移除参数值"""
-        import re
-        # 移除字符串值
-        sql = re.sub(r"'[^']*'", "?", sql)
-        # 移除数字值
-        sql = re.sub(r'\b\d+\b', '?', sql)
-        # 标准化空白
-        sql = ' '.join(sql.split())
-        return sql
-
-    def generate_suggestions(self, queries):
+        return fingerprint_sql(sql)
+
+    def generate_suggestions(self, stats, queries):
         """生成优化建议"""
         suggestions = []
 
-        for sql, stats in queries:
+        # 检查N+1查询：同一SQL在单个请求中重复执行
+        for view, data in stats.items():
+            for sql, entry in data['fingerprints'].items():
+                if entry['max_per_request'] > N_PLUS_ONE_THRESHOLD:
+                    suggestions.append(
+                        f'{view} 可能存在N+1查询（单个请求中同一SQL执行 {entry["max_per_request"]} 次），'
+                        f'考虑使用select_related或prefetch_related：{sql[:120]}'
+                    )
+
+        for view, sql, entry in queries:
             sql_lower = sql.lower()
 
             # 检查是否缺少索引
             if 'where' in sql_lower and 'join' not in sql_lower:
                 suggestions.append('考虑为WHERE子句中的列添加索引')
 
-            # 检查N+1查询
-            if stats['count'] > 10:
-                suggestions.append('可能存在N+1查询问题，考虑使用select_related或prefetch_related')
-
             # 检查全表扫描
-            if 'where' not in sql_lower and 'limit' not in sql_lower:
+            if sql_lower.startswith('select') and 'where' not in sql_lower and 'limit' not in sql_lower:
                 suggestions.append('查询可能进行全表扫描，考虑添加WHERE条件或LIMIT')
 
         if suggestions:
-            for suggestion in set(suggestions):
+            for suggestion in dict.fromkeys(suggestions):
                 self.stdout.write(f'  - {suggestion}')
         else:
             self.stdout.write('  未发现明显的优化点')
-
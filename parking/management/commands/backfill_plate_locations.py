@@ -0,0 +1,56 @@
+"""
+回填车牌地址信息命令
+
+按主键分块为历史停车记录回填车牌省份/地级市字段（使用进程内前缀映射，不逐条查询）。
+"""
+from django.core.management.base import BaseCommand
+
+from parking.services.plate_location_service import BACKFILL_CHUNK_SIZE, PlateLocationService
+
+
+class Command(BaseCommand):
+    help = '为历史停车记录回填车牌地址信息'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BACKFILL_CHUNK_SIZE,
+            help=f'每块处理的记录数（默认 {BACKFILL_CHUNK_SIZE}）',
+        )
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='覆盖已有地址信息的记录',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计不写入',
+        )
+
+    def handle(self, *args, **options):
+        prefix_count = len(PlateLocationService.get_prefix_map())
+        if not prefix_count:
+            self.stdout.write(self.style.WARNING(
+                '车牌前缀映射为空，请先执行 init_license_plate_data'
+            ))
+            return
+
+        self.stdout.write(f'已加载 {prefix_count} 个车牌前缀，开始回填...')
+
+        def progress(scanned: int, updated: int) -> None:
+            self.stdout.write(f'  已扫描 {scanned} 条，已更新 {updated} 条')
+
+        stats = PlateLocationService.backfill_records(
+            chunk_size=max(options['chunk_size'], 1),
+            overwrite=options['overwrite'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+
+        action = '可更新' if options['dry_run'] else '已更新'
+        self.stdout.write(self.style.SUCCESS(
+            f"回填完成：扫描 {stats['scanned']} 条，{action} {stats['updated']} 条，"
+            f"未知前缀 {stats['unknown']} 条"
+        ))
@@ -0,0 +1,125 @@
+"""
+核心热点函数微基准命令
+
+在临时测试数据库和进程内缓存中运行 parking/benchmarks.py 注册的基准
+（车牌验证、计费、车位号批量解析、仪表盘聚合、API 响应序列化），
+输出每次操作的最短/中位耗时，并与保存的基线比较：
+比基线慢超过阈值的基准视为回退，命令以非零状态退出。
+
+基线与机器相关，更换运行环境后应使用 --update-baseline 重新生成。
+
+示例：
+    python manage.py benchmark
+    python manage.py benchmark --filter calculate_fee --filter dashboard
+    python manage.py benchmark --rows 1000 --output bench.json
+    python manage.py benchmark --update-baseline
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from loguru import logger
+
+from parking.benchmarks import DEFAULT_ROWS, compare, load_results, run_benchmarks, save_results
+
+# 默认基线文件
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+# 基准运行期间关闭的日志（入场、模型保存等逐条日志）
+LOGGERS_DISABLED = ('parking', 'apps')
+# 基准使用的进程内缓存（不访问 Redis）
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'parking-benchmark',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = '运行核心热点函数微基准，并与保存的基线比较'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', action='append', default=[], help='只运行名称包含该字符串的基准（可多次指定）')
+        parser.add_argument('--repeat', type=int, default=5, help='每个基准计时的批数（默认5）')
+        parser.add_argument(
+            '--rows', type=int, action='append',
+            help=f"车位号批量解析的行数（可多次指定，默认{','.join(map(str, DEFAULT_ROWS))}）"
+        )
+        parser.add_argument('--output', help='结果保存路径（JSON）')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='基线文件路径')
+        parser.add_argument('--update-baseline', action='store_true', help='将本次结果保存为基线')
+        parser.add_argument('--threshold', type=float, default=0.25, help='回退阈值（默认0.25，即慢25%%）')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat 必须大于 0')
+        rows = options['rows'] or list(DEFAULT_ROWS)
+        if any(count < 1 for count in rows):
+            raise CommandError('--rows 必须大于 0')
+        if options['threshold'] < 0:
+            raise CommandError('--threshold 不能小于 0')
+
+        results = self._run(options['filter'], rows, options['repeat'])
+        if not results['results']:
+            raise CommandError('没有匹配的基准')
+
+        baseline_path = Path(options['baseline'])
+        regressions = []
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            save_results(results, baseline_path)
+            self.stdout.write(self.style.SUCCESS(f'已保存基线：{baseline_path}'))
+        elif baseline_path.exists():
+            comparison = compare(results, load_results(baseline_path), options['threshold'])
+            results['comparison'] = comparison
+            regressions = self._report(comparison, options['threshold'])
+        else:
+            self.stdout.write(self.style.WARNING(f'基线不存在：{baseline_path}（使用 --update-baseline 生成）'))
+
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(f"结果已保存：{options['output']}")
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} 个基准性能回退：{', '.join(regressions)}")
+
+    def _run(self, patterns: list[str], rows: list[int], repeat: int) -> dict:
+        """在临时测试数据库和进程内缓存中运行基准"""
+        for name in LOGGERS_DISABLED:
+            logger.disable(name)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                return run_benchmarks(patterns, rows, repeat, progress=self._progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            for name in LOGGERS_DISABLED:
+                logger.enable(name)
+
+    def _progress(self, name: str, result: dict) -> None:
+        self.stdout.write(
+            f"  {name:<32} 最短 {result['min_us']:>12.2f}µs  中位 {result['median_us']:>12.2f}µs"
+            f"  （{result['number']} 次 × {result['repeat']} 批）"
+        )
+
+    def _report(self, comparison: list[dict], threshold: float) -> list[str]:
+        """输出与基线的比较，返回回退的基准名称"""
+        self.stdout.write('')
+        self.stdout.write(f'与基线比较（回退阈值 +{threshold:.0%}）：')
+        regressions = []
+        for item in comparison:
+            line = (
+                f"  {item['name']:<32} {item['baseline_us']:>12.2f}µs → {item['current_us']:>12.2f}µs"
+                f"  ×{item['ratio']:.2f}"
+            )
+            if item['regressed']:
+                regressions.append(item['name'])
+                self.stdout.write(self.style.ERROR(line))
+            elif item['ratio'] < 1 - threshold:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+        return regressions
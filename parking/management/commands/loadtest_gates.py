@@ -0,0 +1,319 @@
+"""
+道闸并发压测命令
+
+创建压测停车场和车位（沿用车位批量创建服务），启动 K 个并发道闸线程，
+每个道闸随机调用 ParkingRecordService.vehicle_entry / vehicle_exit，报告：
+- 吞吐量（ops/s）和各操作的 p50/p95/p99 延迟
+- 数据库错误（死锁、锁等待超时、SQLite database is locked）次数和重试次数
+- no_available_space 误报：返回无车位时，按已完成的入场/出场推算停车场仍有空位
+- 压测结束后占用计数与车位表是否一致
+
+使用当前配置的默认数据库。SQLite 下所有写入串行；要观察行锁竞争，
+可将 DJANGO_SETTINGS_MODULE 指向本地 PostgreSQL 配置（如 config.settings.prod 配合 DB_* 环境变量）。
+压测车牌使用保留号段（使馆车牌 + 学字后缀，真实车辆不会使用），并跳过库中已存在的车牌；
+压测数据默认在结束后删除（--keep 保留），只删除压测停车场和本次压测创建的车辆。
+
+示例：
+    python manage.py loadtest_gates --lots 2 --spaces 50 --gates 8 --ops 200
+"""
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, connections, transaction
+from loguru import logger
+
+from parking.models import ParkingLot, Vehicle
+from parking.services import OccupancyService, ParkingRecordService
+from parking.space_creation_service import SpaceCreationService
+
+# 压测停车场名称前缀（用于清理）
+LOT_NAME_PREFIX = '压测停车场-'
+# 压测车牌保留号段：使 + 地市代号（不含 I、O）+ 5位序号 + 学
+PLATE_PREFIX = '使'
+PLATE_CITIES = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+PLATE_SUFFIX = '学'
+PLATE_CAPACITY = len(PLATE_CITIES) * 100_000
+# 压测期间关闭的日志（逐条入场/出场和模型保存日志）
+LOGGERS_DISABLED = ('parking', 'apps')
+# 数据库错误重试前的等待时间（秒）
+RETRY_BACKOFF = 0.05
+
+
+@dataclass
+class _LotCounter:
+    """
+    停车场的压测计数（用于判断 no_available_space 是否为误报）
+
+    只统计已返回的入场和出场：正在进行的入场可能已占用车位，按已占用计算；
+    正在进行的出场不计为空位。推算的占用数仍小于车位数时，无车位即为误报。
+    """
+    capacity: int
+    entered: int = 0
+    entering: int = 0
+    exited: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def begin_entry(self) -> None:
+        with self.lock:
+            self.entering += 1
+
+    def end_entry(self, success: bool) -> bool:
+        """结束一次入场，返回失败时停车场是否确定仍有空位"""
+        with self.lock:
+            self.entering -= 1
+            if success:
+                self.entered += 1
+                return False
+            return self.entered + self.entering - self.exited < self.capacity
+
+    def end_exit(self) -> None:
+        with self.lock:
+            self.exited += 1
+
+
+class _PlateRange:
+    """压测车牌号段（线程安全），跳过库中已存在的车牌"""
+
+    def __init__(self):
+        self.existing = set(Vehicle.objects.filter(
+            license_plate__startswith=PLATE_PREFIX,
+            license_plate__endswith=PLATE_SUFFIX
+        ).values_list('license_plate', flat=True))
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    @property
+    def available(self) -> int:
+        return PLATE_CAPACITY - len(self.existing)
+
+    def next(self) -> str:
+        with self.lock:
+            while True:
+                sequence = self.sequence
+                self.sequence += 1
+                city = PLATE_CITIES[sequence // 100_000]
+                plate = f'{PLATE_PREFIX}{city}{sequence % 100_000:05d}{PLATE_SUFFIX}'
+                if plate not in self.existing:
+                    return plate
+
+
+@dataclass
+class _GateStats:
+    """单个道闸线程的统计"""
+    latencies: dict[str, list[float]] = field(default_factory=lambda: {'entry': [], 'exit': []})
+    results: Counter = field(default_factory=Counter)
+    retries: int = 0
+    database_errors: int = 0
+    false_negatives: int = 0
+    # 成功入场时创建的车辆（压测车牌不在库中，入场时新建）
+    vehicle_ids: list[int] = field(default_factory=list)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+class Command(BaseCommand):
+    help = '并发道闸压测：模拟多个道闸同时调用入场/出场服务，报告吞吐量、延迟和锁竞争'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lots', type=int, default=2, help='压测停车场数量（默认2）')
+        parser.add_argument('--spaces', type=int, default=50, help='每个停车场的车位数（默认50）')
+        parser.add_argument('--gates', type=int, default=8, help='并发道闸（线程）数量（默认8）')
+        parser.add_argument('--ops', type=int, default=200, help='每个道闸的操作次数（默认200）')
+        parser.add_argument('--entry-ratio', type=float, default=0.6, help='入场操作的比例（默认0.6）')
+        parser.add_argument('--retries', type=int, default=2, help='数据库错误时的重试次数（默认2）')
+        parser.add_argument('--seed', type=int, help='随机数种子')
+        parser.add_argument('--keep', action='store_true', help='保留压测数据')
+        parser.add_argument('--force', action='store_true', help='允许在 DEBUG=False 的环境运行')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('压测会写入大量数据，非调试环境请加 --force 确认')
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in (':memory:', ''):
+            raise CommandError('内存 SQLite 数据库不能在线程间共享，请使用文件数据库')
+        for name in ('lots', 'spaces', 'gates', 'ops'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} 必须大于 0')
+
+        # 压测期间关闭业务日志，避免逐条输出影响计时
+        for name in LOGGERS_DISABLED:
+            logger.disable(name)
+        try:
+            self._run(options)
+        finally:
+            for name in LOGGERS_DISABLED:
+                logger.enable(name)
+
+    def _run(self, options) -> None:
+        rng = random.Random(options['seed'])
+        plates = _PlateRange()
+        if plates.available < options['gates'] * options['ops']:
+            raise CommandError(f'压测车牌号段最多可用 {plates.available} 个，请减少 --gates 或 --ops')
+        lots = self._seed(options['lots'], options['spaces'])
+        counters = {lot.pk: _LotCounter(capacity=options['spaces']) for lot in lots}
+
+        self.stdout.write(
+            f"数据库 {connection.vendor}，{len(lots)} 个停车场 × {options['spaces']} 个车位，"
+            f"{options['gates']} 个道闸 × {options['ops']} 次操作"
+        )
+
+        gate_stats = [_GateStats() for _ in range(options['gates'])]
+        threads = [
+            threading.Thread(
+                target=self._run_gate,
+                args=(
+                    lots[index % len(lots)].pk,
+                    counters[lots[index % len(lots)].pk],
+                    gate_stats[index],
+                    plates,
+                    random.Random(rng.random()),
+                    options,
+                ),
+                name=f'gate-{index}',
+            )
+            for index in range(options['gates'])
+        ]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self._report(gate_stats, elapsed, [lot.pk for lot in lots])
+
+        if not options['keep']:
+            self._cleanup(lots, [pk for stats in gate_stats for pk in stats.vehicle_ids])
+
+    def _seed(self, lot_count: int, space_count: int) -> list[ParkingLot]:
+        """创建压测停车场和车位"""
+        suffix = time.strftime('%m%d%H%M%S')
+        lots = []
+        for index in range(lot_count):
+            lot = ParkingLot.objects.create(
+                name=f'{LOT_NAME_PREFIX}{suffix}-{index + 1}',
+                address='压测数据',
+                total_spaces=0,
+                hourly_rate=5,
+            )
+            SpaceCreationService.create_spaces_from_range(lot, 'A001', f'A{space_count:03d}')
+            lots.append(lot)
+        return lots
+
+    def _run_gate(self, parking_lot_id, counter, stats, plates, rng, options) -> None:
+        """单个道闸线程：随机入场/出场"""
+        parked: list[str] = []
+        try:
+            for _ in range(options['ops']):
+                if not parked or rng.random() < options['entry_ratio']:
+                    plate = plates.next()
+                    counter.begin_entry()
+                    error_code, result = self._call(
+                        stats, 'entry', options['retries'],
+                        lambda: ParkingRecordService.vehicle_entry(plate, parking_lot_id)
+                    )
+                    if counter.end_entry(error_code is None) and error_code == 'no_available_space':
+                        stats.false_negatives += 1
+                    if error_code is None:
+                        parked.append(plate)
+                        stats.vehicle_ids.append(result.record.vehicle_id)
+                else:
+                    plate = parked.pop(rng.randrange(len(parked)))
+                    error_code, _ = self._call(
+                        stats, 'exit', options['retries'],
+                        lambda: ParkingRecordService.vehicle_exit(license_plate=plate, auto_pay=True)
+                    )
+                    if error_code is None:
+                        counter.end_exit()
+                    elif error_code == 'database_error':
+                        parked.append(plate)
+        finally:
+            connections.close_all()
+
+    def _call(self, stats: _GateStats, operation: str, retries: int, func) -> tuple[str | None, object]:
+        """
+        调用入场/出场服务，数据库错误时重试，记录延迟（含重试）和结果
+
+        Returns:
+            tuple: (错误码，成功时为 None; 服务返回的结果，抛出数据库错误时为 None)
+        """
+        started = time.perf_counter()
+        for attempt in range(retries + 1):
+            if attempt:
+                stats.retries += 1
+                time.sleep(RETRY_BACKOFF * attempt)
+            try:
+                result = func()
+                error_code = None if result.success else result.error_code
+            except DatabaseError:
+                # 服务层之外抛出的数据库错误（如事务提交时的锁冲突）
+                result = None
+                error_code = 'database_error'
+            if error_code != 'database_error':
+                break
+            stats.database_errors += 1
+        stats.latencies[operation].append(time.perf_counter() - started)
+        stats.results[f"{operation}:{error_code or 'ok'}"] += 1
+        return error_code, result
+
+    def _report(self, gate_stats: list[_GateStats], elapsed: float, lot_ids: list[int]) -> None:
+        """输出压测结果"""
+        results = Counter()
+        latencies = {'entry': [], 'exit': []}
+        retries = database_errors = false_negatives = 0
+        for stats in gate_stats:
+            results.update(stats.results)
+            for operation, values in stats.latencies.items():
+                latencies[operation].extend(values)
+            retries += stats.retries
+            database_errors += stats.database_errors
+            false_negatives += stats.false_negatives
+
+        total = sum(results.values())
+        self.stdout.write('')
+        self.stdout.write(f'总操作 {total} 次，耗时 {elapsed:.2f}s，吞吐量 {total / elapsed:.1f} ops/s')
+        for operation, label in (('entry', '入场'), ('exit', '出场')):
+            values = latencies[operation]
+            if not values:
+                continue
+            self.stdout.write(
+                f'  {label} {len(values)} 次：'
+                f'p50 {_percentile(values, 50) * 1000:.1f}ms，'
+                f'p95 {_percentile(values, 95) * 1000:.1f}ms，'
+                f'p99 {_percentile(values, 99) * 1000:.1f}ms，'
+                f'最大 {max(values) * 1000:.1f}ms'
+            )
+        self.stdout.write('结果分布：')
+        for key, count in sorted(results.items()):
+            self.stdout.write(f'  {key}: {count}')
+        self.stdout.write(f'数据库错误（死锁/锁超时）{database_errors} 次，重试 {retries} 次')
+
+        drift = OccupancyService.reconcile(lot_ids=lot_ids, dry_run=True)
+        if false_negatives:
+            self.stdout.write(self.style.WARNING(f'no_available_space 误报 {false_negatives} 次'))
+        else:
+            self.stdout.write(self.style.SUCCESS('no_available_space 无误报'))
+        if drift:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} 个停车场的占用计数与车位表不一致'))
+        else:
+            self.stdout.write(self.style.SUCCESS('占用计数与车位表一致'))
+
+    def _cleanup(self, lots: list[ParkingLot], vehicle_ids: list[int]) -> None:
+        """删除压测数据（停车场级联删除车位、停车记录和在场车辆，再删除本次创建的车辆）"""
+        with transaction.atomic():
+            ParkingLot.objects.filter(pk__in=[lot.pk for lot in lots]).delete()
+            for start in range(0, len(vehicle_ids), 500):
+                Vehicle.objects.filter(pk__in=vehicle_ids[start:start + 500]).delete()
+        self.stdout.write('已删除压测数据')
@@ -0,0 +1,52 @@
+"""
+停车场占用计数对账命令
+
+按 ParkingSpace 重新统计各停车场的车位数和占用数，修复 LotOccupancy 计数漂移。
+可由定时任务周期执行。
+"""
+from django.core.management.base import BaseCommand
+
+from parking.services.occupancy_service import OccupancyService
+
+
+class Command(BaseCommand):
+    help = '对账停车场占用计数，修复与车位表不一致的计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lot',
+            type=int,
+            action='append',
+            dest='lot_ids',
+            help='只处理指定停车场（可重复指定）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只报告漂移不写入',
+        )
+
+    def handle(self, *args, **options):
+        drift = OccupancyService.reconcile(
+            lot_ids=options['lot_ids'],
+            dry_run=options['dry_run'],
+        )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('占用计数与车位表一致'))
+            return
+
+        for item in drift:
+            if item['space_count'] is None:
+                counted = '无计数行'
+            else:
+                counted = f"{item['occupied_count']}/{item['space_count']}"
+            self.stdout.write(
+                f"停车场 {item['name']}（ID {item['parking_lot_id']}）："
+                f"计数 {counted}，实际 {item['actual_occupied']}/{item['actual_spaces']}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'发现 {len(drift)} 个停车场计数漂移（未修复）'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已修复 {len(drift)} 个停车场的占用计数'))
@@ -0,0 +1,134 @@
+"""
+费率调整试算命令
+
+按当前费率和待定费率重算停车场历史已出场记录的费用，报告收入变化。
+不写数据库，待定参数未指定的部分沿用当前配置。
+
+示例：
+    python manage.py tariff_impact --lot 1 --days 90 --daily-max-fee 40
+    python manage.py tariff_impact --lot 1 --charge-type tiered --template 3
+"""
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from parking.models import ParkingLot
+from parking.pricing_models import PricingTemplate
+from parking.services.tariff_impact_service import CHUNK_SIZE, TariffImpactService
+from parking.services.tariff_service import TariffService
+
+
+def _parse_date(value: str):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'日期格式错误（应为 YYYY-MM-DD）: {value}')
+
+
+def _parse_amount(value: str) -> Decimal:
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise CommandError(f'金额格式错误: {value}')
+
+
+class Command(BaseCommand):
+    help = '试算费率调整对停车场历史收入的影响（不写数据库）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, required=True, help='停车场ID')
+        parser.add_argument('--days', type=int, default=90, help='统计最近多少天出场的记录（默认90）')
+        parser.add_argument('--start', help='出场日期起点 YYYY-MM-DD（包含，优先于 --days）')
+        parser.add_argument('--end', help='出场日期终点 YYYY-MM-DD（包含，默认今天）')
+        parser.add_argument('--charge-type', choices=['fixed', 'tiered'], help='待定收费类型')
+        parser.add_argument('--template', type=int, help='待定费率模板ID')
+        parser.add_argument('--no-template', action='store_true', help='待定费率不使用模板（使用自定义规则）')
+        parser.add_argument('--rules', help='待定自定义阶梯规则（JSON 数组）')
+        parser.add_argument('--free-minutes', type=int, help='待定免费时长（分钟）')
+        parser.add_argument('--daily-max-fee', help='待定每日收费上限（元），0 表示不设上限')
+        parser.add_argument('--hourly-rate', help='待定停车场小时费率（元）')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f'每块读取的记录数（默认{CHUNK_SIZE}）')
+
+    def handle(self, *args, **options):
+        try:
+            parking_lot = ParkingLot.objects.get(pk=options['lot'])
+        except ParkingLot.DoesNotExist:
+            raise CommandError(f"停车场不存在: {options['lot']}")
+
+        end_date = _parse_date(options['end']) if options['end'] else timezone.localdate()
+        if options['start']:
+            start_date = _parse_date(options['start'])
+        else:
+            start_date = end_date - timedelta(days=options['days'] - 1)
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+
+        overrides = self._overrides(options)
+        if not overrides:
+            raise CommandError('请至少指定一个待定费率参数')
+        try:
+            proposed = TariffService.compile_proposal(parking_lot, overrides)
+        except PricingTemplate.DoesNotExist:
+            raise CommandError(f"费率模板不存在: {options['template']}")
+        except (KeyError, TypeError, ValueError) as e:
+            raise CommandError(f'待定费率参数错误: {e}')
+
+        self.stdout.write(f'停车场 {parking_lot.name}（ID {parking_lot.pk}），出场日期 {start_date} ~ {end_date}')
+
+        result = TariffImpactService.compare(
+            parking_lot.pk,
+            proposed,
+            start,
+            end,
+            current=TariffService.compile_lot(parking_lot.pk),
+            chunk_size=options['chunk_size'],
+            progress=lambda count: self.stdout.write(f'  已处理 {count} 条记录'),
+        )
+
+        self.stdout.write(
+            f"记录数 {result['records']}，实收 ¥{result['recorded_revenue']}，"
+            f"当前费率 ¥{result['current_revenue']}，待定费率 ¥{result['proposed_revenue']}"
+        )
+        for bucket in result['buckets']:
+            if bucket['records']:
+                self.stdout.write(
+                    f"  {bucket['label']}: {bucket['records']} 条，"
+                    f"¥{bucket['current_revenue']} → ¥{bucket['proposed_revenue']}"
+                )
+
+        percent = result['difference_percent']
+        summary = (
+            f"收入变化 ¥{result['difference']}"
+            + (f'（{percent:+}%）' if percent is not None else '')
+            + f"，上涨 {result['increased']} 条，下降 {result['decreased']} 条"
+        )
+        if result['difference'] < 0:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _overrides(self, options) -> dict:
+        """命令行参数转换为待定费率参数"""
+        overrides = {}
+        if options['charge_type']:
+            overrides['charge_type'] = options['charge_type']
+        if options['no_template']:
+            overrides['template_id'] = None
+        elif options['template'] is not None:
+            overrides['template_id'] = options['template']
+        if options['rules']:
+            try:
+                overrides['custom_rules'] = json.loads(options['rules'])
+            except json.JSONDecodeError as e:
+                raise CommandError(f'规则格式错误: {e}')
+        if options['free_minutes'] is not None:
+            overrides['free_minutes'] = options['free_minutes']
+        if options['daily_max_fee'] is not None:
+            overrides['daily_max_fee'] = _parse_amount(options['daily_max_fee']) or None
+        if options['hourly_rate'] is not None:
+            overrides['hourly_rate'] = _parse_amount(options['hourly_rate'])
+        return overrides
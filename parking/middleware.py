@@ -7,52 +7,83 @@ Author: HeZaoCha
 Created: 2025-12-11
 Version: 1.1.0
 """
+import time
 from typing import Optional
 
+from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.sessions.models import Session
 from django.http import JsonResponse
+from django.shortcuts import redirect
 from django.utils import timezone
 from loguru import logger
 
+from parking.services.user_role_service import UserRoleService
+
 
 class SessionExpiryMiddleware:
     """
     Session过期中间件
     
-    检查用户Session是否过期，过期则自动登出。
+    检查用户Session是否过期，过期则自动登出；临近过期时续期。
+    
+    检查方式由 SESSION_EXPIRY_CHECK 决定：
+    - 'session'（默认）：检查会话数据中的过期时间戳（SESSION_EXPIRES_AT_KEY），
+      会话数据已随请求加载，不额外访问数据库，也适用于缓存会话引擎
+    - 'database'：查询 Session 表的 expire_date（仅适用于数据库会话引擎）
+    
+    续期合并写入：会话剩余有效期小于 SESSION_REFRESH_WINDOW 秒时才更新时间戳，
+    会话因此被标记为已修改并由 SessionMiddleware 保存（同时刷新服务端过期时间），
+    其余请求不写会话（SESSION_SAVE_EVERY_REQUEST 应为 False）。
     """
+    SESSION_EXPIRES_AT_KEY = '_session_expires_at'
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.check = getattr(settings, 'SESSION_EXPIRY_CHECK', 'session')
+        self.refresh_window = getattr(settings, 'SESSION_REFRESH_WINDOW', 1800)
     
     def __call__(self, request):
         # 检查Session是否过期
-        if request.user.is_authenticated:
-            session_key = request.session.session_key
-            if session_key:
-                try:
-                    session = Session.objects.get(session_key=session_key)
-                    # 检查Session是否过期
-                    if session.expire_date and session.expire_date < timezone.now():
-                        # Session已过期，登出用户
-                        logout(request)
-                        logger.info(f'Session过期，用户已登出: {request.user.username}')
-                        
-                        # 如果是AJAX请求，返回JSON响应
-                        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                            return JsonResponse({
-                                'success': False,
-                                'message': '登录已过期，请重新登录',
-                                'error_code': 'session_expired',
-                                'redirect_url': '/login/'
-                            }, status=401)
-                except Session.DoesNotExist:
-                    # Session不存在，登出用户
-                    logout(request)
+        if request.user.is_authenticated and request.session.session_key:
+            if self._expired(request):
+                # Session已过期，登出用户
+                username = request.user.username
+                logout(request)
+                logger.info('Session过期，用户已登出: {}', username)
+                
+                # 如果是AJAX请求，返回JSON响应
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return JsonResponse({
+                        'success': False,
+                        'message': '登录已过期，请重新登录',
+                        'error_code': 'session_expired',
+                        'redirect_url': '/login/'
+                    }, status=401)
+            else:
+                self._refresh(request.session)
         
         response = self.get_response(request)
         return response
+    
+    def _expired(self, request) -> bool:
+        """会话是否已过期"""
+        if self.check == 'database':
+            expire_date = Session.objects.filter(
+                session_key=request.session.session_key
+            ).values_list('expire_date', flat=True).first()
+            # Session不存在视为过期
+            return expire_date is None or expire_date < timezone.now()
+        
+        expires_at = request.session.get(self.SESSION_EXPIRES_AT_KEY)
+        return expires_at is not None and expires_at < time.time()
+    
+    def _refresh(self, session) -> None:
+        """剩余有效期小于续期窗口（或尚无时间戳）时续期"""
+        expires_at = session.get(self.SESSION_EXPIRES_AT_KEY)
+        now = time.time()
+        if expires_at is None or expires_at - now < self.refresh_window:
+            session[self.SESSION_EXPIRES_AT_KEY] = now + session.get_expiry_age()
 
 
 class PermissionCheckMiddleware:
@@ -60,36 +91,27 @@ class PermissionCheckMiddleware:
     权限检查中间件
     
     根据用户角色重定向到对应界面。
+    
+    在执行视图之前判断：被重定向的请求不执行视图；
+    只有访问受限路径的已登录用户才需要角色，角色从按用户的缓存读取（见 UserRoleService）。
     """
+    # 受限路径前缀 → 不允许访问的角色和重定向地址
+    RESTRICTED_PATHS = (
+        ('/manage/', {'customer': '/parking/customer/', 'staff': '/dashboard/'}),
+        ('/dashboard/', {'customer': '/parking/customer/'}),
+    )
     
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
-        response = self.get_response(request)
-        
-        # 如果用户已登录，检查是否需要重定向
-        if request.user.is_authenticated:
-            # 获取用户角色
-            try:
-                profile = request.user.profile
-                role = profile.role
-            except AttributeError:
-                # 如果没有profile，默认为客户
-                role = 'customer'
-            
-            # 根据路径和角色进行重定向
-            path = request.path
-            
-            # 客户访问管理员/工作人员页面，重定向到客户页面
-            if role == 'customer' and path.startswith(('/dashboard/', '/manage/')):
-                from django.shortcuts import redirect
-                return redirect('/parking/customer/')
-            
-            # 工作人员访问管理员页面，重定向到工作台
-            if role == 'staff' and path.startswith('/manage/'):
-                from django.shortcuts import redirect
-                return redirect('/dashboard/')
+        path = request.path
+        for prefix, redirects in self.RESTRICTED_PATHS:
+            if path.startswith(prefix):
+                if request.user.is_authenticated:
+                    redirect_url = redirects.get(UserRoleService.get_role(request.user))
+                    if redirect_url:
+                        return redirect(redirect_url)
+                break
         
-        return response
-
+        return self.get_response(request)
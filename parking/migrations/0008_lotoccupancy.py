@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_lot_occupancy(apps, schema_editor):
+    """按现有车位为每个停车场创建占用计数"""
+    ParkingLot = apps.get_model('parking', 'ParkingLot')
+    LotOccupancy = apps.get_model('parking', 'LotOccupancy')
+    lots = ParkingLot.objects.annotate(
+        spaces=Count('parking_spaces'),
+        occupied=Count('parking_spaces', filter=Q(parking_spaces__is_occupied=True))
+    ).values_list('pk', 'spaces', 'occupied')
+    LotOccupancy.objects.bulk_create([
+        LotOccupancy(parking_lot_id=pk, space_count=spaces, occupied_count=occupied)
+        for pk, spaces, occupied in lots
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_province_parkingrecord_plate_city_code_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotOccupancy',
+            fields=[
+                ('parking_lot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='parking.parkinglot', verbose_name='停车场')),
+                ('space_count', models.IntegerField(default=0, help_text='停车场实际存在的车位数', verbose_name='车位数')),
+                ('occupied_count', models.IntegerField(default=0, help_text='当前被占用的车位数', verbose_name='已占用车位数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('reconciled_at', models.DateTimeField(blank=True, help_text='最近一次按车位表重新统计的时间', null=True, verbose_name='最近对账时间')),
+            ],
+            options={
+                'verbose_name': '停车场占用计数',
+                'verbose_name_plural': '停车场占用计数',
+            },
+        ),
+        migrations.RunPython(populate_lot_occupancy, migrations.RunPython.noop),
+    ]
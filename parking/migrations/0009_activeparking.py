@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_active_parking(apps, schema_editor):
+    """为现有未出场记录登记在场车辆（同一车牌有多条时取最近入场的一条）"""
+    ParkingRecord = apps.get_model('parking', 'ParkingRecord')
+    ActiveParking = apps.get_model('parking', 'ActiveParking')
+    active = {}
+    for record_id, plate in ParkingRecord.objects.filter(
+        exit_time__isnull=True
+    ).order_by('-entry_time', '-pk').values_list('pk', 'vehicle__license_plate').iterator():
+        active.setdefault(plate, record_id)
+    ActiveParking.objects.bulk_create(
+        [ActiveParking(license_plate=plate, record_id=record_id) for plate, record_id in active.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_lotoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveParking',
+            fields=[
+                ('license_plate', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='车牌号')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='入场登记时间')),
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='active_session', to='parking.parkingrecord', verbose_name='停车记录')),
+            ],
+            options={
+                'verbose_name': '在场车辆',
+                'verbose_name_plural': '在场车辆',
+            },
+        ),
+        migrations.RunPython(populate_active_parking, migrations.RunPython.noop),
+    ]
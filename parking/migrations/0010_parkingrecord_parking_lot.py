@@ -0,0 +1,50 @@
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+
+# 回填批大小（按主键区间），每批单独提交，避免长事务锁表
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def backfill_parking_lot(apps, schema_editor):
+    """按车位所属停车场分批回填停车记录的 parking_lot"""
+    ParkingRecord = apps.get_model('parking', 'ParkingRecord')
+    ParkingSpace = apps.get_model('parking', 'ParkingSpace')
+    space_lot = ParkingSpace.objects.filter(pk=OuterRef('parking_space_id')).values('parking_lot_id')[:1]
+
+    pending = ParkingRecord.objects.filter(parking_lot__isnull=True)
+    bounds = pending.aggregate(low=models.Min('pk'), high=models.Max('pk'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_CHUNK_SIZE):
+        with transaction.atomic():
+            pending.filter(
+                pk__gte=start, pk__lt=start + BACKFILL_CHUNK_SIZE
+            ).update(parking_lot_id=Subquery(space_lot))
+
+
+class Migration(migrations.Migration):
+
+    # 回填分批提交，不在单个事务中执行整个迁移
+    atomic = False
+
+    dependencies = [
+        ('parking', '0009_activeparking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parkingrecord',
+            name='parking_lot',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='停车位所属停车场（保存时自动填充）', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parking_records', to='parking.parkinglot', verbose_name='停车场'),
+        ),
+        migrations.RunPython(backfill_parking_lot, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['parking_lot', 'entry_time'], name='record_lot_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['parking_lot', 'exit_time'], name='record_lot_exit_idx'),
+        ),
+    ]
@@ -9,6 +9,8 @@ from parking.models.parking_lot import ParkingLot
 from parking.models.parking_space import ParkingSpace
 from parking.models.vehicle import Vehicle, VIPVehicle
 from parking.models.parking_record import ParkingRecord
+from parking.models.lot_occupancy import LotOccupancy
+from parking.models.active_parking import ActiveParking
 from parking.models.validators import (
     validate_license_plate,
     license_plate_validator,
@@ -23,6 +25,8 @@ __all__ = [
     'Vehicle',
     'VIPVehicle',
     'ParkingRecord',
+    'LotOccupancy',
+    'ActiveParking',
     'validate_license_plate',
     'license_plate_validator',
     'PROVINCE_ABBREVIATIONS',
@@ -0,0 +1,42 @@
+"""
+在场车辆模型
+
+每辆在场车辆一行，以车牌号为主键，指向其未出场的停车记录：
+- 数据库层面保证同一车牌只有一条未出场记录（并发重复入场时主键冲突）
+- “是否在场”等查询按主键读取一行，不再连接车辆表并扫描 exit_time 索引
+入场时创建、出场时删除，与停车记录在同一事务内维护（见 ActiveParkingService）。
+"""
+from django.db import models
+
+from parking.models.parking_record import ParkingRecord
+
+
+class ActiveParking(models.Model):
+    """
+    在场车辆
+
+    停车记录删除时级联删除。
+    """
+    license_plate = models.CharField(
+        max_length=10,
+        primary_key=True,
+        verbose_name='车牌号'
+    )
+    record = models.OneToOneField(
+        ParkingRecord,
+        on_delete=models.CASCADE,
+        related_name='active_session',
+        verbose_name='停车记录'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='入场登记时间'
+    )
+
+    class Meta:
+        verbose_name = '在场车辆'
+        verbose_name_plural = '在场车辆'
+
+    def __str__(self) -> str:
+        """返回在场车辆的字符串表示"""
+        return f"{self.license_plate} → {self.record_id}"
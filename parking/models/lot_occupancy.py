@@ -0,0 +1,63 @@
+"""
+停车场占用计数模型
+
+每个停车场一行，随入场/出场和车位增删原子更新（F 表达式），
+停车场列表、仪表盘和可用车位查询直接读取计数，不再对 ParkingSpace 做 COUNT。
+计数出现漂移时由 reconcile_occupancy 命令按 ParkingSpace 重新统计修复。
+"""
+from django.db import models
+
+from parking.models.parking_lot import ParkingLot
+
+
+class LotOccupancy(models.Model):
+    """
+    停车场占用计数
+
+    计数允许短暂为负（漂移），读取时按 0 截断，由对账修复。
+    """
+    parking_lot = models.OneToOneField(
+        ParkingLot,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='occupancy',
+        verbose_name='停车场'
+    )
+    space_count = models.IntegerField(
+        default=0,
+        verbose_name='车位数',
+        help_text='停车场实际存在的车位数'
+    )
+    occupied_count = models.IntegerField(
+        default=0,
+        verbose_name='已占用车位数',
+        help_text='当前被占用的车位数'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新时间'
+    )
+    reconciled_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='最近对账时间',
+        help_text='最近一次按车位表重新统计的时间'
+    )
+
+    class Meta:
+        verbose_name = '停车场占用计数'
+        verbose_name_plural = '停车场占用计数'
+
+    def __str__(self) -> str:
+        """返回占用计数的字符串表示"""
+        return f"{self.parking_lot_id}: {self.occupied_count}/{self.space_count}"
+
+    @property
+    def occupied(self) -> int:
+        """已占用车位数（漂移为负时按 0 处理）"""
+        return max(0, self.occupied_count)
+
+    @property
+    def available(self) -> int:
+        """按实际车位数计算的空闲车位数"""
+        return max(0, self.space_count - self.occupied)
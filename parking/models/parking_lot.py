@@ -5,6 +5,7 @@
 """
 from decimal import Decimal
 
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -112,15 +113,19 @@ class ParkingLot(models.Model):
         Returns:
             int: 当前可用的车位数
         """
-        occupied = self.parking_spaces.filter(is_occupied=True).count()
-        return max(0, self.total_spaces - occupied)
+        return max(0, self.total_spaces - self.occupied_spaces)
 
     @property
     def occupied_spaces(self) -> int:
         """
         获取已占用车位数
         
+        读取占用计数（LotOccupancy），没有计数行时回退到统计车位表。
+        
         Returns:
             int: 当前已占用的车位数
         """
-        return self.parking_spaces.filter(is_occupied=True).count()
+        try:
+            return self.occupancy.occupied
+        except ObjectDoesNotExist:
+            return self.parking_spaces.filter(is_occupied=True).count()
@@ -10,6 +10,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
 
+from parking.models.parking_lot import ParkingLot
 from parking.models.parking_space import ParkingSpace
 from parking.models.vehicle import Vehicle
 
@@ -32,6 +33,17 @@ class ParkingRecord(models.Model):
         related_name='parking_records',
         verbose_name='停车位'
     )
+    # 冗余自车位所属停车场，按停车场查询记录时不再连接车位表
+    parking_lot = models.ForeignKey(
+        ParkingLot,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,  # 由 (parking_lot, entry_time) 复合索引覆盖
+        related_name='parking_records',
+        verbose_name='停车场',
+        help_text='停车位所属停车场（保存时自动填充）'
+    )
     entry_time = models.DateTimeField(
         verbose_name='入场时间',
         help_text='车辆进入停车场的时间'
@@ -132,6 +144,9 @@ class ParkingRecord(models.Model):
             models.Index(fields=['exit_time'], name='record_exit_time_idx'),
             models.Index(fields=['is_paid'], name='record_is_paid_idx'),
             models.Index(fields=['parking_space', 'entry_time'], name='record_space_entry_idx'),
+            # 按停车场的历史和收入查询
+            models.Index(fields=['parking_lot', 'entry_time'], name='record_lot_entry_idx'),
+            models.Index(fields=['parking_lot', 'exit_time'], name='record_lot_exit_idx'),
             # 公安查询优化：按地区查询
             models.Index(fields=['plate_province_code', 'plate_city_code'], name='record_plate_location_idx'),
             models.Index(fields=['plate_province_code', 'entry_time'], name='record_province_entry_idx'),
@@ -150,6 +165,7 @@ class ParkingRecord(models.Model):
         根据停车时长和停车场费率计算费用。
         支持固定小时收费和阶梯制收费。
         支持VIP/员工车辆免费或折扣。
+        费率来自按停车场缓存的编译费率（TariffService），计费本身不访问数据库。
         
         Author: HeZaoCha
         Created: 2024-12-09
@@ -159,6 +175,8 @@ class ParkingRecord(models.Model):
         Returns:
             Decimal: 计算得出的停车费用
         """
+        from parking.services.tariff_service import TariffService
+        
         # 检查是否为VIP/员工免费车辆
         vip_info = self.vehicle.get_vip_info()
         if vip_info and vip_info.is_free:
@@ -171,58 +189,17 @@ class ParkingRecord(models.Model):
             end_time = timezone.now()
         else:
             end_time = self.exit_time
-
-        # 计算停车时长（分钟）
-        duration = end_time - self.entry_time
-        duration_minutes = int(duration.total_seconds() / 60)
-        
-        parking_lot = self.parking_space.parking_lot
         
-        # 获取费率配置（延迟导入避免循环依赖）
-        try:
-            from parking.pricing_models import ParkingLotPricing
-            pricing_config = parking_lot.pricing_config
-        except (AttributeError, ImportError):
-            pricing_config = None
-        
-        # 计算费用（使用match/case优化）
-        if pricing_config:
-            match pricing_config.charge_type:
-                case 'tiered':
-                    # 阶梯制收费
-                    fee = self._calculate_tiered_fee(
-                        duration_minutes,
-                        pricing_config,
-                        parking_lot
-                    )
-                case 'fixed' | _:
-                    # 固定小时收费（原有逻辑）
-                    duration_hours = duration.total_seconds() / 3600
-                    # 向上取整到小时
-                    hours = int(duration_hours) + (1 if duration_hours % 1 > 0 else 0)
-                    hours_decimal = Decimal(str(hours))
-                    fee = hours_decimal * parking_lot.hourly_rate
-        else:
-            # 无配置，使用固定费率
-            duration_hours = duration.total_seconds() / 3600
-            hours = int(duration_hours) + (1 if duration_hours % 1 > 0 else 0)
-            hours_decimal = Decimal(str(hours))
-            fee = hours_decimal * parking_lot.hourly_rate
+        tariff = TariffService.get_tariff(self.parking_space.parking_lot_id)
         
-        # 应用VIP折扣
+        # 应用VIP折扣（discount_rate为1表示免费，0.5表示半价，0表示全价）
+        discount_rate = None
         if vip_info:
             self.discount_rate = vip_info.discount_rate
-            # discount_rate为1表示免费，0.5表示半价，0表示全价
-            discount = Decimal('1.00') - vip_info.discount_rate
-            fee = fee * discount
+            discount_rate = vip_info.discount_rate
         
-        # 应用每日收费上限
-        if pricing_config:
-            daily_max = pricing_config.get_daily_max_fee()
-            if daily_max and fee > daily_max:
-                fee = daily_max
-        
-        return fee.quantize(Decimal('0.01'))
+        # 编译费率中已包含每日收费上限
+        return tariff.evaluate(end_time - self.entry_time, discount_rate)
     
     def _calculate_tiered_fee(
         self,
@@ -241,54 +218,10 @@ class ParkingRecord(models.Model):
         Returns:
             Decimal: 计算得出的费用
         """
-        # 获取免费时长
-        free_minutes = pricing_config.get_free_minutes()
-        if duration_minutes <= free_minutes:
-            return Decimal('0.00')
-        
-        # 获取费率规则
-        rules = pricing_config.get_effective_rules()
-        if not rules:
-            # 如果没有规则，使用固定费率
-            duration_hours = duration_minutes / 60
-            hours = int(duration_hours) + (1 if duration_hours % 1 > 0 else 0)
-            return Decimal(str(hours)) * parking_lot.hourly_rate
+        from parking.services.tariff_service import TariffService, cents_to_decimal
         
-        # 按规则计算费用
-        total_fee = Decimal('0.00')
-        remaining_minutes = duration_minutes - free_minutes
-        
-        for rule in sorted(rules, key=lambda x: x['start_minutes']):
-            start = rule['start_minutes']
-            end = rule.get('end_minutes')
-            rate_per_hour = Decimal(str(rule['rate_per_hour']))
-            
-            if remaining_minutes <= 0:
-                break
-            
-            # 计算此规则适用的分钟数
-            rule_start = max(0, start - free_minutes)
-            rule_end = (end - free_minutes) if end else None
-            
-            if rule_end is None:
-                # 无上限，全部按此费率计算
-                hours = remaining_minutes / 60
-                hours_ceil = int(hours) + (1 if hours % 1 > 0 else 0)
-                total_fee += Decimal(str(hours_ceil)) * rate_per_hour
-                break
-            else:
-                # 有上限，计算此规则范围内的费用
-                if remaining_minutes <= rule_start:
-                    continue
-                
-                applicable_minutes = min(remaining_minutes, rule_end) - rule_start
-                if applicable_minutes > 0:
-                    hours = applicable_minutes / 60
-                    hours_ceil = int(hours) + (1 if hours % 1 > 0 else 0)
-                    total_fee += Decimal(str(hours_ceil)) * rate_per_hour
-                    remaining_minutes -= applicable_minutes
-        
-        return total_fee
+        tariff = TariffService.compile(parking_lot, pricing_config)
+        return cents_to_decimal(tariff.tiered_fee_cents(duration_minutes))
 
     def save(self, *args, **kwargs) -> None:
         """
@@ -298,6 +231,16 @@ class ParkingRecord(models.Model):
             *args: 位置参数
             **kwargs: 关键字参数
         """
+        # 同步冗余的停车场（车位已加载时按车位校正，避免额外查询）
+        if self.parking_space_id is not None and (
+            self.parking_lot_id is None or ParkingRecord.parking_space.is_cached(self)
+        ):
+            parking_lot_id = self.parking_space.parking_lot_id
+            if parking_lot_id != self.parking_lot_id:
+                self.parking_lot_id = parking_lot_id
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'parking_lot'}
+        
         if self.exit_time and self.entry_time:
             # 计算停车时长（分钟）
             duration = self.exit_time - self.entry_time
@@ -92,3 +92,16 @@ class ParkingSpace(models.Model):
     def __str__(self) -> str:
         """返回停车位的字符串表示"""
         return f"{self.parking_lot.name} - {self.space_number}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        从数据库加载时记录所属停车场和占用状态
+
+        保存时据此计算占用计数的增量（见 OccupancyService.space_saved）。
+        """
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'parking_lot_id' in loaded and 'is_occupied' in loaded:
+            instance._occupancy_state = (loaded['parking_lot_id'], loaded['is_occupied'])
+        return instance
@@ -206,24 +206,19 @@ class Vehicle(models.Model):
     
     @property
     def is_vip(self) -> bool:
-        """检查是否为VIP/免费停车车辆"""
-        return VIPVehicle.objects.filter(
-            license_plate=self.license_plate,
-            is_active=True
-        ).exists()
+        """检查是否为VIP/免费停车车辆（查询进程内 VIP 索引）"""
+        from parking.services.vip_service import VIPService
+        return VIPService.is_vip(self.license_plate)
     
-    def get_vip_info(self) -> VIPVehicle | None:
-        """获取VIP信息"""
-        try:
-            vip = VIPVehicle.objects.get(
-                license_plate=self.license_plate,
-                is_active=True
-            )
-            if vip.is_valid:
-                return vip
-        except VIPVehicle.DoesNotExist:
-            pass
-        return None
+    def get_vip_info(self):
+        """
+        获取VIP信息（查询进程内 VIP 索引）
+        
+        Returns:
+            VIPInfo | None: 已启用且在有效期内时返回 VIP 信息
+        """
+        from parking.services.vip_service import VIPService
+        return VIPService.get_vip_info(self.license_plate)
     
     def clean(self) -> None:
         """
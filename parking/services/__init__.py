@@ -15,13 +15,24 @@ from parking.services.exceptions import (
 from parking.services.data_classes import (
     EntryResult,
     ExitResult,
+    GateEvent,
     QueryResult,
 )
+from parking.services.active_parking_service import ActiveParkingService
 from parking.services.parking_lot_service import ParkingLotService
 from parking.services.parking_space_service import ParkingSpaceService
 from parking.services.vehicle_service import VehicleService
 from parking.services.parking_record_service import ParkingRecordService
 from parking.services.dashboard_service import DashboardService
+from parking.services.fee_quote_service import FeeQuote, FeeQuoteService
+from parking.services.occupancy_events import OccupancyEvents
+from parking.services.occupancy_service import OccupancyService
+from parking.services.space_allocator import SpaceAllocator
+from parking.services.tariff_service import CompiledTariff, TariffService
+from parking.services.vip_service import VIPInfo, VIPService
+from parking.services.wanted_service import WantedVehicleService
+from parking.services.plate_location_service import PlateLocation, PlateLocationService
+from parking.services.user_role_service import UserRoleService
 
 __all__ = [
     # 异常类
@@ -33,11 +44,26 @@ __all__ = [
     # 数据类
     'EntryResult',
     'ExitResult',
+    'GateEvent',
     'QueryResult',
+    'CompiledTariff',
+    'FeeQuote',
+    'VIPInfo',
+    'PlateLocation',
     # 服务类
+    'ActiveParkingService',
     'ParkingLotService',
     'ParkingSpaceService',
     'VehicleService',
     'ParkingRecordService',
     'DashboardService',
+    'FeeQuoteService',
+    'OccupancyService',
+    'OccupancyEvents',
+    'SpaceAllocator',
+    'TariffService',
+    'VIPService',
+    'WantedVehicleService',
+    'PlateLocationService',
+    'UserRoleService',
 ]
@@ -0,0 +1,184 @@
+"""
+在场车辆服务
+
+维护 ActiveParking（车牌号 → 未出场停车记录），替代按
+vehicle__license_plate + exit_time__isnull 对停车记录的连接查询：
+- 逐条 save() 的停车记录由信号在入场时登记、出场时注销
+- 批量 bulk_create()/bulk_update() 的调用方显式调用 open_many/close_records
+- 同一车牌重复登记时主键冲突：open 抛出 VehicleAlreadyParkedError，open_many 返回冲突的车牌
+"""
+from collections.abc import Iterable
+
+from django.db import IntegrityError, transaction
+
+from parking.models.active_parking import ActiveParking
+from parking.models.parking_record import ParkingRecord
+from parking.services.exceptions import VehicleAlreadyParkedError
+
+# 影响在场状态的停车记录字段
+_TRACKED_FIELDS = frozenset({'exit_time'})
+
+
+class ActiveParkingService:
+    """
+    在场车辆服务类
+
+    提供按车牌的在场查询以及登记、注销。
+    """
+
+    @staticmethod
+    def get_record(license_plate: str) -> ParkingRecord | None:
+        """
+        获取车辆的在场停车记录（按主键读取）
+
+        Args:
+            license_plate: 车牌号（已规范化）
+
+        Returns:
+            ParkingRecord | None: 在场停车记录（已加载车辆、车位和停车场），不在场时返回 None
+        """
+        active = ActiveParking.objects.select_related(
+            'record__vehicle', 'record__parking_space__parking_lot'
+        ).filter(pk=license_plate).first()
+        return active.record if active else None
+
+    @staticmethod
+    def get_record_id(license_plate: str) -> int | None:
+        """
+        获取车辆在场停车记录的ID（不连接其他表）
+
+        Args:
+            license_plate: 车牌号（已规范化）
+
+        Returns:
+            int | None: 停车记录ID，不在场时返回 None
+        """
+        return ActiveParking.objects.filter(pk=license_plate).values_list(
+            'record_id', flat=True
+        ).first()
+
+    @staticmethod
+    def is_parked(license_plate: str) -> bool:
+        """
+        检查车辆是否在场
+
+        Args:
+            license_plate: 车牌号（已规范化）
+
+        Returns:
+            bool: 是否在场
+        """
+        return ActiveParking.objects.filter(pk=license_plate).exists()
+
+    @staticmethod
+    def get_record_ids(plates: Iterable[str]) -> dict[str, int]:
+        """
+        批量获取在场停车记录ID
+
+        Args:
+            plates: 车牌号列表（已规范化）
+
+        Returns:
+            dict[str, int]: 车牌号 → 停车记录ID（只包含在场车辆）
+        """
+        return dict(
+            ActiveParking.objects.filter(pk__in=list(plates)).values_list(
+                'license_plate', 'record_id'
+            )
+        )
+
+    @staticmethod
+    def get_parked_lots(plates: Iterable[str]) -> dict[str, str]:
+        """
+        批量获取在场车辆所在停车场名称
+
+        Args:
+            plates: 车牌号列表（已规范化）
+
+        Returns:
+            dict[str, str]: 车牌号 → 停车场名称（只包含在场车辆）
+        """
+        return dict(
+            ActiveParking.objects.filter(pk__in=list(plates)).values_list(
+                'license_plate', 'record__parking_space__parking_lot__name'
+            )
+        )
+
+    @staticmethod
+    def open(record: ParkingRecord) -> None:
+        """
+        登记在场车辆
+
+        Args:
+            record: 新建的未出场停车记录
+
+        Raises:
+            VehicleAlreadyParkedError: 该车牌已有未出场记录
+        """
+        license_plate = record.vehicle.license_plate
+        try:
+            with transaction.atomic():
+                ActiveParking.objects.create(license_plate=license_plate, record=record)
+        except IntegrityError:
+            lot_name = ActiveParkingService.get_parked_lots([license_plate]).get(license_plate, '')
+            raise VehicleAlreadyParkedError(license_plate, lot_name)
+
+    @staticmethod
+    def open_many(records: list[ParkingRecord]) -> set[str]:
+        """
+        批量登记在场车辆（用于 bulk_create 的停车记录）
+
+        已在场的车牌（并发入场先登记了该车牌）跳过，不影响其他车牌的登记。
+
+        Args:
+            records: 新建的未出场停车记录列表（车牌号互不相同）
+
+        Returns:
+            set[str]: 未能登记的车牌号（已有其他未出场记录），由调用方撤销对应记录
+        """
+        if not records:
+            return set()
+        ActiveParking.objects.bulk_create(
+            [
+                ActiveParking(license_plate=record.vehicle.license_plate, record=record)
+                for record in records
+            ],
+            ignore_conflicts=True
+        )
+        registered = ActiveParkingService.get_record_ids(
+            record.vehicle.license_plate for record in records
+        )
+        return {
+            record.vehicle.license_plate
+            for record in records
+            if registered.get(record.vehicle.license_plate) != record.pk
+        }
+
+    @staticmethod
+    def close_records(record_ids: Iterable[int]) -> None:
+        """
+        注销在场车辆（用于 bulk_update 出场的停车记录）
+
+        Args:
+            record_ids: 已出场的停车记录ID列表
+        """
+        ActiveParking.objects.filter(record_id__in=list(record_ids)).delete()
+
+    @staticmethod
+    def record_saved(record: ParkingRecord, created: bool, update_fields=None) -> None:
+        """
+        停车记录保存后登记或注销（由 post_save 信号调用）
+
+        Args:
+            record: 停车记录对象
+            created: 是否新建
+            update_fields: save() 的 update_fields
+        """
+        if created:
+            if record.exit_time is None:
+                ActiveParkingService.open(record)
+            return
+        if update_fields is not None and not _TRACKED_FIELDS.intersection(update_fields):
+            return
+        if record.exit_time is not None:
+            ActiveParkingService.close_records([record.pk])
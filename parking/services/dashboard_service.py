@@ -2,63 +2,475 @@
 仪表盘服务
 
 从 parking.services 迁移
+
+仪表盘快照拆分为独立缓存的几部分，入场/出场/支付在事务提交后就地更新，
+不再每次写入都清除整个缓存：
+- lots：活跃停车场列表（结构数据），停车场或车位增删时整体重建
+- occupied:<停车场ID>：各停车场已占用车位数（整数计数，cache.incr 原子增减）
+- active：在场车辆数（整数计数）
+- today:<日期>:count / today:<日期>:revenue：今日入场数和今日收入（分），按日期分键，跨天自然切换
+- recent：最近记录环形缓冲（最多 RECENT_RECORDS_LIMIT 条，加锁后就地更新）
+
+各部分最长保留 CACHE_TTL_DASHBOARD 秒，到期后按部分从数据库重建（定时全量校正）；
+结构变化时 invalidate_cache() 递增版本号，所有部分在下次读取时重建。
+缺失部分由一个请求重建，并发请求使用上一版本的旧值或等待重建结果，避免集中查询数据库。
 """
+import time
 from typing import Any
 
 from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger
 
-from parking.services.parking_lot_service import ParkingLotService
+from infra.cache import SingleFlightCache
+from parking.models.parking_lot import ParkingLot
+from parking.services.occupancy_service import OccupancyService
 from parking.services.parking_record_service import ParkingRecordService
-from parking.services.parking_space_service import ParkingSpaceService
+from parking.services.tariff_service import cents_to_decimal, to_cents
 
 # 缓存键和TTL
 CACHE_KEY_PREFIX = 'parking:'
-CACHE_KEY_DASHBOARD = f'{CACHE_KEY_PREFIX}dashboard:data'
-CACHE_TTL_DASHBOARD = 300  # 5分钟
+CACHE_KEY_DASHBOARD = f'{CACHE_KEY_PREFIX}dashboard:'
+CACHE_KEY_DASHBOARD_VERSION = f'{CACHE_KEY_DASHBOARD}version'
+CACHE_TTL_DASHBOARD = 300  # 5分钟，到期后按部分重建
+
+# 最近记录环形缓冲长度
+RECENT_RECORDS_LIMIT = 10
+# 就地更新最近记录/停车场列表时的锁有效期（秒）
+PATCH_LOCK_TIMEOUT = 5
+
+# 缺失部分的合并重建（一个请求重建，其余请求使用旧值或等待）
+_flight = SingleFlightCache('dashboard', ttl=CACHE_TTL_DASHBOARD, key_prefix=CACHE_KEY_DASHBOARD)
 
 
 class DashboardService:
     """
     仪表盘服务类
-    
+
     提供仪表盘数据聚合服务。
-    使用缓存优化性能，减少数据库查询。
+    快照按部分缓存，写入路径就地更新，减少重建次数。
     """
-    
+
     @staticmethod
     def get_dashboard_data(use_cache: bool = True) -> dict[str, Any]:
         """
         获取仪表盘所需的所有数据（带缓存优化）
-        
+
         Args:
             use_cache: 是否使用缓存，默认True
-        
+
         Returns:
             dict[str, Any]: 仪表盘数据字典
         """
-        # 尝试从缓存获取
-        if use_cache:
-            cached_data = cache.get(CACHE_KEY_DASHBOARD)
-            if cached_data is not None:
-                return cached_data
-        
-        # 获取活跃停车场（带可用车位信息）
-        parking_lots = ParkingLotService.get_active_lots_with_availability()
-        lot_ids = [lot['id'] for lot in parking_lots]
-        
-        # 获取车位统计
-        space_stats = ParkingSpaceService.get_space_statistics(lot_ids)
-        
-        # 获取今日统计
+        if not use_cache:
+            lots = DashboardService._load_lots()
+            occupied = DashboardService._load_occupied(lot['id'] for lot in lots)
+            today_count, today_revenue = DashboardService._load_today()
+            active_count = DashboardService._load_active_count()
+            recent_records = DashboardService._load_recent_records()
+            return DashboardService._assemble(
+                lots, occupied, today_count, today_revenue, active_count, recent_records
+            )
+
+        keys = DashboardService._keys()
+        cached = cache.get_many([
+            keys['lots'], keys['active'], keys['today_count'],
+            keys['today_revenue'], keys['recent'],
+        ])
+
+        # 停车场列表（结构数据）
+        lots_part = cached.get(keys['lots'])
+        if lots_part is None:
+            lots_part = DashboardService._rebuild(
+                keys, keys['lots'],
+                lambda: DashboardService._store(keys['lots'], DashboardService._load_lots())
+            )
+        lots = lots_part['data']
+
+        # 各停车场已占用车位数
+        occupied_keys = {lot['id']: DashboardService._occupied_key(keys, lot['id']) for lot in lots}
+        cached_occupied = cache.get_many(list(occupied_keys.values()))
+        occupied = {
+            lot_id: cached_occupied[key]
+            for lot_id, key in occupied_keys.items()
+            if key in cached_occupied
+        }
+        missing = {
+            occupied_keys[lot_id]: lot_id for lot_id in occupied_keys if lot_id not in occupied
+        }
+        if missing:
+            def load_occupied():
+                loaded = DashboardService._load_occupied(missing.values())
+                cache.set_many(
+                    {occupied_keys[lot_id]: count for lot_id, count in loaded.items()},
+                    CACHE_TTL_DASHBOARD
+                )
+                return loaded
+
+            occupied.update(DashboardService._rebuild(keys, missing, load_occupied))
+
+        # 今日统计
+        today_count = cached.get(keys['today_count'])
+        today_revenue = cached.get(keys['today_revenue'])
+        if today_count is None or today_revenue is None:
+            def load_today():
+                count, revenue = DashboardService._load_today()
+                cache.set_many({
+                    keys['today_count']: count,
+                    keys['today_revenue']: revenue,
+                }, CACHE_TTL_DASHBOARD)
+                return {'count': count, 'revenue': revenue}
+
+            today = DashboardService._rebuild(
+                keys, {keys['today_count']: 'count', keys['today_revenue']: 'revenue'}, load_today
+            )
+            today_count, today_revenue = today['count'], today['revenue']
+
+        # 在场车辆数
+        active_count = cached.get(keys['active'])
+        if active_count is None:
+            def load_active():
+                count = DashboardService._load_active_count()
+                cache.set(keys['active'], count, CACHE_TTL_DASHBOARD)
+                return count
+
+            active_count = DashboardService._rebuild(keys, keys['active'], load_active)
+
+        # 最近记录
+        recent_part = cached.get(keys['recent'])
+        if recent_part is None:
+            recent_part = DashboardService._rebuild(
+                keys, keys['recent'],
+                lambda: DashboardService._store(
+                    keys['recent'], DashboardService._load_recent_records()
+                )
+            )
+
+        return DashboardService._assemble(
+            lots, occupied, today_count, today_revenue, active_count, recent_part['data']
+        )
+
+    @staticmethod
+    def record_entries(records: list) -> None:
+        """
+        入场后更新仪表盘（事务提交后生效）
+
+        Args:
+            records: 新建的停车记录列表（需已加载 vehicle 和 parking_space）
+        """
+        records = [record for record in records if record is not None]
+        if not records:
+            return
+        rows = [DashboardService._record_row(record) for record in records]
+        entry_times = [record.entry_time for record in records]
+
+        def apply():
+            keys = DashboardService._keys()
+            today_start = DashboardService._today_start()
+            DashboardService._incr(keys['active'], len(rows))
+            DashboardService._incr(
+                keys['today_count'],
+                sum(1 for entry_time in entry_times if entry_time >= today_start)
+            )
+
+            def push(recent: list[dict]) -> list[dict]:
+                names = DashboardService._lot_names(keys)
+                added = []
+                for row in rows:
+                    row = dict(row)
+                    row['parking_lot'] = row['lot_name'] = names.get(row.pop('lot_id'), '')
+                    added.append(row)
+                merged = sorted(added + recent, key=lambda r: r['entry_time'], reverse=True)
+                return merged[:RECENT_RECORDS_LIMIT]
+
+            DashboardService._patch(keys['recent'], push)
+
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def record_exits(records: list) -> None:
+        """
+        出场后更新仪表盘（事务提交后生效）
+
+        Args:
+            records: 已出场的停车记录列表
+        """
+        records = [record for record in records if record is not None]
+        if not records:
+            return
+        DashboardService._apply_record_updates(records, active_delta=-len(records))
+
+    @staticmethod
+    def record_payments(records: list) -> None:
+        """
+        支付后更新仪表盘（事务提交后生效）
+
+        Args:
+            records: 已支付的停车记录列表
+        """
+        records = [record for record in records if record is not None]
+        if not records:
+            return
+        DashboardService._apply_record_updates(records, active_delta=0)
+
+    @staticmethod
+    def apply_occupancy(parking_lot_id: int, delta: int) -> None:
+        """
+        更新停车场已占用车位数（由占用计数在事务提交后调用）
+
+        Args:
+            parking_lot_id: 停车场ID
+            delta: 已占用车位数变化量
+        """
+        DashboardService._incr(
+            DashboardService._occupied_key(DashboardService._keys(), parking_lot_id), delta
+        )
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """
+        清除仪表盘缓存（递增版本号，所有部分在下次读取时重建）
+
+        用于停车场、车位等结构变化；入场/出场/支付请使用 record_* 方法就地更新。
+        """
+        try:
+            cache.incr(CACHE_KEY_DASHBOARD_VERSION)
+        except ValueError:
+            cache.set(CACHE_KEY_DASHBOARD_VERSION, int(time.time()), None)
+
+    @staticmethod
+    def _apply_record_updates(records: list, active_delta: int) -> None:
+        """出场/支付：更新在场数、今日收入和最近记录中的对应条目"""
+        rows = {record.pk: DashboardService._record_row(record) for record in records}
+        paid_today = [
+            (record.entry_time, to_cents(record.fee))
+            for record in records
+            if record.is_paid and record.fee
+        ]
+
+        def apply():
+            keys = DashboardService._keys()
+            today_start = DashboardService._today_start()
+            if active_delta:
+                DashboardService._incr(keys['active'], active_delta)
+            revenue = sum(cents for entry_time, cents in paid_today if entry_time >= today_start)
+            DashboardService._incr(keys['today_revenue'], revenue)
+
+            def update(recent: list[dict]) -> list[dict]:
+                for item in recent:
+                    row = rows.get(item['id'])
+                    if row:
+                        item.update(
+                            exit_time=row['exit_time'],
+                            fee=row['fee'],
+                            is_paid=row['is_paid'],
+                            is_active=row['is_active'],
+                        )
+                return recent
+
+            DashboardService._patch(keys['recent'], update)
+
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def _keys() -> dict[str, str]:
+        """当前版本的各部分缓存键"""
+        version = cache.get(CACHE_KEY_DASHBOARD_VERSION)
+        if version is None:
+            version = int(time.time())
+            if not cache.add(CACHE_KEY_DASHBOARD_VERSION, version, None):
+                version = cache.get(CACHE_KEY_DASHBOARD_VERSION, version)
+        prefix = f'{CACHE_KEY_DASHBOARD}{version}:'
+        day = DashboardService._today_start().date().isoformat()
+        return {
+            'prefix': prefix,
+            'previous': f'{CACHE_KEY_DASHBOARD}{version - 1}:',
+            'lots': f'{prefix}lots',
+            'active': f'{prefix}active',
+            'today_count': f'{prefix}today:{day}:count',
+            'today_revenue': f'{prefix}today:{day}:revenue',
+            'recent': f'{prefix}recent',
+        }
+
+    @staticmethod
+    def _rebuild(keys: dict[str, str], part: str | dict[str, Any], load):
+        """
+        合并重建缺失的部分
+
+        同一时刻只有一个请求从数据库重建，其余请求使用上一版本的旧值（版本号递增后仍在有效期内），
+        没有旧值时等待重建结果。
+
+        Args:
+            keys: 当前版本的缓存键
+            part: 缓存键；一组键一起重建时为 缓存键 → 结果名称 的映射
+            load: 从数据库加载并写入缓存的函数
+
+        Returns:
+            部分数据；一组键时为 结果名称 → 值 的字典
+        """
+        def previous(key: str) -> str:
+            return keys['previous'] + key.removeprefix(keys['prefix'])
+
+        if isinstance(part, str):
+            return _flight.coalesce(part, load, stale=lambda: cache.get(previous(part)))
+
+        def collect(names: dict[str, Any]) -> dict | None:
+            values = cache.get_many(list(names))
+            if len(values) < len(names):
+                return None
+            return {label: values[key] for key, label in names.items()}
+
+        return _flight.coalesce(
+            next(iter(part)),
+            load,
+            stale=lambda: collect({previous(key): label for key, label in part.items()}),
+            read=lambda: collect(part),
+        )
+
+    @staticmethod
+    def _occupied_key(keys: dict[str, str], parking_lot_id: int) -> str:
+        return f"{keys['prefix']}occupied:{parking_lot_id}"
+
+    @staticmethod
+    def _today_start():
+        return timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def _incr(key: str, delta: int) -> None:
+        """原子增减整数计数；计数不存在时跳过，下次读取时从数据库重建"""
+        if not delta:
+            return
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+    @staticmethod
+    def _store(key: str, data) -> dict:
+        """保存带构建时间的部分（就地更新时保持原到期时间）"""
+        part = {'built_at': time.time(), 'data': data}
+        cache.set(key, part, CACHE_TTL_DASHBOARD)
+        return part
+
+    @staticmethod
+    def _patch(key: str, update) -> None:
+        """
+        加锁后就地更新部分数据
+
+        未缓存时跳过（下次读取时重建）；拿不到锁时删除该部分，避免丢失更新。
+        """
+        lock_key = f'{key}:lock'
+        if not cache.add(lock_key, 1, PATCH_LOCK_TIMEOUT):
+            cache.delete(key)
+            return
+        try:
+            part = cache.get(key)
+            if part is None:
+                return
+            remaining = part['built_at'] + CACHE_TTL_DASHBOARD - time.time()
+            if remaining <= 0:
+                cache.delete(key)
+                return
+            part['data'] = update(part['data'])
+            cache.set(key, part, remaining)
+        except Exception as e:
+            logger.warning("仪表盘缓存就地更新失败，已丢弃该部分: key={}, 错误={}", key, str(e))
+            cache.delete(key)
+        finally:
+            cache.delete(lock_key)
+
+    @staticmethod
+    def _lot_names(keys: dict[str, str]) -> dict[int, str]:
+        part = cache.get(keys['lots'])
+        lots = part['data'] if part else DashboardService._load_lots()
+        return {lot['id']: lot['name'] for lot in lots}
+
+    @staticmethod
+    def _record_row(record) -> dict[str, Any]:
+        """停车记录在最近记录中的表示（停车场名称在更新缓存时补充）"""
+        return {
+            'id': record.id,
+            'license_plate': record.vehicle.license_plate,
+            'space_number': record.parking_space.space_number,
+            'lot_id': record.parking_space.parking_lot_id,
+            'entry_time': record.entry_time.isoformat(),
+            'exit_time': record.exit_time.isoformat() if record.exit_time else None,
+            'fee': str(record.fee) if record.fee else None,
+            'is_paid': record.is_paid,
+            'is_active': record.exit_time is None,
+        }
+
+    @staticmethod
+    def _assemble(
+        lots: list[dict],
+        occupied: dict[int, int],
+        today_count: int,
+        today_revenue: int,
+        active_count: int,
+        recent_records: list[dict]
+    ) -> dict[str, Any]:
+        """组装仪表盘数据（格式与拆分缓存前保持一致）"""
+        parking_lots = []
+        total_spaces = 0
+        occupied_spaces = 0
+        for lot in lots:
+            lot_occupied = max(0, occupied.get(lot['id'], 0))
+            total_spaces += lot['space_count']
+            occupied_spaces += lot_occupied
+            parking_lots.append({
+                'id': lot['id'],
+                'name': lot['name'],
+                'address': lot['address'],
+                'total_spaces': lot['total_spaces'],
+                'occupied_spaces': lot_occupied,
+                'available_spaces': max(0, lot['total_spaces'] - lot_occupied),
+                'hourly_rate': lot['hourly_rate'],
+            })
+
+        return {
+            'total_lots': len(parking_lots),
+            'total_spaces': total_spaces,
+            'occupied_spaces': occupied_spaces,
+            'available_spaces': max(0, total_spaces - occupied_spaces),
+            'today_count': today_count,
+            'today_revenue': cents_to_decimal(today_revenue),
+            'active_count': max(0, active_count),
+            'recent_records': [dict(record) for record in recent_records],
+            'parking_lots': parking_lots,
+        }
+
+    @staticmethod
+    def _load_lots() -> list[dict]:
+        lots = list(
+            ParkingLot.objects.filter(is_active=True).values(
+                'id', 'name', 'address', 'total_spaces', 'hourly_rate'
+            )
+        )
+        occupancy = OccupancyService.get_occupancy_map(lot['id'] for lot in lots)
+        for lot in lots:
+            lot['space_count'] = occupancy[lot['id']].space_count
+        return lots
+
+    @staticmethod
+    def _load_occupied(lot_ids) -> dict[int, int]:
+        occupancy = OccupancyService.get_occupancy_map(lot_ids)
+        return {lot_id: row.occupied for lot_id, row in occupancy.items()}
+
+    @staticmethod
+    def _load_today() -> tuple[int, int]:
         today_stats = ParkingRecordService.get_today_statistics()
-        
-        # 获取在场车辆数（优化：直接使用QuerySet的count，避免加载数据）
-        active_count = ParkingRecordService.get_active_records().count()
-        
-        # 获取最近记录（优化：转换为可序列化格式以便缓存）
-        recent_records_qs = ParkingRecordService.get_recent_records()
+        return today_stats['count'], to_cents(today_stats['revenue'])
+
+    @staticmethod
+    def _load_active_count() -> int:
+        # 优化：直接使用QuerySet的count，避免加载数据
+        return ParkingRecordService.get_active_records().count()
+
+    @staticmethod
+    def _load_recent_records() -> list[dict]:
         # 转换为字典列表，便于缓存和API响应
-        recent_records = [
+        return [
             {
                 'id': r.id,
                 'license_plate': r.vehicle.license_plate,
@@ -71,32 +483,5 @@ class DashboardService:
                 'is_paid': r.is_paid,
                 'is_active': r.exit_time is None,  # 添加is_active字段
             }
-            for r in recent_records_qs
+            for r in ParkingRecordService.get_recent_records(RECENT_RECORDS_LIMIT)
         ]
-        
-        data = {
-            'total_lots': len(lot_ids),
-            'total_spaces': space_stats.get('total', 0),
-            'occupied_spaces': space_stats.get('occupied', 0),
-            'available_spaces': space_stats.get('available', 0),
-            'today_count': today_stats['count'],
-            'today_revenue': today_stats['revenue'],
-            'active_count': active_count,
-            'recent_records': recent_records,  # 已转换为字典列表，便于缓存
-            'parking_lots': parking_lots,
-        }
-        
-        # 缓存结果（5分钟）
-        if use_cache:
-            cache.set(CACHE_KEY_DASHBOARD, data, CACHE_TTL_DASHBOARD)
-        
-        return data
-    
-    @staticmethod
-    def invalidate_cache() -> None:
-        """
-        清除仪表盘缓存
-        
-        在数据更新时调用，确保缓存一致性。
-        """
-        cache.delete(CACHE_KEY_DASHBOARD)
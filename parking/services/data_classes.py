@@ -37,3 +37,15 @@ class QueryResult:
     records: list[ParkingRecord]
     total_count: int
     has_more: bool = False
+
+
+@dataclass
+class GateEvent:
+    """道闸事件（批量入场/出场的单条事件）"""
+    event_type: str  # entry / exit
+    license_plate: str = ''
+    parking_lot_id: int | None = None
+    vehicle_type: str = 'car'
+    parking_space_id: int | None = None
+    record_id: int | None = None
+    auto_pay: bool = False
@@ -0,0 +1,145 @@
+"""
+在场车辆费用报价缓存
+
+车主查询接口（公开、频繁刷新）对在场车辆的费用报价按停车记录缓存：
+- 报价包含停车位信息、入场时间、费率版本、VIP 折扣和当前费用，
+  以及费用下一次变化的时刻（费用是停车时长的阶梯函数）
+- 变化时刻之前的查询直接使用缓存的费用；到达变化时刻、费率版本或 VIP 折扣变化时，
+  由缓存的入场时间重新计费（不访问数据库）
+- 车辆出场或缴费时删除报价
+"""
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from parking.models.parking_record import ParkingRecord
+from parking.services.tariff_service import TariffService, cents_to_decimal
+from parking.services.vip_service import VIPService
+
+CACHE_KEY_PREFIX = 'parking:quote:'
+# 报价最长缓存时间（秒）
+QUOTE_TTL = 3600
+
+
+def _cache_key(record_id: int) -> str:
+    return f'{CACHE_KEY_PREFIX}{record_id}'
+
+
+@dataclass(frozen=True)
+class FeeQuote:
+    """在场车辆的费用报价"""
+    record_id: int
+    parking_lot_id: int
+    parking_lot: str
+    space_number: str
+    floor: str | None
+    area: str | None
+    entry_time: datetime
+    tariff_version: str
+    discount_rate: Decimal | None
+    fee_cents: int
+    # 费用变化的时间戳，为 None 表示缓存期内不再变化
+    valid_until: float | None
+
+    @property
+    def fee(self) -> Decimal:
+        """当前费用（元）"""
+        return cents_to_decimal(self.fee_cents)
+
+
+class FeeQuoteService:
+    """
+    费用报价服务类
+    """
+
+    @staticmethod
+    def get_quote(license_plate: str, record_id: int) -> FeeQuote | None:
+        """
+        获取在场车辆的费用报价
+
+        Args:
+            license_plate: 车牌号（已规范化）
+            record_id: 在场停车记录ID
+
+        Returns:
+            FeeQuote | None: 费用报价，记录不存在时返回 None
+        """
+        vip_info = VIPService.get_vip_info(license_plate)
+        discount_rate = vip_info.discount_rate if vip_info else None
+
+        quote = cache.get(_cache_key(record_id))
+        if isinstance(quote, FeeQuote):
+            tariff = TariffService.get_tariff(quote.parking_lot_id)
+            if (
+                quote.tariff_version == tariff.version
+                and quote.discount_rate == discount_rate
+                and (quote.valid_until is None or time.time() < quote.valid_until)
+            ):
+                return quote
+            # 跨过费用变化时刻或计费参数变化：由缓存的入场时间重新计费
+            return FeeQuoteService._price(quote, discount_rate)
+
+        record = ParkingRecord.objects.select_related(
+            'parking_space__parking_lot'
+        ).filter(pk=record_id, exit_time__isnull=True).first()
+        if record is None:
+            return None
+
+        space = record.parking_space
+        quote = FeeQuote(
+            record_id=record.pk,
+            parking_lot_id=space.parking_lot_id,
+            parking_lot=space.parking_lot.name,
+            space_number=space.space_number,
+            floor=space.floor,
+            area=space.area,
+            entry_time=record.entry_time,
+            tariff_version='',
+            discount_rate=None,
+            fee_cents=0,
+            valid_until=None,
+        )
+        return FeeQuoteService._price(quote, discount_rate)
+
+    @staticmethod
+    def invalidate(record_ids) -> None:
+        """
+        删除停车记录的费用报价（出场或缴费后调用）
+
+        Args:
+            record_ids: 停车记录ID列表
+        """
+        keys = [_cache_key(record_id) for record_id in record_ids]
+        if keys:
+            cache.delete_many(keys)
+
+    @staticmethod
+    def _price(quote: FeeQuote, discount_rate: Decimal | None) -> FeeQuote:
+        """按当前时间和费率重新计费并写入缓存"""
+        tariff = TariffService.get_tariff(quote.parking_lot_id)
+        now = timezone.now()
+        duration = now - quote.entry_time
+        next_change = tariff.next_change(
+            duration, discount_rate, horizon=timedelta(seconds=QUOTE_TTL)
+        )
+
+        if next_change is None:
+            valid_until = None
+            timeout = QUOTE_TTL
+        else:
+            valid_until = (quote.entry_time + next_change).timestamp()
+            timeout = min(QUOTE_TTL, max(1, int(valid_until - now.timestamp()) + 1))
+
+        quote = replace(
+            quote,
+            tariff_version=tariff.version,
+            discount_rate=discount_rate,
+            fee_cents=tariff.fee_cents(duration, discount_rate),
+            valid_until=valid_until,
+        )
+        cache.set(_cache_key(quote.record_id), quote, timeout)
+        return quote
@@ -0,0 +1,241 @@
+"""
+停车场占用事件推送
+
+入场/出场等改变占用计数的事务提交后，向共享缓存中的事件日志追加一条
+停车场占用事件（递增序号 + 短时保存的事件键）。
+
+订阅端（ASGI 流式接口）每个进程每个事件循环只有一个轮询任务读取事件日志，
+再分发给该进程内所有已连接的客户端队列：
+几百个打开的屏幕只对应每个进程每秒一次缓存读取，而不是各自轮询统计接口。
+
+- 没有订阅者时（监听标记过期）发布端直接跳过，不产生额外开销
+- 客户端队列积压时丢弃事件并标记需要重新同步，由接口重新发送快照
+"""
+import asyncio
+import weakref
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import transaction
+from loguru import logger
+
+from parking.models.lot_occupancy import LotOccupancy
+
+CACHE_KEY_PREFIX = 'parking:events:occupancy:'
+_SEQ_KEY = f'{CACHE_KEY_PREFIX}seq'
+_LISTENERS_KEY = f'{CACHE_KEY_PREFIX}listeners'
+
+# 事件在缓存中的保存时间（秒）
+EVENT_TTL = 120
+# 订阅端轮询事件日志的间隔（秒）
+POLL_INTERVAL = 1.0
+# 监听标记有效期（秒），轮询任务每次轮询时续期
+LISTENERS_TTL = 30
+# 单次轮询最多读取的事件数，落后更多时直接要求客户端重新同步
+MAX_EVENTS_PER_POLL = 500
+# 每个客户端队列的最大积压事件数
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _event_key(seq: int) -> str:
+    return f'{CACHE_KEY_PREFIX}{seq}'
+
+
+class OccupancyEvents:
+    """
+    停车场占用事件发布服务
+
+    由 OccupancyService 在计数变化时调用，事务提交后发布。
+    """
+
+    @staticmethod
+    def publish_on_commit(parking_lot_id: int, delta: int) -> None:
+        """
+        事务提交后发布停车场占用事件
+
+        Args:
+            parking_lot_id: 停车场ID
+            delta: 已占用车位数变化量
+        """
+        transaction.on_commit(lambda: OccupancyEvents.publish(parking_lot_id, delta))
+
+    @staticmethod
+    def publish(parking_lot_id: int, delta: int) -> int | None:
+        """
+        发布停车场占用事件（携带提交后的计数）
+
+        Args:
+            parking_lot_id: 停车场ID
+            delta: 已占用车位数变化量
+
+        Returns:
+            int | None: 事件序号，没有订阅者或发布失败时返回 None
+        """
+        try:
+            if not cache.get(_LISTENERS_KEY):
+                return None
+            occupancy = LotOccupancy.objects.filter(parking_lot_id=parking_lot_id).first()
+            if occupancy is None:
+                return None
+            event = {
+                'lot_id': parking_lot_id,
+                'delta': delta,
+                'occupied': occupancy.occupied,
+                'spaces': occupancy.space_count,
+                'available': occupancy.available,
+            }
+            cache.add(_SEQ_KEY, 0, None)
+            seq = cache.incr(_SEQ_KEY)
+            cache.set(_event_key(seq), event, EVENT_TTL)
+            return seq
+        except Exception as e:
+            # 推送只是通知，失败时客户端在下次重连时通过快照恢复
+            logger.warning("发布停车场占用事件失败: 停车场={}, 错误={}", parking_lot_id, str(e))
+            return None
+
+    @staticmethod
+    def snapshot(parking_lot_id: int | None = None) -> dict:
+        """
+        获取活跃停车场的占用快照（客户端连接或重新同步时发送）
+
+        Args:
+            parking_lot_id: 只包含指定停车场，为 None 时包含全部活跃停车场
+
+        Returns:
+            dict: lots（各停车场计数）及汇总的 total_spaces、occupied_spaces、available_spaces
+        """
+        from parking.models.parking_lot import ParkingLot
+        from parking.services.occupancy_service import OccupancyService
+
+        lots = ParkingLot.objects.filter(is_active=True)
+        if parking_lot_id is not None:
+            lots = lots.filter(pk=parking_lot_id)
+        names = dict(lots.values_list('pk', 'name'))
+        occupancy = OccupancyService.get_occupancy_map(names)
+
+        result = [
+            {
+                'lot_id': lot_id,
+                'name': name,
+                'occupied': occupancy[lot_id].occupied,
+                'spaces': occupancy[lot_id].space_count,
+                'available': occupancy[lot_id].available,
+            }
+            for lot_id, name in names.items()
+        ]
+        total = sum(lot['spaces'] for lot in result)
+        occupied = sum(lot['occupied'] for lot in result)
+        return {
+            'lots': result,
+            'total_spaces': total,
+            'occupied_spaces': occupied,
+            'available_spaces': max(0, total - occupied),
+        }
+
+
+@dataclass(eq=False)
+class Subscription:
+    """单个客户端的订阅"""
+    queue: asyncio.Queue = field(
+        default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    )
+    # 积压或轮询落后导致丢失事件，需要重新发送快照
+    needs_resync: bool = False
+
+    def deliver(self, seq: int, event: dict) -> None:
+        try:
+            self.queue.put_nowait((seq, event))
+        except asyncio.QueueFull:
+            self.needs_resync = True
+
+
+class _Broadcaster:
+    """一个事件循环内的事件分发器（单个轮询任务）"""
+
+    def __init__(self):
+        self.subscriptions: set[Subscription] = set()
+        self.task: asyncio.Task | None = None
+        self.last_seq: int | None = None
+        self.stalled_seq: int | None = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self.subscriptions.add(subscription)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    async def _poll(self) -> None:
+        try:
+            await cache.aset(_LISTENERS_KEY, True, LISTENERS_TTL)
+            self.last_seq = await cache.aget(_SEQ_KEY) or 0
+            while self.subscriptions:
+                await asyncio.sleep(POLL_INTERVAL)
+                await self._poll_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("停车场占用事件轮询异常: {}", str(e))
+            for subscription in self.subscriptions:
+                subscription.needs_resync = True
+        finally:
+            self.task = None
+
+    async def _poll_once(self) -> None:
+        await cache.aset(_LISTENERS_KEY, True, LISTENERS_TTL)
+        seq = await cache.aget(_SEQ_KEY) or 0
+        if seq < self.last_seq:
+            # 缓存被清空，序号重新开始
+            self.last_seq = 0
+        if seq == self.last_seq:
+            return
+
+        first = max(self.last_seq + 1, seq - MAX_EVENTS_PER_POLL + 1)
+        lagged = first > self.last_seq + 1
+        events = await cache.aget_many([_event_key(n) for n in range(first, seq + 1)])
+
+        delivered = []
+        last = first - 1
+        for n in range(first, seq + 1):
+            event = events.get(_event_key(n))
+            if event is None:
+                if self.stalled_seq != n:
+                    # 发布端已递增序号但可能尚未写入事件，下次轮询再读
+                    self.stalled_seq = n
+                    break
+                # 连续两次缺失：事件已过期或发布失败
+                lagged = True
+            else:
+                delivered.append((n, event))
+            last = n
+        self.last_seq = last
+
+        for subscription in self.subscriptions:
+            if lagged:
+                subscription.needs_resync = True
+            for n, event in delivered:
+                subscription.deliver(n, event)
+
+
+# 按事件循环区分分发器：ASGI 服务器一个进程一个循环，
+# WSGI 下流式响应各自在独立循环中运行
+_broadcasters: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def subscribe() -> Subscription:
+    """在当前事件循环中订阅停车场占用事件"""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = _Broadcaster()
+    return broadcaster.subscribe()
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    """取消订阅"""
+    broadcaster = _broadcasters.get(asyncio.get_running_loop())
+    if broadcaster is not None:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,300 @@
+"""
+停车场占用计数服务
+
+维护 LotOccupancy 计数，替代对 ParkingSpace 的 COUNT 统计：
+- 入场/出场、车位增删时在同一事务内用 F 表达式原子增减计数
+- 逐个保存的车位（save()）由信号按加载时的状态计算增量
+- 批量 update()/bulk_create() 的调用方显式调用 mark_spaces/add_spaces
+- 计数行缺失时读取方按车位表补建，漂移由 reconcile 修复
+- 计数变化在事务提交后发布占用事件（见 occupancy_events）并同步仪表盘缓存
+"""
+from collections import Counter
+from collections.abc import Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from loguru import logger
+
+from parking.models.lot_occupancy import LotOccupancy
+from parking.models.parking_lot import ParkingLot
+from parking.models.parking_space import ParkingSpace
+from parking.services.occupancy_events import OccupancyEvents
+
+# 影响占用计数的车位字段
+_TRACKED_FIELDS = frozenset({'parking_lot', 'parking_lot_id', 'is_occupied'})
+
+
+class OccupancyService:
+    """
+    停车场占用计数服务类
+
+    提供计数的增量更新、读取和对账。
+    """
+
+    @staticmethod
+    def adjust(parking_lot_id: int, occupied: int = 0, spaces: int = 0) -> None:
+        """
+        原子增减停车场的占用计数
+
+        Args:
+            parking_lot_id: 停车场ID
+            occupied: 已占用车位数增量
+            spaces: 车位数增量
+        """
+        if not occupied and not spaces:
+            return
+        updated = LotOccupancy.objects.filter(parking_lot_id=parking_lot_id).update(
+            occupied_count=F('occupied_count') + occupied,
+            space_count=F('space_count') + spaces,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            # 不在此处补建：级联删除停车场时车位信号也会走到这里
+            logger.debug("停车场 {} 没有占用计数行，跳过增量更新", parking_lot_id)
+            return
+        OccupancyEvents.publish_on_commit(parking_lot_id, occupied)
+        OccupancyService._sync_dashboard_on_commit(parking_lot_id, occupied, structural=bool(spaces))
+
+    @staticmethod
+    def mark_spaces(spaces: Iterable[ParkingSpace], occupied: bool) -> None:
+        """
+        记录已通过 update() 改变占用状态的车位
+
+        调用方须保证这些车位在数据库中确实由相反状态变为 occupied
+        （例如加锁并按 is_occupied 过滤后更新）。
+
+        Args:
+            spaces: 停车位列表
+            occupied: 更新后的占用状态
+        """
+        per_lot: Counter[int] = Counter()
+        for space in spaces:
+            space.is_occupied = occupied
+            space._occupancy_state = (space.parking_lot_id, occupied)
+            per_lot[space.parking_lot_id] += 1
+        delta = 1 if occupied else -1
+        for parking_lot_id, count in per_lot.items():
+            OccupancyService.adjust(parking_lot_id, occupied=delta * count)
+
+    @staticmethod
+    def add_spaces(parking_lot_id: int, spaces: list[ParkingSpace]) -> int:
+        """
+        记录批量创建（bulk_create）的车位
+
+        Args:
+            parking_lot_id: 停车场ID
+            spaces: 新创建的停车位列表
+
+        Returns:
+            int: 停车场当前车位数
+        """
+        for space in spaces:
+            space._occupancy_state = (parking_lot_id, space.is_occupied)
+        OccupancyService.adjust(
+            parking_lot_id,
+            occupied=sum(1 for space in spaces if space.is_occupied),
+            spaces=len(spaces)
+        )
+        return OccupancyService.get_occupancy(parking_lot_id).space_count
+
+    @staticmethod
+    def space_saved(space: ParkingSpace, created: bool, update_fields=None) -> None:
+        """
+        车位保存后更新计数（由 post_save 信号调用）
+
+        Args:
+            space: 停车位对象
+            created: 是否新建
+            update_fields: save() 的 update_fields
+        """
+        current = (space.parking_lot_id, space.is_occupied)
+        if created:
+            OccupancyService.adjust(current[0], occupied=int(current[1]), spaces=1)
+        else:
+            if update_fields is not None and not _TRACKED_FIELDS.intersection(update_fields):
+                return
+            previous = getattr(space, '_occupancy_state', None)
+            if previous is None:
+                # 无法得知保存前的状态（实例不是从数据库加载的），留给对账修复
+                return
+            if previous[0] != current[0]:
+                OccupancyService.adjust(previous[0], occupied=-int(previous[1]), spaces=-1)
+                OccupancyService.adjust(current[0], occupied=int(current[1]), spaces=1)
+            elif previous[1] != current[1]:
+                OccupancyService.adjust(current[0], occupied=1 if current[1] else -1)
+        space._occupancy_state = current
+
+    @staticmethod
+    def space_deleted(space: ParkingSpace) -> None:
+        """
+        车位删除后更新计数（由 post_delete 信号调用）
+
+        Args:
+            space: 停车位对象
+        """
+        previous = getattr(space, '_occupancy_state', None)
+        parking_lot_id, is_occupied = previous or (space.parking_lot_id, space.is_occupied)
+        OccupancyService.adjust(parking_lot_id, occupied=-int(is_occupied), spaces=-1)
+
+    @staticmethod
+    def get_occupancy(parking_lot_id: int) -> LotOccupancy:
+        """
+        获取停车场的占用计数（缺失时按车位表补建）
+
+        Args:
+            parking_lot_id: 停车场ID
+
+        Returns:
+            LotOccupancy: 占用计数
+        """
+        try:
+            return LotOccupancy.objects.get(parking_lot_id=parking_lot_id)
+        except LotOccupancy.DoesNotExist:
+            return OccupancyService._create_from_spaces(parking_lot_id)
+
+    @staticmethod
+    def get_occupancy_map(lot_ids: Iterable[int]) -> dict[int, LotOccupancy]:
+        """
+        批量获取停车场的占用计数（缺失时按车位表补建）
+
+        Args:
+            lot_ids: 停车场ID列表
+
+        Returns:
+            dict[int, LotOccupancy]: 停车场ID → 占用计数
+        """
+        lot_ids = list(lot_ids)
+        occupancy = LotOccupancy.objects.in_bulk(lot_ids)
+        for parking_lot_id in lot_ids:
+            if parking_lot_id not in occupancy:
+                occupancy[parking_lot_id] = OccupancyService._create_from_spaces(parking_lot_id)
+        return occupancy
+
+    @staticmethod
+    def get_totals(lot_ids: Iterable[int]) -> dict[str, int]:
+        """
+        汇总多个停车场的车位统计
+
+        Args:
+            lot_ids: 停车场ID列表
+
+        Returns:
+            dict: 统计信息，包含total、occupied、available
+        """
+        occupancy = OccupancyService.get_occupancy_map(lot_ids)
+        total = sum(row.space_count for row in occupancy.values())
+        occupied = sum(row.occupied for row in occupancy.values())
+        return {
+            'total': total,
+            'occupied': occupied,
+            'available': max(0, total - occupied)
+        }
+
+    @staticmethod
+    def reconcile(lot_ids: Iterable[int] | None = None, dry_run: bool = False) -> list[dict]:
+        """
+        按车位表重新统计占用计数并修复漂移
+
+        Args:
+            lot_ids: 停车场ID列表，为 None 时处理全部停车场
+            dry_run: 只报告漂移不写入
+
+        Returns:
+            list[dict]: 存在漂移的停车场，包含计数值与实际值
+        """
+        lots = ParkingLot.objects.all()
+        if lot_ids is not None:
+            lots = lots.filter(pk__in=list(lot_ids))
+        actual = {
+            row['pk']: row
+            for row in lots.annotate(
+                spaces=Count('parking_spaces'),
+                occupied=Count('parking_spaces', filter=Q(parking_spaces__is_occupied=True))
+            ).values('pk', 'name', 'spaces', 'occupied')
+        }
+        counters = LotOccupancy.objects.in_bulk(list(actual))
+
+        drift = []
+        now = timezone.now()
+        for parking_lot_id, row in actual.items():
+            counter = counters.get(parking_lot_id)
+            if (
+                counter is not None
+                and counter.space_count == row['spaces']
+                and counter.occupied_count == row['occupied']
+            ):
+                continue
+            drift.append({
+                'parking_lot_id': parking_lot_id,
+                'name': row['name'],
+                'space_count': counter.space_count if counter else None,
+                'occupied_count': counter.occupied_count if counter else None,
+                'actual_spaces': row['spaces'],
+                'actual_occupied': row['occupied'],
+            })
+
+        if not dry_run:
+            # 统计与写入之间可能有入场/出场，逐个锁定计数行后重新统计
+            for item in drift:
+                OccupancyService._reset_from_spaces(item['parking_lot_id'])
+            LotOccupancy.objects.filter(pk__in=list(actual)).update(reconciled_at=now)
+
+        if drift:
+            logger.warning(
+                "停车场占用计数漂移: {} 个停车场, dry_run={}",
+                len(drift), dry_run
+            )
+        return drift
+
+    @staticmethod
+    def _count_spaces(parking_lot_id: int) -> dict[str, int]:
+        return ParkingSpace.objects.filter(parking_lot_id=parking_lot_id).aggregate(
+            spaces=Count('id'),
+            occupied=Count('id', filter=Q(is_occupied=True))
+        )
+
+    @staticmethod
+    def _create_from_spaces(parking_lot_id: int) -> LotOccupancy:
+        """按车位表创建计数行（并发创建时以先创建者为准）"""
+        counts = OccupancyService._count_spaces(parking_lot_id)
+        try:
+            with transaction.atomic():
+                return LotOccupancy.objects.create(
+                    parking_lot_id=parking_lot_id,
+                    space_count=counts['spaces'],
+                    occupied_count=counts['occupied'],
+                    reconciled_at=timezone.now()
+                )
+        except IntegrityError:
+            return LotOccupancy.objects.get(parking_lot_id=parking_lot_id)
+
+    @staticmethod
+    def _reset_from_spaces(parking_lot_id: int) -> None:
+        with transaction.atomic():
+            # 先锁定计数行：并发入场/出场在更新计数时等待，统计结果不会被覆盖
+            exists = LotOccupancy.objects.select_for_update().filter(
+                parking_lot_id=parking_lot_id
+            ).exists()
+            if not exists:
+                OccupancyService._create_from_spaces(parking_lot_id)
+                return
+            counts = OccupancyService._count_spaces(parking_lot_id)
+            LotOccupancy.objects.filter(parking_lot_id=parking_lot_id).update(
+                space_count=counts['spaces'],
+                occupied_count=counts['occupied'],
+                updated_at=timezone.now(),
+                reconciled_at=timezone.now()
+            )
+            OccupancyEvents.publish_on_commit(parking_lot_id, 0)
+            OccupancyService._sync_dashboard_on_commit(parking_lot_id, 0, structural=True)
+
+    @staticmethod
+    def _sync_dashboard_on_commit(parking_lot_id: int, occupied: int, structural: bool) -> None:
+        """事务提交后同步仪表盘缓存：占用变化就地增减，车位数变化或重置时整体重建"""
+        from parking.services.dashboard_service import DashboardService
+
+        if structural:
+            transaction.on_commit(DashboardService.invalidate_cache)
+        elif occupied:
+            transaction.on_commit(lambda: DashboardService.apply_occupancy(parking_lot_id, occupied))
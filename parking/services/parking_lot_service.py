@@ -3,15 +3,23 @@
 
 从 parking.services 迁移
 """
-from django.core.cache import cache
-from django.db.models import Count, Q, QuerySet
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.functions import Coalesce, Greatest
 
+from infra.cache import SingleFlightCache
 from parking.models.parking_lot import ParkingLot
 
 # 缓存键前缀和TTL
 CACHE_KEY_PREFIX = 'parking:'
 CACHE_TTL_SHORT = 60  # 1分钟
 
+# 停车场对象缓存（过期后由一个请求重建，其余请求在宽限期内使用旧值；不存在时不缓存）
+_lot_cache = SingleFlightCache(
+    'lot', ttl=CACHE_TTL_SHORT, grace=CACHE_TTL_SHORT, key_prefix=f'{CACHE_KEY_PREFIX}lot:',
+    cache_none=False
+)
+
 
 class ParkingLotService:
     """
@@ -31,12 +39,11 @@ class ParkingLotService:
         Note:
             使用 occupied_count 而非 occupied_spaces 避免与模型 property 冲突
             注意：QuerySet 不能直接缓存，但查询结果可以缓存
+            占用数直接读取占用计数（LotOccupancy），不再统计车位表；
+            缺少计数行的停车场按 0 计，由 reconcile_occupancy 补建
         """
         return ParkingLot.objects.filter(is_active=True).annotate(
-            occupied_count=Count(
-                'parking_spaces',
-                filter=Q(parking_spaces__is_occupied=True)
-            )
+            occupied_count=Greatest(Coalesce(F('occupancy__occupied_count'), 0), 0)
         ).only('id', 'name', 'address', 'total_spaces', 'hourly_rate')
     
     @staticmethod
@@ -76,17 +83,22 @@ class ParkingLotService:
         Note:
             使用 Django 缓存框架缓存查询结果，减少数据库访问
             注意：缓存时间较短（1分钟），确保状态变更能及时反映
+            停车场保存或删除后由信号删除缓存；不存在或已停用（None）时不缓存
+        """
+        def load() -> ParkingLot | None:
+            return ParkingLot.objects.filter(id=lot_id, is_active=True).first()
+
+        return _lot_cache.get(lot_id, load)
+    
+    @staticmethod
+    def invalidate_lot_cache(lot_id: int) -> None:
         """
-        cache_key = f'{CACHE_KEY_PREFIX}lot:{lot_id}'
-        cached_lot = cache.get(cache_key)
-        if cached_lot is not None:
-            return cached_lot
+        删除停车场缓存（停车场保存或删除后调用，之后的请求不会读到旧值）
         
-        try:
-            lot = ParkingLot.objects.get(id=lot_id, is_active=True)
-            # 缓存1分钟（较短时间，确保状态变更能及时反映）
-            cache.set(cache_key, lot, CACHE_TTL_SHORT)
-            return lot
-        except ParkingLot.DoesNotExist:
-            # 不缓存None结果，因为状态可能变化（非活跃可能变为活跃）
-            return None
+        立即删除并在事务提交后再删除一次，避免事务提交前有请求按旧数据重建缓存。
+        
+        Args:
+            lot_id: 停车场ID
+        """
+        _lot_cache.delete(lot_id)
+        transaction.on_commit(lambda: _lot_cache.delete(lot_id))
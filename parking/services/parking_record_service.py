@@ -8,6 +8,7 @@ from decimal import Decimal
 from typing import Any
 
 from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.db import DatabaseError, transaction
 from django.db.models import QuerySet, Sum
 from django.utils import timezone
@@ -17,8 +18,15 @@ from parking.models.parking_lot import ParkingLot
 from parking.models.parking_record import ParkingRecord
 from parking.models.parking_space import ParkingSpace
 from parking.models.vehicle import Vehicle
-from parking.services.data_classes import EntryResult, ExitResult, QueryResult
+from parking.services.active_parking_service import ActiveParkingService
+from parking.services.data_classes import EntryResult, ExitResult, GateEvent, QueryResult
+from parking.services.exceptions import VehicleAlreadyParkedError
+from parking.services.fee_quote_service import FeeQuoteService
+from parking.services.occupancy_service import OccupancyService
+from parking.services.plate_location_service import PlateLocationService
+from parking.services.space_allocator import SpaceAllocator
 from parking.services.vehicle_service import VehicleService
+from parking.services.wanted_service import WantedVehicleService
 
 # 缓存键前缀和TTL
 CACHE_KEY_PREFIX = 'parking:'
@@ -104,14 +112,8 @@ class ParkingRecordService:
                         error_code='space_unavailable'
                     )
             else:
-                # 自动分配：查找可用车位（使用行级锁）
-                parking_space = ParkingSpace.objects.select_for_update(
-                    skip_locked=True  # 跳过已锁定的行，提高并发性能
-                ).filter(
-                    parking_lot_id=parking_lot_id,
-                    is_occupied=False,
-                    is_reserved=False
-                ).first()
+                # 自动分配：从空闲车位表取候选车位，条件更新占用
+                parking_space = SpaceAllocator.allocate(parking_lot_id)
                 
                 if not parking_space:
                     return EntryResult(
@@ -126,55 +128,44 @@ class ParkingRecordService:
                 vehicle_type=vehicle_type
             )
             
-            # 5. 标记车位为已占用
-            parking_space.is_occupied = True
-            parking_space.save(update_fields=['is_occupied', 'updated_at'])
+            # 5. 标记车位为已占用（自动分配的车位已由分配器占用）
+            if not parking_space.is_occupied:
+                parking_space.is_occupied = True
+                parking_space.save(update_fields=['is_occupied', 'updated_at'])
             
-            # 清除相关缓存
-            from parking.services.dashboard_service import DashboardService
-            DashboardService.invalidate_cache()
+            # 6. 获取车牌号地址信息（进程内前缀映射）
+            location_info = PlateLocationService.resolve(normalized_plate)
             
-            # 6. 获取车牌号地址信息（延迟导入避免循环依赖）
+            # 7. 创建停车记录（包含地址信息），同时登记在场车辆
             try:
-                from parking.license_plate_models import LicensePlateLocation
-                location_info = LicensePlateLocation.get_location_by_plate(normalized_plate)
-            except (ImportError, AttributeError):
-                location_info = {}
+                with transaction.atomic():
+                    record = ParkingRecord.objects.create(
+                        vehicle=vehicle,
+                        parking_space=parking_space,
+                        entry_time=timezone.now(),
+                        operator_id=operator_id,
+                        plate_province_code=location_info.get('province_code', ''),
+                        plate_province_name=location_info.get('province_name', ''),
+                        plate_city_code=location_info.get('city_code', ''),
+                        plate_city_name=location_info.get('city_name', ''),
+                    )
+            except VehicleAlreadyParkedError as e:
+                # 并发入场：另一请求已登记该车牌，撤销本次车位占用
+                transaction.set_rollback(True)
+                SpaceAllocator.release(parking_lot_id, parking_space.pk, immediate=True)
+                return EntryResult(
+                    success=False,
+                    message=f'车辆已在 {e.lot_name} 停车',
+                    error_code='vehicle_already_parked'
+                )
             
-            # 7. 创建停车记录（包含地址信息）
-            record = ParkingRecord.objects.create(
-                vehicle=vehicle,
-                parking_space=parking_space,
-                entry_time=timezone.now(),
-                operator_id=operator_id,
-                plate_province_code=location_info.get('province_code', ''),
-                plate_province_name=location_info.get('province_name', ''),
-                plate_city_code=location_info.get('city_code', ''),
-                plate_city_name=location_info.get('city_name', ''),
-            )
+            # 8. 检查是否为通缉车辆（进程内集合匹配，命中后在事务提交后异步处理警报）
+            if WantedVehicleService.is_wanted(normalized_plate):
+                WantedVehicleService.dispatch_alerts([record.id])
             
-            # 8. 检查是否为通缉车辆（延迟导入避免循环依赖）
-            try:
-                from parking.license_plate_models import WantedVehicle, VehicleAlertLog
-                wanted_vehicles = WantedVehicle.objects.filter(
-                    license_plate=normalized_plate,
-                    status='active'
-                ).order_by('-priority')
-                
-                if wanted_vehicles.exists():
-                    # 创建警报日志
-                    for wanted in wanted_vehicles:
-                        VehicleAlertLog.objects.create(
-                            wanted_vehicle=wanted,
-                            parking_record=record
-                        )
-                        # 通知管理员（这里可以扩展为发送邮件、短信等）
-                        logger.warning(
-                            "⚠️ 通缉车辆入场警报: 车牌=%s, 优先级=%s, 记录ID=%s",
-                            normalized_plate, wanted.priority, record.id
-                        )
-            except (ImportError, AttributeError):
-                pass
+            # 事务提交后就地更新仪表盘缓存
+            from parking.services.dashboard_service import DashboardService
+            DashboardService.record_entries([record])
             
             logger.info(
                 "车辆入场成功: 车牌=%s, 停车场=%s, 车位=%s",
@@ -242,12 +233,11 @@ class ParkingRecordService:
                     )
             elif license_plate:
                 normalized_plate = license_plate.upper().strip()
+                # 在场车辆表按车牌主键读取记录ID，再按主键锁定记录
+                active_record_id = ActiveParkingService.get_record_id(normalized_plate)
                 record = ParkingRecord.objects.select_for_update().select_related(
                     'vehicle', 'parking_space__parking_lot'
-                ).filter(
-                    vehicle__license_plate=normalized_plate,
-                    exit_time__isnull=True
-                ).first()
+                ).filter(pk=active_record_id).first() if active_record_id else None
                 
                 if not record:
                     return ExitResult(
@@ -285,9 +275,9 @@ class ParkingRecordService:
             parking_space.is_occupied = False
             parking_space.save(update_fields=['is_occupied', 'updated_at'])
             
-            # 清除相关缓存
+            # 事务提交后就地更新仪表盘缓存
             from parking.services.dashboard_service import DashboardService
-            DashboardService.invalidate_cache()
+            DashboardService.record_exits([record])
             
             logger.info(
                 "车辆出场成功: 车牌=%s, 费用=%s, 时长=%s分钟",
@@ -317,6 +307,454 @@ class ParkingRecordService:
                 error_code='unknown_error'
             )
     
+    @staticmethod
+    def process_gate_events(
+        events: list[GateEvent],
+        operator_id: int | None = None
+    ) -> list[EntryResult | ExitResult]:
+        """
+        批量处理道闸入场/出场事件
+
+        高峰期道闸控制器一次上报一批混合的入场/出场事件。
+        同一批次在一个事务内按到达顺序处理：连续的同类事件（且车牌互不重复）
+        合并为一段，使用集合查询和批量写入；段与段之间保持原顺序，
+        因此每个事件的结果与逐条处理一致（例如满场时，排在出场之前的入场仍然失败）。
+        整批只更新一次仪表盘缓存。
+
+        Args:
+            events: 道闸事件列表
+            operator_id: 操作员ID
+
+        Returns:
+            list[EntryResult | ExitResult]: 与输入顺序一一对应的处理结果
+        """
+        results: list[EntryResult | ExitResult | None] = [None] * len(events)
+
+        try:
+            with transaction.atomic():
+                for event_type, run in ParkingRecordService._split_gate_runs(events, results):
+                    if event_type == 'exit':
+                        ParkingRecordService._process_exit_batch(run, operator_id, results)
+                    else:
+                        ParkingRecordService._process_entry_batch(run, operator_id, results)
+        except DatabaseError as e:
+            logger.error("批量道闸事件数据库错误: {}", str(e))
+            return ParkingRecordService._fail_gate_events(
+                events, '系统繁忙，请稍后重试', 'database_error'
+            )
+        except Exception as e:
+            logger.exception("批量道闸事件异常: {}", str(e))
+            return ParkingRecordService._fail_gate_events(
+                events, '处理失败，请联系管理员', 'unknown_error'
+            )
+
+        succeeded = sum(1 for r in results if r is not None and r.success)
+        if succeeded:
+            # 整批一次性就地更新仪表盘缓存
+            from parking.services.dashboard_service import DashboardService
+            DashboardService.record_exits([
+                r.record for r in results if isinstance(r, ExitResult) and r.success
+            ])
+            DashboardService.record_entries([
+                r.record for r in results if isinstance(r, EntryResult) and r.success
+            ])
+
+        logger.info(
+            "批量道闸事件处理完成: 总数={}, 成功={}, 失败={}",
+            len(events), succeeded, len(events) - succeeded
+        )
+        return results
+
+    @staticmethod
+    def _fail_gate_events(
+        events: list[GateEvent],
+        message: str,
+        error_code: str
+    ) -> list[EntryResult | ExitResult]:
+        """整批回滚时每个事件返回相同的失败结果"""
+        return [
+            (ExitResult if event.event_type == 'exit' else EntryResult)(
+                success=False,
+                message=message,
+                error_code=error_code
+            )
+            for event in events
+        ]
+
+    @staticmethod
+    def _split_gate_runs(
+        events: list[GateEvent],
+        results: list
+    ) -> list[tuple[str, list[tuple[int, GateEvent]]]]:
+        """
+        将事件按到达顺序切分为连续的同类事件段
+
+        事件类型变化、或同一车牌（记录）在段内再次出现时开始新的一段，
+        保证按段顺序批量处理与逐条处理的结果一致。
+        不支持的事件类型直接写入失败结果，不参与分段。
+        """
+        runs: list[tuple[str, list[tuple[int, GateEvent]]]] = []
+        run_keys: set = set()
+
+        for index, event in enumerate(events):
+            if event.event_type not in ('entry', 'exit'):
+                results[index] = EntryResult(
+                    success=False,
+                    message=f'不支持的事件类型: {event.event_type}',
+                    error_code='invalid_event_type'
+                )
+                continue
+
+            event.license_plate = (event.license_plate or '').upper().strip()
+            if event.event_type == 'exit' and event.record_id:
+                key = ('record', event.record_id)
+            else:
+                key = ('plate', event.license_plate)
+
+            if not runs or runs[-1][0] != event.event_type or key in run_keys:
+                runs.append((event.event_type, []))
+                run_keys = set()
+            runs[-1][1].append((index, event))
+            run_keys.add(key)
+
+        return runs
+
+    @staticmethod
+    def _process_exit_batch(
+        exits: list[tuple[int, GateEvent]],
+        operator_id: int | None,
+        results: list
+    ) -> None:
+        """批量出场：一次查询锁定记录，批量更新记录并释放车位"""
+        record_ids = [e.record_id for _, e in exits if e.record_id]
+        plates = [e.license_plate for _, e in exits if not e.record_id and e.license_plate]
+
+        locked = ParkingRecord.objects.select_for_update().select_related(
+            'vehicle', 'parking_space__parking_lot'
+        )
+        by_id = locked.in_bulk(record_ids) if record_ids else {}
+        by_plate = {}
+        if plates:
+            active_ids = ActiveParkingService.get_record_ids(plates)
+            active_records = locked.in_bulk(list(active_ids.values()))
+            for plate, record_id in active_ids.items():
+                if record_id in active_records:
+                    by_plate[plate] = active_records[record_id]
+
+        now = timezone.now()
+        updated: list[ParkingRecord] = []
+        handled_ids: set[int] = set()
+
+        for index, event in exits:
+            if event.record_id:
+                record = by_id.get(event.record_id)
+                if record is None:
+                    results[index] = ExitResult(
+                        success=False,
+                        message='停车记录不存在',
+                        error_code='record_not_found'
+                    )
+                    continue
+            elif event.license_plate:
+                record = by_plate.get(event.license_plate)
+                if record is None:
+                    results[index] = ExitResult(
+                        success=False,
+                        message=f'未找到车牌 {event.license_plate} 的在场记录',
+                        error_code='no_active_record'
+                    )
+                    continue
+            else:
+                results[index] = ExitResult(
+                    success=False,
+                    message='请提供车牌号或停车记录ID',
+                    error_code='missing_identifier'
+                )
+                continue
+
+            if record.exit_time or record.pk in handled_ids:
+                results[index] = ExitResult(
+                    success=False,
+                    message=f'车辆 {record.vehicle.license_plate} 已出场',
+                    error_code='already_exited'
+                )
+                continue
+
+            # 与 ParkingRecord.save 相同的时长和费用计算
+            record.exit_time = now
+            if operator_id:
+                record.operator_id = operator_id
+            if event.auto_pay:
+                record.is_paid = True
+            record.duration_minutes = int((record.exit_time - record.entry_time).total_seconds() / 60)
+            if record.fee is None:
+                record.fee = record.calculate_fee()
+            record.updated_at = now
+
+            handled_ids.add(record.pk)
+            updated.append(record)
+            results[index] = ExitResult(
+                success=True,
+                record=record,
+                fee=record.fee or Decimal('0.00'),
+                duration_minutes=record.duration_minutes or 0,
+                message=f'出场成功，停车费用: ¥{record.fee}'
+            )
+
+        if not updated:
+            return
+
+        ParkingRecord.objects.bulk_update(
+            updated,
+            [
+                'exit_time', 'duration_minutes', 'fee', 'is_paid', 'operator',
+                'is_free_parking', 'discount_rate', 'updated_at',
+            ]
+        )
+        ActiveParkingService.close_records(record.pk for record in updated)
+        FeeQuoteService.invalidate(record.pk for record in updated)
+        released: dict[int, list[int]] = {}
+        for record in updated:
+            released.setdefault(record.parking_space.parking_lot_id, []).append(record.parking_space_id)
+        for lot_id, space_ids in released.items():
+            # 只释放仍为占用状态的车位，按实际释放数扣减占用计数
+            count = ParkingSpace.objects.filter(
+                pk__in=space_ids, is_occupied=True
+            ).update(is_occupied=False, updated_at=now)
+            OccupancyService.adjust(lot_id, occupied=-count)
+            SpaceAllocator.release(lot_id, space_ids)
+
+    @staticmethod
+    def _process_entry_batch(
+        entries: list[tuple[int, GateEvent]],
+        operator_id: int | None,
+        results: list
+    ) -> None:
+        """批量入场：集合查询校验与分配车位，批量创建车辆和停车记录"""
+        from parking.models.validators import validate_license_plate
+
+        vehicle_types = {choice for choice, _ in Vehicle.VEHICLE_TYPE_CHOICES}
+        pending: list[tuple[int, GateEvent]] = []
+
+        # 1. 参数校验（不访问数据库）
+        for index, event in entries:
+            try:
+                validate_license_plate(event.license_plate)
+            except ValidationError as e:
+                results[index] = EntryResult(
+                    success=False,
+                    message=str(e.message),
+                    error_code='invalid_license_plate'
+                )
+                continue
+            if not event.parking_lot_id:
+                results[index] = EntryResult(
+                    success=False,
+                    message='请选择停车场',
+                    error_code='missing_lot'
+                )
+                continue
+            if event.vehicle_type not in vehicle_types:
+                results[index] = EntryResult(
+                    success=False,
+                    message=f'无效的车辆类型: {event.vehicle_type}',
+                    error_code='invalid_vehicle_type'
+                )
+                continue
+            pending.append((index, event))
+
+        if not pending:
+            return
+
+        plates = {event.license_plate for _, event in pending}
+
+        # 2. 已在场车辆（一次主键查询）
+        parked_lots = ActiveParkingService.get_parked_lots(plates)
+
+        # 3. 停车场（一次查询）
+        lots = ParkingLot.objects.filter(
+            pk__in={event.parking_lot_id for _, event in pending},
+            is_active=True
+        ).in_bulk()
+
+        accepted: list[tuple[int, GateEvent]] = []
+        for index, event in pending:
+            if event.license_plate in parked_lots:
+                results[index] = EntryResult(
+                    success=False,
+                    message=f'车辆已在 {parked_lots[event.license_plate]} 停车',
+                    error_code='vehicle_already_parked'
+                )
+            elif event.parking_lot_id not in lots:
+                results[index] = EntryResult(
+                    success=False,
+                    message='停车场不存在或已停止运营',
+                    error_code='lot_not_found'
+                )
+            else:
+                accepted.append((index, event))
+
+        if not accepted:
+            return
+
+        # 4. 分配车位：指定车位一次查询，自动分配经空闲车位表按停车场批量占用
+        requested_ids = {e.parking_space_id for _, e in accepted if e.parking_space_id}
+        requested_spaces = {}
+        if requested_ids:
+            requested_spaces = ParkingSpace.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                pk__in=requested_ids,
+                is_occupied=False,
+                is_reserved=False
+            ).in_bulk()
+
+        auto_demand: dict[int, int] = {}
+        for _, event in accepted:
+            if not event.parking_space_id:
+                auto_demand[event.parking_lot_id] = auto_demand.get(event.parking_lot_id, 0) + 1
+
+        # 指定车位先占用，避免自动分配拿到同一车位
+        claimed_ids: set[int] = set()
+        for index, event in accepted:
+            space = requested_spaces.get(event.parking_space_id) if event.parking_space_id else None
+            if (
+                space is not None
+                and space.parking_lot_id == event.parking_lot_id
+                and space.pk not in claimed_ids
+            ):
+                claimed_ids.add(space.pk)
+        if claimed_ids:
+            claimed_ids = {
+                space.pk for space in SpaceAllocator.occupy(
+                    [requested_spaces[space_id] for space_id in claimed_ids]
+                )
+            }
+
+        free_spaces: dict[int, list[ParkingSpace]] = {
+            lot_id: SpaceAllocator.allocate_many(lot_id, demand)
+            for lot_id, demand in auto_demand.items()
+        }
+
+        assignments: list[tuple[int, GateEvent, ParkingSpace]] = []
+        assigned_ids: set[int] = set()
+        for index, event in accepted:
+            lot = lots[event.parking_lot_id]
+            if event.parking_space_id:
+                space = requested_spaces.get(event.parking_space_id)
+                if (
+                    space is None
+                    or space.pk not in claimed_ids
+                    or space.pk in assigned_ids
+                ):
+                    results[index] = EntryResult(
+                        success=False,
+                        message='指定的停车位不存在、已被占用或已预留',
+                        error_code='space_unavailable'
+                    )
+                    continue
+            else:
+                candidates = free_spaces[event.parking_lot_id]
+                if not candidates:
+                    results[index] = EntryResult(
+                        success=False,
+                        message=f'停车场 {lot.name} 已无可用车位',
+                        error_code='no_available_space'
+                    )
+                    continue
+                space = candidates.pop(0)
+            assigned_ids.add(space.pk)
+            assignments.append((index, event, space))
+
+        if not assignments:
+            return
+
+        # 5. 获取或批量创建车辆
+        assigned_plates = [event.license_plate for _, event, _ in assignments]
+        vehicles = Vehicle.objects.in_bulk(assigned_plates, field_name='license_plate')
+        missing = [
+            Vehicle(license_plate=event.license_plate, vehicle_type=event.vehicle_type)
+            for _, event, _ in assignments
+            if event.license_plate not in vehicles
+        ]
+        if missing:
+            Vehicle.objects.bulk_create(missing, ignore_conflicts=True)
+            vehicles.update(Vehicle.objects.in_bulk(
+                [vehicle.license_plate for vehicle in missing],
+                field_name='license_plate'
+            ))
+
+        # 6. 车牌地址信息与批量创建停车记录
+        now = timezone.now()
+        locations = PlateLocationService.resolve_many(assigned_plates)
+        records = []
+        for _, event, space in assignments:
+            location = locations.get(event.license_plate)
+            records.append(ParkingRecord(
+                vehicle=vehicles[event.license_plate],
+                parking_space=space,
+                parking_lot_id=space.parking_lot_id,
+                entry_time=now,
+                operator_id=operator_id,
+                **(location.record_fields() if location else {}),
+            ))
+        ParkingRecord.objects.bulk_create(records)
+        conflicts = ActiveParkingService.open_many(records)
+        if conflicts:
+            # 并发入场已登记这些车牌：撤销对应记录并释放车位，其余事件不受影响
+            assignments, records = ParkingRecordService._revert_conflicting_entries(
+                assignments, records, conflicts, results
+            )
+
+        for (index, event, space), record in zip(assignments, records):
+            results[index] = EntryResult(
+                success=True,
+                record=record,
+                space_number=space.space_number,
+                lot_name=lots[event.parking_lot_id].name,
+                message=f'入场成功，车位号: {space.space_number}'
+            )
+
+        # 7. 通缉车辆检查（进程内集合匹配，命中后在事务提交后异步处理警报）
+        WantedVehicleService.dispatch_alerts(
+            record.pk for record in WantedVehicleService.match_records(records)
+        )
+
+    @staticmethod
+    def _revert_conflicting_entries(
+        assignments: list[tuple[int, GateEvent, ParkingSpace]],
+        records: list[ParkingRecord],
+        conflicts: set[str],
+        results: list
+    ) -> tuple[list[tuple[int, GateEvent, ParkingSpace]], list[ParkingRecord]]:
+        """撤销未能登记在场的入场记录（删除记录、释放车位），返回其余的分配和记录"""
+        parked_lots = ActiveParkingService.get_parked_lots(conflicts)
+        kept_assignments, kept_records, reverted = [], [], []
+        for assignment, record in zip(assignments, records):
+            index, event, space = assignment
+            if event.license_plate not in conflicts:
+                kept_assignments.append(assignment)
+                kept_records.append(record)
+                continue
+            reverted.append(record)
+            results[index] = EntryResult(
+                success=False,
+                message=f'车辆已在 {parked_lots.get(event.license_plate, "")} 停车',
+                error_code='vehicle_already_parked'
+            )
+
+        ParkingRecord.objects.filter(pk__in=[record.pk for record in reverted]).delete()
+        released: dict[int, list[int]] = {}
+        for record in reverted:
+            released.setdefault(record.parking_lot_id, []).append(record.parking_space_id)
+        for lot_id, space_ids in released.items():
+            count = ParkingSpace.objects.filter(
+                pk__in=space_ids, is_occupied=True
+            ).update(is_occupied=False, updated_at=timezone.now())
+            OccupancyService.adjust(lot_id, occupied=-count)
+            SpaceAllocator.release(lot_id, space_ids)
+        return kept_assignments, kept_records
+
     @staticmethod
     def query_vehicle_status(license_plate: str) -> dict[str, Any]:
         """
@@ -330,36 +768,30 @@ class ParkingRecordService:
         """
         normalized_plate = license_plate.upper().strip()
         
-        # 查询在场记录（优化：使用select_related避免N+1查询）
-        active_record = ParkingRecord.objects.filter(
-            vehicle__license_plate=normalized_plate,
-            exit_time__isnull=True
-        ).select_related(
-            'vehicle', 'parking_space', 'parking_space__parking_lot'
-        ).first()
-        
-        if active_record:
-            # 计算当前费用
-            current_fee = active_record.calculate_fee()
-            duration = timezone.now() - active_record.entry_time
+        # 查询在场记录（在场车辆表按车牌主键读取），费用使用缓存的报价
+        record_id = ActiveParkingService.get_record_id(normalized_plate)
+        quote = FeeQuoteService.get_quote(normalized_plate, record_id) if record_id else None
+        
+        if quote:
+            duration = timezone.now() - quote.entry_time
             duration_minutes = int(duration.total_seconds() / 60)
             
             result = {
                 'found': True,
                 'is_parked': True,
                 'license_plate': normalized_plate,
-                'parking_lot': active_record.parking_space.parking_lot.name,
-                'space_number': active_record.parking_space.space_number,
-                'entry_time': active_record.entry_time,
+                'parking_lot': quote.parking_lot,
+                'space_number': quote.space_number,
+                'entry_time': quote.entry_time,
                 'duration_minutes': duration_minutes,
-                'current_fee': current_fee,
-                'record_id': active_record.id,
+                'current_fee': quote.fee,
+                'record_id': quote.record_id,
             }
             # 添加楼层和区域信息（如果存在）
-            if active_record.parking_space.floor:
-                result['floor'] = active_record.parking_space.floor
-            if active_record.parking_space.area:
-                result['area'] = active_record.parking_space.area
+            if quote.floor:
+                result['floor'] = quote.floor
+            if quote.area:
+                result['area'] = quote.area
             return result
         
         # 查询车辆是否存在
@@ -427,7 +859,7 @@ class ParkingRecordService:
         
         # 停车场筛选
         if parking_lot_id:
-            queryset = queryset.filter(parking_space__parking_lot_id=parking_lot_id)
+            queryset = queryset.filter(parking_lot_id=parking_lot_id)
         
         # 状态筛选
         if status == 'active':
@@ -497,9 +929,9 @@ class ParkingRecordService:
             operator_id=operator_id
         )
         
-        # 清除相关缓存
+        # 事务提交后就地更新仪表盘缓存
         from parking.services.dashboard_service import DashboardService
-        DashboardService.invalidate_cache()
+        DashboardService.record_entries([record])
         
         logger.info(
             "车辆 %s 入场，车位: %s",
@@ -545,9 +977,9 @@ class ParkingRecordService:
         parking_space.is_occupied = False
         parking_space.save(update_fields=['is_occupied', 'updated_at'])
         
-        # 清除相关缓存
+        # 事务提交后就地更新仪表盘缓存
         from parking.services.dashboard_service import DashboardService
-        DashboardService.invalidate_cache()
+        DashboardService.record_exits([locked_record])
         
         logger.info(
             "车辆 %s 出场，费用: %s元，时长: %s分钟",
@@ -577,7 +1009,7 @@ class ParkingRecordService:
         Returns:
             dict[str, Any]: 统计数据字典
         """
-        from django.db.models import Count, Q, Sum
+        from django.db.models import Count, Q
         
         today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
         today_records = ParkingRecord.objects.filter(entry_time__gte=today_start)
@@ -3,10 +3,8 @@
 
 从 parking.services 迁移
 """
-from django.db.models import Count, Q, QuerySet
-
-from parking.models.parking_lot import ParkingLot
 from parking.models.parking_space import ParkingSpace
+from parking.services.occupancy_service import OccupancyService
 
 
 class ParkingSpaceService:
@@ -39,7 +37,7 @@ class ParkingSpaceService:
     @staticmethod
     def get_space_statistics(lot_ids: list[int]) -> dict[str, int]:
         """
-        获取多个停车场的车位统计信息（优化：使用aggregate合并查询）
+        获取多个停车场的车位统计信息（读取占用计数，不统计车位表）
         
         Args:
             lot_ids: 停车场ID列表
@@ -47,24 +45,7 @@ class ParkingSpaceService:
         Returns:
             dict: 统计信息，包含total、occupied、available
         """
-        from django.db.models import Count, Q
-        
-        # 优化：使用aggregate合并统计查询，减少数据库访问
         if not lot_ids:
             return {'total': 0, 'occupied': 0, 'available': 0}
         
-        stats = ParkingSpace.objects.filter(
-            parking_lot_id__in=lot_ids
-        ).aggregate(
-            total=Count('id'),
-            occupied=Count('id', filter=Q(is_occupied=True))
-        )
-        
-        total = stats['total'] or 0
-        occupied = stats['occupied'] or 0
-        
-        return {
-            'total': total,
-            'occupied': occupied,
-            'available': max(0, total - occupied)
-        }
+        return OccupancyService.get_totals(lot_ids)
@@ -0,0 +1,220 @@
+"""
+车牌地址解析服务
+
+车牌前缀（省份简称+地级市代号）→ 地区 是由 init_license_plate_data 导入的静态表，
+只有几百条。本服务将其整体加载为进程内只读映射（首次使用时加载），
+单个和批量解析都只做字典查找，不再逐条查询数据库。
+
+- Province/City/LicensePlateLocation 变更时由信号清除映射，
+  各进程通过共享版本号在下次读取时重新加载
+- backfill_records 按主键分块回填历史停车记录的车牌地址字段
+"""
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from django.db import transaction
+from loguru import logger
+
+from infra.cache import ProcessCache
+from parking.license_plate_models import LicensePlateLocation
+
+_location_cache = ProcessCache('plate_locations')
+_MAP_KEY = 'prefix_map'
+
+# 回填历史记录的默认分块大小
+BACKFILL_CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class PlateLocation:
+    """车牌前缀对应的地区信息（不可变）"""
+    prefix: str
+    province_code: str
+    province_name: str
+    city_code: str
+    city_name: str
+    description: str = ''
+
+    def as_dict(self) -> dict[str, str]:
+        """转换为 LicensePlateLocation.get_location_by_plate 的返回格式"""
+        return {
+            'province_code': self.province_code,
+            'province_name': self.province_name,
+            'city_code': self.city_code,
+            'city_name': self.city_name,
+            'prefix': self.prefix,
+            'description': self.description,
+        }
+
+    def record_fields(self) -> dict[str, str]:
+        """停车记录上的车牌地址字段"""
+        return {
+            'plate_province_code': self.province_code,
+            'plate_province_name': self.province_name,
+            'plate_city_code': self.city_code,
+            'plate_city_name': self.city_name,
+        }
+
+
+class PlateLocationService:
+    """
+    车牌地址解析服务类
+
+    提供基于进程内前缀映射的单个/批量车牌地址解析。
+    """
+
+    @staticmethod
+    def get_prefix_map() -> MappingProxyType:
+        """
+        获取车牌前缀映射（进程内缓存，只读）
+
+        Returns:
+            MappingProxyType: 车牌前缀 → PlateLocation
+        """
+        return _location_cache.get(_MAP_KEY, PlateLocationService._load_prefix_map)
+
+    @staticmethod
+    def lookup(license_plate: str) -> PlateLocation | None:
+        """
+        解析单个车牌
+
+        Args:
+            license_plate: 完整车牌号，如：粤E9KM03
+
+        Returns:
+            PlateLocation | None: 地区信息，未知前缀返回 None
+        """
+        if not license_plate or len(license_plate) < 2:
+            return None
+        return PlateLocationService.get_prefix_map().get(license_plate[:2].upper())
+
+    @staticmethod
+    def resolve(license_plate: str) -> dict[str, str]:
+        """
+        解析单个车牌（返回格式与 LicensePlateLocation.get_location_by_plate 一致）
+
+        Args:
+            license_plate: 完整车牌号
+
+        Returns:
+            dict: 地区信息，未知前缀返回空字典
+        """
+        location = PlateLocationService.lookup(license_plate)
+        return location.as_dict() if location else {}
+
+    @staticmethod
+    def resolve_many(license_plates: Iterable[str]) -> dict[str, PlateLocation]:
+        """
+        批量解析车牌（用于导入和批量入场）
+
+        Args:
+            license_plates: 车牌号列表
+
+        Returns:
+            dict[str, PlateLocation]: 车牌号 → 地区信息（不包含未知前缀的车牌）
+        """
+        prefix_map = PlateLocationService.get_prefix_map()
+        result = {}
+        for plate in license_plates:
+            if plate and len(plate) >= 2:
+                location = prefix_map.get(plate[:2].upper())
+                if location:
+                    result[plate] = location
+        return result
+
+    @staticmethod
+    def backfill_records(
+        chunk_size: int = BACKFILL_CHUNK_SIZE,
+        overwrite: bool = False,
+        dry_run: bool = False,
+        progress: Callable[[int, int], None] | None = None
+    ) -> dict[str, int]:
+        """
+        分块回填历史停车记录的车牌地址字段
+
+        按主键顺序分块读取（keyset 分页），每块按前缀分组后批量更新，
+        每块一个事务，可中断后重复执行。
+
+        Args:
+            chunk_size: 每块记录数
+            overwrite: 是否覆盖已有地址信息（默认只处理省份简称为空的记录）
+            dry_run: 只统计不写入
+            progress: 进度回调 (已扫描数, 已更新数)
+
+        Returns:
+            dict: scanned（扫描数）、updated（更新数）、unknown（未知前缀数）
+        """
+        from parking.models.parking_record import ParkingRecord
+
+        prefix_map = PlateLocationService.get_prefix_map()
+        queryset = ParkingRecord.objects.all()
+        if not overwrite:
+            queryset = queryset.filter(plate_province_code='')
+
+        stats = {'scanned': 0, 'updated': 0, 'unknown': 0}
+        last_id = 0
+
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last_id).order_by('pk').values_list(
+                    'pk', 'vehicle__license_plate'
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            groups: dict[PlateLocation, list[int]] = defaultdict(list)
+            for record_id, plate in rows:
+                location = prefix_map.get((plate or '')[:2].upper())
+                if location is None:
+                    stats['unknown'] += 1
+                else:
+                    groups[location].append(record_id)
+
+            if not dry_run:
+                with transaction.atomic():
+                    for location, record_ids in groups.items():
+                        ParkingRecord.objects.filter(pk__in=record_ids).update(
+                            **location.record_fields()
+                        )
+
+            stats['scanned'] += len(rows)
+            stats['updated'] += sum(len(ids) for ids in groups.values())
+            if progress:
+                progress(stats['scanned'], stats['updated'])
+
+        logger.info(
+            "车牌地址回填完成: 扫描={}, 更新={}, 未知前缀={}, dry_run={}",
+            stats['scanned'], stats['updated'], stats['unknown'], dry_run
+        )
+        return stats
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """清除车牌前缀映射，下次读取时重新加载"""
+        _location_cache.invalidate()
+
+    @staticmethod
+    def _load_prefix_map() -> MappingProxyType:
+        rows = LicensePlateLocation.objects.values_list(
+            'license_plate_prefix',
+            'province__code', 'province__name',
+            'city__code', 'city__name',
+            'description'
+        )
+        prefix_map = {
+            prefix: PlateLocation(
+                prefix=prefix,
+                province_code=province_code,
+                province_name=province_name,
+                city_code=city_code,
+                city_name=city_name,
+                description=description,
+            )
+            for prefix, province_code, province_name, city_code, city_name, description in rows
+        }
+        logger.debug("加载车牌前缀映射: {} 个前缀", len(prefix_map))
+        return MappingProxyType(prefix_map)
@@ -0,0 +1,277 @@
+"""
+停车位分配服务
+
+为每个停车场在进程内维护一份空闲车位表（free list），
+入场自动分配时 O(1) 取出候选车位，再通过条件更新在数据库中占用，
+避免并发入场时所有道闸都在同一批低编号车位上排队加锁。
+
+空闲表只是候选集合，数据库中的 is_occupied/is_reserved 才是权威状态：
+- 条件更新失败（候选已被其他进程占用）视为漂移，累计到阈值后重建
+- 空闲表耗尽或超过最大存活时间时，从 ParkingSpace 重建
+"""
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+from loguru import logger
+
+from parking.models.parking_space import ParkingSpace
+from parking.services.occupancy_service import OccupancyService
+
+# 空闲表最大存活时间（秒），超过后下次分配时重建
+POOL_MAX_AGE = 300
+# 条件更新失败次数达到该值时重建空闲表
+POOL_DRIFT_THRESHOLD = 8
+
+
+@dataclass
+class _FreePool:
+    """单个停车场的空闲车位表"""
+    queue: deque = field(default_factory=deque)
+    members: set = field(default_factory=set)
+    built_at: float = 0.0
+    misses: int = 0
+
+    def push(self, space_id: int) -> None:
+        if space_id not in self.members:
+            self.members.add(space_id)
+            self.queue.append(space_id)
+
+    def pop(self) -> int | None:
+        while self.queue:
+            space_id = self.queue.popleft()
+            if space_id in self.members:
+                self.members.discard(space_id)
+                return space_id
+        return None
+
+    def discard(self, space_id: int) -> None:
+        # 队列中的残留项在 pop 时按 members 过滤
+        self.members.discard(space_id)
+
+    def is_stale(self) -> bool:
+        return (
+            time.monotonic() - self.built_at > POOL_MAX_AGE
+            or self.misses >= POOL_DRIFT_THRESHOLD
+        )
+
+
+class SpaceAllocator:
+    """
+    停车位分配器
+
+    所有方法需在事务内调用（占用通过条件 UPDATE 完成，随事务提交或回滚）。
+    其他原因回滚导致的空闲表与数据库不一致由漂移检测和定期重建修复。
+    """
+
+    _pools: dict[int, _FreePool] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def allocate(cls, parking_lot_id: int) -> ParkingSpace | None:
+        """
+        为停车场自动分配一个车位并标记为已占用
+
+        Args:
+            parking_lot_id: 停车场ID
+
+        Returns:
+            ParkingSpace | None: 已占用的车位，无可用车位时返回 None
+        """
+        spaces = cls.allocate_many(parking_lot_id, 1)
+        return spaces[0] if spaces else None
+
+    @classmethod
+    def allocate_many(cls, parking_lot_id: int, count: int) -> list[ParkingSpace]:
+        """
+        为停车场批量分配车位并标记为已占用
+
+        Args:
+            parking_lot_id: 停车场ID
+            count: 需要的车位数量
+
+        Returns:
+            list[ParkingSpace]: 已占用的车位（可能少于 count）
+        """
+        claimed: list[ParkingSpace] = []
+        rebuilt = False
+
+        while len(claimed) < count:
+            candidates = cls._take(parking_lot_id, count - len(claimed))
+            if not candidates:
+                if rebuilt:
+                    break
+                cls.rebuild(parking_lot_id)
+                rebuilt = True
+                continue
+
+            spaces = list(
+                ParkingSpace.objects.select_for_update(
+                    skip_locked=True
+                ).filter(
+                    pk__in=candidates,
+                    parking_lot_id=parking_lot_id,
+                    is_occupied=False,
+                    is_reserved=False
+                )
+            )
+            if spaces:
+                spaces = cls.occupy(spaces)
+                claimed.extend(spaces)
+
+            misses = len(candidates) - len(spaces)
+            if misses:
+                cls._record_misses(parking_lot_id, misses)
+
+        return claimed
+
+    @classmethod
+    def occupy(cls, spaces: list[ParkingSpace]) -> list[ParkingSpace]:
+        """
+        条件更新占用车位（只占用仍为空闲且未预留的车位），并从空闲表移除
+
+        先整批条件更新；更新行数与车位数不一致时（车位已被其他事务占用，
+        例如 SQLite 上 select_for_update 不加锁）回滚该次更新，逐个条件更新以确定实际占用的车位。
+
+        Args:
+            spaces: 候选停车位列表
+
+        Returns:
+            list[ParkingSpace]: 实际占用的车位
+        """
+        now = timezone.now()
+        available = ParkingSpace.objects.filter(is_occupied=False, is_reserved=False)
+
+        savepoint = transaction.savepoint()
+        updated = available.filter(
+            pk__in=[space.pk for space in spaces]
+        ).update(is_occupied=True, updated_at=now)
+        if updated == len(spaces):
+            transaction.savepoint_commit(savepoint)
+            occupied = list(spaces)
+        else:
+            transaction.savepoint_rollback(savepoint)
+            occupied = [
+                space for space in spaces
+                if available.filter(pk=space.pk).update(is_occupied=True, updated_at=now)
+            ]
+
+        with cls._lock:
+            for space in spaces:
+                pool = cls._pools.get(space.parking_lot_id)
+                if pool is not None:
+                    pool.discard(space.pk)
+        OccupancyService.mark_spaces(occupied, occupied=True)
+        return occupied
+
+    @classmethod
+    def release(cls, parking_lot_id: int, space_ids, immediate: bool = False) -> None:
+        """
+        车位释放后放回空闲表（默认在事务提交后生效）
+
+        Args:
+            parking_lot_id: 停车场ID
+            space_ids: 停车位ID或ID列表
+            immediate: 立即放回（用于撤销本事务中的占用：事务回滚时 on_commit 不会执行）
+        """
+        if isinstance(space_ids, int):
+            space_ids = [space_ids]
+        space_ids = list(space_ids)
+
+        def push():
+            with cls._lock:
+                pool = cls._pools.get(parking_lot_id)
+                if pool is None:
+                    return
+                for space_id in space_ids:
+                    pool.push(space_id)
+
+        if immediate:
+            push()
+        else:
+            transaction.on_commit(push)
+
+    @classmethod
+    def discard(cls, parking_lot_id: int, space_id: int) -> None:
+        """从空闲表移除车位（车位被占用、预留或删除时调用）"""
+        with cls._lock:
+            pool = cls._pools.get(parking_lot_id)
+            if pool is not None:
+                pool.discard(space_id)
+
+    @classmethod
+    def rebuild(cls, parking_lot_id: int) -> int:
+        """
+        从数据库重建停车场的空闲表
+
+        Args:
+            parking_lot_id: 停车场ID
+
+        Returns:
+            int: 空闲车位数量
+        """
+        space_ids = list(
+            ParkingSpace.objects.filter(
+                parking_lot_id=parking_lot_id,
+                is_occupied=False,
+                is_reserved=False
+            ).values_list('pk', flat=True)
+        )
+        # 打乱顺序，使多个进程的候选车位错开
+        random.shuffle(space_ids)
+
+        pool = _FreePool(
+            queue=deque(space_ids),
+            members=set(space_ids),
+            built_at=time.monotonic(),
+        )
+        with cls._lock:
+            cls._pools[parking_lot_id] = pool
+
+        logger.debug("重建空闲车位表: 停车场={}, 空闲车位={}", parking_lot_id, len(space_ids))
+        return len(space_ids)
+
+    @classmethod
+    def invalidate(cls, parking_lot_id: int | None = None) -> None:
+        """
+        丢弃空闲表，下次分配时重建
+
+        Args:
+            parking_lot_id: 停车场ID，为 None 时丢弃全部
+        """
+        with cls._lock:
+            if parking_lot_id is None:
+                cls._pools.clear()
+            else:
+                cls._pools.pop(parking_lot_id, None)
+
+    @classmethod
+    def _take(cls, parking_lot_id: int, count: int) -> list[int]:
+        """从空闲表取出候选车位ID，空闲表不存在或已过期时先重建"""
+        with cls._lock:
+            pool = cls._pools.get(parking_lot_id)
+        if pool is None or pool.is_stale():
+            cls.rebuild(parking_lot_id)
+
+        with cls._lock:
+            pool = cls._pools.get(parking_lot_id)
+            candidates = []
+            while pool is not None and len(candidates) < count:
+                space_id = pool.pop()
+                if space_id is None:
+                    break
+                candidates.append(space_id)
+        return candidates
+
+    @classmethod
+    def _record_misses(cls, parking_lot_id: int, misses: int) -> None:
+        with cls._lock:
+            pool = cls._pools.get(parking_lot_id)
+            if pool is not None:
+                pool.misses += misses
+                if pool.misses >= POOL_DRIFT_THRESHOLD:
+                    logger.info("空闲车位表漂移，将重建: 停车场={}", parking_lot_id)
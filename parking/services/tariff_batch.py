@@ -0,0 +1,98 @@
+"""
+批量计费（NumPy 向量化）
+
+对一批停车时长一次性求值编译费率，结果与 CompiledTariff.evaluate 逐条计算完全一致
+（整数分运算，舍入规则相同）。用于历史记录的费率调整试算等批量场景。
+
+本模块依赖 NumPy，只在批量计算处按需导入，不在 parking.services 中导出，
+避免所有进程启动时加载 NumPy。
+"""
+from collections.abc import Sequence
+
+import numpy as np
+
+from parking.services.tariff_service import CompiledTariff, to_cents
+
+
+def _ceil_hours(minutes: np.ndarray) -> np.ndarray:
+    """分钟数按小时向上取整"""
+    return -(-minutes // 60)
+
+
+def _base_fee_cents(tariff: CompiledTariff, seconds: np.ndarray) -> np.ndarray:
+    """计算折扣和上限之前的费用（分），对应 CompiledTariff.base_fee_cents"""
+    if tariff.charge_type != 'tiered':
+        duration_hours = seconds / 3600
+        hours = np.trunc(duration_hours) + (np.mod(duration_hours, 1) > 0)
+        return hours.astype(np.int64) * tariff.hourly_rate_cents
+
+    minutes = np.trunc(seconds / 60).astype(np.int64)
+    free_minutes = tariff.free_minutes
+    charged = minutes > free_minutes
+
+    if not tariff.rules:
+        return np.where(charged, _ceil_hours(minutes) * tariff.hourly_rate_cents, 0)
+
+    total = np.zeros_like(minutes)
+    remaining = minutes - free_minutes
+
+    for rule in tariff.rules:
+        rule_start = max(0, rule.start_minutes - free_minutes)
+
+        if rule.end_minutes is None:
+            # 无上限，剩余时长全部按此费率计算（之后的规则不再生效）
+            total += np.where(remaining > 0, _ceil_hours(remaining) * rule.rate_cents, 0)
+            break
+
+        rule_end = rule.end_minutes - free_minutes
+        applicable = np.minimum(remaining, rule_end) - rule_start
+        # remaining <= rule_start 的行 applicable <= 0，不计费
+        applicable = np.where(applicable > 0, applicable, 0)
+        total += _ceil_hours(applicable) * rule.rate_cents
+        remaining -= applicable
+
+    return np.where(charged, total, 0)
+
+
+def evaluate_batch(
+    tariff: CompiledTariff,
+    durations: Sequence[float] | np.ndarray,
+    discount_rates: Sequence | np.ndarray | None = None,
+    free_mask: Sequence[bool] | np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    批量计算停车费用
+
+    Args:
+        tariff: 编译后的费率
+        durations: 停车时长（秒，即 timedelta.total_seconds()）
+        discount_rates: VIP 折扣率（1.00 免费，0.50 半价，非 VIP 为 0），
+            可以是 Decimal/float 序列或整数分数组，为 None 表示均无折扣
+        free_mask: 免费停车标记（VIP/员工车辆），为 True 的记录费用为 0
+
+    Returns:
+        np.ndarray: 费用（分，int64），与 durations 等长
+    """
+    seconds = np.asarray(durations, dtype=np.float64)
+    # 以万分之一元为单位，保证折扣后的比较和舍入与逐条计算一致
+    scaled = _base_fee_cents(tariff, seconds) * 100
+
+    if discount_rates is not None:
+        discount_cents = np.asarray(discount_rates)
+        if discount_cents.dtype.kind not in 'iu':
+            discount_cents = np.fromiter(
+                (to_cents(rate or 0) for rate in discount_cents),
+                dtype=np.int64,
+                count=len(discount_cents)
+            )
+        scaled = scaled * (100 - discount_cents) // 100
+
+    if tariff.daily_max_cents:
+        scaled = np.minimum(scaled, tariff.daily_max_cents * 100)
+
+    cents, remainder = np.divmod(scaled, 100)
+    cents += (remainder > 50) | ((remainder == 50) & (cents % 2 == 1))
+
+    if free_mask is not None:
+        cents = np.where(np.asarray(free_mask, dtype=bool), 0, cents)
+    return cents
@@ -0,0 +1,182 @@
+"""
+费率调整试算服务
+
+调整停车场费率配置或费率模板前，按当前费率和待定费率分别重算历史已出场记录的费用，
+比较收入变化。记录按主键分块读取（只取计费所需字段），每块用 NumPy 批量计费，
+不逐条调用 ParkingRecord.calculate_fee，也不写数据库。
+
+VIP 折扣和免费标记使用记录上保存的 discount_rate / is_free_parking，
+即按记录当时的 VIP 身份计费。
+"""
+from collections.abc import Callable, Iterator
+from datetime import datetime
+
+import numpy as np
+from loguru import logger
+
+from parking.models import ParkingRecord
+from parking.services.tariff_batch import evaluate_batch
+from parking.services.tariff_service import CompiledTariff, TariffService, cents_to_decimal
+
+# 每块读取的记录数
+CHUNK_SIZE = 5000
+
+# 停车时长分段（小时，左闭右开），最后一段无上限
+DURATION_BUCKETS = (0, 1, 3, 6, 12, 24)
+
+
+def _bucket_label(index: int) -> str:
+    start = DURATION_BUCKETS[index]
+    if index + 1 < len(DURATION_BUCKETS):
+        return f'{start}-{DURATION_BUCKETS[index + 1]}小时'
+    return f'{start}小时以上'
+
+
+class TariffImpactService:
+    """
+    费率调整试算服务类
+    """
+
+    @staticmethod
+    def iter_chunks(
+        parking_lot_id: int,
+        start: datetime,
+        end: datetime,
+        chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """
+        按主键分块读取停车场在时间范围内出场的记录
+
+        Args:
+            parking_lot_id: 停车场ID
+            start: 出场时间起点（包含）
+            end: 出场时间终点（不包含）
+            chunk_size: 每块记录数
+
+        Yields:
+            dict: durations（秒）、discount_cents、is_free、recorded_cents 四个等长数组
+        """
+        queryset = ParkingRecord.objects.filter(
+            parking_lot_id=parking_lot_id,
+            exit_time__gte=start,
+            exit_time__lt=end,
+        ).order_by('pk')
+
+        last_pk = 0
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last_pk).values_list(
+                    'pk', 'entry_time', 'exit_time', 'discount_rate', 'is_free_parking', 'fee'
+                )[:chunk_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+
+            yield {
+                'durations': np.fromiter(
+                    ((exit_time - entry_time).total_seconds() for _, entry_time, exit_time, *_ in rows),
+                    dtype=np.float64,
+                    count=len(rows)
+                ),
+                'discount_cents': np.fromiter(
+                    (int(row[3] * 100) for row in rows), dtype=np.int64, count=len(rows)
+                ),
+                'is_free': np.fromiter((row[4] for row in rows), dtype=bool, count=len(rows)),
+                'recorded_cents': np.fromiter(
+                    (int((row[5] or 0) * 100) for row in rows), dtype=np.int64, count=len(rows)
+                ),
+            }
+
+            if len(rows) < chunk_size:
+                return
+
+    @staticmethod
+    def compare(
+        parking_lot_id: int,
+        proposed: CompiledTariff,
+        start: datetime,
+        end: datetime,
+        current: CompiledTariff | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        progress: Callable[[int], None] | None = None
+    ) -> dict:
+        """
+        比较当前费率和待定费率在历史记录上的收入
+
+        Args:
+            parking_lot_id: 停车场ID
+            proposed: 待定费率（见 TariffService.compile_proposal）
+            start: 出场时间起点（包含）
+            end: 出场时间终点（不包含）
+            current: 当前费率，默认为停车场的编译费率
+            chunk_size: 每块记录数
+            progress: 每处理完一块后调用，参数为已处理记录数
+
+        Returns:
+            dict: 记录数、当前/待定/实收金额（Decimal）、差额、涨跌记录数、按时长分段的汇总
+        """
+        if current is None:
+            current = TariffService.get_tariff(parking_lot_id)
+
+        bucket_edges = np.array(DURATION_BUCKETS[1:], dtype=np.float64) * 3600
+        bucket_count = len(DURATION_BUCKETS)
+        buckets = np.zeros((bucket_count, 3), dtype=np.int64)  # 记录数、当前、待定
+
+        records = current_total = proposed_total = recorded_total = 0
+        increased = decreased = 0
+
+        for chunk in TariffImpactService.iter_chunks(parking_lot_id, start, end, chunk_size):
+            durations = chunk['durations']
+            current_fees = evaluate_batch(
+                current, durations, chunk['discount_cents'], chunk['is_free']
+            )
+            proposed_fees = evaluate_batch(
+                proposed, durations, chunk['discount_cents'], chunk['is_free']
+            )
+
+            records += len(durations)
+            current_total += int(current_fees.sum())
+            proposed_total += int(proposed_fees.sum())
+            recorded_total += int(chunk['recorded_cents'].sum())
+            increased += int(np.count_nonzero(proposed_fees > current_fees))
+            decreased += int(np.count_nonzero(proposed_fees < current_fees))
+
+            bucket_index = np.searchsorted(bucket_edges, durations, side='right')
+            buckets[:, 0] += np.bincount(bucket_index, minlength=bucket_count)
+            buckets[:, 1] += np.bincount(bucket_index, weights=current_fees, minlength=bucket_count).astype(np.int64)
+            buckets[:, 2] += np.bincount(bucket_index, weights=proposed_fees, minlength=bucket_count).astype(np.int64)
+
+            if progress is not None:
+                progress(records)
+
+        logger.info(
+            "费率调整试算: 停车场={}, 记录数={}, 当前={}, 待定={}",
+            parking_lot_id, records, current_total, proposed_total
+        )
+
+        difference = proposed_total - current_total
+        return {
+            'parking_lot_id': parking_lot_id,
+            'start': start,
+            'end': end,
+            'current_version': current.version,
+            'proposed_version': proposed.version,
+            'records': records,
+            'recorded_revenue': cents_to_decimal(recorded_total),
+            'current_revenue': cents_to_decimal(current_total),
+            'proposed_revenue': cents_to_decimal(proposed_total),
+            'difference': cents_to_decimal(difference),
+            'difference_percent': round(difference * 100 / current_total, 2) if current_total else None,
+            'increased': increased,
+            'decreased': decreased,
+            'buckets': [
+                {
+                    'label': _bucket_label(index),
+                    'records': int(count),
+                    'current_revenue': cents_to_decimal(int(current_fee)),
+                    'proposed_revenue': cents_to_decimal(int(proposed_fee)),
+                }
+                for index, (count, current_fee, proposed_fee) in enumerate(buckets)
+            ],
+        }
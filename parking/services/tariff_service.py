@@ -0,0 +1,397 @@
+"""
+费率编译服务
+
+将停车场的费率配置（ParkingLotPricing + PricingTemplate/PricingRule）编译为
+不可变的费率对象 CompiledTariff，金额统一使用整数分计算，按停车场缓存在进程内。
+计费时直接对编译结果求值，不再访问数据库。
+
+计费规则与 ParkingRecord.calculate_fee 原有实现保持一致：
+- 固定收费：按小时向上取整 × 停车场小时费率（不扣除免费时长）
+- 阶梯收费：免费时长内免费；无规则时按小时向上取整 × 停车场小时费率；
+  有规则时按起始分钟排序，逐段按小时向上取整计费
+- VIP 折扣后再应用每日收费上限，最后四舍六入五成双到分
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from loguru import logger
+
+from infra.cache import ProcessCache
+from parking.models.parking_lot import ParkingLot
+from parking.pricing_models import ParkingLotPricing, PricingTemplate
+
+# 未配置免费时长时的默认值（分钟）
+DEFAULT_FREE_MINUTES = 15
+
+_tariff_cache = ProcessCache('tariff')
+
+
+def to_cents(value) -> int:
+    """
+    金额转换为整数分
+
+    Args:
+        value: 金额（Decimal/float/int/str）
+
+    Returns:
+        int: 分
+    """
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+    """整数分转换为两位小数的 Decimal"""
+    return Decimal(cents).scaleb(-2)
+
+
+def _ceil_hours(minutes: int) -> int:
+    """分钟数按小时向上取整"""
+    return -(-minutes // 60)
+
+
+@dataclass(frozen=True)
+class TariffRule:
+    """编译后的阶梯费率规则"""
+    start_minutes: int
+    end_minutes: int | None
+    rate_cents: int
+
+
+@dataclass(frozen=True)
+class CompiledTariff:
+    """
+    编译后的停车场费率（不可变）
+
+    version 为费率参数的内容哈希，费率参数不变时版本号不变。
+    """
+    charge_type: str  # fixed / tiered
+    hourly_rate_cents: int
+    free_minutes: int
+    rules: tuple[TariffRule, ...]
+    daily_max_cents: int | None
+    version: str
+    parking_lot_id: int | None = None
+
+    @classmethod
+    def build(
+        cls,
+        charge_type: str,
+        hourly_rate,
+        free_minutes: int = DEFAULT_FREE_MINUTES,
+        rules=(),
+        daily_max_fee=None,
+        parking_lot_id: int | None = None
+    ) -> 'CompiledTariff':
+        """
+        由费率参数构建编译后的费率
+
+        Args:
+            charge_type: 收费类型（fixed/tiered，其他值按 fixed 处理）
+            hourly_rate: 停车场小时费率（元）
+            free_minutes: 免费时长（分钟）
+            rules: 阶梯规则（dict，含 start_minutes/end_minutes/rate_per_hour）
+            daily_max_fee: 每日收费上限（元），为空或 0 表示不设上限
+            parking_lot_id: 停车场ID
+
+        Returns:
+            CompiledTariff: 编译后的费率
+        """
+        charge_type = 'tiered' if charge_type == 'tiered' else 'fixed'
+        compiled_rules = tuple(
+            TariffRule(
+                start_minutes=int(rule['start_minutes']),
+                end_minutes=int(rule['end_minutes']) if rule.get('end_minutes') else None,
+                rate_cents=to_cents(rule['rate_per_hour']),
+            )
+            # sorted 为稳定排序，起始分钟相同时保持原有顺序
+            for rule in sorted(rules, key=lambda x: x['start_minutes'])
+        ) if charge_type == 'tiered' else ()
+        hourly_rate_cents = to_cents(hourly_rate or 0)
+        daily_max_cents = to_cents(daily_max_fee) if daily_max_fee else None
+
+        params = (charge_type, hourly_rate_cents, free_minutes, compiled_rules, daily_max_cents)
+        version = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+        return cls(
+            charge_type=charge_type,
+            hourly_rate_cents=hourly_rate_cents,
+            free_minutes=free_minutes,
+            rules=compiled_rules,
+            daily_max_cents=daily_max_cents,
+            version=version,
+            parking_lot_id=parking_lot_id,
+        )
+
+    def base_fee_cents(self, duration: timedelta) -> int:
+        """
+        计算折扣和上限之前的费用
+
+        Args:
+            duration: 停车时长
+
+        Returns:
+            int: 费用（分）
+        """
+        if self.charge_type != 'tiered':
+            duration_hours = duration.total_seconds() / 3600
+            hours = int(duration_hours) + (1 if duration_hours % 1 > 0 else 0)
+            return hours * self.hourly_rate_cents
+
+        duration_minutes = int(duration.total_seconds() / 60)
+        return self.tiered_fee_cents(duration_minutes)
+
+    def tiered_fee_cents(self, duration_minutes: int) -> int:
+        """
+        按阶梯规则计算费用
+
+        Args:
+            duration_minutes: 停车时长（分钟）
+
+        Returns:
+            int: 费用（分）
+        """
+        free_minutes = self.free_minutes
+        if duration_minutes <= free_minutes:
+            return 0
+
+        if not self.rules:
+            return _ceil_hours(duration_minutes) * self.hourly_rate_cents
+
+        total = 0
+        remaining_minutes = duration_minutes - free_minutes
+
+        for rule in self.rules:
+            if remaining_minutes <= 0:
+                break
+
+            rule_start = max(0, rule.start_minutes - free_minutes)
+
+            if rule.end_minutes is None:
+                # 无上限，全部按此费率计算
+                total += _ceil_hours(remaining_minutes) * rule.rate_cents
+                break
+
+            rule_end = rule.end_minutes - free_minutes
+            if remaining_minutes <= rule_start:
+                continue
+
+            applicable_minutes = min(remaining_minutes, rule_end) - rule_start
+            if applicable_minutes > 0:
+                total += _ceil_hours(applicable_minutes) * rule.rate_cents
+                remaining_minutes -= applicable_minutes
+
+        return total
+
+    def evaluate(self, duration: timedelta, discount_rate: Decimal | None = None) -> Decimal:
+        """
+        计算停车费用
+
+        Args:
+            duration: 停车时长
+            discount_rate: VIP 折扣率（1.00 免费，0.50 半价），非 VIP 为 None
+
+        Returns:
+            Decimal: 费用（元，两位小数）
+        """
+        return cents_to_decimal(self.fee_cents(duration, discount_rate))
+
+    def fee_cents(self, duration: timedelta, discount_rate: Decimal | None = None) -> int:
+        """
+        计算停车费用（整数分）
+
+        Args:
+            duration: 停车时长
+            discount_rate: VIP 折扣率（1.00 免费，0.50 半价），非 VIP 为 None
+
+        Returns:
+            int: 费用（分）
+        """
+        # 以万分之一元为单位，保证折扣后的比较和舍入与 Decimal 计算一致
+        scaled = self.base_fee_cents(duration) * 100
+        if discount_rate is not None:
+            scaled = scaled * (100 - to_cents(discount_rate)) // 100
+
+        if self.daily_max_cents and scaled > self.daily_max_cents * 100:
+            scaled = self.daily_max_cents * 100
+
+        cents, remainder = divmod(scaled, 100)
+        if remainder > 50 or (remainder == 50 and cents % 2):
+            cents += 1
+        return cents
+
+    def next_change(
+        self,
+        duration: timedelta,
+        discount_rate: Decimal | None = None,
+        horizon: timedelta = timedelta(days=1)
+    ) -> timedelta | None:
+        """
+        计算费用下一次变化时的停车时长
+
+        费用是停车时长的阶梯函数：固定收费在整小时之后变化，阶梯收费按整分钟变化。
+        停车时长小于返回值时费用与当前相同。
+
+        Args:
+            duration: 当前停车时长
+            discount_rate: VIP 折扣率，非 VIP 为 None
+            horizon: 最多向后查找的时长
+
+        Returns:
+            timedelta | None: 费用变化时的停车时长，horizon 内不变化时返回 None
+        """
+        current = self.fee_cents(duration, discount_rate)
+        if self.daily_max_cents and current >= self.daily_max_cents:
+            # 已达每日上限，之后不再变化
+            return None
+
+        seconds = max(0, int(duration.total_seconds()))
+        limit = seconds + int(horizon.total_seconds())
+        # 固定收费在整小时之后才计入下一小时，以整小时为界（提前一瞬失效）
+        step = 3600 if self.charge_type != 'tiered' else 60
+        boundary = (seconds // step + 1) * step
+        while boundary <= limit:
+            probe = boundary + 1 if self.charge_type != 'tiered' else boundary
+            if self.fee_cents(timedelta(seconds=probe), discount_rate) != current:
+                return timedelta(seconds=boundary)
+            boundary += step
+        return None
+
+
+class TariffService:
+    """
+    费率服务类
+
+    按停车场缓存编译后的费率，费率模型或停车场变更时由信号清除。
+    """
+
+    @staticmethod
+    def get_tariff(parking_lot_id: int) -> CompiledTariff:
+        """
+        获取停车场的编译费率（进程内缓存）
+
+        Args:
+            parking_lot_id: 停车场ID
+
+        Returns:
+            CompiledTariff: 编译后的费率
+        """
+        return _tariff_cache.get(
+            parking_lot_id,
+            lambda: TariffService.compile_lot(parking_lot_id)
+        )
+
+    @staticmethod
+    def compile_lot(parking_lot_id: int) -> CompiledTariff:
+        """
+        从数据库加载并编译停车场费率
+
+        Args:
+            parking_lot_id: 停车场ID
+
+        Returns:
+            CompiledTariff: 编译后的费率
+        """
+        parking_lot = ParkingLot.objects.get(pk=parking_lot_id)
+        try:
+            pricing_config = ParkingLotPricing.objects.select_related(
+                'template'
+            ).get(parking_lot_id=parking_lot_id)
+        except ParkingLotPricing.DoesNotExist:
+            pricing_config = None
+
+        tariff = TariffService.compile(parking_lot, pricing_config)
+        logger.debug(
+            "编译停车场费率: 停车场={}, 类型={}, 版本={}",
+            parking_lot_id, tariff.charge_type, tariff.version
+        )
+        return tariff
+
+    @staticmethod
+    def compile(parking_lot, pricing_config=None) -> CompiledTariff:
+        """
+        编译费率配置（不写数据库，配置对象可以是未保存的）
+
+        Args:
+            parking_lot: 停车场对象
+            pricing_config: 费率配置对象（可选）
+
+        Returns:
+            CompiledTariff: 编译后的费率
+        """
+        if pricing_config is None:
+            return CompiledTariff.build(
+                'fixed',
+                parking_lot.hourly_rate,
+                parking_lot_id=parking_lot.pk
+            )
+
+        return CompiledTariff.build(
+            pricing_config.charge_type,
+            parking_lot.hourly_rate,
+            free_minutes=pricing_config.get_free_minutes(),
+            rules=pricing_config.get_effective_rules(),
+            daily_max_fee=pricing_config.get_daily_max_fee(),
+            parking_lot_id=parking_lot.pk
+        )
+
+    @staticmethod
+    def compile_proposal(parking_lot, overrides: dict) -> CompiledTariff:
+        """
+        在停车场当前费率配置上叠加待定参数并编译（不写数据库）
+
+        用于调整费率前的试算，未出现在 overrides 中的参数沿用当前配置。
+        与保存后的计费规则一致：选择了模板时，免费时长和每日上限以模板为准。
+
+        Args:
+            parking_lot: 停车场对象
+            overrides: 待定参数，可包含 charge_type、template_id（None 表示不使用模板）、
+                custom_rules、free_minutes、daily_max_fee（为空或 0 表示不设上限）、
+                hourly_rate（停车场小时费率）
+
+        Returns:
+            CompiledTariff: 编译后的费率
+
+        Raises:
+            PricingTemplate.DoesNotExist: 模板不存在
+        """
+        try:
+            current = ParkingLotPricing.objects.get(parking_lot_id=parking_lot.pk)
+        except ParkingLotPricing.DoesNotExist:
+            current = None
+
+        pricing_config = ParkingLotPricing(
+            parking_lot=parking_lot,
+            charge_type=overrides.get(
+                'charge_type', current.charge_type if current else 'fixed'
+            ),
+            template_id=overrides.get(
+                'template_id', current.template_id if current else None
+            ),
+            free_minutes=overrides.get(
+                'free_minutes', current.free_minutes if current else None
+            ),
+            daily_max_fee=overrides.get(
+                'daily_max_fee', current.daily_max_fee if current else None
+            ),
+            custom_rules=overrides.get(
+                'custom_rules', current.custom_rules if current else []
+            ),
+        )
+        if pricing_config.template_id:
+            pricing_config.template = PricingTemplate.objects.get(pk=pricing_config.template_id)
+
+        return CompiledTariff.build(
+            pricing_config.charge_type,
+            overrides.get('hourly_rate') or parking_lot.hourly_rate,
+            free_minutes=pricing_config.get_free_minutes(),
+            rules=pricing_config.get_effective_rules(),
+            daily_max_fee=pricing_config.get_daily_max_fee(),
+            parking_lot_id=parking_lot.pk
+        )
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """清除所有停车场的编译费率（模板可被多个停车场共用）"""
+        _tariff_cache.invalidate()
@@ -0,0 +1,56 @@
+"""
+用户角色服务
+
+按用户缓存 UserProfile.role（共享缓存，同一用户的所有会话共用），
+权限中间件判断重定向时不再逐请求查询用户资料。
+UserProfile 保存/删除时由信号删除对应用户的缓存。
+"""
+from django.core.cache import cache
+
+from parking.user_models import UserProfile
+
+CACHE_KEY_PREFIX = 'parking:user_role:'
+# 角色缓存时间（秒）
+ROLE_TTL = 3600
+# 没有用户资料时的默认角色
+DEFAULT_ROLE = 'customer'
+
+
+def _cache_key(user_id: int) -> str:
+    return f'{CACHE_KEY_PREFIX}{user_id}'
+
+
+class UserRoleService:
+    """
+    用户角色服务类
+    """
+
+    @staticmethod
+    def get_role(user) -> str:
+        """
+        获取用户角色
+
+        Args:
+            user: 已登录用户
+
+        Returns:
+            str: 角色（admin/staff/customer），没有用户资料时为 customer
+        """
+        key = _cache_key(user.pk)
+        role = cache.get(key)
+        if role is None:
+            role = UserProfile.objects.filter(user_id=user.pk).values_list(
+                'role', flat=True
+            ).first() or DEFAULT_ROLE
+            cache.set(key, role, ROLE_TTL)
+        return role
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """
+        删除用户的角色缓存（用户资料变更后调用）
+
+        Args:
+            user_id: 用户ID
+        """
+        cache.delete(_cache_key(user_id))
@@ -7,6 +7,7 @@ from django.db.models import Q, QuerySet
 
 from parking.models.parking_record import ParkingRecord
 from parking.models.vehicle import Vehicle
+from parking.services.active_parking_service import ActiveParkingService
 from parking.services.data_classes import QueryResult
 
 
@@ -91,10 +92,8 @@ class VehicleService:
             tuple: (是否停车, 停车记录)
         """
         try:
-            record = ParkingRecord.objects.filter(
-                vehicle__license_plate=license_plate.upper().strip(),
-                exit_time__isnull=True
-            ).select_related('vehicle', 'parking_space', 'parking_space__parking_lot').first()
+            # 在场车辆表按车牌主键读取
+            record = ActiveParkingService.get_record(license_plate.upper().strip())
             
             return (record is not None, record)
         except Exception:
@@ -0,0 +1,175 @@
+"""
+VIP/员工车辆服务
+
+在进程内维护已启用且未过期的 VIP 车牌索引（车牌 → VIPInfo），
+计费、车辆查询和车辆列表判断 VIP 状态时直接查索引，不再逐行查询 VIPVehicle。
+
+- VIPVehicle 保存/删除时由信号清除索引（跨进程通过共享版本号同步）
+- 日期变化时清理已过期的条目；未到生效日期的条目在查询时按日期判断
+"""
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+
+from django.utils import timezone
+from loguru import logger
+
+from infra.cache import ProcessCache
+from parking.models.vehicle import VIPVehicle
+
+_vip_cache = ProcessCache('vip_index')
+_INDEX_KEY = 'index'
+
+
+@dataclass(frozen=True)
+class VIPInfo:
+    """VIP 车辆信息（索引条目，不可变）"""
+    license_plate: str
+    vip_type: str
+    vip_type_display: str
+    discount_rate: Decimal
+    valid_from: date
+    valid_until: date | None = None
+
+    @property
+    def is_free(self) -> bool:
+        """是否完全免费"""
+        return self.discount_rate >= Decimal('1.00')
+
+    def is_valid_on(self, day: date) -> bool:
+        """指定日期是否在有效期内"""
+        if self.valid_from > day:
+            return False
+        if self.valid_until and self.valid_until < day:
+            return False
+        return True
+
+    @property
+    def is_valid(self) -> bool:
+        """当前是否在有效期内"""
+        return self.is_valid_on(timezone.now().date())
+
+    def get_vip_type_display(self) -> str:
+        """类型显示名称（与 VIPVehicle 保持一致）"""
+        return self.vip_type_display
+
+
+@dataclass
+class _VIPIndex:
+    """VIP 车牌索引"""
+    entries: dict[str, VIPInfo] = field(default_factory=dict)
+    swept_on: date | None = None
+
+    def sweep(self, today: date) -> None:
+        """清理已过期的条目"""
+        expired = [
+            plate for plate, info in self.entries.items()
+            if info.valid_until and info.valid_until < today
+        ]
+        if expired:
+            # 整体替换字典，读取中的线程不受影响
+            self.entries = {
+                plate: info for plate, info in self.entries.items()
+                if plate not in expired
+            }
+            logger.info("VIP索引清理过期车牌: {} 个", len(expired))
+        self.swept_on = today
+
+
+class VIPService:
+    """
+    VIP 服务类
+
+    提供基于进程内索引的 VIP 状态查询。
+    """
+
+    @staticmethod
+    def get_vip_info(license_plate: str) -> VIPInfo | None:
+        """
+        获取车牌的有效 VIP 信息
+
+        Args:
+            license_plate: 车牌号
+
+        Returns:
+            VIPInfo | None: 已启用且在有效期内时返回 VIP 信息，否则返回 None
+        """
+        if not license_plate:
+            return None
+        today = timezone.now().date()
+        info = VIPService._get_index(today).entries.get(license_plate.upper().strip())
+        if info and info.is_valid_on(today):
+            return info
+        return None
+
+    @staticmethod
+    def is_vip(license_plate: str) -> bool:
+        """
+        检查车牌是否为有效的 VIP/免费停车车辆
+
+        Args:
+            license_plate: 车牌号
+
+        Returns:
+            bool: 是否为 VIP
+        """
+        return VIPService.get_vip_info(license_plate) is not None
+
+    @staticmethod
+    def get_vip_map(license_plates) -> dict[str, VIPInfo]:
+        """
+        批量获取车牌的有效 VIP 信息（用于列表）
+
+        Args:
+            license_plates: 车牌号列表
+
+        Returns:
+            dict[str, VIPInfo]: 车牌号 → VIP 信息（仅包含有效 VIP）
+        """
+        today = timezone.now().date()
+        entries = VIPService._get_index(today).entries
+        result = {}
+        for plate in license_plates:
+            info = entries.get(plate)
+            if info and info.is_valid_on(today):
+                result[plate] = info
+        return result
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """清除 VIP 索引，下次查询时重新加载"""
+        _vip_cache.invalidate()
+
+    @staticmethod
+    def _get_index(today: date) -> _VIPIndex:
+        index = _vip_cache.get(_INDEX_KEY, VIPService._load_index)
+        if index.swept_on != today:
+            index.sweep(today)
+        return index
+
+    @staticmethod
+    def _load_index() -> _VIPIndex:
+        """从数据库加载已启用且未过期的 VIP 车辆"""
+        today = timezone.now().date()
+        type_display = dict(VIPVehicle.VIP_TYPE_CHOICES)
+        rows = VIPVehicle.objects.filter(
+            is_active=True
+        ).exclude(
+            valid_until__lt=today
+        ).values_list(
+            'license_plate', 'vip_type', 'discount_rate', 'valid_from', 'valid_until'
+        )
+
+        entries = {
+            plate: VIPInfo(
+                license_plate=plate,
+                vip_type=vip_type,
+                vip_type_display=type_display.get(vip_type, vip_type),
+                discount_rate=discount_rate,
+                valid_from=valid_from,
+                valid_until=valid_until,
+            )
+            for plate, vip_type, discount_rate, valid_from, valid_until in rows
+        }
+        logger.debug("加载VIP索引: {} 个车牌", len(entries))
+        return _VIPIndex(entries=entries, swept_on=today)
@@ -0,0 +1,193 @@
+"""
+通缉车辆服务
+
+入场时通缉车辆命中极少，原先每次入场都在入场事务内查询一次 WantedVehicle。
+本服务在进程内维护通缉中车牌的哈希集合：
+- 入场路径只做集合查找，未命中不访问数据库
+- 命中时在事务提交后投递到 Celery 高优先级队列，
+  由任务创建警报日志并通知管理员，不占用道闸的入场事务
+- WantedVehicle 保存/删除（包括 cancel()）时由信号清除集合
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from loguru import logger
+
+from infra.cache import ProcessCache
+from parking.license_plate_models import VehicleAlertLog, WantedVehicle
+
+_wanted_cache = ProcessCache('wanted_plates')
+_PLATES_KEY = 'plates'
+
+
+class WantedVehicleService:
+    """
+    通缉车辆服务类
+
+    提供通缉车牌匹配和异步警报处理。
+    """
+
+    @staticmethod
+    def get_wanted_plates() -> frozenset[str]:
+        """
+        获取通缉中的车牌集合（进程内缓存）
+
+        Returns:
+            frozenset[str]: 通缉中的车牌号集合
+        """
+        return _wanted_cache.get(_PLATES_KEY, WantedVehicleService._load_plates)
+
+    @staticmethod
+    def is_wanted(license_plate: str) -> bool:
+        """
+        检查车牌是否在通缉中（不访问数据库）
+
+        Args:
+            license_plate: 车牌号
+
+        Returns:
+            bool: 是否为通缉车辆
+        """
+        return license_plate.upper().strip() in WantedVehicleService.get_wanted_plates()
+
+    @staticmethod
+    def match_records(records) -> list:
+        """
+        筛选车牌命中通缉集合的停车记录
+
+        Args:
+            records: 停车记录列表（需已加载 vehicle）
+
+        Returns:
+            list: 命中的停车记录
+        """
+        plates = WantedVehicleService.get_wanted_plates()
+        if not plates:
+            return []
+        return [record for record in records if record.vehicle.license_plate in plates]
+
+    @staticmethod
+    def dispatch_alerts(record_ids: list[int]) -> None:
+        """
+        事务提交后处理通缉警报
+
+        开启 WANTED_ALERT_ASYNC 时投递到 Celery 高优先级队列，
+        否则（或投递失败时）在提交后同步处理。
+
+        Args:
+            record_ids: 命中通缉的停车记录ID列表
+        """
+        record_ids = list(record_ids)
+        if not record_ids:
+            return
+
+        def dispatch():
+            if getattr(settings, 'WANTED_ALERT_ASYNC', True):
+                try:
+                    from parking.tasks.high_priority import process_wanted_vehicle_alerts
+                    # 限制投递重试，消息代理不可用时尽快回退到同步处理
+                    process_wanted_vehicle_alerts.apply_async(
+                        args=[record_ids],
+                        queue='high_priority',
+                        retry_policy={'max_retries': 1, 'interval_start': 0, 'interval_max': 0.2}
+                    )
+                    return
+                except Exception as e:
+                    logger.error("通缉警报任务投递失败，改为同步处理: {}", str(e))
+            WantedVehicleService.create_alerts(record_ids)
+
+        transaction.on_commit(dispatch)
+
+    @staticmethod
+    def create_alerts(record_ids: list[int]) -> int:
+        """
+        为命中通缉的停车记录创建警报日志并通知管理员
+
+        Args:
+            record_ids: 停车记录ID列表
+
+        Returns:
+            int: 创建的警报数量
+        """
+        from parking.models.parking_record import ParkingRecord
+
+        records = {
+            record.vehicle.license_plate: record
+            for record in ParkingRecord.objects.select_related(
+                'vehicle', 'parking_space__parking_lot'
+            ).filter(pk__in=record_ids)
+        }
+        if not records:
+            return 0
+
+        wanted_vehicles = WantedVehicle.objects.filter(
+            license_plate__in=records.keys(),
+            status='active'
+        ).order_by('-priority')
+
+        # 任务重试时跳过已创建的警报
+        existing = set(VehicleAlertLog.objects.filter(
+            parking_record_id__in=record_ids
+        ).values_list('wanted_vehicle_id', 'parking_record_id'))
+
+        alerts = []
+        for wanted in wanted_vehicles:
+            record = records[wanted.license_plate]
+            if (wanted.pk, record.pk) in existing:
+                continue
+            alerts.append(VehicleAlertLog(wanted_vehicle=wanted, parking_record=record))
+            logger.warning(
+                "⚠️ 通缉车辆入场警报: 车牌={}, 优先级={}, 记录ID={}",
+                wanted.license_plate, wanted.priority, record.id
+            )
+        if not alerts:
+            return 0
+
+        VehicleAlertLog.objects.bulk_create(alerts)
+        WantedVehicleService._notify_admins(alerts)
+        return len(alerts)
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """清除通缉车牌集合，下次匹配时重新加载"""
+        _wanted_cache.invalidate()
+
+    @staticmethod
+    def _load_plates() -> frozenset[str]:
+        plates = frozenset(
+            WantedVehicle.objects.filter(status='active').values_list('license_plate', flat=True)
+        )
+        logger.debug("加载通缉车牌集合: {} 个车牌", len(plates))
+        return plates
+
+    @staticmethod
+    def _notify_admins(alerts: list[VehicleAlertLog]) -> None:
+        """向管理员发送站内通知并记录已通知用户"""
+        from apps.notifications.services import NotificationService
+
+        admins = list(User.objects.filter(
+            Q(is_superuser=True) | Q(profile__role='admin'),
+            is_active=True
+        ).distinct())
+        if not admins:
+            return
+
+        for alert in alerts:
+            record = alert.parking_record
+            for admin in admins:
+                NotificationService.create_notification(
+                    user=admin,
+                    title=f'通缉车辆入场警报：{alert.wanted_vehicle.license_plate}',
+                    message=(
+                        f'通缉车辆 {alert.wanted_vehicle.license_plate} 于 '
+                        f'{record.entry_time:%Y-%m-%d %H:%M} 进入 '
+                        f'{record.parking_space.parking_lot.name} '
+                        f'（车位 {record.parking_space.space_number}），'
+                        f'优先级 {alert.wanted_vehicle.priority}'
+                    ),
+                    notification_type='warning',
+                    related_object=alert
+                )
+            if alert.pk:
+                alert.notified_users.add(*admins)
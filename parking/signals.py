@@ -0,0 +1,144 @@
+"""
+停车场信号处理器
+
+保持进程内缓存结构（空闲车位表、编译费率、VIP 索引、通缉车牌集合、车牌前缀映射等）
+以及停车场占用计数、在场车辆、仪表盘缓存、费用报价、用户角色缓存与模型变更同步。
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from parking.license_plate_models import City, LicensePlateLocation, Province, WantedVehicle
+from parking.models.parking_lot import ParkingLot
+from parking.models.parking_record import ParkingRecord
+from parking.models.parking_space import ParkingSpace
+from parking.models.vehicle import VIPVehicle
+from parking.pricing_models import ParkingLotPricing, PricingRule, PricingTemplate
+from parking.services.active_parking_service import ActiveParkingService
+from parking.services.dashboard_service import DashboardService
+from parking.services.fee_quote_service import FeeQuoteService
+from parking.services.occupancy_service import OccupancyService
+from parking.services.parking_lot_service import ParkingLotService
+from parking.services.space_allocator import SpaceAllocator
+from parking.services.plate_location_service import PlateLocationService
+from parking.services.tariff_service import TariffService
+from parking.services.vip_service import VIPService
+from parking.services.user_role_service import UserRoleService
+from parking.services.wanted_service import WantedVehicleService
+from parking.user_models import UserProfile
+
+
+@receiver(post_save, sender=ParkingSpace)
+def sync_space_allocator_on_save(sender, instance, **kwargs):
+    """车位保存后同步空闲车位表"""
+    if instance.is_occupied or instance.is_reserved:
+        SpaceAllocator.discard(instance.parking_lot_id, instance.pk)
+    else:
+        SpaceAllocator.release(instance.parking_lot_id, instance.pk)
+
+
+@receiver(post_delete, sender=ParkingSpace)
+def sync_space_allocator_on_delete(sender, instance, **kwargs):
+    """车位删除后从空闲车位表移除"""
+    SpaceAllocator.discard(instance.parking_lot_id, instance.pk)
+
+
+@receiver(post_save, sender=ParkingSpace)
+def update_occupancy_on_space_save(sender, instance, created, update_fields=None, **kwargs):
+    """车位新建或占用状态变化后增减停车场占用计数"""
+    OccupancyService.space_saved(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=ParkingSpace)
+def update_occupancy_on_space_delete(sender, instance, **kwargs):
+    """车位删除后扣减停车场占用计数"""
+    OccupancyService.space_deleted(instance)
+
+
+@receiver(post_save, sender=ParkingRecord)
+def sync_active_parking_on_record_save(sender, instance, created, update_fields=None, **kwargs):
+    """停车记录入场时登记在场车辆，出场时注销"""
+    ActiveParkingService.record_saved(instance, created, update_fields)
+
+
+@receiver(post_save, sender=ParkingRecord)
+def invalidate_fee_quote_on_record_save(sender, instance, created, **kwargs):
+    """停车记录出场或缴费后删除费用报价"""
+    if not created and (instance.exit_time is not None or instance.is_paid):
+        FeeQuoteService.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=ParkingLot)
+def create_lot_occupancy(sender, instance, created, **kwargs):
+    """新建停车场时创建占用计数行"""
+    if created:
+        OccupancyService.get_occupancy(instance.pk)
+
+
+@receiver(post_save, sender=ParkingLot)
+def reset_space_allocator_on_lot_save(sender, instance, **kwargs):
+    """
+    停车场保存后丢弃其空闲车位表
+
+    批量创建车位（bulk_create 不触发车位信号）后会回写停车场的 total_spaces，
+    借此重建空闲车位表。
+    """
+    SpaceAllocator.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=ParkingLot)
+@receiver(post_delete, sender=ParkingLot)
+def invalidate_dashboard_on_lot_change(sender, instance, **kwargs):
+    """停车场变更后重建仪表盘缓存（停车场列表属于结构数据）"""
+    DashboardService.invalidate_cache()
+
+
+@receiver(post_save, sender=ParkingLot)
+@receiver(post_delete, sender=ParkingLot)
+def invalidate_lot_cache(sender, instance, **kwargs):
+    """停车场变更后删除停车场对象缓存"""
+    ParkingLotService.invalidate_lot_cache(instance.pk)
+
+
+@receiver(post_save, sender=ParkingLot)
+@receiver(post_delete, sender=ParkingLot)
+@receiver(post_save, sender=ParkingLotPricing)
+@receiver(post_delete, sender=ParkingLotPricing)
+@receiver(post_save, sender=PricingTemplate)
+@receiver(post_delete, sender=PricingTemplate)
+@receiver(post_save, sender=PricingRule)
+@receiver(post_delete, sender=PricingRule)
+def invalidate_tariff_cache(sender, instance, **kwargs):
+    """停车场或费率模型变更后清除编译费率缓存"""
+    TariffService.invalidate_cache()
+
+
+@receiver(post_save, sender=VIPVehicle)
+@receiver(post_delete, sender=VIPVehicle)
+def invalidate_vip_index(sender, instance, **kwargs):
+    """VIP 车辆变更后清除 VIP 索引"""
+    VIPService.invalidate_cache()
+
+
+@receiver(post_save, sender=WantedVehicle)
+@receiver(post_delete, sender=WantedVehicle)
+def invalidate_wanted_plates(sender, instance, **kwargs):
+    """通缉车辆变更（包括取消通缉）后清除通缉车牌集合"""
+    WantedVehicleService.invalidate_cache()
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=LicensePlateLocation)
+@receiver(post_delete, sender=LicensePlateLocation)
+def invalidate_plate_locations(sender, instance, **kwargs):
+    """车牌地址数据变更后清除车牌前缀映射"""
+    PlateLocationService.invalidate_cache()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_role(sender, instance, **kwargs):
+    """用户资料变更（包括角色调整）后删除该用户的角色缓存"""
+    UserRoleService.invalidate(instance.user_id)
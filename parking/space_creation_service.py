@@ -16,6 +16,7 @@ from loguru import logger
 from openpyxl import Workbook, load_workbook
 
 from .models import ParkingLot, ParkingSpace
+from .services.occupancy_service import OccupancyService
 
 
 class SpaceNumberParser:
@@ -281,9 +282,8 @@ class SpaceCreationService:
             ParkingSpace.objects.bulk_create(spaces_to_create)
             created_numbers = [s.space_number for s in spaces_to_create]
         
-        # 更新停车场总车位数
-        parking_lot.total_spaces = ParkingSpace.objects.filter(parking_lot=parking_lot).count()
-        parking_lot.save(update_fields=['total_spaces'])
+        # 更新停车场总车位数（由占用计数累加，不重新统计车位表）
+        SpaceCreationService._sync_total_spaces(parking_lot, spaces_to_create)
         
         return len(created_numbers), len(skipped_numbers), created_numbers, skipped_numbers, True, '创建完成'
     
@@ -360,8 +360,7 @@ class SpaceCreationService:
                         created_numbers = [s.space_number for s in spaces_to_create]
                     
                     # 更新总车位数
-                    parking_lot.total_spaces = ParkingSpace.objects.filter(parking_lot=parking_lot).count()
-                    parking_lot.save(update_fields=['total_spaces'])
+                    SpaceCreationService._sync_total_spaces(parking_lot, spaces_to_create)
                     
                     return len(created_numbers), len(skipped_numbers), created_numbers, skipped_numbers, failed_lines, True, '创建完成'
                 
@@ -400,8 +399,7 @@ class SpaceCreationService:
                         created_numbers = [s.space_number for s in spaces_to_create]
                     
                     # 更新总车位数
-                    parking_lot.total_spaces = ParkingSpace.objects.filter(parking_lot=parking_lot).count()
-                    parking_lot.save(update_fields=['total_spaces'])
+                    SpaceCreationService._sync_total_spaces(parking_lot, spaces_to_create)
                     
                     return len(created_numbers), len(skipped_numbers), created_numbers, skipped_numbers, failed_lines, True, '创建完成'
                 
@@ -433,3 +431,14 @@ class SpaceCreationService:
             msg += f'，{len(failed_lines)} 行解析失败'
         return created, True, msg
 
+    
+    @staticmethod
+    def _sync_total_spaces(parking_lot: ParkingLot, created_spaces: list[ParkingSpace]) -> None:
+        """
+        批量创建车位后更新停车场总车位数
+        
+        bulk_create 不触发车位信号，这里显式累加占用计数中的车位数，
+        并以其回写 total_spaces（停车场保存信号会据此重建空闲车位表）。
+        """
+        parking_lot.total_spaces = OccupancyService.add_spaces(parking_lot.pk, created_spaces)
+        parking_lot.save(update_fields=['total_spaces'])
@@ -7,11 +7,13 @@
 from .email_tasks import send_email_async, send_verification_code_async
 from .notification_tasks import send_notification_async
 from .report_tasks import generate_report_async
+from .high_priority import process_wanted_vehicle_alerts
 
 __all__ = [
     'send_email_async',
     'send_verification_code_async',
     'send_notification_async',
     'generate_report_async',
+    'process_wanted_vehicle_alerts',
 ]
 
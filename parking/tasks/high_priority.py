@@ -0,0 +1,24 @@
+"""
+高优先级异步任务
+
+路由到 high_priority 队列，用于需要尽快处理的告警类任务
+"""
+
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=5, ignore_result=True)
+def process_wanted_vehicle_alerts(self, record_ids):
+    """
+    处理通缉车辆入场警报
+    
+    Args:
+        record_ids: 命中通缉的停车记录ID列表
+    """
+    from parking.services.wanted_service import WantedVehicleService
+    
+    try:
+        count = WantedVehicleService.create_alerts(record_ids)
+    except Exception as exc:
+        raise self.retry(exc=exc)
+    return {'status': 'success', 'alerts': count}
@@ -83,6 +83,7 @@ class ParkingRecordFactory(factory.django.DjangoModelFactory):
     
     vehicle = factory.SubFactory(VehicleFactory)
     parking_space = factory.SubFactory(ParkingSpaceFactory)
+    parking_lot = factory.SelfAttribute('parking_space.parking_lot')
     entry_time = factory.LazyFunction(timezone.now)
     exit_time = None
     fee = None
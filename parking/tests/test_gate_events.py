@@ -0,0 +1,231 @@
+"""
+批量道闸事件测试
+
+验证 ParkingRecordService.process_gate_events 按到达顺序处理事件，
+结果与逐条处理一致，单条事件失败不影响同批其他事件。
+"""
+import pytest
+from django.db import DatabaseError
+
+from parking.models import ParkingRecord
+from parking.services import ParkingRecordService
+from parking.services.active_parking_service import ActiveParkingService
+from parking.services.data_classes import EntryResult, ExitResult, GateEvent
+from parking.services.occupancy_service import OccupancyService
+from parking.tests.conftest import (
+    ParkingLotFactory,
+    ParkingRecordFactory,
+    ParkingSpaceFactory,
+    VehicleFactory,
+)
+
+
+def entry(plate: str, lot_id: int) -> GateEvent:
+    return GateEvent(event_type='entry', license_plate=plate, parking_lot_id=lot_id)
+
+
+def exit_(plate: str) -> GateEvent:
+    return GateEvent(event_type='exit', license_plate=plate)
+
+
+@pytest.fixture
+def single_space_lot(db):
+    """只有一个车位的停车场"""
+    lot = ParkingLotFactory(total_spaces=1)
+    ParkingSpaceFactory(parking_lot=lot, space_number='A001')
+    return lot
+
+
+@pytest.mark.django_db
+class TestGateEventOrdering:
+    """批量事件的处理顺序"""
+
+    def test_entry_before_exit_fails_when_full(self, single_space_lot):
+        """满场时排在出场之前的入场仍然失败"""
+        ParkingRecordService.vehicle_entry('粤B10001', single_space_lot.id)
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B10002', single_space_lot.id),
+            exit_('粤B10001'),
+        ])
+
+        assert isinstance(results[0], EntryResult)
+        assert not results[0].success
+        assert results[0].error_code == 'no_available_space'
+        assert isinstance(results[1], ExitResult)
+        assert results[1].success
+
+    def test_exit_before_entry_frees_space(self, single_space_lot):
+        """出场释放的车位可被同批之后的入场使用"""
+        ParkingRecordService.vehicle_entry('粤B10001', single_space_lot.id)
+
+        results = ParkingRecordService.process_gate_events([
+            exit_('粤B10001'),
+            entry('粤B10002', single_space_lot.id),
+        ])
+
+        assert [r.success for r in results] == [True, True]
+        assert ParkingRecord.objects.get(
+            vehicle__license_plate='粤B10002', exit_time__isnull=True
+        ).parking_space.space_number == 'A001'
+
+    def test_results_follow_input_order(self, parking_lot_with_spaces):
+        """混合事件的结果与输入顺序一一对应"""
+        lot_id = parking_lot_with_spaces.id
+        events = [
+            entry('粤B20001', lot_id),
+            entry('粤B20002', lot_id),
+            exit_('粤B20001'),
+            entry('粤B20003', lot_id),
+            exit_('粤B20002'),
+        ]
+
+        results = ParkingRecordService.process_gate_events(events)
+
+        assert len(results) == len(events)
+        assert [type(r) for r in results] == [
+            EntryResult, EntryResult, ExitResult, EntryResult, ExitResult
+        ]
+        assert all(r.success for r in results)
+        assert [r.record.vehicle.license_plate for r in results] == [
+            '粤B20001', '粤B20002', '粤B20001', '粤B20003', '粤B20002'
+        ]
+        assert OccupancyService.reconcile([lot_id], dry_run=True) == []
+
+    def test_same_plate_entry_exit_entry(self, parking_lot_with_spaces):
+        """同一车牌在一批内入场、出场、再入场"""
+        lot_id = parking_lot_with_spaces.id
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B30001', lot_id),
+            exit_('粤B30001'),
+            entry('粤B30001', lot_id),
+        ])
+
+        assert [r.success for r in results] == [True, True, True]
+        assert ParkingRecord.objects.filter(vehicle__license_plate='粤B30001').count() == 2
+        assert ParkingRecord.objects.filter(
+            vehicle__license_plate='粤B30001', exit_time__isnull=True
+        ).count() == 1
+
+
+@pytest.mark.django_db
+class TestGateEventFailures:
+    """单条事件失败"""
+
+    def test_invalid_event_type(self, parking_lot_with_spaces):
+        """不支持的事件类型只影响该条事件"""
+        lot_id = parking_lot_with_spaces.id
+
+        results = ParkingRecordService.process_gate_events([
+            GateEvent(event_type='pass', license_plate='粤B40001', parking_lot_id=lot_id),
+            entry('粤B40002', lot_id),
+        ])
+
+        assert not results[0].success
+        assert results[0].error_code == 'invalid_event_type'
+        assert results[1].success
+
+    def test_duplicate_entry_in_batch(self, parking_lot_with_spaces):
+        """同一车牌在一批内重复入场，第二次失败"""
+        lot_id = parking_lot_with_spaces.id
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B40003', lot_id),
+            entry('粤B40003', lot_id),
+        ])
+
+        assert results[0].success
+        assert not results[1].success
+        assert results[1].error_code == 'vehicle_already_parked'
+        assert ParkingRecord.objects.filter(vehicle__license_plate='粤B40003').count() == 1
+
+    def test_already_parked_vehicle(self, active_parking_record, parking_lot):
+        """已在场车辆的入场失败，同批其他事件正常处理"""
+        ParkingSpaceFactory(parking_lot=parking_lot)
+        plate = active_parking_record.vehicle.license_plate
+
+        results = ParkingRecordService.process_gate_events([
+            entry(plate, parking_lot.id),
+            entry('粤B40004', parking_lot.id),
+        ])
+
+        assert not results[0].success
+        assert results[0].error_code == 'vehicle_already_parked'
+        assert results[1].success
+
+    def test_concurrent_entry_conflict(self, parking_lot_with_spaces, monkeypatch):
+        """并发入场先登记了车牌时，只撤销该车牌的入场并释放车位"""
+        lot_id = parking_lot_with_spaces.id
+        open_many = ActiveParkingService.open_many
+
+        def open_after_concurrent_entry(records):
+            # 模拟另一请求在本批检查之后、登记之前完成了同一车牌的入场
+            ParkingRecordFactory(
+                vehicle=VehicleFactory(license_plate='粤B40010'),
+                parking_space=ParkingSpaceFactory(parking_lot=ParkingLotFactory()),
+            )
+            return open_many(records)
+
+        monkeypatch.setattr(
+            ActiveParkingService, 'open_many', staticmethod(open_after_concurrent_entry)
+        )
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B40009', lot_id),
+            entry('粤B40010', lot_id),
+        ])
+
+        assert results[0].success
+        assert not results[1].success
+        assert results[1].error_code == 'vehicle_already_parked'
+        assert not ParkingRecord.objects.filter(
+            vehicle__license_plate='粤B40010', parking_lot_id=lot_id
+        ).exists()
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 1
+        assert OccupancyService.reconcile([lot_id], dry_run=True) == []
+
+    def test_exit_without_active_record(self, parking_lot_with_spaces):
+        """无在场记录的出场失败"""
+        results = ParkingRecordService.process_gate_events([
+            exit_('粤B40005'),
+            entry('粤B40006', parking_lot_with_spaces.id),
+        ])
+
+        assert not results[0].success
+        assert results[0].error_code == 'no_active_record'
+        assert results[1].success
+
+    def test_database_error_fails_every_event(self, parking_lot_with_spaces, monkeypatch):
+        """数据库错误时整批回滚，每条事件都返回 database_error"""
+        def fail(*args, **kwargs):
+            raise DatabaseError('connection lost')
+
+        monkeypatch.setattr(ParkingRecordService, '_process_entry_batch', fail)
+        lot_id = parking_lot_with_spaces.id
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B40007', lot_id),
+            exit_('粤B40008'),
+        ])
+
+        assert [r.error_code for r in results] == ['database_error', 'database_error']
+        assert isinstance(results[1], ExitResult)
+        assert not ParkingRecord.objects.filter(vehicle__license_plate='粤B40007').exists()
+
+    def test_unexpected_error_fails_every_event(self, parking_lot_with_spaces, monkeypatch):
+        """其他异常同样整批回滚，每条事件返回 unknown_error（与单条入场/出场一致）"""
+        def fail(*args, **kwargs):
+            raise ValueError('bad tariff')
+
+        monkeypatch.setattr(ParkingRecordService, '_process_exit_batch', fail)
+        lot_id = parking_lot_with_spaces.id
+
+        results = ParkingRecordService.process_gate_events([
+            entry('粤B40011', lot_id),
+            exit_('粤B40011'),
+        ])
+
+        assert [r.error_code for r in results] == ['unknown_error', 'unknown_error']
+        assert [type(r) for r in results] == [EntryResult, ExitResult]
+        assert not ParkingRecord.objects.filter(vehicle__license_plate='粤B40011').exists()
@@ -0,0 +1,198 @@
+"""
+幂等请求测试
+
+验证道闸 API 携带 Idempotency-Key 重试时重放首次响应、不重复入场，
+以及暂时性错误不保存。
+"""
+import json
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from parking.models import ParkingRecord
+from parking.services import ParkingRecordService
+from parking.services.data_classes import EntryResult
+
+REPLAYED_HEADER = 'Idempotency-Key-Replayed'
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    """幂等响应保存在缓存中，测试环境默认的 DummyCache 不保存任何数据"""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'idempotency-tests',
+        }
+    }
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def post_json(client, name: str, payload: dict, key: str | None = None):
+    headers = {'Idempotency-Key': key} if key else {}
+    return client.post(
+        reverse(name),
+        data=json.dumps(payload),
+        content_type='application/json',
+        headers=headers
+    )
+
+
+@pytest.mark.django_db
+class TestIdempotentEntry:
+    """单条入场 API"""
+
+    def test_replay_returns_first_response(self, authenticated_client, parking_lot_with_spaces):
+        """相同键重试返回首次响应，不重复入场"""
+        payload = {'license_plate': '粤B50001', 'parking_lot_id': parking_lot_with_spaces.id}
+
+        first = post_json(authenticated_client, 'parking:api_entry', payload, key='entry-1')
+        second = post_json(authenticated_client, 'parking:api_entry', payload, key='entry-1')
+
+        assert first.status_code == 200
+        assert first.json()['success']
+        assert REPLAYED_HEADER not in first
+        assert second.status_code == 200
+        assert second[REPLAYED_HEADER] == 'true'
+        assert second.content == first.content
+        assert ParkingRecord.objects.filter(vehicle__license_plate='粤B50001').count() == 1
+
+    def test_without_key_is_not_replayed(self, authenticated_client, parking_lot_with_spaces):
+        """未携带幂等键时按普通请求处理"""
+        payload = {'license_plate': '粤B50002', 'parking_lot_id': parking_lot_with_spaces.id}
+
+        post_json(authenticated_client, 'parking:api_entry', payload)
+        second = post_json(authenticated_client, 'parking:api_entry', payload)
+
+        assert REPLAYED_HEADER not in second
+        assert second.json()['error_code'] == 'vehicle_already_parked'
+
+    def test_reused_key_with_different_body(self, authenticated_client, parking_lot_with_spaces):
+        """相同键用于不同请求体时返回 422"""
+        lot_id = parking_lot_with_spaces.id
+        post_json(
+            authenticated_client, 'parking:api_entry',
+            {'license_plate': '粤B50003', 'parking_lot_id': lot_id}, key='entry-2'
+        )
+
+        response = post_json(
+            authenticated_client, 'parking:api_entry',
+            {'license_plate': '粤B50004', 'parking_lot_id': lot_id}, key='entry-2'
+        )
+
+        assert response.status_code == 422
+        assert response.json()['error_code'] == 'idempotency_key_reused'
+        assert not ParkingRecord.objects.filter(vehicle__license_plate='粤B50004').exists()
+
+    def test_invalid_key(self, authenticated_client, parking_lot_with_spaces):
+        """格式不合法的幂等键返回 400"""
+        response = post_json(
+            authenticated_client, 'parking:api_entry',
+            {'license_plate': '粤B50005', 'parking_lot_id': parking_lot_with_spaces.id},
+            key='含空格 的键'
+        )
+
+        assert response.status_code == 400
+        assert response.json()['error_code'] == 'invalid_idempotency_key'
+
+    def test_transient_error_is_not_stored(
+        self, authenticated_client, parking_lot_with_spaces, monkeypatch
+    ):
+        """暂时性错误不保存，相同键重试时重新处理"""
+        vehicle_entry = ParkingRecordService.vehicle_entry
+        calls = []
+
+        def flaky_entry(**kwargs):
+            calls.append(kwargs['license_plate'])
+            if len(calls) == 1:
+                return EntryResult(
+                    success=False,
+                    message='系统繁忙，请稍后重试',
+                    error_code='database_error'
+                )
+            return vehicle_entry(**kwargs)
+
+        monkeypatch.setattr(ParkingRecordService, 'vehicle_entry', staticmethod(flaky_entry))
+        payload = {'license_plate': '粤B50006', 'parking_lot_id': parking_lot_with_spaces.id}
+
+        first = post_json(authenticated_client, 'parking:api_entry', payload, key='entry-3')
+        second = post_json(authenticated_client, 'parking:api_entry', payload, key='entry-3')
+
+        assert first.json()['error_code'] == 'database_error'
+        assert REPLAYED_HEADER not in second
+        assert second.json()['success']
+        assert len(calls) == 2
+
+    def test_keys_are_scoped_per_user(
+        self, client, user, staff_user, parking_lot_with_spaces
+    ):
+        """不同用户使用相同键互不影响"""
+        lot_id = parking_lot_with_spaces.id
+        client.force_login(user)
+        post_json(
+            client, 'parking:api_entry',
+            {'license_plate': '粤B50007', 'parking_lot_id': lot_id}, key='shared'
+        )
+
+        client.force_login(staff_user)
+        response = post_json(
+            client, 'parking:api_entry',
+            {'license_plate': '粤B50008', 'parking_lot_id': lot_id}, key='shared'
+        )
+
+        assert REPLAYED_HEADER not in response
+        assert response.json()['success']
+
+
+@pytest.mark.django_db
+class TestIdempotentGateEvents:
+    """批量道闸事件 API"""
+
+    def test_replay_batch(self, authenticated_client, parking_lot_with_spaces):
+        """批量事件重试返回首次结果，不重复处理"""
+        lot_id = parking_lot_with_spaces.id
+        payload = {'events': [
+            {'type': 'entry', 'license_plate': '粤B60001', 'parking_lot_id': lot_id},
+            {'type': 'entry', 'license_plate': '粤B60002', 'parking_lot_id': lot_id},
+        ]}
+
+        first = post_json(authenticated_client, 'parking:api_gate_events', payload, key='batch-1')
+        second = post_json(authenticated_client, 'parking:api_gate_events', payload, key='batch-1')
+
+        assert [item['success'] for item in first.json()['data']['results']] == [True, True]
+        assert second[REPLAYED_HEADER] == 'true'
+        assert second.content == first.content
+        assert ParkingRecord.objects.filter(parking_lot_id=lot_id).count() == 2
+
+    def test_batch_with_transient_result_is_not_stored(
+        self, authenticated_client, parking_lot_with_spaces, monkeypatch
+    ):
+        """批量结果中有暂时性错误时整批不保存"""
+        process_gate_events = ParkingRecordService.process_gate_events
+        calls = []
+
+        def flaky_process(events, operator_id=None):
+            calls.append(len(events))
+            if len(calls) == 1:
+                return [
+                    EntryResult(success=False, message='系统繁忙', error_code='database_error')
+                    for _ in events
+                ]
+            return process_gate_events(events, operator_id=operator_id)
+
+        monkeypatch.setattr(
+            ParkingRecordService, 'process_gate_events', staticmethod(flaky_process)
+        )
+        payload = {'events': [
+            {'type': 'entry', 'license_plate': '粤B60003', 'parking_lot_id': parking_lot_with_spaces.id},
+        ]}
+
+        post_json(authenticated_client, 'parking:api_gate_events', payload, key='batch-2')
+        second = post_json(authenticated_client, 'parking:api_gate_events', payload, key='batch-2')
+
+        assert REPLAYED_HEADER not in second
+        assert second.json()['data']['results'][0]['success']
+        assert len(calls) == 2
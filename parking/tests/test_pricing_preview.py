@@ -0,0 +1,47 @@
+"""
+费率预览 API 测试
+"""
+import json
+
+import pytest
+from django.urls import reverse
+
+
+def post_preview(client, payload):
+    return client.post(
+        reverse('parking:api_pricing_preview'),
+        data=json.dumps(payload),
+        content_type='application/json'
+    )
+
+
+@pytest.mark.django_db
+class TestPricingPreview:
+    """费率预览"""
+
+    def test_preview_durations(self, staff_client, parking_lot):
+        """按停车场当前费率逐个预览多个时长"""
+        response = post_preview(staff_client, {
+            'lot_id': parking_lot.id,
+            'durations': [0, 60, 61],
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data['success']
+        assert [item['fee'] for item in data['results']] == ['0.00', '5.00', '10.00']
+
+    @pytest.mark.parametrize('payload', [[1], 'lot', 3])
+    def test_non_object_body(self, staff_client, payload):
+        """请求体不是 JSON 对象时返回 400"""
+        response = post_preview(staff_client, payload)
+
+        assert response.status_code == 400
+        assert response.json() == {'success': False, 'message': '请求数据格式错误'}
+
+    def test_invalid_duration(self, staff_client, parking_lot):
+        """时长不是数字时返回参数错误"""
+        response = post_preview(staff_client, {'lot_id': parking_lot.id, 'durations': ['abc']})
+
+        assert response.status_code == 400
+        assert not response.json()['success']
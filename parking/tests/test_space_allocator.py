@@ -0,0 +1,174 @@
+"""
+车位分配器与占用计数测试
+
+验证 SpaceAllocator 的分配、占用和释放与 OccupancyService 的占用计数保持一致
+（对账无漂移），空闲表与数据库不一致时能自行修复。
+"""
+import pytest
+from django.db import transaction
+
+from parking.models import ParkingSpace
+from parking.services.occupancy_service import OccupancyService
+from parking.services.space_allocator import SpaceAllocator
+from parking.tests.conftest import ParkingLotFactory, ParkingSpaceFactory
+
+
+@pytest.fixture(autouse=True)
+def reset_pools():
+    """空闲表为进程内的类属性，测试之间不共享"""
+    SpaceAllocator.invalidate()
+    yield
+    SpaceAllocator.invalidate()
+
+
+def assert_consistent(lot_id: int) -> None:
+    """占用计数与车位表一致"""
+    assert OccupancyService.reconcile([lot_id], dry_run=True) == []
+
+
+@pytest.mark.django_db
+class TestSpaceAllocator:
+    """车位分配"""
+
+    def test_allocate_many_updates_occupancy(self, parking_lot_with_spaces):
+        """批量分配的车位互不重复，占用计数同步增加"""
+        lot_id = parking_lot_with_spaces.id
+
+        with transaction.atomic():
+            spaces = SpaceAllocator.allocate_many(lot_id, 4)
+
+        assert len({space.pk for space in spaces}) == 4
+        assert ParkingSpace.objects.filter(parking_lot_id=lot_id, is_occupied=True).count() == 4
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 4
+        assert_consistent(lot_id)
+
+    def test_allocate_many_stops_when_full(self, parking_lot_with_spaces):
+        """空闲车位不足时返回实际分配的车位"""
+        lot_id = parking_lot_with_spaces.id
+
+        with transaction.atomic():
+            spaces = SpaceAllocator.allocate_many(lot_id, 15)
+            extra = SpaceAllocator.allocate(lot_id)
+
+        assert len(spaces) == 10
+        assert extra is None
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 10
+        assert_consistent(lot_id)
+
+    def test_reserved_spaces_are_skipped(self, parking_lot):
+        """预留车位不参与分配"""
+        ParkingSpaceFactory(parking_lot=parking_lot, is_reserved=True)
+        free = ParkingSpaceFactory(parking_lot=parking_lot)
+
+        with transaction.atomic():
+            spaces = SpaceAllocator.allocate_many(parking_lot.id, 2)
+
+        assert [space.pk for space in spaces] == [free.pk]
+        assert_consistent(parking_lot.id)
+
+    def test_occupy_skips_taken_spaces(self, parking_lot_with_spaces):
+        """候选车位已被其他事务占用时只占用仍空闲的车位"""
+        lot_id = parking_lot_with_spaces.id
+        spaces = list(ParkingSpace.objects.filter(parking_lot_id=lot_id)[:3])
+        # 模拟另一事务已占用第一个车位
+        ParkingSpace.objects.filter(pk=spaces[0].pk).update(is_occupied=True)
+        OccupancyService.adjust(lot_id, occupied=1)
+
+        with transaction.atomic():
+            occupied = SpaceAllocator.occupy(spaces)
+
+        assert [space.pk for space in occupied] == [spaces[1].pk, spaces[2].pk]
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 3
+        assert_consistent(lot_id)
+
+    def test_release_returns_space_to_pool(self, parking_lot, django_capture_on_commit_callbacks):
+        """出场释放的车位在事务提交后可再次分配"""
+        space = ParkingSpaceFactory(parking_lot=parking_lot)
+
+        with transaction.atomic():
+            assert SpaceAllocator.allocate(parking_lot.id).pk == space.pk
+        assert SpaceAllocator.allocate(parking_lot.id) is None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            ParkingSpace.objects.filter(pk=space.pk).update(is_occupied=False)
+            OccupancyService.mark_spaces([space], occupied=False)
+            SpaceAllocator.release(parking_lot.id, space.pk)
+
+        with transaction.atomic():
+            assert SpaceAllocator.allocate(parking_lot.id).pk == space.pk
+        assert_consistent(parking_lot.id)
+
+    def test_external_occupation_is_not_allocated(self, parking_lot_with_spaces):
+        """空闲表中的车位在别处被占用后不会被重复分配"""
+        lot_id = parking_lot_with_spaces.id
+        SpaceAllocator.rebuild(lot_id)
+        # 绕过分配器直接占用全部车位（例如管理后台或其他进程）
+        for space in ParkingSpace.objects.filter(parking_lot_id=lot_id):
+            space.is_occupied = True
+            space.save()
+
+        with transaction.atomic():
+            assert SpaceAllocator.allocate_many(lot_id, 3) == []
+        assert_consistent(lot_id)
+
+    def test_pool_rebuilt_for_new_spaces(self, parking_lot):
+        """空闲表为空时从数据库重建，能分配到之后新增的车位"""
+        SpaceAllocator.rebuild(parking_lot.id)
+        space = ParkingSpaceFactory(parking_lot=parking_lot)
+
+        with transaction.atomic():
+            allocated = SpaceAllocator.allocate(parking_lot.id)
+
+        assert allocated.pk == space.pk
+        assert_consistent(parking_lot.id)
+
+
+@pytest.mark.django_db
+class TestOccupancyReconcile:
+    """占用计数对账"""
+
+    def test_reconcile_repairs_drift(self, parking_lot_with_spaces):
+        """绕过计数的批量更新产生漂移，对账后恢复一致"""
+        lot_id = parking_lot_with_spaces.id
+        ParkingSpace.objects.filter(
+            pk__in=ParkingSpace.objects.filter(parking_lot_id=lot_id).values('pk')[:2]
+        ).update(is_occupied=True)
+
+        drift = OccupancyService.reconcile([lot_id], dry_run=True)
+
+        assert len(drift) == 1
+        assert drift[0]['occupied_count'] == 0
+        assert drift[0]['actual_occupied'] == 2
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 0
+
+        OccupancyService.reconcile([lot_id])
+
+        assert OccupancyService.get_occupancy(lot_id).occupied_count == 2
+        assert_consistent(lot_id)
+
+    def test_space_changes_keep_counts(self, parking_lot):
+        """新增、占用、删除车位时计数同步"""
+        spaces = [ParkingSpaceFactory(parking_lot=parking_lot) for _ in range(3)]
+        spaces[0].is_occupied = True
+        spaces[0].save()
+        spaces[1].delete()
+
+        occupancy = OccupancyService.get_occupancy(parking_lot.id)
+        assert occupancy.space_count == 2
+        assert occupancy.occupied_count == 1
+        assert_consistent(parking_lot.id)
+
+    def test_counts_split_by_lot(self):
+        """多个停车场的计数互不影响"""
+        first, second = ParkingLotFactory(), ParkingLotFactory()
+        for lot in (first, second):
+            for _ in range(2):
+                ParkingSpaceFactory(parking_lot=lot)
+
+        with transaction.atomic():
+            SpaceAllocator.allocate_many(first.id, 2)
+
+        assert OccupancyService.get_totals([first.id, second.id]) == {
+            'total': 4, 'occupied': 2, 'available': 2
+        }
+        assert OccupancyService.reconcile([first.id, second.id], dry_run=True) == []
@@ -0,0 +1,213 @@
+"""
+编译费率与批量计费测试
+
+以重构前 ParkingRecord.calculate_fee 的 Decimal 逐条计算为基准，
+验证 CompiledTariff.evaluate 和 tariff_batch.evaluate_batch 的结果完全一致。
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from parking.pricing_models import ParkingLotPricing
+from parking.services.tariff_batch import evaluate_batch
+from parking.services.tariff_service import CompiledTariff, TariffService, to_cents
+from parking.tests.conftest import (
+    CompletedParkingRecordFactory,
+    ParkingLotFactory,
+    ParkingSpaceFactory,
+)
+
+DURATIONS = [
+    timedelta(0),
+    timedelta(seconds=59),
+    timedelta(minutes=14, seconds=59),
+    timedelta(minutes=15),
+    timedelta(minutes=15, seconds=30),
+    timedelta(minutes=16),
+    timedelta(minutes=60),
+    timedelta(minutes=61),
+    timedelta(minutes=75),
+    timedelta(hours=2, minutes=30),
+    timedelta(hours=3, minutes=15, seconds=1),
+    timedelta(hours=8),
+    timedelta(hours=23, minutes=59),
+    timedelta(hours=25),
+    timedelta(days=3, minutes=7),
+]
+
+DISCOUNT_RATES = [None, Decimal('0.00'), Decimal('0.15'), Decimal('0.50'), Decimal('0.85'), Decimal('1.00')]
+
+TARIFFS = {
+    'fixed': dict(charge_type='fixed', hourly_rate=Decimal('5.00')),
+    'fixed_with_cap': dict(charge_type='fixed', hourly_rate=Decimal('3.50'), daily_max_fee=Decimal('20.00')),
+    'tiered_without_rules': dict(charge_type='tiered', hourly_rate=Decimal('4.00'), free_minutes=30),
+    'tiered': dict(
+        charge_type='tiered',
+        hourly_rate=Decimal('5.00'),
+        free_minutes=15,
+        rules=[
+            {'start_minutes': 0, 'end_minutes': 60, 'rate_per_hour': 0},
+            {'start_minutes': 60, 'end_minutes': 180, 'rate_per_hour': 3.5},
+            {'start_minutes': 180, 'end_minutes': None, 'rate_per_hour': 2.25},
+        ],
+    ),
+    'tiered_with_gap_and_cap': dict(
+        charge_type='tiered',
+        hourly_rate=Decimal('5.00'),
+        free_minutes=10,
+        rules=[
+            # 乱序且中间有空档的规则
+            {'start_minutes': 240, 'end_minutes': 600, 'rate_per_hour': 1.5},
+            {'start_minutes': 0, 'end_minutes': 120, 'rate_per_hour': 6},
+        ],
+        daily_max_fee=Decimal('25.50'),
+    ),
+}
+
+
+def _ceil(value: float) -> int:
+    return int(value) + (1 if value % 1 > 0 else 0)
+
+
+def baseline_fee(
+    duration: timedelta,
+    charge_type: str,
+    hourly_rate: Decimal,
+    free_minutes: int = 15,
+    rules=(),
+    daily_max_fee: Decimal | None = None,
+    discount_rate: Decimal | None = None,
+) -> Decimal:
+    """重构前的逐条 Decimal 计费（ParkingRecord.calculate_fee / _calculate_tiered_fee）"""
+    duration_minutes = int(duration.total_seconds() / 60)
+
+    if charge_type == 'tiered':
+        if duration_minutes <= free_minutes:
+            fee = Decimal('0.00')
+        elif not rules:
+            fee = Decimal(str(_ceil(duration_minutes / 60))) * hourly_rate
+        else:
+            fee = Decimal('0.00')
+            remaining_minutes = duration_minutes - free_minutes
+            for rule in sorted(rules, key=lambda x: x['start_minutes']):
+                rate_per_hour = Decimal(str(rule['rate_per_hour']))
+                if remaining_minutes <= 0:
+                    break
+                rule_start = max(0, rule['start_minutes'] - free_minutes)
+                rule_end = (rule['end_minutes'] - free_minutes) if rule.get('end_minutes') else None
+                if rule_end is None:
+                    fee += Decimal(str(_ceil(remaining_minutes / 60))) * rate_per_hour
+                    break
+                if remaining_minutes <= rule_start:
+                    continue
+                applicable_minutes = min(remaining_minutes, rule_end) - rule_start
+                if applicable_minutes > 0:
+                    fee += Decimal(str(_ceil(applicable_minutes / 60))) * rate_per_hour
+                    remaining_minutes -= applicable_minutes
+    else:
+        fee = Decimal(str(_ceil(duration.total_seconds() / 3600))) * hourly_rate
+
+    if discount_rate is not None:
+        fee = fee * (Decimal('1.00') - discount_rate)
+    if daily_max_fee and fee > daily_max_fee:
+        fee = daily_max_fee
+    return fee.quantize(Decimal('0.01'))
+
+
+class TestCompiledTariff:
+    """编译费率逐条计算"""
+
+    @pytest.mark.parametrize('name', TARIFFS)
+    @pytest.mark.parametrize('discount_rate', DISCOUNT_RATES)
+    def test_matches_baseline(self, name, discount_rate):
+        """各类费率、时长和折扣下与基准计算一致"""
+        params = TARIFFS[name]
+        tariff = CompiledTariff.build(**params)
+
+        for duration in DURATIONS:
+            assert tariff.evaluate(duration, discount_rate) == baseline_fee(
+                duration, discount_rate=discount_rate, **params
+            ), duration
+
+    def test_version_depends_only_on_parameters(self):
+        """版本号只由费率参数决定"""
+        first = CompiledTariff.build(**TARIFFS['tiered'], parking_lot_id=1)
+        second = CompiledTariff.build(**TARIFFS['tiered'], parking_lot_id=2)
+        changed = CompiledTariff.build(**{**TARIFFS['tiered'], 'free_minutes': 20})
+
+        assert first.version == second.version
+        assert first.version != changed.version
+
+
+class TestEvaluateBatch:
+    """批量计费"""
+
+    @pytest.mark.parametrize('name', TARIFFS)
+    def test_matches_single_evaluation(self, name):
+        """批量结果与逐条计算一致（折扣率为 Decimal 序列）"""
+        tariff = CompiledTariff.build(**TARIFFS[name])
+        durations = [d for d in DURATIONS for _ in DISCOUNT_RATES]
+        rates = [rate for _ in DURATIONS for rate in DISCOUNT_RATES]
+
+        cents = evaluate_batch(tariff, [d.total_seconds() for d in durations], rates)
+
+        assert cents.tolist() == [
+            tariff.fee_cents(duration, rate) for duration, rate in zip(durations, rates)
+        ]
+
+    def test_integer_discount_cents(self):
+        """折扣率可以直接传入整数分数组"""
+        tariff = CompiledTariff.build(**TARIFFS['tiered_with_gap_and_cap'])
+        seconds = [d.total_seconds() for d in DURATIONS]
+        rates = [Decimal('0.15')] * len(DURATIONS)
+
+        assert evaluate_batch(tariff, seconds, [to_cents(r) for r in rates]).tolist() == \
+            evaluate_batch(tariff, seconds, rates).tolist()
+
+    def test_free_mask(self):
+        """免费停车的记录费用为 0"""
+        tariff = CompiledTariff.build(**TARIFFS['fixed'])
+        seconds = [timedelta(hours=2).total_seconds()] * 3
+
+        cents = evaluate_batch(tariff, seconds, free_mask=[False, True, False])
+
+        assert cents.tolist() == [1000, 0, 1000]
+
+
+@pytest.mark.django_db
+class TestLotTariff:
+    """停车场费率编译"""
+
+    def test_compile_lot_with_custom_rules(self):
+        """按停车场费率配置编译，停车记录费用与基准一致"""
+        params = TARIFFS['tiered']
+        lot = ParkingLotFactory(hourly_rate=params['hourly_rate'])
+        ParkingLotPricing.objects.create(
+            parking_lot=lot,
+            charge_type='tiered',
+            free_minutes=params['free_minutes'],
+            custom_rules=params['rules'],
+        )
+        TariffService.invalidate_cache()
+
+        tariff = TariffService.compile_lot(lot.id)
+        record = CompletedParkingRecordFactory(
+            parking_space=ParkingSpaceFactory(parking_lot=lot),
+            fee=None,
+            duration_minutes=None,
+        )
+
+        assert tariff.version == CompiledTariff.build(**params).version
+        assert record.fee == baseline_fee(record.exit_time - record.entry_time, **params)
+
+    def test_lot_without_pricing_uses_hourly_rate(self):
+        """无费率配置的停车场按小时费率计费"""
+        lot = ParkingLotFactory(hourly_rate=Decimal('6.50'))
+        TariffService.invalidate_cache()
+
+        tariff = TariffService.get_tariff(lot.id)
+
+        assert tariff.charge_type == 'fixed'
+        for duration in DURATIONS:
+            assert tariff.evaluate(duration) == baseline_fee(duration, 'fixed', Decimal('6.50'))
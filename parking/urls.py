@@ -12,7 +12,7 @@ from django.urls import path
 
 from .views import (
     admin, alert, api, auth_views, contact, customer,
-    police, pricing, schedule, space_creation,
+    police, pricing, schedule, space_creation, stream,
     auth as views_auth, dashboard as views_dashboard
 )
 
@@ -30,6 +30,7 @@ urlpatterns = [
     # 车辆入场/出场/查询
     path('api/entry/', api.api_vehicle_entry, name='api_entry'),
     path('api/exit/', api.api_vehicle_exit, name='api_exit'),
+    path('api/gate-events/', api.api_gate_events, name='api_gate_events'),
     path('api/query/', api.api_vehicle_query, name='api_query'),
     path('api/search/', api.api_search_records, name='api_search'),
     
@@ -39,6 +40,8 @@ urlpatterns = [
     path('api/lots/<int:lot_id>/', api.api_parking_lot_detail, name='api_parking_lot_detail'),
     path('api/available-spaces/', api.api_available_spaces, name='api_available_spaces'),
     path('api/validate-plate/', api.api_validate_plate, name='api_validate_plate'),
+    path('api/occupancy/stream/', stream.api_occupancy_stream, name='api_occupancy_stream'),
+    path('api/cache/metrics/', api.api_cache_metrics, name='api_cache_metrics'),
     
     # ==================== 自定义管理后台 ====================
     path('manage/', admin.admin_index, name='admin_index'),
@@ -101,6 +104,7 @@ urlpatterns = [
     path('manage/pricing/templates/<int:template_id>/', pricing.pricing_template_edit, name='admin_pricing_template_edit'),
     path('manage/pricing/templates/<int:template_id>/delete/', pricing.pricing_template_delete, name='admin_pricing_template_delete'),
     path('api/pricing/preview/', pricing.pricing_preview, name='api_pricing_preview'),
+    path('api/pricing/impact/', pricing.pricing_impact, name='api_pricing_impact'),
     
     # ==================== 公安查询 ====================
     path('manage/police/query/', police.police_query_view, name='admin_police_query'),
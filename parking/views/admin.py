@@ -16,7 +16,8 @@ from typing import Any
 from django.contrib import messages
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db import transaction
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, Greatest
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
@@ -27,7 +28,7 @@ from loguru import logger
 
 from parking.decorators import staff_member_required
 from parking.models import ParkingLot, ParkingRecord, ParkingSpace, Vehicle
-from parking.services import DashboardService, ParkingRecordService
+from parking.services import ActiveParkingService, DashboardService, ParkingRecordService, VIPService
 
 # 每页显示数量
 PAGE_SIZE = 15
@@ -76,9 +77,10 @@ def admin_index(request: HttpRequest) -> HttpResponse:
 @staff_member_required
 def parking_lot_list(request: HttpRequest) -> HttpResponse:
     """停车场列表视图"""
+    # 车位数与占用数读取占用计数（LotOccupancy），不再逐个停车场统计车位表
     queryset = ParkingLot.objects.annotate(
-        space_count=Count('parking_spaces'),
-        occupied_count=Count('parking_spaces', filter=Q(parking_spaces__is_occupied=True))
+        space_count=Coalesce(F('occupancy__space_count'), 0),
+        occupied_count=Greatest(Coalesce(F('occupancy__occupied_count'), 0), 0)
     ).order_by('-created_at')
     
     # 搜索
@@ -130,7 +132,7 @@ def parking_lot_detail(request: HttpRequest, pk: int) -> HttpResponse:
     
     # 优化：使用select_related和only()减少查询和传输数据
     recent_records = ParkingRecord.objects.filter(
-        parking_space__parking_lot=lot
+        parking_lot=lot
     ).select_related(
         'vehicle', 'parking_space'
     ).only(
@@ -462,6 +464,11 @@ def vehicle_list(request: HttpRequest) -> HttpResponse:
     except (PageNotAnInteger, EmptyPage):
         vehicles = paginator.page(1)
     
+    # VIP 状态从进程内索引批量获取，避免逐行查询
+    vip_map = VIPService.get_vip_map(vehicle.license_plate for vehicle in vehicles)
+    for vehicle in vehicles:
+        vehicle.vip_info = vip_map.get(vehicle.license_plate)
+    
     context = {
         'vehicles': vehicles,
         'search': search,
@@ -515,8 +522,8 @@ def vehicle_delete(request: HttpRequest, pk: int) -> JsonResponse:
         vehicle = get_object_or_404(Vehicle, pk=pk)
         
         # 检查是否有未完成的停车记录
-        # 优化：直接使用exists()检查，避免加载数据
-        if ParkingRecord.objects.filter(vehicle=vehicle, exit_time__isnull=True).exists():
+        # 优化：在场车辆表按车牌主键检查
+        if ActiveParkingService.is_parked(vehicle.license_plate):
             return JsonResponse({
                 'success': False,
                 'message': '该车辆当前正在停车中，无法删除'
@@ -637,6 +644,7 @@ def parking_record_checkout(request: HttpRequest, pk: int) -> JsonResponse:
             space = record.parking_space
             space.is_occupied = False
             space.save(update_fields=['is_occupied', 'updated_at'])
+            DashboardService.record_exits([record])
             
             logger.info(
                 "用户 %s 处理出场: 车牌 %s, 费用 %s",
@@ -678,6 +686,7 @@ def parking_record_pay(request: HttpRequest, pk: int) -> JsonResponse:
         
         record.is_paid = True
         record.save(update_fields=['is_paid', 'updated_at'])
+        DashboardService.record_payments([record])
         
         logger.info(
             "用户 %s 确认支付: 车牌 %s, 费用 %s",
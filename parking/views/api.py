@@ -18,15 +18,24 @@ from django.http import HttpRequest, JsonResponse
 from django.views.decorators.http import require_GET, require_POST
 from loguru import logger
 
+from infra.cache import get_cache_metrics
+from parking.decorators import idempotent_request, staff_member_required
 from parking.forms import VehicleEntryForm, VehicleExitForm, VehicleQueryForm
 from parking.models import ParkingLot, ParkingRecord, ParkingSpace, Vehicle, validate_license_plate
 from parking.services import (
     DashboardService,
+    EntryResult,
+    ExitResult,
+    GateEvent,
     ParkingLotService,
     ParkingRecordService,
     VehicleService,
+    VIPService,
 )
 
+# 批量道闸事件单次最大数量
+GATE_BATCH_MAX_EVENTS = 500
+
 
 def api_response(
     success: bool,
@@ -61,8 +70,32 @@ def api_response(
     return JsonResponse(response, status=status_code)
 
 
+def _entry_result_data(result: EntryResult, license_plate: str) -> dict[str, Any]:
+    """入场成功结果的响应数据"""
+    return {
+        'license_plate': license_plate,
+        'parking_lot': result.lot_name,
+        'space_number': result.space_number,
+        'entry_time': result.record.entry_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'record_id': result.record.id,
+    }
+
+
+def _exit_result_data(result: ExitResult) -> dict[str, Any]:
+    """出场成功结果的响应数据"""
+    return {
+        'license_plate': result.record.vehicle.license_plate,
+        'fee': str(result.fee),
+        'duration_minutes': result.duration_minutes,
+        'entry_time': result.record.entry_time.strftime('%Y-%m-%d %H:%M'),
+        'exit_time': result.record.exit_time.strftime('%Y-%m-%d %H:%M'),
+        'is_paid': result.record.is_paid,
+    }
+
+
 @login_required
 @require_POST
+@idempotent_request('entry')
 def api_vehicle_entry(request: HttpRequest) -> JsonResponse:
     """
     车辆入场 API
@@ -74,6 +107,9 @@ def api_vehicle_entry(request: HttpRequest) -> JsonResponse:
         parking_lot_id: 停车场ID
         vehicle_type: 车辆类型（可选，默认 car）
         
+    请求头：
+        Idempotency-Key: 幂等键（可选），道闸超时重试时返回首次请求的结果
+        
     返回：
         success: 是否成功
         data: 入场信息（车位号、停车场等）
@@ -151,13 +187,7 @@ def api_vehicle_entry(request: HttpRequest) -> JsonResponse:
             
             return api_response(
                 success=True,
-                data={
-                    'license_plate': license_plate,
-                    'parking_lot': result.lot_name,
-                    'space_number': result.space_number,
-                    'entry_time': result.record.entry_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'record_id': result.record.id,
-                },
+                data=_entry_result_data(result, license_plate),
                 message=result.message
             )
         else:
@@ -184,6 +214,7 @@ def api_vehicle_entry(request: HttpRequest) -> JsonResponse:
 
 @login_required
 @require_POST
+@idempotent_request('exit')
 def api_vehicle_exit(request: HttpRequest) -> JsonResponse:
     """
     车辆出场 API
@@ -195,6 +226,9 @@ def api_vehicle_exit(request: HttpRequest) -> JsonResponse:
         record_id: 停车记录ID（与 license_plate 二选一）
         auto_pay: 是否自动标记为已支付（可选，默认 false）
         
+    请求头：
+        Idempotency-Key: 幂等键（可选），道闸超时重试时返回首次请求的结果
+        
     返回：
         success: 是否成功
         data: 出场信息（费用、时长等）
@@ -253,14 +287,7 @@ def api_vehicle_exit(request: HttpRequest) -> JsonResponse:
             
             return api_response(
                 success=True,
-                data={
-                    'license_plate': result.record.vehicle.license_plate,
-                    'fee': str(result.fee),
-                    'duration_minutes': result.duration_minutes,
-                    'entry_time': result.record.entry_time.strftime('%Y-%m-%d %H:%M'),
-                    'exit_time': result.record.exit_time.strftime('%Y-%m-%d %H:%M'),
-                    'is_paid': result.record.is_paid,
-                },
+                data=_exit_result_data(result),
                 message=result.message
             )
         else:
@@ -285,6 +312,161 @@ def api_vehicle_exit(request: HttpRequest) -> JsonResponse:
         )
 
 
+@login_required
+@require_POST
+@idempotent_request('gate_events')
+def api_gate_events(request: HttpRequest) -> JsonResponse:
+    """
+    批量道闸事件 API
+
+    一次提交多条入场/出场事件，服务层以集合查询和批量写入处理，
+    整批只清除一次缓存，逐条返回处理结果。
+
+    请求参数（POST JSON）：
+        events: 事件列表，每项包含
+            type: 事件类型（entry/exit）
+            license_plate: 车牌号（入场必填；出场与 record_id 二选一）
+            parking_lot_id: 停车场ID（入场必填）
+            vehicle_type: 车辆类型（可选，默认 car）
+            parking_space_id: 指定停车位ID（可选）
+            record_id: 停车记录ID（出场可选）
+            auto_pay: 是否自动标记为已支付（出场可选）
+
+    返回：
+        success: 请求是否被处理
+        data: results（与 events 顺序一致）、succeeded、failed
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return api_response(
+            success=False,
+            message='请求数据格式错误',
+            error_code='invalid_json'
+        )
+
+    raw_events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(raw_events, list) or not raw_events:
+        return api_response(
+            success=False,
+            message='请提供事件列表',
+            error_code='missing_events'
+        )
+    if len(raw_events) > GATE_BATCH_MAX_EVENTS:
+        return api_response(
+            success=False,
+            message=f'单次最多提交{GATE_BATCH_MAX_EVENTS}条事件',
+            error_code='too_many_events'
+        )
+
+    try:
+        items: list[dict[str, Any] | None] = [None] * len(raw_events)
+        events: list[GateEvent] = []
+        positions: list[int] = []
+
+        for index, raw in enumerate(raw_events):
+            event, error = _parse_gate_event(raw)
+            if error:
+                items[index] = {'success': False, 'message': error[1], 'error_code': error[0]}
+                continue
+            events.append(event)
+            positions.append(index)
+
+        results = ParkingRecordService.process_gate_events(
+            events,
+            operator_id=request.user.id
+        ) if events else []
+
+        for index, event, result in zip(positions, events, results):
+            item = {
+                'success': result.success,
+                'message': result.message,
+            }
+            if result.success:
+                item['data'] = (
+                    _entry_result_data(result, event.license_plate)
+                    if isinstance(result, EntryResult)
+                    else _exit_result_data(result)
+                )
+            else:
+                item['error_code'] = result.error_code
+            items[index] = item
+
+        for index, item in enumerate(items):
+            item['index'] = index
+            item['type'] = raw_events[index].get('type') if isinstance(raw_events[index], dict) else None
+
+        succeeded = sum(1 for item in items if item['success'])
+        logger.info(
+            "用户 {} 提交批量道闸事件: 总数={}, 成功={}",
+            request.user.username, len(items), succeeded
+        )
+
+        return api_response(
+            success=True,
+            data={
+                'results': items,
+                'succeeded': succeeded,
+                'failed': len(items) - succeeded,
+            },
+            message=f'已处理 {len(items)} 条事件，成功 {succeeded} 条'
+        )
+
+    except Exception as e:
+        logger.exception("批量道闸事件API异常: {}", str(e))
+        return api_response(
+            success=False,
+            message='系统错误，请稍后重试',
+            error_code='server_error'
+        )
+
+
+def _parse_gate_event(raw: Any) -> tuple[GateEvent | None, tuple[str, str] | None]:
+    """
+    解析单条道闸事件
+
+    Returns:
+        tuple: (事件, None) 或 (None, (错误代码, 错误消息))
+    """
+    if not isinstance(raw, dict):
+        return None, ('invalid_event', '事件格式错误')
+
+    event_type = raw.get('type')
+    if event_type not in ('entry', 'exit'):
+        return None, ('invalid_event_type', f'不支持的事件类型: {event_type}')
+
+    def to_int(value):
+        return int(value) if value not in (None, '') else None
+
+    try:
+        parking_lot_id = to_int(raw.get('parking_lot_id'))
+        parking_space_id = to_int(raw.get('parking_space_id'))
+        record_id = to_int(raw.get('record_id'))
+    except (ValueError, TypeError):
+        return None, ('invalid_id', '无效的ID参数')
+
+    auto_pay = raw.get('auto_pay', False)
+    if isinstance(auto_pay, str):
+        auto_pay = auto_pay.lower() in ('true', '1', 'yes')
+
+    license_plate = str(raw.get('license_plate') or '').strip().upper()
+    if event_type == 'exit' and license_plate and not record_id:
+        try:
+            validate_license_plate(license_plate)
+        except ValidationError as e:
+            return None, ('invalid_license_plate', str(e.message))
+
+    return GateEvent(
+        event_type=event_type,
+        license_plate=license_plate,
+        parking_lot_id=parking_lot_id,
+        vehicle_type=raw.get('vehicle_type') or 'car',
+        parking_space_id=parking_space_id,
+        record_id=record_id,
+        auto_pay=bool(auto_pay),
+    ), None
+
+
 @require_GET
 def api_vehicle_query(request: HttpRequest) -> JsonResponse:
     """
@@ -313,14 +495,11 @@ def api_vehicle_query(request: HttpRequest) -> JsonResponse:
         # 查询车辆状态
         status = ParkingRecordService.query_vehicle_status(license_plate)
         
-        # 检查是否为VIP车辆
-        from parking.models import VIPVehicle
-        try:
-            vip = VIPVehicle.objects.get(license_plate=license_plate, is_active=True)
-            status['is_vip'] = vip.is_valid
-            status['vip_type'] = vip.get_vip_type_display() if vip.is_valid else None
-        except VIPVehicle.DoesNotExist:
-            status['is_vip'] = False
+        # 检查是否为VIP车辆（进程内索引）
+        vip_info = VIPService.get_vip_info(license_plate)
+        status['is_vip'] = vip_info is not None
+        if vip_info:
+            status['vip_type'] = vip_info.get_vip_type_display()
         
         # 格式化时间
         if status.get('entry_time'):
@@ -680,3 +859,18 @@ def api_validate_plate(request: HttpRequest) -> JsonResponse:
             error_code='server_error'
         )
 
+
+@staff_member_required
+@require_GET
+def api_cache_metrics(request: HttpRequest) -> JsonResponse:
+    """
+    缓存指标 API（仅工作人员）
+    
+    返回当前工作进程内各防击穿缓存的命中、旧值命中、未命中、重建等计数。
+    计数按进程统计，多进程部署时每次请求只反映处理该请求的进程。
+    
+    返回：
+        success: 是否成功
+        data: 缓存名称 → 指标计数
+    """
+    return api_response(success=True, data=get_cache_metrics())
@@ -86,7 +86,7 @@ def police_query_view(request: HttpRequest) -> HttpResponse:
     
     # 停车场筛选
     if parking_lot_id:
-        queryset = queryset.filter(parking_space__parking_lot_id=parking_lot_id)
+        queryset = queryset.filter(parking_lot_id=parking_lot_id)
     
     # 默认查询今天的记录
     if not date_from and not date_to:
@@ -8,9 +8,12 @@ Created: 2025-12-11
 Version: 1.1.0
 """
 import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
 
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
 from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.vary import vary_on_headers
@@ -18,6 +21,10 @@ from loguru import logger
 
 from parking.decorators import staff_member_required
 from parking.pricing_models import ParkingLotPricing, PricingRule, PricingTemplate
+from parking.services.tariff_service import TariffService
+
+# 单次预览最多计算的时长个数
+PREVIEW_MAX_DURATIONS = 100
 
 
 @staff_member_required
@@ -203,143 +210,200 @@ def parking_lot_pricing_edit(request, lot_id):
     return render(request, 'admin/parking_lot/pricing_edit.html', context)
 
 
+def _fee_breakdown(tariff, duration_minutes: int) -> list[str]:
+    """
+    生成费用计算说明
+
+    Args:
+        tariff: 编译后的费率
+        duration_minutes: 停车时长（分钟）
+
+    Returns:
+        list[str]: 计算说明
+    """
+    if tariff.charge_type == 'fixed':
+        hours = (duration_minutes + 59) // 60
+        breakdown = [
+            f'停车时长：{duration_minutes}分钟（按{hours}小时计费）',
+            f'费率：¥{tariff.hourly_rate_cents / 100:.2f}/小时',
+            f'费用：{hours} × ¥{tariff.hourly_rate_cents / 100:.2f} = ¥{hours * tariff.hourly_rate_cents / 100:.2f}',
+        ]
+    else:
+        breakdown = [f'前{tariff.free_minutes}分钟免费']
+        if duration_minutes <= tariff.free_minutes:
+            return breakdown
+        breakdown.append(f'计费时长：{duration_minutes - tariff.free_minutes}分钟')
+        if tariff.rules:
+            breakdown.append('阶梯规则：')
+            for rule in tariff.rules:
+                end = rule.end_minutes if rule.end_minutes is not None else '∞'
+                breakdown.append(
+                    f'  {rule.start_minutes}-{end}分钟：¥{rule.rate_cents / 100:.2f}/小时'
+                )
+        else:
+            breakdown.append(f'费率：¥{tariff.hourly_rate_cents / 100:.2f}/小时')
+
+    if tariff.daily_max_cents and tariff.base_fee_cents(timedelta(minutes=duration_minutes)) > tariff.daily_max_cents:
+        breakdown.append(f'超过每日上限¥{tariff.daily_max_cents / 100:.2f}，按上限计费')
+    return breakdown
+
+
 @staff_member_required
 @require_http_methods(['POST'])
 def pricing_preview(request):
-    """费率预览API"""
+    """
+    费率预览API
+
+    在停车场当前费率配置上叠加页面中未保存的参数并编译，在内存中计算费用，不写数据库。
+
+    请求参数：
+        lot_id: 停车场ID
+        duration_minutes: 停车时长（分钟）
+        durations: 多个停车时长（分钟，数组，最多100个），提供时按顺序返回 results
+        charge_type、template_id、custom_rules、free_minutes、daily_max_fee、hourly_rate:
+            未保存的费率参数，未提供的沿用当前配置
+    """
+    from parking.models import ParkingLot
+
     try:
         data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
-        
-        duration_minutes = int(data.get('duration_minutes', 0))
-        charge_type = data.get('charge_type', 'fixed')
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': '请求数据格式错误'}, status=400)
+
         lot_id = data.get('lot_id')
-        
         if not lot_id:
             return JsonResponse({
                 'success': False,
                 'message': '请提供停车场ID'
             }, status=400)
-        
-        from parking.models import ParkingLot, ParkingRecord, ParkingSpace, Vehicle
-        from datetime import timedelta
-        from django.utils import timezone
-        
         parking_lot = get_object_or_404(ParkingLot, id=lot_id)
-        
-        try:
-            pricing_config = parking_lot.pricing_config
-        except AttributeError:
-            pricing_config = None
-        
-        if duration_minutes <= 0:
-            return JsonResponse({
-                'success': True,
-                'fee': '0.00',
-                'breakdown': []
-            })
-        
-        # 计算费用（使用match/case优化）
-        match charge_type:
-            case 'fixed':
-                hourly_rate = float(data.get('hourly_rate', parking_lot.hourly_rate))
-                free_minutes = 15
-                
-                if duration_minutes <= free_minutes:
-                    fee = 0.00
-                    breakdown = [f'前{free_minutes}分钟免费']
-                else:
-                    billable_minutes = duration_minutes - free_minutes
-                    hours = (billable_minutes + 59) // 60  # 向上取整
-                    fee = hours * hourly_rate
-                    breakdown = [
-                        f'前{free_minutes}分钟免费',
-                        f'计费时长：{billable_minutes}分钟（按{hours}小时计费）',
-                        f'费率：¥{hourly_rate:.2f}/小时',
-                        f'费用：{hours} × ¥{hourly_rate:.2f} = ¥{fee:.2f}'
-                    ]
-            case 'tiered':
-                # 阶梯收费
-                # 检查是否有配置或模板
-                template_id = data.get('template_id')
-                if template_id:
-                    template = PricingTemplate.objects.get(id=template_id)
-                    free_minutes = template.free_minutes
-                elif pricing_config and pricing_config.charge_type == 'tiered':
-                    free_minutes = pricing_config.get_free_minutes()
-                else:
-                    free_minutes = int(data.get('free_minutes', 15))
-                
-                daily_max_fee = float(data.get('daily_max_fee', 0)) or None
-                
-                if duration_minutes <= free_minutes:
-                    fee = 0.00
-                    breakdown = [f'前{free_minutes}分钟免费']
-                else:
-                    # 创建临时记录来计算费用
-                    temp_vehicle, _ = Vehicle.objects.get_or_create(
-                        license_plate='TEMP_PREVIEW',
-                        defaults={'vehicle_type': 'car'}
-                    )
-                    temp_space = ParkingSpace.objects.filter(
-                        parking_lot=parking_lot,
-                        is_occupied=False
-                    ).first()
-                    
-                    if temp_space:
-                        # 临时创建费率配置（如果不存在）
-                        if not pricing_config:
-                            from parking.pricing_models import ParkingLotPricing
-                            pricing_config, _ = ParkingLotPricing.objects.get_or_create(
-                                parking_lot=parking_lot,
-                                defaults={'charge_type': 'tiered'}
-                            )
-                        
-                        if template_id:
-                            pricing_config.template_id = template_id
-                        pricing_config.charge_type = 'tiered'
-                        pricing_config.free_minutes = free_minutes
-                        pricing_config.daily_max_fee = daily_max_fee
-                        pricing_config.save()
-                        
-                        temp_record = ParkingRecord.objects.create(
-                            vehicle=temp_vehicle,
-                            parking_space=temp_space,
-                            entry_time=timezone.now() - timedelta(minutes=duration_minutes),
-                            exit_time=timezone.now()
-                        )
-                        fee = float(temp_record.calculate_fee())
-                        temp_record.delete()
-                        
-                        breakdown = [f'前{free_minutes}分钟免费']
-                        breakdown.append(f'计费时长：{duration_minutes - free_minutes}分钟')
-                        
-                        # 获取规则详情
-                        effective_rules = pricing_config.get_effective_rules()
-                        if effective_rules:
-                            breakdown.append('阶梯规则：')
-                            for rule in effective_rules:
-                                start = rule.get('start_minutes', 0)
-                                end = rule.get('end_minutes', '∞')
-                                rate = rule.get('rate_per_hour', 0)
-                                breakdown.append(f'  {start}-{end}分钟：¥{rate:.2f}/小时')
-                        
-                        if daily_max_fee and fee > daily_max_fee:
-                            breakdown.append(f'超过每日上限¥{daily_max_fee:.2f}，按上限计费')
-                            fee = daily_max_fee
-                    else:
-                        fee = 0.00
-                        breakdown = ['无法计算：停车场无可用车位']
-        
-        return JsonResponse({
-            'success': True,
-            'fee': f'{fee:.2f}',
-            'breakdown': breakdown
+
+        if 'durations' in data:
+            durations = data['durations']
+            if isinstance(durations, str):
+                durations = json.loads(durations)
+            durations = [int(minutes) for minutes in durations]
+            if len(durations) > PREVIEW_MAX_DURATIONS:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'一次最多预览{PREVIEW_MAX_DURATIONS}个时长'
+                }, status=400)
+        else:
+            durations = [int(data.get('duration_minutes', 0))]
+
+        tariff = TariffService.compile_proposal(parking_lot, _parse_overrides(data))
+    except PricingTemplate.DoesNotExist:
+        return JsonResponse({'success': False, 'message': '费率模板不存在'}, status=400)
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        return JsonResponse({'success': False, 'message': f'参数错误: {e}'}, status=400)
+
+    results = []
+    for minutes in durations:
+        if minutes <= 0:
+            results.append({'duration_minutes': minutes, 'fee': '0.00', 'breakdown': []})
+            continue
+        results.append({
+            'duration_minutes': minutes,
+            'fee': str(tariff.evaluate(timedelta(minutes=minutes))),
+            'breakdown': _fee_breakdown(tariff, minutes),
         })
-        
+
+    response = {
+        'success': True,
+        'version': tariff.version,
+    }
+    if 'durations' in data:
+        response['results'] = results
+    else:
+        response['fee'] = results[0]['fee']
+        response['breakdown'] = results[0]['breakdown']
+    return JsonResponse(response)
+
+
+def _parse_overrides(data) -> dict:
+    """
+    从请求数据中解析待定费率参数（只包含请求中出现的参数）
+
+    Args:
+        data: 请求数据（JSON 对象或 POST 表单）
+
+    Returns:
+        dict: 待定费率参数（见 TariffService.compile_proposal）
+
+    Raises:
+        ValueError: 参数格式错误
+    """
+    overrides = {}
+    if data.get('charge_type') in ('fixed', 'tiered'):
+        overrides['charge_type'] = data['charge_type']
+    if 'template_id' in data:
+        overrides['template_id'] = int(data['template_id']) if data['template_id'] else None
+    if 'custom_rules' in data:
+        rules = data['custom_rules']
+        overrides['custom_rules'] = json.loads(rules) if isinstance(rules, str) else rules
+    if data.get('free_minutes') not in (None, ''):
+        overrides['free_minutes'] = int(data['free_minutes'])
+    if 'daily_max_fee' in data:
+        overrides['daily_max_fee'] = Decimal(str(data['daily_max_fee'] or 0)) or None
+    if data.get('hourly_rate') not in (None, ''):
+        overrides['hourly_rate'] = Decimal(str(data['hourly_rate']))
+    return overrides
+
+
+@staff_member_required
+@require_http_methods(['POST'])
+def pricing_impact(request):
+    """
+    费率调整试算API
+
+    按当前费率和待定费率重算停车场历史已出场记录的费用（分块批量计算，不写数据库）。
+
+    请求参数：
+        lot_id: 停车场ID
+        days: 统计最近多少天出场的记录（默认90，最多366）
+        charge_type、template_id、custom_rules、free_minutes、daily_max_fee、hourly_rate:
+            待定费率参数，未提供的沿用当前配置
+    """
+    from parking.models import ParkingLot
+    from parking.services.tariff_impact_service import TariffImpactService
+
+    try:
+        data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': '请求数据格式错误'}, status=400)
+        parking_lot = get_object_or_404(ParkingLot, id=data.get('lot_id'))
+        days = min(max(int(data.get('days') or 90), 1), 366)
+        overrides = _parse_overrides(data)
+        proposed = TariffService.compile_proposal(parking_lot, overrides)
+    except PricingTemplate.DoesNotExist:
+        return JsonResponse({'success': False, 'message': '费率模板不存在'}, status=400)
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        return JsonResponse({'success': False, 'message': f'参数错误: {e}'}, status=400)
+
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today - timedelta(days=days - 1), time.min))
+    end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+
+    try:
+        result = TariffImpactService.compare(
+            parking_lot.pk,
+            proposed,
+            start,
+            end,
+            current=TariffService.compile_lot(parking_lot.pk),
+        )
     except Exception as e:
-        logger.exception('费率预览计算失败')
+        logger.exception('费率调整试算失败')
         return JsonResponse({
             'success': False,
-            'message': f'计算失败: {str(e)}'
+            'message': f'试算失败: {str(e)}'
         }, status=500)
 
+    return JsonResponse({
+        'success': True,
+        'data': {
+            **result,
+            'start': result['start'].isoformat(),
+            'end': result['end'].isoformat(),
+        }
+    })
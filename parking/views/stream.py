@@ -0,0 +1,176 @@
+"""
+实时推送视图模块
+
+以 Server-Sent Events 推送停车场占用变化，页面不必定时轮询统计接口。
+只在 ASGI 部署（config.asgi）下提供：WSGI 会先把整个异步流读完才发送，
+连接期间收不到事件且占用一个工作进程，因此 WSGI 下直接返回 503，页面退回定时轮询。
+
+Author: HeZaoCha
+Created: 2025-12-11
+Version: 1.1.0
+"""
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from loguru import logger
+
+from parking.services import occupancy_events
+from parking.services.occupancy_events import OccupancyEvents
+
+# 心跳间隔（秒），防止代理关闭空闲连接
+HEARTBEAT_INTERVAL = 15
+# 单个连接的最长保持时间（秒），到期后由浏览器自动重连，便于服务端滚动重启
+STREAM_MAX_SECONDS = 300
+# 浏览器断线重连间隔（毫秒）
+RECONNECT_DELAY_MS = 3000
+# 每个进程的最大连接数（OCCUPANCY_STREAM_MAX_CONNECTIONS）
+DEFAULT_MAX_CONNECTIONS = 500
+# 每个客户端（登录用户或 IP）的最大并发连接数（OCCUPANCY_STREAM_MAX_PER_CLIENT）
+DEFAULT_MAX_PER_CLIENT = 3
+
+# 本进程当前连接数（ASGI 下所有连接在同一事件循环中，无需加锁）
+_active_streams = 0
+
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    """格式化一条 SSE 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _client_key(request: HttpRequest, user) -> str:
+    """
+    客户端标识：登录用户按用户ID，匿名按 IP
+
+    反向代理后取 X-Forwarded-For 的最后一项（由最近一层代理追加，客户端无法伪造），
+    见部署文档中 Nginx 的推送配置。
+    """
+    if user.is_authenticated:
+        return f'user:{user.pk}'
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return f"ip:{forwarded.split(',')[-1].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', 'unknown')}"
+
+
+async def _acquire_client_slot(key: str) -> bool:
+    """占用客户端的一个连接名额（计数在共享缓存中，过期时间为连接最长保持时间）"""
+    limit = getattr(settings, 'OCCUPANCY_STREAM_MAX_PER_CLIENT', DEFAULT_MAX_PER_CLIENT)
+    await cache.aadd(key, 0, STREAM_MAX_SECONDS + 60)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        # 缓存不可用或计数刚过期：不限制
+        return True
+    if count > limit:
+        await _release_client_slot(key)
+        return False
+    return True
+
+
+async def _release_client_slot(key: str) -> None:
+    try:
+        await cache.adecr(key)
+    except ValueError:
+        pass
+
+
+async def _occupancy_stream(parking_lot_id: int | None, slot_key: str) -> AsyncIterator[str]:
+    """先发送占用快照，再逐条推送占用变化事件（结束时释放连接名额）"""
+    global _active_streams
+    _active_streams += 1
+    subscription = None
+    try:
+        subscription = occupancy_events.subscribe()
+        snapshot = sync_to_async(OccupancyEvents.snapshot)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_MAX_SECONDS
+
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+        yield _sse('snapshot', await snapshot(parking_lot_id))
+
+        while (remaining := deadline - loop.time()) > 0:
+            if subscription.needs_resync:
+                # 丢失过事件：清空积压，重新发送快照
+                subscription.needs_resync = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield _sse('snapshot', await snapshot(parking_lot_id))
+
+            try:
+                seq, event = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=min(HEARTBEAT_INTERVAL, remaining)
+                )
+            except TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+
+            if parking_lot_id is None or event['lot_id'] == parking_lot_id:
+                yield _sse('occupancy', event, seq)
+    finally:
+        if subscription is not None:
+            occupancy_events.unsubscribe(subscription)
+        _active_streams -= 1
+        await _release_client_slot(slot_key)
+
+
+def _unavailable(message: str, error_code: str, status: int) -> JsonResponse:
+    return JsonResponse({'success': False, 'message': message, 'error_code': error_code}, status=status)
+
+
+@require_GET
+async def api_occupancy_stream(request: HttpRequest) -> HttpResponse:
+    """
+    停车场占用实时推送 API（Server-Sent Events）
+
+    连接后先发送 snapshot 事件（各停车场当前计数及汇总），
+    之后在入场/出场等事务提交后推送 occupancy 事件（单个停车场的最新计数和变化量）。
+    推送的数据与公开的统计接口（/api/stats/）相同，不要求登录，但限制连接数：
+    每个登录用户或 IP 最多 OCCUPANCY_STREAM_MAX_PER_CLIENT 个并发连接（超出返回 429），
+    每个进程最多 OCCUPANCY_STREAM_MAX_CONNECTIONS 个（超出返回 503）。
+    非 ASGI 部署返回 503（stream_unavailable），客户端应退回定时轮询统计接口。
+
+    请求参数（GET）：
+        lot_id: 只推送指定停车场（可选）
+
+    事件：
+        snapshot: lots、total_spaces、occupied_spaces、available_spaces
+        occupancy: lot_id、delta、occupied、spaces、available
+    """
+    if not isinstance(request, ASGIRequest):
+        return _unavailable('实时推送不可用，请使用统计接口', 'stream_unavailable', 503)
+
+    max_connections = getattr(settings, 'OCCUPANCY_STREAM_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+    if _active_streams >= max_connections:
+        logger.warning("实时推送连接数已满: {}", _active_streams)
+        return _unavailable('实时推送连接数已满，请稍后重试', 'stream_busy', 503)
+
+    slot_key = f'parking:occupancy_stream:{_client_key(request, await request.auser())}'
+    if not await _acquire_client_slot(slot_key):
+        return _unavailable('实时推送连接过多', 'too_many_streams', 429)
+
+    try:
+        parking_lot_id = int(request.GET['lot_id']) if request.GET.get('lot_id') else None
+    except (TypeError, ValueError):
+        parking_lot_id = None
+
+    response = StreamingHttpResponse(
+        _occupancy_stream(parking_lot_id, slot_key),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 代理缓冲，事件立即送达
+    response['X-Accel-Buffering'] = 'no'
+    return response